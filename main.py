@@ -2,6 +2,7 @@ import sys
 import ctypes # 用于检查管理员权限
 import os     # 用于路径和退出
 import json   # 用于JSON数据处理
+import multiprocessing  # 分片工作进程（freeze_support）
 
 #  全局变量存储弹性心跳监控器
 resilient_heartbeat_monitor = None
@@ -200,6 +201,9 @@ def setup_virtual_environment():
 setup_virtual_environment()
 
 import logging # <--- 添加 logging 模块导入
+import logging.handlers # <-- QueueHandler/QueueListener 异步写日志
+import queue
+import atexit
 import datetime # <-- Import datetime
 import glob     # <-- Import glob
 
@@ -333,6 +337,8 @@ except ImportError:
 
 # --- Constants for Logging ---
 LOG_DIR = "." # Log directory (current directory)
+_log_queue_listener = None # 异步文件日志监听器
+_console_log_handler = None # 控制台日志处理器（调试日志开关调整其级别）
 LOG_FILENAME_FORMAT = "app_%Y-%m-%d.log"
 MAX_LOG_FILES = 10 # Keep the 10 most recent log files
 
@@ -478,14 +484,14 @@ def sanitize_sensitive_data(data, data_type="unknown"):
         return str(data)
 
 # --- Function to Setup Logging and Cleanup Old Logs ---
-def setup_logging_and_cleanup():
-    # --- 1. Cleanup Old Logs ---
-    log_pattern = os.path.join(LOG_DIR, "app_*.log")
+def _cleanup_dated_files(pattern: str):
+    """按文件名中的日期（前缀_YYYY-MM-DD.扩展名）只保留最新的 MAX_LOG_FILES 个文件"""
+    log_pattern = os.path.join(LOG_DIR, pattern)
     existing_logs = []
     for filepath in glob.glob(log_pattern):
         filename = os.path.basename(filepath)
         try:
-            # Extract date string (assuming format app_YYYY-MM-DD.log)
+            # Extract date string (assuming format prefix_YYYY-MM-DD.ext)
             date_str = filename.split('_')[1].split('.')[0]
             log_date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
             existing_logs.append((log_date, filepath))
@@ -507,6 +513,11 @@ def setup_logging_and_cleanup():
             except OSError as e:
                 print(f"错误: 删除日志文件 {filepath} 时出错: {e}")
 
+def setup_logging_and_cleanup():
+    # --- 1. Cleanup Old Logs (app_YYYY-MM-DD.log 和工作流追踪 trace_YYYY-MM-DD.jsonl) ---
+    _cleanup_dated_files("app_*.log")
+    _cleanup_dated_files("trace_????-??-??.jsonl")
+
     # --- 2. Setup Logging for Today ---
     current_log_filename = datetime.date.today().strftime(LOG_FILENAME_FORMAT)
     current_log_filepath = os.path.join(LOG_DIR, current_log_filename)
@@ -517,33 +528,75 @@ def setup_logging_and_cleanup():
     if logger_instance.hasHandlers():
         logger_instance.handlers.clear()
 
-    # --- MODIFIED: Set Level to DEBUG ---
-    logger_instance.setLevel(logging.DEBUG) # Set minimum logging level to DEBUG
-    # -----------------------------------
+    # 默认 INFO；配置中开启 debug_logging 后由 set_debug_logging() 调整为 DEBUG
+    logger_instance.setLevel(logging.INFO)
     formatter = logging.Formatter('%(asctime)s - %(levelname)s - [%(module)s:%(lineno)d] - %(message)s') # Added line number
 
     # File Handler (Dated) - 只记录INFO级别及以上的日志
+    # 通过 QueueHandler + QueueListener 异步写盘，避免工作线程在磁盘IO上阻塞
+    global _log_queue_listener
     try:
         file_handler = logging.FileHandler(current_log_filepath, encoding='utf-8')
         file_handler.setLevel(logging.INFO)  # 文件只记录INFO及以上级别
         file_handler.setFormatter(formatter)
-        logger_instance.addHandler(file_handler)
+        log_queue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.setLevel(logging.INFO)
+        logger_instance.addHandler(queue_handler)
+        if _log_queue_listener is not None:
+            _log_queue_listener.stop()
+        _log_queue_listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+        _log_queue_listener.start()
+        atexit.register(shutdown_logging)
     except Exception as e:
         print(f"错误: 无法设置日志文件处理器 {current_log_filepath}: {e}")
 
-    # Console Handler - 显示所有级别的日志
+    # Console Handler - 同步输出，默认只显示INFO及以上，避免热路径上的DEBUG日志阻塞工作线程
+    global _console_log_handler
     stream_handler = logging.StreamHandler(sys.stdout)
-    stream_handler.setLevel(logging.DEBUG)  # 控制台显示所有级别
+    stream_handler.setLevel(logging.INFO)
     stream_handler.setFormatter(formatter)
     logger_instance.addHandler(stream_handler)
+    _console_log_handler = stream_handler
 
     logging.info(f"日志记录已初始化。当前日志文件: {current_log_filepath}")
-    logging.info("日志配置: 文件记录INFO级别及以上，控制台显示所有级别")
+    logging.info("日志配置: 文件和控制台记录INFO级别及以上")
 
     # --- ADDED: Set urllib3 logging level to INFO to hide detailed connection logs ---
     logging.getLogger("urllib3.connectionpool").setLevel(logging.INFO)
     # -----------------------------------------------------------------------------
 
+    # 工作流结构化追踪：环形缓冲区 + 后台刷写到 trace_YYYY-MM-DD.jsonl
+    try:
+        from utils.workflow_tracer import configure_workflow_tracer
+        configure_workflow_tracer(LOG_DIR)
+    except Exception as e:
+        print(f"错误: 无法启动工作流追踪: {e}")
+
+def set_debug_logging(enabled: bool):
+    """调试日志开关：开启时根日志器和控制台显示DEBUG级别（文件仍只记录INFO及以上）"""
+    level = logging.DEBUG if enabled else logging.INFO
+    logging.getLogger().setLevel(level)
+    if _console_log_handler is not None:
+        _console_log_handler.setLevel(level)
+    if enabled:
+        logging.info("调试日志已开启: 控制台显示DEBUG级别")
+
+def shutdown_logging():
+    """停止工作流追踪和异步日志写入（写完队列中剩余的记录）"""
+    global _log_queue_listener
+    try:
+        from utils.workflow_tracer import shutdown_workflow_tracer
+        shutdown_workflow_tracer()
+    except Exception as e:
+        print(f"错误: 停止工作流追踪时出错: {e}")
+    if _log_queue_listener is not None:
+        try:
+            _log_queue_listener.stop()
+        except Exception as e:
+            print(f"错误: 停止日志队列监听器时出错: {e}")
+        _log_queue_listener = None
+
 # --- Call Setup Early in the script ---
 setup_logging_and_cleanup()
 
@@ -1383,6 +1436,9 @@ def load_config() -> dict:
         'emulator_type': 'auto',        # 游戏 新增：模拟器类型设置
         'binding_method': 'enhanced',   # 工具 新增：绑定方法设置
         'ldplayer_console_path': None,  # 游戏 雷电模拟器控制台路径
+        'adb_framebuffer_capture': False,  # 模拟器窗口使用ADB帧缓冲截图
+        'debug_logging': False,         # 控制台显示DEBUG级别日志
+        'process_shards': 0,            # 多窗口分片执行的工作进程数，0 = 禁用
         # 热键配置 - 使用新的统一键名
         'start_task_hotkey': 'F9',      # 启动任务热键，默认F9
         'stop_task_hotkey': 'F10',      # 停止任务热键，默认F10
@@ -1421,6 +1477,9 @@ def save_config(config_to_save: dict):
         config_to_save.setdefault('emulator_type', 'auto')        # 游戏 新增：模拟器类型设置
         config_to_save.setdefault('binding_method', 'enhanced')   # 工具 新增：绑定方法设置
         config_to_save.setdefault('ldplayer_console_path', None)  # 游戏 雷电模拟器控制台路径
+        config_to_save.setdefault('adb_framebuffer_capture', False)  # 模拟器窗口使用ADB帧缓冲截图
+        config_to_save.setdefault('debug_logging', False)         # 控制台显示DEBUG级别日志
+        config_to_save.setdefault('process_shards', 0)            # 多窗口分片执行的工作进程数，0 = 禁用
 
         # 快捷键配置 - 确保使用新键名
         config_to_save.setdefault('start_task_hotkey', 'F9')
@@ -1445,6 +1504,7 @@ def save_config(config_to_save: dict):
 
 # Load configuration EARLY
 config = load_config()
+set_debug_logging(bool(config.get('debug_logging', False)))
 
 # --- Imports that should happen AFTER potential elevation ---
 # These imports are placed here because they might depend on environment
@@ -2556,6 +2616,9 @@ def enhanced_license_validation_with_config(hardware_id: str, license_key: str =
         return False, 500, None, None
 
 if __name__ == "__main__":
+    # 打包后的程序以 spawn 方式启动分片工作进程，必须最先调用
+    multiprocessing.freeze_support()
+
     # --- ADDED: Set the global exception hook at the very beginning ---
     sys.excepthook = global_exception_handler
     # -----------------------------------------------------------------
@@ -2844,6 +2907,7 @@ if __name__ == "__main__":
                 logging.error(f"错误 关闭统一OCR服务时出错: {e}")
 
         app.aboutToQuit.connect(cleanup_ocr_service)
+        app.aboutToQuit.connect(shutdown_logging)
         # --- END ADDED ---
 
         # 设置程序退出时的清理
@@ -2976,16 +3040,18 @@ if __name__ == "__main__":
         """异步初始化OCR服务，避免阻塞主窗口显示"""
         logging.info("启动 异步初始化统一OCR服务（FastDeploy优先）...")
         try:
-            from services.unified_ocr_service import initialize_unified_ocr_service
+            from services.unified_ocr_service import initialize_unified_ocr_service, warm_up_unified_ocr_service
             ocr_init_success = initialize_unified_ocr_service()
             if ocr_init_success:
                 logging.info("成功 统一OCR服务异步初始化成功，已常驻内存")
+                # 执行一次空白推理预热，避免首张OCR卡片卡顿
+                warm_up_unified_ocr_service()
                 # 获取服务信息
                 try:
                     from services.unified_ocr_service import get_unified_ocr_service
                     service = get_unified_ocr_service()
                     info = service.get_service_info()
-                    logging.info(f"OCR引擎信息: {info['engine_type']}")
+                    logging.info(f"OCR引擎信息: {info['engine_type']}, 模型加载: {info['model_load_time_ms']}ms, 首次推理: {info['first_inference_time_ms']}ms")
                 except Exception as service_info_error:
                     logging.warning(f"获取OCR服务信息失败: {service_info_error}")
             else:
@@ -11,6 +11,8 @@ from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, field
 from concurrent.futures import ThreadPoolExecutor, Future
 import queue
+
+from utils.heavy_op_admission import heavy_operation, OP_OCR
 logger = logging.getLogger(__name__)
 
 # 尝试导入psutil，如果失败则使用替代方案
@@ -219,11 +221,9 @@ class MultiOCRPool:
                 logger.error("FastDeploy不可用，无法创建OCR服务")
                 return None
 
-            # 创建独立的OCR服务实例
-            ocr_service = FastDeployOCRService()
-
-            # 初始化OCR服务
-            if not ocr_service.initialize():
+            # 从已预热的常驻引擎克隆独立实例，避免每个实例重新从磁盘加载模型
+            ocr_service = get_fastdeploy_ocr_service().clone()
+            if ocr_service is None:
                 logger.error(f"OCR服务初始化失败: {service_id}")
                 return None
 
@@ -374,7 +374,8 @@ class MultiOCRPool:
             
             # 执行OCR识别
             logger.debug(f"执行OCR识别: {service_id} (窗口: {window_title})")
-            results = service_instance.ocr_service.recognize_text(image, confidence)
+            with heavy_operation(OP_OCR, window_hwnd):
+                results = service_instance.ocr_service.recognize_text(image, confidence)
             
             # 更新统计信息
             processing_time = time.time() - start_time
@@ -503,6 +504,10 @@ class MultiOCRPool:
                 avg_time = (service_instance.total_processing_time /
                            max(service_instance.total_requests, 1))
 
+                engine_info = {}
+                if hasattr(service_instance.ocr_service, 'get_service_info'):
+                    engine_info = service_instance.ocr_service.get_service_info()
+
                 services_info.append({
                     "service_id": service_id,
                     "assigned_windows": service_instance.assigned_windows.copy(),
@@ -512,7 +517,10 @@ class MultiOCRPool:
                     "total_requests": service_instance.total_requests,
                     "average_processing_time": avg_time,
                     "last_used": service_instance.last_used,
-                    "can_accept_more": service_instance.can_accept_window()
+                    "can_accept_more": service_instance.can_accept_window(),
+                    "model_load_time_ms": engine_info.get('model_load_time_ms'),
+                    "first_inference_time_ms": engine_info.get('first_inference_time_ms'),
+                    "cloned": engine_info.get('cloned', False)
                 })
 
             return services_info
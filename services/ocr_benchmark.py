@@ -0,0 +1,410 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+OCR服务合成基准测试
+用OpenCV渲染中文/数字合成文字区域，按指定并发回放到 UnifiedOCRService、
+FastDeployOCRService 和 MultiOCRPool，统计 p50/p95 延迟、吞吐、单实例内存和准确率。
+
+桩模式（--stub）下用模拟预测器替换FastDeploy管道，无需模型文件即可验证测试框架本身。
+
+用法:
+    python -m services.ocr_benchmark --stub
+    python -m services.ocr_benchmark --targets fastdeploy pool --concurrency 1 4 8 --samples 200
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 合成样本使用的文字
+_CHINESE_WORDS = ["确定", "取消", "领取奖励", "开始战斗", "返回", "体力不足", "挑战", "自动", "商店", "任务完成"]
+_DIGIT_WORDS = ["0", "12", "345", "6789", "1024", "99999", "3/5", "120/120"]
+
+# 渲染中文时尝试的字体（Windows常见字体）
+_CJK_FONT_CANDIDATES = [
+    r"C:\Windows\Fonts\msyh.ttc",
+    r"C:\Windows\Fonts\simhei.ttf",
+    r"C:\Windows\Fonts\simsun.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+]
+
+BENCHMARK_TARGETS = ["unified", "fastdeploy", "pool"]
+
+
+@dataclass
+class SyntheticSample:
+    """合成样本"""
+    image: np.ndarray
+    text: str
+    font_scale: float
+
+
+@dataclass
+class BenchmarkResult:
+    """单个目标/并发组合的测试结果"""
+    target: str
+    concurrency: int
+    samples: int
+    p50_ms: float = 0.0
+    p95_ms: float = 0.0
+    mean_ms: float = 0.0
+    throughput_per_sec: float = 0.0
+    accuracy: float = 0.0
+    instances: int = 1
+    memory_per_instance_mb: Optional[float] = None
+    errors: int = 0
+    extra: Dict[str, object] = field(default_factory=dict)
+
+
+def _image_key(image: np.ndarray) -> str:
+    """计算图像内容摘要（桩预测器用来查找真值）"""
+    return hashlib.md5(np.ascontiguousarray(image).tobytes()).hexdigest()
+
+
+def _find_cjk_font(size: int):
+    """查找可用的中文字体"""
+    if not PIL_AVAILABLE:
+        return None
+    for font_path in _CJK_FONT_CANDIDATES:
+        if os.path.exists(font_path):
+            try:
+                return ImageFont.truetype(font_path, size)
+            except Exception:
+                continue
+    return None
+
+
+def render_text_region(text: str, font_scale: float) -> Optional[np.ndarray]:
+    """渲染单个文字区域（BGR），中文需要PIL和中文字体，否则返回None"""
+    if not CV2_AVAILABLE:
+        raise RuntimeError("OpenCV不可用，无法生成合成样本")
+
+    is_ascii = all(ord(ch) < 128 for ch in text)
+    pixel_height = max(12, int(24 * font_scale))
+    pad = pixel_height // 2
+
+    if is_ascii:
+        (text_w, text_h), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 2)
+        image = np.full((text_h + baseline + pad * 2, text_w + pad * 2, 3), 255, dtype=np.uint8)
+        cv2.putText(image, text, (pad, pad + text_h), cv2.FONT_HERSHEY_SIMPLEX,
+                    font_scale, (0, 0, 0), 2, cv2.LINE_AA)
+        return image
+
+    font = _find_cjk_font(pixel_height)
+    if font is None:
+        return None
+    text_w = int(font.getlength(text)) if hasattr(font, 'getlength') else pixel_height * len(text)
+    canvas = Image.new("RGB", (text_w + pad * 2, pixel_height + pad * 2), (255, 255, 255))
+    ImageDraw.Draw(canvas).text((pad, pad), text, font=font, fill=(0, 0, 0))
+    return cv2.cvtColor(np.array(canvas), cv2.COLOR_RGB2BGR)
+
+
+def generate_samples(count: int, font_scales: Tuple[float, ...] = (0.6, 1.0, 1.6, 2.4),
+                     seed: int = 0) -> List[SyntheticSample]:
+    """生成合成样本（中文字体不可用时只生成数字样本）"""
+    rng = random.Random(seed)
+    words = _CHINESE_WORDS + _DIGIT_WORDS
+    samples = []
+    while len(samples) < count:
+        text = rng.choice(words)
+        scale = rng.choice(font_scales)
+        image = render_text_region(text, scale)
+        if image is None:
+            # 中文字体不可用，改用数字样本
+            words = _DIGIT_WORDS
+            continue
+        samples.append(SyntheticSample(image=image, text=text, font_scale=scale))
+    return samples
+
+
+class _StubResult:
+    """模拟FastDeploy OCRResult"""
+
+    def __init__(self, text: str, width: int, height: int):
+        self.boxes = [np.array([0, 0, width, 0, width, height, 0, height])] if text else []
+        self.text = [text] if text else []
+        self.rec_scores = [0.99] if text else []
+
+
+class StubPredictor:
+    """
+    模拟PPOCRv3管道：按固定耗时（可带抖动）返回预先登记的真值文字
+    """
+
+    def __init__(self, truth: Dict[str, str], latency_ms: float = 20.0, jitter_ms: float = 5.0):
+        self._truth = truth
+        self._latency_ms = latency_ms
+        self._jitter_ms = jitter_ms
+        # 模拟单个预测器内部不可并发
+        self._lock = threading.Lock()
+
+    def predict(self, image: np.ndarray) -> _StubResult:
+        with self._lock:
+            delay = self._latency_ms + random.uniform(-self._jitter_ms, self._jitter_ms)
+            if delay > 0:
+                time.sleep(delay / 1000.0)
+            text = self._truth.get(_image_key(image), "")
+            return _StubResult(text, image.shape[1], image.shape[0])
+
+    def clone(self) -> 'StubPredictor':
+        return StubPredictor(self._truth, self._latency_ms, self._jitter_ms)
+
+
+def install_stub_predictor(samples: List[SyntheticSample], latency_ms: float = 20.0,
+                           jitter_ms: float = 5.0) -> StubPredictor:
+    """用桩预测器替换常驻FastDeploy引擎，并让统一OCR服务使用它"""
+    from services import fastdeploy_ocr_service
+    from services.unified_ocr_service import get_unified_ocr_service
+
+    if fastdeploy_ocr_service.cv2 is None:
+        fastdeploy_ocr_service.cv2 = cv2
+
+    # FastDeployOCRService.recognize_text 会先把BGR转成RGB，真值按转换后的图像登记
+    truth = {_image_key(cv2.cvtColor(s.image, cv2.COLOR_BGR2RGB)): s.text for s in samples}
+    stub = StubPredictor(truth, latency_ms, jitter_ms)
+
+    service = fastdeploy_ocr_service.get_fastdeploy_ocr_service()
+    service._ocr_pipeline = stub
+    service._service_active = True
+    service._model_load_time_ms = 0.0
+
+    unified = get_unified_ocr_service()
+    unified._ocr_engine = service
+    unified._engine_type = 'fastdeploy'
+    unified._service_active = True
+    return stub
+
+
+def _current_rss_mb() -> Optional[float]:
+    if not PSUTIL_AVAILABLE:
+        return None
+    return psutil.Process().memory_info().rss / 1024 / 1024
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def _is_correct(results: List[Dict], expected: str) -> bool:
+    recognized = "".join(r.get('text', '') for r in results).replace(" ", "")
+    return recognized == expected.replace(" ", "")
+
+
+def _run_load(recognize: Callable[[int, np.ndarray], List[Dict]], samples: List[SyntheticSample],
+              concurrency: int) -> Tuple[List[float], int, int, float]:
+    """按并发度回放样本，返回 (延迟列表ms, 正确数, 错误数, 总耗时s)"""
+    latencies: List[float] = []
+    correct = 0
+    errors = 0
+    stats_lock = threading.Lock()
+
+    def worker(index: int, sample: SyntheticSample):
+        nonlocal correct, errors
+        start = time.perf_counter()
+        try:
+            results = recognize(index % concurrency, sample.image)
+            ok = _is_correct(results, sample.text)
+            failed = False
+        except Exception as e:
+            logger.debug(f"基准测试识别异常: {e}")
+            ok, failed = False, True
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with stats_lock:
+            latencies.append(elapsed_ms)
+            correct += int(ok)
+            errors += int(failed)
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for index, sample in enumerate(samples):
+            executor.submit(worker, index, sample)
+    wall_time = time.perf_counter() - wall_start
+    return latencies, correct, errors, wall_time
+
+
+def _summarize(target: str, concurrency: int, samples: List[SyntheticSample],
+               load: Tuple[List[float], int, int, float]) -> BenchmarkResult:
+    latencies, correct, errors, wall_time = load
+    ordered = sorted(latencies)
+    return BenchmarkResult(
+        target=target,
+        concurrency=concurrency,
+        samples=len(samples),
+        p50_ms=_percentile(ordered, 50),
+        p95_ms=_percentile(ordered, 95),
+        mean_ms=sum(ordered) / max(len(ordered), 1),
+        throughput_per_sec=len(samples) / wall_time if wall_time > 0 else 0.0,
+        accuracy=correct / max(len(samples), 1),
+        errors=errors,
+    )
+
+
+def benchmark_unified(samples: List[SyntheticSample], concurrency: int) -> BenchmarkResult:
+    """测试统一OCR服务（单个常驻引擎）"""
+    from services.unified_ocr_service import get_unified_ocr_service
+
+    service = get_unified_ocr_service()
+    rss_before = _current_rss_mb()
+    if not service.warm_up():
+        raise RuntimeError("统一OCR服务初始化失败")
+    rss_after = _current_rss_mb()
+
+    result = _summarize('unified', concurrency, samples,
+                        _run_load(lambda _, image: service.recognize_text(image, 0.0), samples, concurrency))
+    if rss_before is not None and rss_after is not None:
+        result.memory_per_instance_mb = max(0.0, rss_after - rss_before)
+    result.extra = {k: v for k, v in service.get_service_info().items()
+                    if k in ('model_load_time_ms', 'first_inference_time_ms')}
+    return result
+
+
+def benchmark_fastdeploy(samples: List[SyntheticSample], concurrency: int) -> BenchmarkResult:
+    """测试FastDeploy服务：每个并发线程使用一个克隆实例"""
+    from services.fastdeploy_ocr_service import get_fastdeploy_ocr_service
+
+    base = get_fastdeploy_ocr_service()
+    if not base.warm_up():
+        raise RuntimeError("FastDeploy OCR服务初始化失败")
+
+    rss_before = _current_rss_mb()
+    instances = [base] + [base.clone() for _ in range(concurrency - 1)]
+    instances = [instance for instance in instances if instance is not None]
+    rss_after = _current_rss_mb()
+
+    result = _summarize('fastdeploy', concurrency, samples,
+                        _run_load(lambda slot, image: instances[slot % len(instances)].recognize_text(image, 0.0),
+                                  samples, concurrency))
+    result.instances = len(instances)
+    if rss_before is not None and rss_after is not None and len(instances) > 1:
+        result.memory_per_instance_mb = max(0.0, rss_after - rss_before) / (len(instances) - 1)
+    clone_times = [i.get_service_info()['model_load_time_ms'] for i in instances[1:]]
+    result.extra = {'clone_time_ms': clone_times}
+    return result
+
+
+def benchmark_pool(samples: List[SyntheticSample], concurrency: int) -> BenchmarkResult:
+    """测试多OCR服务池：每个并发线程模拟一个窗口"""
+    from services.multi_ocr_pool import MultiOCRPool
+
+    pool = MultiOCRPool(max_services=max(1, concurrency))
+    try:
+        rss_before = _current_rss_mb()
+        fake_hwnds = [100000 + slot for slot in range(concurrency)]
+        for slot, hwnd in enumerate(fake_hwnds):
+            pool.preregister_window(f"benchmark_window_{slot}", hwnd)
+        rss_after = _current_rss_mb()
+
+        result = _summarize('pool', concurrency, samples,
+                            _run_load(lambda slot, image: pool.recognize_text(
+                                f"benchmark_window_{slot}", fake_hwnds[slot], image, 0.0), samples, concurrency))
+        service_count = len(pool.get_service_info())
+        result.instances = service_count
+        if rss_before is not None and rss_after is not None and service_count:
+            result.memory_per_instance_mb = max(0.0, rss_after - rss_before) / service_count
+        return result
+    finally:
+        pool.shutdown()
+
+
+_BENCHMARKS = {
+    'unified': benchmark_unified,
+    'fastdeploy': benchmark_fastdeploy,
+    'pool': benchmark_pool,
+}
+
+
+def run_benchmark(targets: List[str] = None, concurrency_levels: List[int] = None, sample_count: int = 100,
+                  stub: bool = False, stub_latency_ms: float = 20.0, seed: int = 0) -> List[BenchmarkResult]:
+    """运行基准测试，返回所有结果"""
+    targets = targets or list(BENCHMARK_TARGETS)
+    concurrency_levels = concurrency_levels or [1, 4]
+
+    samples = generate_samples(sample_count, seed=seed)
+    if stub:
+        install_stub_predictor(samples, latency_ms=stub_latency_ms)
+
+    results = []
+    for target in targets:
+        for concurrency in concurrency_levels:
+            try:
+                result = _BENCHMARKS[target](samples, concurrency)
+            except Exception as e:
+                logger.error(f"基准测试失败: {target} x{concurrency}: {e}")
+                result = BenchmarkResult(target=target, concurrency=concurrency, samples=len(samples),
+                                         errors=len(samples), extra={'error': str(e)})
+            logger.info(f"[OCR基准] {target} 并发{concurrency}: p50={result.p50_ms:.1f}ms p95={result.p95_ms:.1f}ms "
+                        f"吞吐={result.throughput_per_sec:.1f}/s 准确率={result.accuracy:.1%}")
+            results.append(result)
+    return results
+
+
+def format_results(results: List[BenchmarkResult]) -> str:
+    """将结果格式化为文本表格"""
+    header = f"{'目标':<12}{'并发':>6}{'样本':>6}{'p50(ms)':>10}{'p95(ms)':>10}{'吞吐(/s)':>10}{'准确率':>8}{'实例':>6}{'内存/实例(MB)':>14}"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        memory = f"{r.memory_per_instance_mb:.1f}" if r.memory_per_instance_mb is not None else "-"
+        lines.append(f"{r.target:<12}{r.concurrency:>6}{r.samples:>6}{r.p50_ms:>10.1f}{r.p95_ms:>10.1f}"
+                     f"{r.throughput_per_sec:>10.1f}{r.accuracy:>8.1%}{r.instances:>6}{memory:>14}")
+    return "\n".join(lines)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="OCR服务合成基准测试")
+    parser.add_argument('--targets', nargs='+', choices=BENCHMARK_TARGETS, default=list(BENCHMARK_TARGETS))
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4])
+    parser.add_argument('--samples', type=int, default=100)
+    parser.add_argument('--stub', action='store_true', help="使用桩预测器（无需模型文件）")
+    parser.add_argument('--stub-latency-ms', type=float, default=20.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', dest='json_path', help="将结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    results = run_benchmark(args.targets, args.concurrency, args.samples,
+                            stub=args.stub, stub_latency_ms=args.stub_latency_ms, seed=args.seed)
+    print(format_results(results))
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump([asdict(r) for r in results], f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -210,6 +210,14 @@ class UnifiedOCRService:
 
                 return []
 
+    def warm_up(self) -> bool:
+        """初始化并预热OCR引擎（执行一次空白推理）"""
+        if not self.is_ready() and not self.initialize():
+            return False
+        if self._engine_type == 'fastdeploy' and hasattr(self._ocr_engine, 'warm_up'):
+            return self._ocr_engine.warm_up()
+        return True
+
     def _recognize_with_paddleocr(self, image: np.ndarray, confidence: float) -> List[Dict[str, Any]]:
         """使用PaddleOCR识别文字（已废弃）"""
         logger.warning("PaddleOCR已被移除，无法执行识别")
@@ -217,6 +225,13 @@ class UnifiedOCRService:
 
     def get_service_info(self) -> Dict[str, Any]:
         """获取服务信息"""
+        engine_info = {}
+        if self._ocr_engine is not None and hasattr(self._ocr_engine, 'get_service_info'):
+            try:
+                engine_info = self._ocr_engine.get_service_info()
+            except Exception as e:
+                logger.debug(f"获取引擎信息失败: {e}")
+
         return {
             'engine_type': self._engine_type,
             'service_active': self._service_active,
@@ -225,7 +240,10 @@ class UnifiedOCRService:
             'init_error': self._init_error,
             'fastdeploy_available': FASTDEPLOY_AVAILABLE,
             'paddleocr_available': PADDLEOCR_AVAILABLE,
-            'preferred_engine': self._preferred_engine
+            'preferred_engine': self._preferred_engine,
+            'model_load_time_ms': engine_info.get('model_load_time_ms'),
+            'first_inference_time_ms': engine_info.get('first_inference_time_ms'),
+            'warmed_up': engine_info.get('warmed_up', False)
         }
 
     def shutdown(self):
@@ -259,6 +277,11 @@ def initialize_unified_ocr_service(engine_type: str = None) -> bool:
     service = get_unified_ocr_service()
     return service.initialize(engine_type=engine_type)
 
+def warm_up_unified_ocr_service() -> bool:
+    """初始化并预热统一OCR服务（建议在主窗口显示后于后台线程调用）"""
+    service = get_unified_ocr_service()
+    return service.warm_up()
+
 def is_unified_ocr_service_ready() -> bool:
     """检查统一OCR服务是否就绪"""
     service = get_unified_ocr_service()
@@ -381,8 +381,16 @@ class AdvancedADBKeyboardSetup:
         logger.info(f"📦 异步安装ADBKeyboard: {device_id}")
         return self.adb_pool.execute_command_async(command)
 
+    @staticmethod
+    def _invalidate_app_queries():
+        """安装后清除雷电控制台的应用查询缓存（模块未加载时没有缓存，不为此导入任务模块）"""
+        app_manager = sys.modules.get('tasks.ldplayer_app_manager')
+        if app_manager is not None:
+            app_manager.invalidate_console_cache()
+
     def _install_callback(self, success: bool, stdout: str, stderr: str):
         """安装回调函数"""
+        self._invalidate_app_queries()
         if success:
             logger.info("✅ ADBKeyboard安装成功")
         else:
@@ -401,6 +409,7 @@ class AdvancedADBKeyboardSetup:
 
         logger.info(f"📦 安装ADBKeyboard: {device_id}")
         success, stdout, stderr = self.adb_pool.execute_command_sync(command)
+        self._invalidate_app_queries()
 
         if success:
             logger.info(f"✅ ADBKeyboard安装成功: {device_id}")
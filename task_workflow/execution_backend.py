@@ -0,0 +1,532 @@
+# -*- coding: utf-8 -*-
+
+"""
+执行后端接口
+无界面执行器只通过这里的抽象接口访问平台能力：
+- CaptureBackend: 窗口截图（Win32CaptureBackend 为 GDI 截图，AdbCaptureBackend 读取模拟器的帧缓冲）
+- InputBackend: 鼠标/键盘输入
+- WindowBackend: 窗口状态查询（WindowInfoSource）和激活
+
+Win32ExecutionBackend 包装现有的 pywin32 实现（延迟导入，模块本身不依赖 pywin32）；
+FakeWindowBackend 用回放帧作为截图并记录所有输入调用，用于在 Linux 上跑完整工作流做吞吐基准和性能回归。
+
+截图设置 CaptureSettings.adb_framebuffer（配置项 adb_framebuffer_capture）打开后，Win32 截图按窗口句柄查找
+MuMu/雷电 模拟器的 ADB 序列号（resolve_emulator_serial）并登记 ADB 帧缓冲截图，找不到设备的窗口仍走 GDI。
+
+执行器在运行线程上登记当前后端，任务模块通过 get_execution_backend() 获取截图和输入接口；
+登记后端的同时登记它的窗口状态监视器，utils.window_state 的 is_window_valid/get_window_state 随之读取该后端的窗口。
+
+目前走后端的任务调用：
+- 截图：查找图片并点击、OCR文字识别、找色功能、鼠标操作中的识图
+- 后台点击：查找图片并点击、点击坐标（非 Win32 后端时坐标直接按客户区坐标使用）
+- 窗口状态：所有通过 utils.window_state 查询的任务
+前台输入、找色躲避的按键按住和模拟器专用输入仍直接调用平台实现。
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from utils.window_state import (WindowInfoSource, Win32WindowInfoSource, FakeWindowInfoSource,
+                                WindowStateWatcher, get_window_state_watcher, set_current_window_watcher,
+                                set_default_window_watcher, get_window_state, PYWIN32_AVAILABLE)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CaptureSettings:
+    """截图设置（全局）"""
+    adb_framebuffer: bool = False  # 模拟器窗口改用 ADB 帧缓冲截图
+
+
+_capture_settings = CaptureSettings()
+
+
+def get_capture_settings() -> CaptureSettings:
+    """获取全局截图设置"""
+    return _capture_settings
+
+
+def resolve_emulator_serial(hwnd: int) -> Optional[str]:
+    """按窗口句柄查找 MuMu/雷电 模拟器的 ADB 序列号（地址:端口），不是模拟器窗口时返回 None"""
+    try:
+        from utils.mumu_manager import get_mumu_manager
+        manager = get_mumu_manager()
+        if manager.is_available():
+            vm_index = manager.get_vm_index_by_hwnd(hwnd)
+            if vm_index is not None:
+                vm_info = manager.get_vm_info(vm_index) or {}
+                if vm_info.get('adb_port'):
+                    return f"{vm_info.get('adb_host_ip') or '127.0.0.1'}:{vm_info['adb_port']}"
+    except Exception as e:
+        logger.debug(f"查找窗口 {hwnd} 对应的MuMu设备失败: {e}")
+
+    try:
+        from utils.ldplayer_manager import get_ldplayer_manager
+        manager = get_ldplayer_manager()
+        if manager.is_available():
+            instance = manager.get_instance_by_hwnd(hwnd)
+            if instance and instance.get('adb_port'):
+                return f"127.0.0.1:{instance['adb_port']}"
+    except Exception as e:
+        logger.debug(f"查找窗口 {hwnd} 对应的雷电设备失败: {e}")
+    return None
+
+
+class CaptureBackend:
+    """截图接口"""
+
+    def capture(self, hwnd: int) -> Optional[np.ndarray]:
+        """截取窗口客户区（BGR），失败返回 None"""
+        raise NotImplementedError
+
+
+class InputBackend:
+    """输入接口"""
+
+    def click(self, hwnd: int, x: int, y: int, button: str = 'left', clicks: int = 1,
+              interval: float = 0.1) -> bool:
+        """在窗口客户区坐标点击"""
+        raise NotImplementedError
+
+    def drag(self, hwnd: int, start: Tuple[int, int], end: Tuple[int, int], duration: float = 0.5) -> bool:
+        raise NotImplementedError
+
+    def send_key(self, hwnd: int, key: str) -> bool:
+        raise NotImplementedError
+
+    def send_text(self, hwnd: int, text: str) -> bool:
+        raise NotImplementedError
+
+    def release_key(self, hwnd: int, key: str, execution_mode: str = 'background') -> bool:
+        """释放按键（支持 "ctrl+w" 形式的组合键）"""
+        raise NotImplementedError
+
+
+class WindowBackend(WindowInfoSource):
+    """窗口接口：在 WindowInfoSource 的查询之外提供激活"""
+
+    def activate(self, hwnd: int) -> bool:
+        """把窗口切到前台"""
+        raise NotImplementedError
+
+
+class ExecutionBackend:
+    """执行后端：截图、输入、窗口三个接口的组合"""
+
+    name = 'abstract'
+
+    def __init__(self, capture: CaptureBackend, input: InputBackend, window: WindowBackend):
+        self.capture = capture
+        self.input = input
+        self.window = window
+
+    @property
+    def available(self) -> bool:
+        """当前环境能否使用该后端"""
+        return True
+
+    @property
+    def window_watcher(self) -> WindowStateWatcher:
+        """该后端使用的窗口状态监视器"""
+        raise NotImplementedError
+
+
+# ----------------------------------------------------------------------
+# Win32 实现
+# ----------------------------------------------------------------------
+class Win32CaptureBackend(CaptureBackend):
+    """
+    后台截图（BitBlt/PrintWindow）
+
+    截图设置打开 ADB 帧缓冲截图时，先按窗口句柄登记模拟器设备，
+    capture_window_background 对已登记的窗口直接返回设备帧。
+    """
+
+    def __init__(self):
+        self._adb: Optional['AdbCaptureBackend'] = None
+
+    def capture(self, hwnd: int) -> Optional[np.ndarray]:
+        try:
+            from utils.win32_utils import capture_window_background
+        except ImportError:
+            return None
+        if get_capture_settings().adb_framebuffer:
+            if self._adb is None:
+                self._adb = AdbCaptureBackend(resolver=resolve_emulator_serial)
+            self._adb.ensure_registered(hwnd)
+        elif self._adb is not None:
+            # 设置关闭后撤销按需登记的窗口
+            self._adb.release_resolved()
+            self._adb = None
+        return capture_window_background(hwnd)
+
+
+class AdbCaptureBackend(CaptureBackend):
+    """
+    ADB 帧缓冲截图：已登记的模拟器窗口返回设备最新帧，其他窗口交给 fallback（默认 GDI 截图）
+
+    Args:
+        resolver: 函数(hwnd) -> 设备序列号 或 None，用于按需登记未显式登记的窗口（如 resolve_emulator_serial）
+        fallback: 取不到设备帧时使用的截图接口，None 表示 GDI 截图
+    """
+
+    UNRESOLVED_RETRY_SECONDS = 30.0
+
+    def __init__(self, resolver: Optional[Callable[[int], Optional[str]]] = None,
+                 fallback: Optional[CaptureBackend] = None):
+        from utils.adb_framebuffer import get_adb_capture_manager
+        self.manager = get_adb_capture_manager()
+        self.resolver = resolver
+        self.fallback = fallback if fallback is not None else Win32CaptureBackend()
+        self._unresolved: Dict[int, float] = {}  # 找不到设备的窗口 -> 查找时间（time.monotonic）
+        self._resolved: set = set()
+
+    def register_window(self, hwnd: int, serial: str, output_size: Optional[Tuple[int, int]] = None):
+        """登记窗口对应的设备（output_size 为输出尺寸 (宽, 高)）"""
+        self.manager.register_window(hwnd, serial, output_size)
+
+    def ensure_registered(self, hwnd: int) -> bool:
+        """
+        窗口未登记时用 resolver 查找设备并登记（输出尺寸取窗口客户区，与 GDI 截图坐标一致）；
+        找不到设备的窗口在 UNRESOLVED_RETRY_SECONDS 内不重复查找（模拟器稍后启动或 ADB 稍后连上时能重新登记）
+        """
+        if self.manager.is_registered(hwnd):
+            return True
+        if self.resolver is None:
+            return False
+        failed_at = self._unresolved.get(hwnd)
+        if failed_at is not None and time.monotonic() - failed_at < self.UNRESOLVED_RETRY_SECONDS:
+            return False
+        serial = self.resolver(hwnd)
+        if not serial:
+            self._unresolved[hwnd] = time.monotonic()
+            return False
+        self._unresolved.pop(hwnd, None)
+        state = get_window_state(hwnd)
+        width, height = state.client_size
+        self.manager.register_window(hwnd, serial, (width, height) if state.valid and width > 0 and height > 0 else None)
+        self._resolved.add(hwnd)
+        return True
+
+    def release_resolved(self):
+        """撤销按需登记的窗口"""
+        for hwnd in list(self._resolved):
+            self.manager.unregister_window(hwnd)
+        self._resolved.clear()
+        self._unresolved.clear()
+
+    def capture(self, hwnd: int) -> Optional[np.ndarray]:
+        self.ensure_registered(hwnd)
+        frame = self.manager.capture(hwnd)
+        if frame is None and self.fallback is not None:
+            return self.fallback.capture(hwnd)
+        return frame
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """每台设备的帧率、每帧字节数和错误数"""
+        return self.manager.get_stats()
+
+
+# 后台按键用的虚拟键码
+_VIRTUAL_KEY_CODES = {
+    'w': 0x57, 's': 0x53, 'a': 0x41, 'd': 0x44,
+    'up': 0x26, 'down': 0x28, 'left': 0x25, 'right': 0x27,
+    'space': 0x20, 'enter': 0x0D, 'shift': 0x10, 'ctrl': 0x11, 'alt': 0x12,
+}
+
+
+class Win32InputBackend(InputBackend):
+    """基于窗口消息（后台）或 pyautogui（前台）的输入"""
+
+    def click(self, hwnd: int, x: int, y: int, button: str = 'left', clicks: int = 1,
+              interval: float = 0.1) -> bool:
+        from utils.win32_utils import click_background
+        return click_background(hwnd, x, y, button=button, clicks=clicks, interval=interval)
+
+    @staticmethod
+    def _simulator(hwnd: int):
+        from utils.input_simulation.factory import global_input_simulator_manager
+        return global_input_simulator_manager.get_simulator(hwnd)
+
+    def drag(self, hwnd: int, start: Tuple[int, int], end: Tuple[int, int], duration: float = 0.5) -> bool:
+        simulator = self._simulator(hwnd)
+        return bool(simulator and simulator.drag(start[0], start[1], end[0], end[1], duration=duration))
+
+    def send_key(self, hwnd: int, key: str) -> bool:
+        vk_code = _VIRTUAL_KEY_CODES.get(key.lower())
+        if vk_code is None and len(key) == 1:
+            import win32api
+            vk_code = win32api.VkKeyScan(key) & 0xFF
+        simulator = self._simulator(hwnd)
+        return bool(simulator and vk_code is not None and simulator.send_key(vk_code))
+
+    def send_text(self, hwnd: int, text: str) -> bool:
+        simulator = self._simulator(hwnd)
+        return bool(simulator and simulator.send_text(text))
+
+    def release_key(self, hwnd: int, key: str, execution_mode: str = 'background') -> bool:
+        keys = [k.strip() for k in key.split('+')] if '+' in key else [key.strip()]
+        if execution_mode.startswith('foreground'):
+            import pyautogui
+            for single_key in keys:
+                try:
+                    pyautogui.keyUp(single_key)
+                    logger.debug(f"  释放按键: {single_key}")
+                except Exception as e:
+                    logger.warning(f"释放按键 {single_key} 失败: {e}")
+            return True
+
+        if not hwnd:
+            return False
+        try:
+            import win32api
+            import win32con
+            for single_key in keys:
+                vk_code = _VIRTUAL_KEY_CODES.get(single_key.lower())
+                if vk_code is not None:
+                    win32api.PostMessage(hwnd, win32con.WM_KEYUP, vk_code, 0)
+                    logger.debug(f"  后台释放按键: {single_key}")
+            return True
+        except Exception as e:
+            logger.warning(f"后台释放按键 {key} 失败: {e}")
+            return False
+
+
+class Win32WindowBackend(Win32WindowInfoSource, WindowBackend):
+    """Win32 窗口查询和激活"""
+
+    def activate(self, hwnd: int) -> bool:
+        try:
+            import win32gui
+        except ImportError:
+            logger.warning("pywin32 不可用，无法激活窗口")
+            return False
+        try:
+            if not hwnd or not win32gui.IsWindow(hwnd):
+                logger.warning(f"目标窗口句柄无效: {hwnd}")
+                return False
+
+            try:
+                window_title = win32gui.GetWindowText(hwnd)
+            except Exception:
+                window_title = f"HWND:{hwnd}"
+
+            logger.info(f"前台模式：激活目标窗口 {window_title} (HWND: {hwnd})")
+
+            # 检查窗口是否已经是前台窗口
+            if win32gui.GetForegroundWindow() == hwnd:
+                logger.info(f"窗口已是前台窗口，无需激活: {window_title}")
+                return True
+
+            # 检查窗口是否最小化
+            if win32gui.IsIconic(hwnd):
+                logger.info(f"窗口已最小化，正在恢复: {window_title}")
+                win32gui.ShowWindow(hwnd, 9)  # SW_RESTORE = 9
+                time.sleep(0.2)  # 等待窗口恢复
+
+            # 激活窗口
+            win32gui.SetForegroundWindow(hwnd)
+            time.sleep(0.1)  # 等待窗口激活
+
+            # 验证激活是否成功
+            new_foreground = win32gui.GetForegroundWindow()
+            if new_foreground == hwnd:
+                logger.info(f"窗口激活成功: {window_title}")
+                return True
+
+            logger.warning(f"窗口激活可能失败: 期望={hwnd}, 实际={new_foreground}")
+            # 尝试备用方法
+            try:
+                win32gui.BringWindowToTop(hwnd)
+                logger.info(f"使用备用方法将窗口置顶: {window_title}")
+                return True
+            except Exception as e:
+                logger.error(f"备用激活方法失败: {e}")
+                return False
+
+        except Exception as e:
+            logger.error(f"激活目标窗口时出错: {e}")
+            return False
+
+
+class Win32ExecutionBackend(ExecutionBackend):
+    """Win32 执行后端（桌面环境默认）"""
+
+    name = 'win32'
+
+    def __init__(self):
+        super().__init__(Win32CaptureBackend(), Win32InputBackend(), Win32WindowBackend())
+
+    @property
+    def available(self) -> bool:
+        return PYWIN32_AVAILABLE
+
+    @property
+    def window_watcher(self) -> WindowStateWatcher:
+        return get_window_state_watcher()
+
+
+# ----------------------------------------------------------------------
+# 假窗口实现
+# ----------------------------------------------------------------------
+FrameSource = Union[Sequence[np.ndarray], Callable[[int, int], Optional[np.ndarray]]]
+
+
+class _FakeCapture(CaptureBackend):
+    def __init__(self, owner: 'FakeWindowBackend'):
+        self._owner = owner
+
+    def capture(self, hwnd: int) -> Optional[np.ndarray]:
+        return self._owner.next_frame(hwnd)
+
+
+class _FakeInput(InputBackend):
+    def __init__(self, owner: 'FakeWindowBackend'):
+        self._owner = owner
+
+    def click(self, hwnd: int, x: int, y: int, button: str = 'left', clicks: int = 1,
+              interval: float = 0.1) -> bool:
+        return self._owner.record_input(hwnd, 'click', x, y, button, clicks)
+
+    def drag(self, hwnd: int, start: Tuple[int, int], end: Tuple[int, int], duration: float = 0.5) -> bool:
+        return self._owner.record_input(hwnd, 'drag', start, end, duration)
+
+    def send_key(self, hwnd: int, key: str) -> bool:
+        return self._owner.record_input(hwnd, 'key', key)
+
+    def send_text(self, hwnd: int, text: str) -> bool:
+        return self._owner.record_input(hwnd, 'text', text)
+
+    def release_key(self, hwnd: int, key: str, execution_mode: str = 'background') -> bool:
+        return self._owner.record_input(hwnd, 'release_key', key)
+
+
+class _FakeWindow(WindowBackend):
+    def __init__(self, owner: 'FakeWindowBackend'):
+        self._owner = owner
+
+    def query(self, hwnd: int):
+        return self._owner.window_source.query(hwnd)
+
+    def activate(self, hwnd: int) -> bool:
+        self._owner.record_input(hwnd, 'activate')
+        return self.query(hwnd) is not None
+
+
+class FakeWindowBackend(ExecutionBackend):
+    """
+    假窗口后端：回放帧作为截图，记录所有输入调用
+
+    Args:
+        frames: {hwnd: 帧列表（循环回放）或 函数(hwnd, 截图序号) -> 帧}
+        window_size: 假窗口客户区尺寸，未指定时取首帧尺寸
+    """
+
+    name = 'fake'
+
+    def __init__(self, frames: Optional[Dict[int, FrameSource]] = None,
+                 window_size: Optional[Tuple[int, int]] = None):
+        super().__init__(_FakeCapture(self), _FakeInput(self), _FakeWindow(self))
+        self._frames: Dict[int, FrameSource] = {}
+        self._capture_counts: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.window_source = FakeWindowInfoSource()
+        self._watcher = WindowStateWatcher(self.window)
+        self.input_log: List[Tuple[float, int, str, Tuple[Any, ...]]] = []
+        for hwnd, source in (frames or {}).items():
+            self.add_window(hwnd, source, window_size)
+
+    def add_window(self, hwnd: int, frames: FrameSource, window_size: Optional[Tuple[int, int]] = None,
+                   title: str = ""):
+        """添加假窗口"""
+        if window_size is None:
+            first = frames(hwnd, 0) if callable(frames) else (frames[0] if len(frames) else None)
+            window_size = (first.shape[1], first.shape[0]) if first is not None else (800, 600)
+        with self._lock:
+            self._frames[hwnd] = frames if callable(frames) else list(frames)
+            self._capture_counts.setdefault(hwnd, 0)
+        self.window_source.set_window(hwnd, title or f"FakeWindow-{hwnd}", (0, 0) + tuple(window_size))
+        self._watcher.invalidate(hwnd)
+
+    def destroy_window(self, hwnd: int):
+        """销毁假窗口"""
+        self.window_source.destroy_window(hwnd)
+        self._watcher.invalidate(hwnd)
+
+    @property
+    def window_watcher(self) -> WindowStateWatcher:
+        return self._watcher
+
+    def next_frame(self, hwnd: int) -> Optional[np.ndarray]:
+        """按截图序号回放下一帧"""
+        with self._lock:
+            source = self._frames.get(hwnd)
+            index = self._capture_counts.get(hwnd, 0)
+            self._capture_counts[hwnd] = index + 1
+        if source is None:
+            return None
+        if callable(source):
+            return source(hwnd, index)
+        return source[index % len(source)] if source else None
+
+    def capture_count(self, hwnd: int) -> int:
+        """窗口被截图的次数"""
+        return self._capture_counts.get(hwnd, 0)
+
+    def record_input(self, hwnd: int, action: str, *args) -> bool:
+        """记录一次输入调用"""
+        with self._lock:
+            self.input_log.append((time.perf_counter(), hwnd, action, args))
+        return True
+
+    def inputs_for(self, hwnd: int) -> List[Tuple[str, Tuple[Any, ...]]]:
+        """某个窗口记录到的输入 [(动作, 参数)]"""
+        with self._lock:
+            return [(action, args) for _, log_hwnd, action, args in self.input_log if log_hwnd == hwnd]
+
+
+# ----------------------------------------------------------------------
+# 当前后端
+# ----------------------------------------------------------------------
+_default_backend: Optional[ExecutionBackend] = None
+_current = threading.local()
+
+
+def get_default_backend() -> ExecutionBackend:
+    """默认后端（Win32）"""
+    global _default_backend
+    if _default_backend is None:
+        _default_backend = Win32ExecutionBackend()
+    return _default_backend
+
+
+def set_default_backend(backend: Optional[ExecutionBackend]):
+    """替换默认后端（例如在测试进程中全局使用假窗口），None 恢复 Win32"""
+    global _default_backend
+    _default_backend = backend
+    set_default_window_watcher(backend.window_watcher if backend is not None else None)
+
+
+def set_current_backend(backend: Optional[ExecutionBackend]):
+    """登记当前线程的执行后端及其窗口状态监视器（由执行器在运行线程和分支线程上调用）"""
+    _current.backend = backend
+    set_current_window_watcher(backend.window_watcher if backend is not None else None)
+
+
+def get_execution_backend() -> ExecutionBackend:
+    """获取当前线程的执行后端（未登记时返回默认后端）"""
+    return getattr(_current, 'backend', None) or get_default_backend()
+
+
+def uses_native_input() -> bool:
+    """
+    当前后端是否为 Win32 后端
+    任务模块据此决定走原有的模拟器/前台输入链路，还是把点击直接交给执行后端（假窗口回放）
+    """
+    return isinstance(get_execution_backend(), Win32ExecutionBackend)
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+"""
+工作流执行计划
+在运行前把卡片和连接编译成不可变的执行计划：
+- 预先解析任务模块的执行函数
+- 预先解析参数（执行后操作转换为整数动作码）
+- 成功/失败/顺序后继卡片在编译时确定，运行时 O(1) 查找
+
+执行器运行时只需沿着计划行走，不再逐步读取卡片、查找模块、比较字符串或线性扫描连接。
+"""
+
+import logging
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# 执行后操作动作码
+ACTION_NEXT = 0      # 执行下一步
+ACTION_STOP = 1      # 停止工作流
+ACTION_JUMP = 2      # 跳转到步骤
+ACTION_REPEAT = 3    # 继续执行本步骤
+
+ACTION_CODES = {
+    '执行下一步': ACTION_NEXT,
+    '停止工作流': ACTION_STOP,
+    '跳转到步骤': ACTION_JUMP,
+    '继续执行本步骤': ACTION_REPEAT,
+    '继续本步骤': ACTION_REPEAT,
+    '停止任务': ACTION_STOP,
+}
+
+# 任务模块调用方式
+CALL_EXECUTE_TASK = 0  # execute_task(params=..., counters=..., ...)
+CALL_EXECUTE = 1       # execute(params, counters, execution_mode, target_hwnd, card_id, ...)
+CALL_MISSING = 2       # 找不到模块或模块没有执行方法
+
+
+def parse_action(action: Optional[str]) -> int:
+    """将执行后操作字符串转换为动作码，未知值视为执行下一步"""
+    return ACTION_CODES.get(action, ACTION_NEXT)
+
+
+@dataclass(frozen=True)
+class CompiledCard:
+    """编译后的卡片"""
+    card_id: Any
+    task_type: str
+    module: Any
+    execute: Optional[Callable]
+    call_style: int
+    params: Mapping[str, Any]
+    on_failure: int
+    failure_jump_target_id: Optional[Any]
+    workflow_retry_interval: float
+    success_next: Optional[Any]
+    failure_next: Optional[Any]
+    on_success: int = ACTION_NEXT
+    success_jump_target_id: Optional[Any] = None
+
+
+class ExecutionPlan:
+    """不可变执行计划"""
+
+    __slots__ = ('cards', 'start_card_id', 'source_key')
+
+    def __init__(self, cards: Dict[Any, CompiledCard], start_card_id: Any = None, source_key: Any = None):
+        self.cards: Mapping[Any, CompiledCard] = MappingProxyType(cards)
+        self.start_card_id = start_card_id
+        self.source_key = source_key
+
+    def get(self, card_id: Any) -> Optional[CompiledCard]:
+        """获取编译后的卡片"""
+        return self.cards.get(card_id)
+
+    def next_card(self, card_id: Any, success: bool) -> Optional[Any]:
+        """O(1) 查找下一个卡片：优先同类型连接（success/failure），其次顺序连接"""
+        card = self.cards.get(card_id)
+        if card is None:
+            return None
+        return card.success_next if success else card.failure_next
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def __contains__(self, card_id: Any) -> bool:
+        return card_id in self.cards
+
+
+def _read_card(card: Any):
+    """读取卡片的任务类型和参数（兼容 TaskCard 对象和字典）"""
+    if hasattr(card, 'task_type'):
+        return card.task_type, dict(card.parameters or {})
+    return card.get('task_type', '未知'), dict(card.get('parameters', {}) or {})
+
+
+def _resolve_callable(module: Any):
+    """解析任务模块的执行函数和调用方式"""
+    if module is None:
+        return None, CALL_MISSING
+    if hasattr(module, 'execute_task'):
+        return module.execute_task, CALL_EXECUTE_TASK
+    if hasattr(module, 'execute'):
+        return module.execute, CALL_EXECUTE
+    return None, CALL_MISSING
+
+
+def _build_successor_tables(connections_data: List[Dict[str, Any]]):
+    """按连接出现顺序构建 成功/失败/顺序 后继表（与原先线性查找的优先级一致）"""
+    typed: Dict[str, Dict[Any, Any]] = {'success': {}, 'failure': {}, 'sequential': {}}
+    for connection in connections_data or []:
+        table = typed.get(connection.get('type'))
+        start_id = connection.get('start_card_id')
+        if table is not None and start_id not in table:
+            table[start_id] = connection.get('end_card_id')
+    return typed
+
+
+def _build_untyped_successor_table(connections_data: List[Dict[str, Any]]) -> Dict[Any, Any]:
+    """忽略连接类型的后继表（后出现的连接覆盖先出现的，与任务模块原有的 connection_map 一致）"""
+    table: Dict[Any, Any] = {}
+    for connection in connections_data or []:
+        start_id = connection.get('start_card_id')
+        end_id = connection.get('end_card_id')
+        if start_id and end_id:
+            table[start_id] = end_id
+    return table
+
+
+def compile_workflow(cards_data: Dict[Any, Any], connections_data: List[Dict[str, Any]],
+                     task_modules: Dict[str, Any], start_card_id: Any = None,
+                     source_key: Any = None, untyped_connections: bool = False) -> ExecutionPlan:
+    """
+    将卡片和连接编译为执行计划
+
+    Args:
+        cards_data: 卡片字典 {card_id: TaskCard 或 dict}
+        connections_data: 连接列表
+        task_modules: 任务类型到模块的映射
+        start_card_id: 起始卡片ID
+        source_key: 计划来源标识（例如模块文件路径和修改时间），用于缓存
+        untyped_connections: 为 True 时忽略连接类型，成功和失败使用同一个后继（任务模块内工作流）
+    """
+    if untyped_connections:
+        success_table = failure_table = {}
+        sequential_table = _build_untyped_successor_table(connections_data)
+    else:
+        successors = _build_successor_tables(connections_data)
+        success_table = successors['success']
+        failure_table = successors['failure']
+        sequential_table = successors['sequential']
+
+    compiled: Dict[Any, CompiledCard] = {}
+    for card_id, card in cards_data.items():
+        task_type, params = _read_card(card)
+        module = task_modules.get(task_type)
+        execute, call_style = _resolve_callable(module)
+
+        retry_interval = params.get('workflow_retry_interval', params.get('retry_interval', 0.5))
+        try:
+            retry_interval = float(retry_interval)
+        except (TypeError, ValueError):
+            retry_interval = 0.5
+
+        sequential_next = sequential_table.get(card_id)
+        compiled[card_id] = CompiledCard(
+            card_id=card_id,
+            task_type=task_type,
+            module=module,
+            execute=execute,
+            call_style=call_style,
+            params=MappingProxyType(params),
+            on_failure=parse_action(params.get('on_failure', '执行下一步')),
+            failure_jump_target_id=params.get('failure_jump_target_id'),
+            workflow_retry_interval=retry_interval,
+            success_next=success_table.get(card_id, sequential_next),
+            failure_next=failure_table.get(card_id, sequential_next),
+            on_success=parse_action(params.get('on_success', '执行下一步')),
+            success_jump_target_id=params.get('success_jump_target_id'),
+        )
+
+    missing = [c.task_type for c in compiled.values() if c.call_style == CALL_MISSING]
+    if missing:
+        logger.warning(f"执行计划中有 {len(missing)} 个卡片找不到可执行的任务模块: {sorted(set(missing))}")
+
+    logger.debug(f"工作流已编译为执行计划: {len(compiled)} 个卡片, {len(connections_data or [])} 条连接")
+    return ExecutionPlan(compiled, start_card_id, source_key)
@@ -0,0 +1,644 @@
+# -*- coding: utf-8 -*-
+
+"""
+无界面工作流执行器
+执行引擎本身不依赖 pywin32 和 Qt：
+- 截图、输入、窗口状态通过执行后端（task_workflow/execution_backend.py）访问
+- 执行事件通过 ExecutionListener 回调通知，Qt 适配器（task_workflow/executor.py）把回调转换为信号
+- 任务模块表由调用方传入；未传入时才延迟导入 tasks 包
+
+配合 FakeWindowBackend 可以在 Linux 上用回放帧跑工作流，用于吞吐基准和性能回归测试。
+回放覆盖的范围见 execution_backend 模块说明：走后端的是截图、后台点击和窗口状态，
+前台输入、按键按住和模拟器专用输入仍直接调用平台实现，含这些操作的卡片在回放中会失败。
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from task_workflow.execution_plan import (
+    compile_workflow, ExecutionPlan, ACTION_CODES, ACTION_NEXT, ACTION_STOP, ACTION_JUMP, ACTION_REPEAT,
+    CALL_EXECUTE_TASK, CALL_EXECUTE
+)
+from task_workflow.execution_backend import ExecutionBackend, get_default_backend, set_current_backend
+from task_workflow.parallel_branches import FORK_TASK_TYPE, JOIN_RESULT_KEY, ParallelBranchRunner
+from task_workflow.workflow_checkpoint import (
+    CheckpointWriter, WorkflowCheckpoint, apply_checkpoint, get_checkpoint_settings, load_checkpoint,
+    workflow_fingerprint
+)
+from utils.cancellation import CancellationToken, set_current_token
+from utils.heavy_op_admission import set_current_window
+from utils.workflow_tracer import get_workflow_tracer, TRACE_INFO, TRACE_ERROR
+from utils.workflow_profiler import get_workflow_profiler
+
+logger = logging.getLogger(__name__)
+
+# 每次运行最多转储追踪缓冲区的次数（卡片反复出错时不会写出大量转储文件）
+MAX_TRACE_DUMPS_PER_RUN = 3
+
+
+class ExecutionListener:
+    """执行事件监听器（默认全部为空操作，回调在执行线程或分支线程中调用）"""
+
+    def execution_started(self):
+        pass
+
+    def execution_finished(self, message: str):
+        pass
+
+    def card_executing(self, card_id: Any):
+        pass
+
+    def card_finished(self, card_id: Any, success: bool):
+        pass
+
+    def step_details(self, details: str):
+        pass
+
+    def error_occurred(self, card_id: Any, message: str):
+        pass
+
+
+def _load_default_task_modules() -> Dict[str, Any]:
+    """默认任务模块（tasks 包逐个导入，缺少界面依赖的模块被跳过，其余任务仍可在 Linux 上运行）"""
+    from tasks import TASK_MODULES
+    return TASK_MODULES
+
+
+def normalize_execution_mode(execution_mode: str) -> str:
+    """标准化执行模式（foreground* / background* / emulator）"""
+    if execution_mode.startswith('foreground'):
+        return 'foreground'
+    if execution_mode.startswith('background'):
+        return 'background'
+    if execution_mode == 'emulator_adb':
+        return 'emulator'
+    return execution_mode
+
+
+class HeadlessWorkflowExecutor:
+    """无界面工作流执行器"""
+
+    def __init__(self, cards_data: Dict[Any, Any], connections_data: List[Dict[str, Any]],
+                 task_modules: Optional[Dict[str, Any]] = None, target_window_title: str = None,
+                 execution_mode: str = 'foreground', start_card_id: Any = None,
+                 images_dir: str = None, target_hwnd: int = None,
+                 backend: Optional[ExecutionBackend] = None,
+                 listener: Optional[ExecutionListener] = None,
+                 workflow_file: Optional[str] = None, checkpoint_path: Optional[str] = None,
+                 cancel_token: Optional[CancellationToken] = None):
+        """
+        Args:
+            cards_data: 卡片数据字典
+            connections_data: 连接数据列表
+            task_modules: 任务类型到模块的映射（为空时使用 tasks.TASK_MODULES）
+            target_window_title: 目标窗口标题（仅用于日志）
+            execution_mode: 执行模式
+            start_card_id: 起始卡片ID
+            images_dir: 图片目录
+            target_hwnd: 目标窗口句柄
+            backend: 执行后端（为空时使用默认的 Win32 后端）
+            listener: 执行事件监听器
+            workflow_file: 工作流文件路径（记录到检查点，供恢复命令使用）
+            checkpoint_path: 检查点文件（为空时按全局检查点设置决定是否写入及写入位置）
+            cancel_token: 外部取消令牌（例如调度器持有的令牌，取消即停止执行；运行开始时不重置）
+        """
+        self.cards_data = cards_data
+        self.connections_data = connections_data
+        self.task_modules = task_modules
+        self.target_hwnd = target_hwnd
+        self.target_window_title = target_window_title
+        self.execution_mode = execution_mode
+        self.start_card_id = start_card_id
+        self.images_dir = images_dir
+        self.backend = backend or get_default_backend()
+        self.listener = listener or ExecutionListener()
+
+        self._stop_requested = False
+        self._is_running = False
+        # 取消令牌：停止请求立即唤醒所有等待（作为 stop_checker 传给任务模块）
+        self._external_token = cancel_token is not None
+        self._cancel_token = cancel_token or CancellationToken()
+        self._current_card_id = None
+
+        # 持久计数器（跨卡片、跨重试保留）
+        self._persistent_counters: Dict[str, Any] = {}
+
+        # 执行计划（run 时编译）和每张卡片的调度开销统计
+        self._plan: Optional[ExecutionPlan] = None
+        self._dispatch_count = 0
+        self._dispatch_overhead_ns = 0
+
+        # 并行分支共享线程池（首次遇到并行分支卡片时创建）
+        self.branch_pool_size = 4
+        self._branch_pool: Optional[ThreadPoolExecutor] = None
+
+        # 检查点：定期保存当前卡片、计数器和上下文状态，进程意外退出后可快速恢复
+        self.workflow_file = workflow_file
+        self.checkpoint_path = checkpoint_path
+        self._checkpoint: Optional[CheckpointWriter] = None
+        self._workflow_completed = False
+        self._trace_dumps = 0
+
+    # ------------------------------------------------------------------
+    # 运行控制
+    # ------------------------------------------------------------------
+    def run(self) -> Tuple[bool, str]:
+        """在当前线程执行工作流，返回 (是否成功, 结束消息)"""
+        if self._is_running:
+            logger.warning("工作流已在运行中")
+            return False, "工作流已在运行中"
+
+        self._is_running = True
+        self._stop_requested = False
+        if not self._external_token:
+            self._cancel_token.reset()
+        set_current_token(self._cancel_token)
+        set_current_backend(self.backend)
+        set_current_window(self.target_hwnd)
+
+        logger.info(f"WorkflowExecutor启动: 窗口='{self.target_window_title}', 模式={self.execution_mode}, "
+                    f"HWND={self.target_hwnd}, 后端={self.backend.name}")
+        logger.info("开始执行工作流")
+
+        # 在前台模式下激活目标窗口
+        if normalize_execution_mode(self.execution_mode) == 'foreground' and self.target_hwnd:
+            self.backend.window.activate(self.target_hwnd)
+
+        self.listener.execution_started()
+
+        # 由窗口状态监视器维护窗口有效性，卡片执行时只读取缓存
+        window_watcher = self.backend.window_watcher
+        if self.target_hwnd:
+            window_watcher.watch(self.target_hwnd)
+
+        self._workflow_completed = False
+        self._trace_dumps = 0
+        self._checkpoint = self._create_checkpoint_writer()
+        profiler = get_workflow_profiler()
+        if profiler.enabled:
+            profiler.begin_run(self.target_hwnd)
+
+        success, message = False, ""
+        try:
+            success, message = self._execute_workflow()
+        except Exception as e:
+            logger.error(f"工作流执行过程中发生错误: {e}", exc_info=True)
+            success, message = False, f"执行错误: {str(e)}"
+        finally:
+            # 正常完成时删除检查点，否则保存最终状态（在清理上下文之前）
+            if self._workflow_completed:
+                self._discard_checkpoint()
+            else:
+                self._finish_checkpoint(self._current_card_id)
+
+            # 工作流结束时释放所有按键
+            self._release_all_keys()
+
+            # 清理OCR上下文数据，防止影响下次执行
+            try:
+                from task_workflow.workflow_context import clear_all_ocr_data
+                clear_all_ocr_data()
+                logger.info("工作流结束，已清理所有OCR上下文数据")
+            except Exception as e:
+                logger.warning(f"清理OCR上下文数据时发生错误: {e}")
+
+            # 性能分析开启时导出本窗口本次运行的 Chrome trace
+            if profiler.enabled:
+                profiler.export_chrome_trace(hwnd=self.target_hwnd)
+
+            if self.target_hwnd:
+                window_watcher.unwatch(self.target_hwnd)
+
+            if self._branch_pool is not None:
+                self._branch_pool.shutdown(wait=False)
+                self._branch_pool = None
+
+            set_current_token(None)
+            set_current_backend(None)
+            set_current_window(None)
+            self._is_running = False
+
+        self.listener.execution_finished(message)
+        return success, message
+
+    def request_stop(self):
+        """请求停止执行"""
+        logger.info("请求停止工作流执行")
+        self._stop_requested = True
+        self._cancel_token.cancel()
+
+        # 释放所有可能正在按下的按键
+        self._release_all_keys()
+
+    def _is_stop_requested(self) -> bool:
+        """停止检查函数（传递给任务模块）"""
+        return self._stop_requested
+
+    def is_running(self) -> bool:
+        """检查是否正在运行"""
+        return self._is_running
+
+    def _release_all_keys(self):
+        """释放所有可能正在按下的按键"""
+        try:
+            # 释放找色任务可能按下的移动按键
+            find_color_key = self._persistent_counters.get('__find_color_last_pressed_key__')
+            if find_color_key:
+                logger.info(f"工作流停止，释放找色任务按键: {find_color_key}")
+                normalized_mode = normalize_execution_mode(self.execution_mode)
+                if normalized_mode == 'background' and self.target_hwnd:
+                    self.backend.input.release_key(self.target_hwnd, find_color_key, 'background')
+                elif normalized_mode == 'foreground':
+                    self.backend.input.release_key(self.target_hwnd, find_color_key, 'foreground')
+
+                # 清除按键状态
+                self._persistent_counters['__find_color_last_pressed_key__'] = None
+                logger.info("找色任务按键状态已清除")
+
+        except Exception as e:
+            logger.error(f"释放按键时发生错误: {e}")
+
+    # ------------------------------------------------------------------
+    # 检查点
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _workflow_context():
+        from task_workflow.workflow_context import get_workflow_context
+        return get_workflow_context()
+
+    def _dump_trace(self, reason: str):
+        """转储追踪缓冲区（每次运行最多 MAX_TRACE_DUMPS_PER_RUN 次）"""
+        if self._trace_dumps >= MAX_TRACE_DUMPS_PER_RUN:
+            logger.debug(f"本次运行的追踪转储已达上限，跳过: {reason}")
+            return
+        self._trace_dumps += 1
+        get_workflow_tracer().dump(reason)
+
+    def _create_checkpoint_writer(self) -> Optional[CheckpointWriter]:
+        settings = get_checkpoint_settings()
+        path = self.checkpoint_path or (settings.path_for(self.target_hwnd) if settings.enabled else None)
+        if not path:
+            return None
+        meta = {
+            'fingerprint': workflow_fingerprint(self.cards_data, self.connections_data),
+            'workflow_file': self.workflow_file,
+            'hwnd': self.target_hwnd,
+            'window_title': self.target_window_title,
+            'execution_mode': self.execution_mode,
+        }
+        return CheckpointWriter(path, meta, settings)
+
+    def _finish_checkpoint(self, card_id: Any):
+        """保存最终检查点并停止写入"""
+        checkpoint = self._checkpoint
+        if checkpoint is None or card_id is None:
+            return
+        checkpoint.write(card_id, self._persistent_counters, self._workflow_context())
+        checkpoint.close()
+        logger.info(f"工作流检查点已保存: {checkpoint.path} (卡片 {card_id}, {checkpoint.get_stats()})")
+
+    def _discard_checkpoint(self):
+        if self._checkpoint is not None:
+            self._checkpoint.discard()
+
+    def resume_from_checkpoint(self, checkpoint) -> bool:
+        """
+        从检查点恢复状态：起始卡片改为检查点中的卡片，计数器和上下文写回检查点中的值
+
+        Args:
+            checkpoint: WorkflowCheckpoint 或检查点文件路径
+        """
+        if not isinstance(checkpoint, WorkflowCheckpoint):
+            path = checkpoint
+            checkpoint = load_checkpoint(path)
+            if checkpoint is None:
+                logger.warning(f"找不到可用的检查点: {path}")
+                return False
+            self.checkpoint_path = self.checkpoint_path or path
+
+        fingerprint = workflow_fingerprint(self.cards_data, self.connections_data)
+        if checkpoint.workflow_fingerprint and checkpoint.workflow_fingerprint != fingerprint:
+            logger.error("检查点与当前工作流不匹配（卡片或连接已改变），无法恢复")
+            return False
+        if checkpoint.card_id not in self.cards_data:
+            logger.error(f"检查点中的卡片 {checkpoint.card_id} 不在当前工作流中，无法恢复")
+            return False
+
+        apply_checkpoint(checkpoint, self._persistent_counters, self._workflow_context())
+        self.start_card_id = checkpoint.card_id
+        logger.info(f"从检查点恢复: 卡片 {checkpoint.card_id}, 计数器 {len(checkpoint.counters)} 个, "
+                    f"全局变量 {len(checkpoint.global_vars)} 个, 保存于 "
+                    f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(checkpoint.timestamp))}")
+        return True
+
+    # ------------------------------------------------------------------
+    # 执行计划
+    # ------------------------------------------------------------------
+    def compile_plan(self) -> ExecutionPlan:
+        """将当前卡片和连接编译为执行计划"""
+        task_modules = self.task_modules if self.task_modules is not None else _load_default_task_modules()
+        self._plan = compile_workflow(self.cards_data, self.connections_data, task_modules,
+                                      start_card_id=self.start_card_id)
+        self._dispatch_count = 0
+        self._dispatch_overhead_ns = 0
+        return self._plan
+
+    def _record_dispatch(self, dispatch_start: int, task_start: int, task_end: int):
+        """记录一次卡片调度的开销（不含任务本身执行时间）"""
+        self._dispatch_count += 1
+        self._dispatch_overhead_ns += (task_start - dispatch_start) + (time.perf_counter_ns() - task_end)
+
+    def get_dispatch_stats(self) -> Dict[str, Any]:
+        """获取每张卡片的调度开销统计"""
+        count = self._dispatch_count
+        return {
+            'dispatch_count': count,
+            'total_overhead_ms': self._dispatch_overhead_ns / 1e6,
+            'mean_overhead_us': (self._dispatch_overhead_ns / count / 1e3) if count else 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # 主循环
+    # ------------------------------------------------------------------
+    def _execute_workflow(self) -> Tuple[bool, str]:
+        """执行工作流的核心逻辑"""
+        try:
+            if self.start_card_id is None:
+                error_msg = "未指定起始卡片ID"
+                logger.error(error_msg)
+                return False, error_msg
+
+            if self.start_card_id not in self.cards_data:
+                error_msg = f"找不到起始卡片: {self.start_card_id}"
+                logger.error(error_msg)
+                return False, error_msg
+
+            # 编译执行计划：模块、参数、动作码和后继卡片在运行前一次性解析
+            plan = self.compile_plan()
+
+            listener = self.listener
+            checkpoint = self._checkpoint
+            context = self._workflow_context() if checkpoint is not None else None
+            listener.step_details("开始执行工作流...")
+
+            current_card_id = self.start_card_id
+            retry_counts = {}  # 记录每个卡片的重试次数
+            perf_counter_ns = time.perf_counter_ns
+            tracer = get_workflow_tracer()
+            profiler = get_workflow_profiler()
+
+            while current_card_id is not None:
+                dispatch_start = perf_counter_ns()
+
+                # 检查停止请求
+                if self._stop_requested or self._cancel_token.is_cancelled:
+                    logger.info("检测到停止请求，终止工作流执行")
+
+                    # 释放所有按键
+                    self._release_all_keys()
+
+                    # 清理前保存最终检查点，恢复时从下一张卡片继续
+                    self._finish_checkpoint(current_card_id)
+
+                    # 清理OCR上下文数据
+                    try:
+                        from task_workflow.workflow_context import clear_all_ocr_data, clear_multi_image_memory
+                        clear_all_ocr_data()
+                        logger.info("工作流停止，已清理所有OCR上下文数据")
+
+                        # 清理多图识别记忆数据
+                        clear_multi_image_memory()
+                        logger.info("工作流停止，已清理所有多图识别记忆数据")
+                    except Exception as e:
+                        logger.warning(f"停止时清理上下文数据发生错误: {e}")
+                    return True, "工作流被用户停止"
+
+                # 检查卡片是否存在
+                card = plan.get(current_card_id)
+                if card is None:
+                    error_msg = f"找不到步骤 {current_card_id}"
+                    logger.error(error_msg)
+                    return False, error_msg
+
+                task_type = card.task_type
+
+                # 到达写入间隔时保存检查点（恢复时重新执行这张卡片）
+                if checkpoint is not None:
+                    checkpoint.maybe_write(current_card_id, self._persistent_counters, context)
+
+                self._current_card_id = current_card_id
+                listener.card_executing(current_card_id)
+                listener.step_details(f"正在执行: {task_type}")
+
+                logger.debug(f"执行卡片 {current_card_id}: {task_type}")
+
+                # 执行卡片逻辑（任务本身的耗时不计入调度开销）
+                task_start = perf_counter_ns()
+                with profiler.card_span(current_card_id, task_type, self.target_hwnd):
+                    if task_type == FORK_TASK_TYPE:
+                        success, next_card_id = self._execute_fork(card)
+                    else:
+                        success, next_card_id = self._execute_compiled_card(card)
+                task_end = perf_counter_ns()
+                tracer.card_finished(current_card_id, task_type, (task_end - task_start) / 1e6, success,
+                                     self.target_hwnd, next_card_id)
+
+                listener.card_finished(current_card_id, success)
+                listener.step_details(f"{task_type} 执行成功" if success else f"{task_type} 执行失败")
+
+                # 处理特殊返回值
+                if next_card_id == 'STOP_WORKFLOW':
+                    self._workflow_completed = True
+                    return True, f"工作流执行完成"
+
+                # 处理失败时的操作
+                if not success:
+                    failure_action = card.on_failure
+
+                    if failure_action == ACTION_STOP:
+                        logger.info(f"{task_type} 执行失败，停止工作流")
+                        return False, f"工作流在步骤 {current_card_id} ({task_type}) 处失败并停止"
+                    elif failure_action == ACTION_JUMP:
+                        jump_target = card.failure_jump_target_id
+                        if jump_target and next_card_id is None:
+                            logger.info(f"{task_type} 执行失败，跳转到步骤 {jump_target}")
+                            next_card_id = jump_target
+                    elif failure_action == ACTION_REPEAT:
+                        # 双重重试机制：
+                        # 1. 任务内部重试（如图片查找3次）
+                        # 2. 工作流级别重试（重新执行整个步骤）
+
+                        current_retry_count = retry_counts.get(current_card_id, 0)
+                        retry_counts[current_card_id] = current_retry_count + 1
+
+                        # 获取重试间隔设置
+                        workflow_retry_interval = card.workflow_retry_interval
+
+                        logger.debug(f"{task_type} 任务内部重试已完成，开始工作流级重试 (第 {retry_counts[current_card_id]} 次)")
+                        tracer.record(TRACE_INFO, 'retry', current_card_id, task_type,
+                                      outcome=retry_counts[current_card_id], hwnd=self.target_hwnd)
+                        self._record_dispatch(dispatch_start, task_start, task_end)
+
+                        # 添加工作流重试间隔，并在等待期间检查停止请求
+                        if workflow_retry_interval > 0:
+                            logger.debug(f"工作流重试间隔: {workflow_retry_interval} 秒...")
+
+                            # 在取消令牌上等待，停止请求立即唤醒
+                            if self._cancel_token.wait(workflow_retry_interval):
+                                logger.info("用户按下停止按钮，终止'继续执行本步骤'循环")
+                                return False, '工作流被用户停止'
+
+                        # 重新执行当前步骤（允许无限重试）
+                        continue
+                else:
+                    # 执行成功，重置重试计数器
+                    if current_card_id in retry_counts:
+                        del retry_counts[current_card_id]
+
+                # 如果没有指定下一个卡片，根据计划中的后继表查找
+                if next_card_id is None:
+                    next_card_id = plan.next_card(current_card_id, success)
+                    logger.debug(f"卡片 {current_card_id} (success={success}) -> 下一个卡片 {next_card_id}")
+
+                current_card_id = next_card_id
+                self._record_dispatch(dispatch_start, task_start, task_end)
+
+            self._workflow_completed = True
+            return True, "工作流执行完成"
+
+        except Exception as e:
+            error_msg = f"工作流执行失败: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            tracer = get_workflow_tracer()
+            tracer.record(TRACE_ERROR, 'workflow_error', self._current_card_id, hwnd=self.target_hwnd, detail=str(e))
+            self._dump_trace(error_msg)
+            if self._current_card_id is not None:
+                self.listener.error_occurred(self._current_card_id, str(e))
+            return False, error_msg
+
+    # ------------------------------------------------------------------
+    # 并行分支
+    # ------------------------------------------------------------------
+    def _execute_fork(self, card) -> Tuple[bool, Any]:
+        """执行并行分支卡片：各分支在共享线程池中并发执行，汇合后以汇合卡片作为下一步"""
+        if self._branch_pool is None:
+            self._branch_pool = ThreadPoolExecutor(max_workers=self.branch_pool_size,
+                                                   thread_name_prefix=f"WorkflowBranch-{self.target_hwnd}")
+        runner = ParallelBranchRunner(self._plan, self._execute_branch_card, self._branch_pool,
+                                      self._cancel_token, self.target_hwnd)
+        result = runner.run_fork(card, self._persistent_counters)
+        if result.join_card_id is None:
+            return result.success, None
+        # 汇合结果交给汇合卡片，按其成功/失败操作继续
+        self._persistent_counters[JOIN_RESULT_KEY.format(result.join_card_id)] = result.success
+        return result.success, result.join_card_id
+
+    def _execute_branch_card(self, card, stop_checker: CancellationToken,
+                             counters: Dict[str, Any]) -> Tuple[bool, Any]:
+        """在分支线程中执行单个卡片（使用分支的计数器副本，与主循环一样通知监听器并记录追踪/性能数据）"""
+        set_current_backend(self.backend)
+        set_current_window(self.target_hwnd)
+        self.listener.card_executing(card.card_id)
+        task_start = time.perf_counter_ns()
+        with get_workflow_profiler().card_span(card.card_id, card.task_type, self.target_hwnd):
+            success, next_card_id = self._execute_compiled_card(card, stop_checker, counters)
+        get_workflow_tracer().card_finished(card.card_id, card.task_type, (time.perf_counter_ns() - task_start) / 1e6,
+                                            success, self.target_hwnd, next_card_id)
+        self.listener.card_finished(card.card_id, success)
+        return success, next_card_id
+
+    # ------------------------------------------------------------------
+    # 单卡片执行
+    # ------------------------------------------------------------------
+    def _execute_compiled_card(self, card, stop_checker: Optional[CancellationToken] = None,
+                               counters: Optional[Dict[str, Any]] = None) -> Tuple[bool, Any]:
+        """执行单个编译后卡片的逻辑（stop_checker 为空时使用执行器的取消令牌，counters 为空时使用持久计数器）"""
+        card_id = card.card_id
+        if stop_checker is None:
+            stop_checker = self._cancel_token
+        task_type = card.task_type
+        try:
+            # 获取对应的任务模块（编译时已解析）
+            if card.module is None:
+                logger.error(f"找不到任务类型 '{task_type}' 对应的模块")
+                return False, None
+
+            if counters is None:
+                counters = self._persistent_counters  # 使用持久计数器
+            execution_mode = self.execution_mode
+            window_region = None
+            target_hwnd = self.target_hwnd
+
+            # 如果没有有效的预设句柄，返回失败
+            if not target_hwnd:
+                logger.error(f"错误 没有有效的窗口句柄，请先绑定窗口")
+                return False, None
+
+            # 验证预设的窗口句柄是否有效（读取窗口状态缓存）
+            try:
+                if self.backend.window_watcher.is_valid(target_hwnd):
+                    logger.debug(f"使用预设窗口句柄: {target_hwnd}")
+                else:
+                    logger.error(f"错误 预设窗口句柄无效: {target_hwnd}，请手动重新绑定窗口")
+                    return False, None
+            except Exception as e:
+                logger.error(f"错误 验证预设窗口句柄时出错: {e}，请手动重新绑定窗口")
+                return False, None
+
+            # 计划中的参数是只读的，任务可能会修改参数，这里传入浅拷贝
+            card_params = dict(card.params)
+
+            if card.call_style == CALL_EXECUTE_TASK:
+                logger.debug(f"执行任务 '{task_type}': 窗口='{self.target_window_title}' (HWND: {target_hwnd}), 模式={execution_mode}")
+                result = card.execute(
+                    params=card_params,
+                    counters=counters,
+                    execution_mode=execution_mode,
+                    target_hwnd=target_hwnd,
+                    window_region=window_region,
+                    card_id=card_id,
+                    get_image_data=None,  # 工作流执行器暂不支持图片数据获取
+                    stop_checker=stop_checker  # 传递取消令牌（可调用，兼容停止检查函数）
+                )
+            elif card.call_style == CALL_EXECUTE:
+                result = card.execute(
+                    card_params,
+                    counters,
+                    execution_mode,
+                    target_hwnd,
+                    card_id,
+                    get_image_data=None,  # 工作流执行器暂不支持图片数据获取
+                    stop_checker=stop_checker  # 传递取消令牌（可调用，兼容停止检查函数）
+                )
+            else:
+                logger.error(f"任务模块 '{task_type}' 没有 execute_task 或 execute 方法")
+                return False, None
+
+            # 检查返回值是否为None，防止解包错误
+            if result is None:
+                logger.error(f"任务 '{task_type}' 返回了 None，这可能是任务执行异常")
+                return False, None
+            success, action, next_card_id = result
+
+            # 处理返回的动作
+            action_code = ACTION_CODES.get(action, ACTION_NEXT)
+            if action_code == ACTION_STOP:
+                return success, '工作流执行完成'
+            elif action_code == ACTION_JUMP and next_card_id is not None:
+                return success, next_card_id
+            elif action_code == ACTION_REPEAT:
+                # 返回当前卡片ID，让工作流重新执行当前步骤
+                return success, card_id
+            else:
+                # 默认执行下一步，返回 None 让连接查找逻辑处理
+                return success, None
+
+        except Exception as e:
+            logger.error(f"执行卡片 {card_id} ({task_type}) 时发生错误: {e}", exc_info=True)
+            tracer = get_workflow_tracer()
+            tracer.record(TRACE_ERROR, 'card_error', card_id, task_type, hwnd=self.target_hwnd, detail=str(e))
+            self._dump_trace(f"卡片 {card_id} ({task_type}) 异常: {e}")
+            self.listener.error_occurred(card_id, str(e))
+            return False, None
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+
+"""
+工作流并行分支（分叉/汇合）
+"并行分支"卡片把若干条分支提交到执行器的共享线程池并发执行，分支沿执行计划行走，
+到达"并行汇合"卡片（或没有后继）时结束；主流程等待汇合条件满足后从汇合卡片继续。
+
+规则：
+- 汇合方式"全部完成"：等待所有分支结束，全部成功才算成功
+- 汇合方式"任一完成"：第一个成功到达汇合点的分支获胜，其余分支通过取消令牌立即停止
+- 输入串行化：同一窗口的输入原语在窗口输入锁内执行；鼠标/键盘操作类卡片整卡持有输入锁
+- 分支内的"停止工作流"只结束该分支；用户停止会取消所有分支
+- 每条分支使用计数器的副本，汇合时把各分支修改过的键合并回主流程（"任一完成"时获胜分支最后合并）
+- 分支超时或"任一完成"已有获胜分支时取消剩余分支，最多再等待 CANCEL_GRACE_SECONDS 秒，仍未结束的分支不再等待、结果不合并
+- 分支内不支持嵌套并行分支（按普通卡片执行，即顺序执行其第一个分支）
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait as wait_futures
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from task_workflow.execution_plan import ExecutionPlan, CompiledCard, ACTION_STOP, ACTION_JUMP, ACTION_REPEAT
+from utils.cancellation import CancellationToken, set_current_token
+from utils.input_lock import get_input_lock
+
+logger = logging.getLogger(__name__)
+
+FORK_TASK_TYPE = "并行分支"
+JOIN_TASK_TYPE = "并行汇合"
+
+JOIN_ALL = "全部完成"
+JOIN_FIRST = "任一完成"
+
+# 分支中需要整卡持有输入锁的任务类型（多步鼠标/键盘操作）
+INPUT_EXCLUSIVE_TASK_TYPES = frozenset({
+    "模拟鼠标操作", "模拟键盘操作", "查找图片并点击", "点击指定坐标", "鼠标滚轮操作", "旋转视角", "键盘输入",
+})
+
+# 分叉卡片写入计数器的汇合结果键（汇合卡片读取）
+JOIN_RESULT_KEY = "__parallel_join_{}"
+
+# 分支超时取消后等待分支结束的最长时间（秒）
+CANCEL_GRACE_SECONDS = 5.0
+
+# 执行单张卡片: (卡片, 停止检查, 分支计数器) -> (成功, 下一个卡片ID或None)
+CardRunner = Callable[[CompiledCard, CancellationToken, Dict[str, Any]], Tuple[bool, Any]]
+
+
+@dataclass
+class BranchResult:
+    """单条分支的执行结果"""
+    start_card_id: Any
+    success: bool = False
+    reached_join: bool = False
+    cancelled: bool = False
+    last_card_id: Any = None
+    cards_executed: int = 0
+    duration_ms: float = 0.0
+    error: Optional[str] = None
+    counters: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+
+@dataclass
+class ForkResult:
+    """分叉执行结果"""
+    success: bool
+    join_card_id: Any
+    winner: Optional[BranchResult] = None
+    branches: List[BranchResult] = field(default_factory=list)
+    duration_ms: float = 0.0
+
+
+def parse_branch_ids(value: Any) -> List[Any]:
+    """解析分支起始卡片ID列表（支持 "3, 7;12" 形式的文本或列表）"""
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        items = str(value).replace('，', ',').replace(';', ',').replace(' ', ',').split(',')
+    branch_ids = []
+    for item in items:
+        text = str(item).strip()
+        if not text or text.lower() == 'none':
+            continue
+        try:
+            card_id = int(text)
+        except (TypeError, ValueError):
+            logger.warning(f"忽略无效的分支卡片ID: '{text}'")
+            continue
+        if card_id not in branch_ids:
+            branch_ids.append(card_id)
+    return branch_ids
+
+
+def _parse_card_id(value: Any) -> Optional[int]:
+    if value is None or not str(value).strip() or str(value).lower() == 'none':
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ParallelBranchRunner:
+    """在共享线程池上执行分叉卡片的各条分支"""
+
+    def __init__(self, plan: ExecutionPlan, run_card: CardRunner, pool: ThreadPoolExecutor,
+                 parent_token: CancellationToken, target_hwnd: Optional[int] = None):
+        self.plan = plan
+        self.run_card = run_card
+        self.pool = pool
+        self.parent_token = parent_token
+        self.target_hwnd = target_hwnd
+
+    def run_fork(self, fork_card: CompiledCard, counters: Optional[Dict[str, Any]] = None) -> ForkResult:
+        """
+        执行分叉卡片：并发执行所有分支并按汇合方式等待
+
+        Args:
+            counters: 主流程的计数器；各分支在副本上执行，汇合时合并回这里
+        """
+        counters = {} if counters is None else counters
+        params = fork_card.params
+        branch_ids = [card_id for card_id in parse_branch_ids(params.get('branch_card_ids'))
+                      if card_id in self.plan]
+        join_card_id = _parse_card_id(params.get('join_card_id'))
+        join_mode = params.get('join_mode', JOIN_ALL)
+        timeout = float(params.get('branch_timeout', 0) or 0)
+
+        start = time.perf_counter()
+        if not branch_ids:
+            logger.warning(f"并行分支卡片 {fork_card.card_id} 没有有效的分支起始卡片")
+            return ForkResult(False, join_card_id)
+
+        logger.info(f"并行分支 {fork_card.card_id}: 分支={branch_ids}, 汇合卡片={join_card_id}, 汇合方式={join_mode}")
+
+        tokens = [self.parent_token.create_child() for _ in branch_ids]
+        futures = {
+            self.pool.submit(self._run_branch, branch_id, join_card_id, token, dict(counters)): index
+            for index, (branch_id, token) in enumerate(zip(branch_ids, tokens))
+        }
+        deadline = time.monotonic() + timeout if timeout > 0 else None
+
+        results: List[Optional[BranchResult]] = [None] * len(branch_ids)
+        winner: Optional[BranchResult] = None
+        pending = set(futures)
+        cancelling = False
+        try:
+            while pending:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                done, pending = wait_futures(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                if not done:
+                    if cancelling:
+                        logger.warning(f"并行分支 {fork_card.card_id}: {len(pending)} 个分支取消后 "
+                                       f"{CANCEL_GRACE_SECONDS} 秒仍未结束，不再等待")
+                        for future in pending:
+                            index = futures[future]
+                            results[index] = BranchResult(branch_ids[index], cancelled=True,
+                                                          error="分支已取消，但未在宽限时间内结束")
+                        break
+                    logger.warning(f"并行分支 {fork_card.card_id} 超时 ({timeout} 秒)，取消剩余分支")
+                    for token in tokens:
+                        token.cancel("分支超时")
+                    cancelling = True
+                    deadline = time.monotonic() + CANCEL_GRACE_SECONDS
+                    continue
+                for future in done:
+                    result = future.result()
+                    results[futures[future]] = result
+                    if (join_mode == JOIN_FIRST and winner is None and result.success
+                            and not self.parent_token.is_cancelled):
+                        winner = result
+                        logger.info(f"并行分支 {fork_card.card_id}: 分支 {result.start_card_id} 首先完成，取消其余分支")
+                        for token in tokens:
+                            token.cancel("其他分支已完成")
+                        # 与超时相同：落败分支只再等待宽限时间，不响应取消的分支不能卡住汇合
+                        cancelling = True
+                        grace_deadline = time.monotonic() + CANCEL_GRACE_SECONDS
+                        deadline = grace_deadline if deadline is None else min(deadline, grace_deadline)
+        finally:
+            for token in tokens:
+                self.parent_token.release_child(token)
+
+        branch_results = [result for result in results if result is not None]
+        self._merge_counters(counters, branch_results, winner)
+        if join_mode == JOIN_FIRST:
+            success = winner is not None
+        else:
+            success = bool(branch_results) and all(result.success for result in branch_results)
+        if self.parent_token.is_cancelled:
+            success = False
+
+        fork_result = ForkResult(success, join_card_id, winner, branch_results,
+                                 (time.perf_counter() - start) * 1000)
+        logger.info(f"并行分支 {fork_card.card_id} 汇合: 成功={success}, 耗时={fork_result.duration_ms:.0f}ms, "
+                    f"分支结果={[(r.start_card_id, r.success, r.cards_executed) for r in branch_results]}")
+        return fork_result
+
+    @staticmethod
+    def _merge_counters(counters: Dict[str, Any], branch_results: List[BranchResult],
+                        winner: Optional[BranchResult]):
+        """把各分支修改过的计数器合并回主流程（获胜分支最后合并，冲突时以它为准）"""
+        base = dict(counters)
+        ordered = [result for result in branch_results if result is not winner]
+        if winner is not None:
+            ordered.append(winner)
+        for result in ordered:
+            if result.cards_executed == 0:
+                continue  # 未执行过卡片（含超时后未结束的分支）
+            for key, value in result.counters.items():
+                if key not in base or base[key] is not value:
+                    counters[key] = value
+            for key in base:
+                if key not in result.counters:
+                    counters.pop(key, None)
+
+    def _run_branch(self, start_card_id: Any, join_card_id: Any, token: CancellationToken,
+                    counters: Dict[str, Any]) -> BranchResult:
+        """沿执行计划执行一条分支（使用自己的计数器副本），直到到达汇合卡片、没有后继或被取消"""
+        result = BranchResult(start_card_id, counters=counters)
+        start = time.perf_counter()
+        set_current_token(token)
+        current_card_id = start_card_id
+        try:
+            while current_card_id is not None:
+                if token.is_cancelled:
+                    result.cancelled = True
+                    result.success = False
+                    return result
+                if current_card_id == join_card_id:
+                    result.reached_join = True
+                    return result
+
+                card = self.plan.get(current_card_id)
+                if card is None:
+                    result.error = f"找不到步骤 {current_card_id}"
+                    logger.error(f"分支 {start_card_id}: {result.error}")
+                    return result
+
+                if card.task_type in INPUT_EXCLUSIVE_TASK_TYPES:
+                    with get_input_lock(self.target_hwnd):
+                        success, next_card_id = self.run_card(card, token, counters)
+                else:
+                    success, next_card_id = self.run_card(card, token, counters)
+                result.cards_executed += 1
+                result.last_card_id = current_card_id
+                result.success = success
+
+                if next_card_id == 'STOP_WORKFLOW' or next_card_id == '工作流执行完成':
+                    return result
+
+                if not success:
+                    if card.on_failure == ACTION_STOP:
+                        return result
+                    if card.on_failure == ACTION_JUMP and next_card_id is None:
+                        next_card_id = card.failure_jump_target_id
+                    elif card.on_failure == ACTION_REPEAT:
+                        if token.wait(card.workflow_retry_interval):
+                            result.cancelled = True
+                            result.success = False
+                            return result
+                        continue
+
+                if next_card_id is None:
+                    next_card_id = self.plan.next_card(current_card_id, success)
+                current_card_id = next_card_id
+
+            # 没有后继：分支自然结束
+            result.reached_join = join_card_id is None
+            return result
+        except Exception as e:
+            result.success = False
+            result.error = str(e)
+            logger.error(f"分支 {start_card_id} 执行出错: {e}", exc_info=True)
+            return result
+        finally:
+            set_current_token(None)
+            result.duration_ms = (time.perf_counter() - start) * 1000
@@ -0,0 +1,602 @@
+# -*- coding: utf-8 -*-
+
+"""
+多进程分片执行
+窗口较多时，执行器中受 GIL 限制的部分（参数处理、日志、结果处理）会占满界面进程的一个核心。
+分片模式把窗口分配到 N 个工作进程，每个进程用无界面执行器运行分配给它的窗口：
+- 界面进程 -> 工作进程：命令管道（启动窗口 / 停止窗口 / 全部停止 / 退出）
+- 工作进程 -> 界面进程：事件管道，紧凑元组按批发送；同一窗口一批内的卡片进度只保留最新状态
+
+任务模块和执行后端以 "模块:属性" 引用传给工作进程，在工作进程内导入（spawn 启动方式下函数不必可序列化）。
+
+资源预算：重量级操作准入门和 OCR 服务池都是进程级的，每个工作进程各有一份。
+为了让 N 个分片合计不超过单进程时的上限，每个分片使用 1/N 的预算（至少 1）：
+- 准入门各类操作的并发上限 = default_op_limits() // N
+- OCR 服务池最大服务数 = 单进程最大服务数 // N
+
+合成负载基准（1→40 个窗口，线程模式与分片模式对比）:
+    python -m task_workflow.sharded_executor --windows 1,5,10,20,40 --shards 4
+"""
+
+import argparse
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import wait as wait_connections
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 事件（工作进程 -> 界面进程），元组第二项是窗口键
+EVT_SHARD_READY = 'R'  # (R, None, 分片序号, 进程ID)
+EVT_STARTED = 'S'  # (S, 窗口键)
+EVT_CARD = 'C'  # (C, 窗口键, 卡片ID)
+EVT_CARD_DONE = 'F'  # (F, 窗口键, 卡片ID, 是否成功, 已执行卡片数)
+EVT_ERROR = 'E'  # (E, 窗口键, 卡片ID, 错误信息)
+EVT_FINISHED = 'D'  # (D, 窗口键, 是否成功, 结束消息, 已执行卡片数)
+
+# 命令（界面进程 -> 工作进程）
+CMD_START = 'start'
+CMD_STOP = 'stop'
+CMD_STOP_ALL = 'stop_all'
+CMD_SHUTDOWN = 'shutdown'
+
+Event = Tuple[Any, ...]
+
+
+def _resolve_reference(reference: Optional[str]) -> Any:
+    """解析 "模块:属性" 引用"""
+    if not reference:
+        return None
+    module_name, _, attribute = reference.partition(':')
+    module = importlib.import_module(module_name)
+    return getattr(module, attribute) if attribute else module
+
+
+# ----------------------------------------------------------------------
+# 工作进程
+# ----------------------------------------------------------------------
+class _EventOutbox:
+    """工作进程的事件发送器：按固定间隔把积累的事件作为一批发送"""
+
+    def __init__(self, conn, flush_interval: float):
+        self._conn = conn
+        self._flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._events: List[Event] = []
+        # 卡片进度只保留每个窗口的最新状态 {窗口键: 事件}
+        self._progress: Dict[Any, Event] = {}
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ShardEventOutbox", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def put(self, event: Event):
+        with self._lock:
+            self._events.append(event)
+
+    def put_progress(self, event: Event):
+        with self._lock:
+            self._progress[event[1]] = event
+
+    def flush(self):
+        with self._lock:
+            if not self._events and not self._progress:
+                return
+            # 先发送卡片进度，再发送有序事件（窗口结束事件在其最终卡片状态之后）
+            batch = list(self._progress.values()) + self._events
+            self._progress = {}
+            self._events = []
+        try:
+            self._conn.send(batch)
+        except (OSError, EOFError, BrokenPipeError):
+            self._closed.set()
+
+    def _run(self):
+        while not self._closed.wait(self._flush_interval):
+            self.flush()
+
+    def close(self):
+        self.flush()
+        self._closed.set()
+        self._thread.join(timeout=1.0)
+
+
+class _ShardListener:
+    """把一个窗口的执行事件写入事件发送器"""
+
+    def __init__(self, outbox: _EventOutbox, window_key: Any):
+        self._outbox = outbox
+        self._key = window_key
+        self.cards_done = 0
+
+    def execution_started(self):
+        self._outbox.put((EVT_STARTED, self._key))
+
+    def execution_finished(self, message: str):
+        pass
+
+    def card_executing(self, card_id: Any):
+        self._outbox.put_progress((EVT_CARD, self._key, card_id))
+
+    def card_finished(self, card_id: Any, success: bool):
+        self.cards_done += 1
+        self._outbox.put_progress((EVT_CARD_DONE, self._key, card_id, success, self.cards_done))
+
+    def step_details(self, details: str):
+        pass
+
+    def error_occurred(self, card_id: Any, message: str):
+        self._outbox.put((EVT_ERROR, self._key, card_id, message))
+
+
+def _run_window(executor, listener: _ShardListener, outbox: _EventOutbox, window_key: Any, start_delay: float):
+    success, message = False, ""
+    try:
+        if start_delay > 0 and executor._cancel_token.wait(start_delay):
+            success, message = True, "工作流被用户停止"
+        else:
+            success, message = executor.run()
+    except Exception as e:
+        logger.error(f"分片窗口 {window_key} 执行出错: {e}", exc_info=True)
+        success, message = False, f"执行错误: {e}"
+    finally:
+        outbox.put((EVT_FINISHED, window_key, success, message, listener.cards_done))
+
+
+def _apply_shard_budget(num_shards: int):
+    """按分片数缩小本进程的准入门并发上限和 OCR 服务池大小（见模块说明）"""
+    from utils.heavy_op_admission import default_op_limits, get_heavy_op_gate
+    gate = get_heavy_op_gate()
+    for op, limit in default_op_limits().items():
+        gate.set_limit(op, max(1, limit // num_shards))
+
+    try:
+        from services.multi_ocr_pool import get_multi_ocr_pool
+    except ImportError as e:
+        logger.debug(f"OCR 服务池不可用，跳过分片预算: {e}")
+        return
+    pool = get_multi_ocr_pool()
+    pool.max_services = max(1, pool.max_services // num_shards)
+    logger.info(f"分片 OCR 服务池最大服务数: {pool.max_services}")
+
+
+def _shard_main(shard_index: int, num_shards: int, command_conn, event_conn, task_modules_ref: Optional[str],
+                backend_factory_ref: Optional[str], flush_interval: float, log_level: int,
+                checkpoints: bool):
+    """工作进程入口"""
+    logging.basicConfig(level=log_level, format=f"%(asctime)s [shard{shard_index}] %(levelname)s %(name)s: %(message)s")
+    _apply_shard_budget(num_shards)
+
+    from task_workflow.headless_executor import HeadlessWorkflowExecutor
+    from utils.cancellation import CancellationToken
+    from task_workflow.workflow_checkpoint import get_checkpoint_settings
+    get_checkpoint_settings().enabled = checkpoints
+
+    task_modules = _resolve_reference(task_modules_ref)
+    backend_factory: Optional[Callable[[int], Any]] = _resolve_reference(backend_factory_ref)
+
+    outbox = _EventOutbox(event_conn, flush_interval)
+    outbox.start()
+    outbox.put((EVT_SHARD_READY, None, shard_index, os.getpid()))
+    outbox.flush()
+
+    windows: Dict[Any, Tuple[Any, threading.Thread]] = {}
+    while True:
+        try:
+            command = command_conn.recv()
+        except (EOFError, OSError):
+            break
+        kind = command[0]
+
+        if kind == CMD_START:
+            _, window_key, payload = command
+            running = windows.get(window_key)
+            if running is not None and running[1].is_alive():
+                logger.warning(f"分片 {shard_index}: 窗口 {window_key} 已在运行")
+                continue
+            hwnd = payload['hwnd']
+            listener = _ShardListener(outbox, window_key)
+            executor = HeadlessWorkflowExecutor(
+                payload['cards_data'], payload['connections_data'], task_modules,
+                target_window_title=payload.get('title'),
+                execution_mode=payload.get('execution_mode', 'background'),
+                start_card_id=payload['start_card_id'],
+                images_dir=payload.get('images_dir'),
+                target_hwnd=hwnd,
+                backend=backend_factory(hwnd) if backend_factory is not None else None,
+                listener=listener,
+                cancel_token=CancellationToken(),  # 外部令牌：启动延迟期间的停止请求不会被 run() 重置
+            )
+            thread = threading.Thread(target=_run_window, name=f"ShardWindow-{hwnd}",
+                                      args=(executor, listener, outbox, window_key, payload.get('start_delay', 0.0)),
+                                      daemon=True)
+            windows[window_key] = (executor, thread)
+            thread.start()
+        elif kind == CMD_STOP:
+            running = windows.get(command[1])
+            if running is not None:
+                running[0].request_stop()
+        elif kind in (CMD_STOP_ALL, CMD_SHUTDOWN):
+            for executor, _ in windows.values():
+                executor.request_stop()
+            if kind == CMD_SHUTDOWN:
+                break
+
+    for _, thread in windows.values():
+        thread.join(timeout=5.0)
+    outbox.close()
+
+
+# ----------------------------------------------------------------------
+# 界面进程
+# ----------------------------------------------------------------------
+@dataclass
+class ShardWindowState:
+    """分片窗口状态（由事件更新）"""
+    window_key: Any
+    shard: int
+    hwnd: int
+    status: str = 'starting'  # starting / running / finished
+    current_card_id: Any = None
+    cards_done: int = 0
+    success: Optional[bool] = None
+    message: str = ""
+    started_at: float = 0.0
+    finished_at: float = 0.0
+
+
+class ShardedWindowExecutor:
+    """多进程分片窗口执行器"""
+
+    def __init__(self, num_shards: Optional[int] = None, task_modules_ref: Optional[str] = None,
+                 backend_factory_ref: Optional[str] = None, on_event: Optional[Callable[[Event], None]] = None,
+                 flush_interval: float = 0.05, log_level: int = logging.WARNING, checkpoints: bool = True):
+        """
+        Args:
+            num_shards: 工作进程数（默认 CPU 核心数 - 1，至少 1）
+            task_modules_ref: 任务模块表引用 "模块:属性"（默认 tasks.TASK_MODULES）
+            backend_factory_ref: 执行后端工厂引用 "模块:属性"，以窗口句柄调用（默认 Win32 后端）
+            on_event: 事件回调（在事件读取线程中调用）
+            flush_interval: 工作进程发送事件批次的间隔（秒）
+            log_level: 工作进程日志级别
+            checkpoints: 工作进程是否写入工作流检查点
+        """
+        self.num_shards = num_shards or max(1, (os.cpu_count() or 2) - 1)
+        self.task_modules_ref = task_modules_ref
+        self.backend_factory_ref = backend_factory_ref
+        self.on_event = on_event
+        self.flush_interval = flush_interval
+        self.log_level = log_level
+        self.checkpoints = checkpoints
+
+        self._processes: List[multiprocessing.Process] = []
+        self._command_conns: List[Any] = []
+        self._event_conns: Dict[Any, int] = {}
+        self._reader: Optional[threading.Thread] = None
+        self._send_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self.windows: Dict[Any, ShardWindowState] = {}
+        self.shard_pids: Dict[int, int] = {}
+
+        # 统计
+        self.event_batches = 0
+        self.event_count = 0
+
+    # ------------------------------------------------------------------
+    # 进程管理
+    # ------------------------------------------------------------------
+    def start(self):
+        """启动工作进程"""
+        if self._processes:
+            return
+        context = multiprocessing.get_context('spawn')
+        for shard_index in range(self.num_shards):
+            command_recv, command_send = context.Pipe(duplex=False)
+            event_recv, event_send = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_shard_main, name=f"WorkflowShard-{shard_index}", daemon=True,
+                args=(shard_index, self.num_shards, command_recv, event_send, self.task_modules_ref, self.backend_factory_ref,
+                      self.flush_interval, self.log_level, self.checkpoints),
+            )
+            process.start()
+            command_recv.close()
+            event_send.close()
+            self._processes.append(process)
+            self._command_conns.append(command_send)
+            self._event_conns[event_recv] = shard_index
+        self._reader = threading.Thread(target=self._read_events, name="ShardEventReader", daemon=True)
+        self._reader.start()
+        logger.info(f"分片执行器已启动 {self.num_shards} 个工作进程")
+
+    def shutdown(self, timeout: float = 10.0):
+        """停止所有窗口并退出工作进程"""
+        for shard_index in range(len(self._command_conns)):
+            self._send(shard_index, (CMD_SHUTDOWN,))
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            process.join(timeout=max(0.1, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning(f"工作进程 {process.name} 未能按时退出，强制终止")
+                process.terminate()
+        for conn in self._command_conns:
+            conn.close()
+        self._processes.clear()
+        self._command_conns.clear()
+        if self._reader is not None:
+            self._reader.join(timeout=2.0)
+            self._reader = None
+        logger.info("分片执行器已关闭")
+
+    def _send(self, shard_index: int, command: Tuple[Any, ...]) -> bool:
+        with self._send_lock:
+            try:
+                self._command_conns[shard_index].send(command)
+                return True
+            except (OSError, EOFError, BrokenPipeError) as e:
+                logger.error(f"向工作进程 {shard_index} 发送命令失败: {e}")
+                return False
+
+    # ------------------------------------------------------------------
+    # 窗口
+    # ------------------------------------------------------------------
+    def _pick_shard(self) -> int:
+        """选择运行中窗口最少的分片"""
+        load = [0] * self.num_shards
+        for state in self.windows.values():
+            if state.status != 'finished':
+                load[state.shard] += 1
+        return min(range(self.num_shards), key=lambda index: load[index])
+
+    def start_window(self, window_key: Any, hwnd: int, cards_data: Dict[Any, Any],
+                     connections_data: List[Dict[str, Any]], start_card_id: Any, title: Optional[str] = None,
+                     execution_mode: str = 'background', images_dir: Optional[str] = None,
+                     start_delay: float = 0.0) -> int:
+        """把窗口分配到一个分片并启动，返回分片序号"""
+        self.start()
+        payload = {
+            'hwnd': hwnd, 'title': title, 'cards_data': cards_data, 'connections_data': connections_data,
+            'start_card_id': start_card_id, 'execution_mode': execution_mode, 'images_dir': images_dir,
+            'start_delay': start_delay,
+        }
+        with self._cond:
+            shard_index = self._pick_shard()
+            self.windows[window_key] = ShardWindowState(window_key, shard_index, hwnd, started_at=time.monotonic())
+        self._send(shard_index, (CMD_START, window_key, payload))
+        logger.info(f"窗口 {title or window_key} (HWND: {hwnd}) 分配到分片 {shard_index}")
+        return shard_index
+
+    def stop_window(self, window_key: Any):
+        state = self.windows.get(window_key)
+        if state is not None:
+            self._send(state.shard, (CMD_STOP, window_key))
+
+    def stop_all(self):
+        for shard_index in range(len(self._command_conns)):
+            self._send(shard_index, (CMD_STOP_ALL,))
+
+    def clear_finished(self):
+        """清除已结束窗口的状态（开始新一轮执行前调用）"""
+        with self._cond:
+            for window_key in [key for key, state in self.windows.items() if state.status == 'finished']:
+                del self.windows[window_key]
+
+    def all_finished(self) -> bool:
+        with self._cond:
+            return all(state.status == 'finished' for state in self.windows.values())
+
+    def wait_all(self, timeout: Optional[float] = None) -> bool:
+        """等待所有窗口结束"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not all(state.status == 'finished' for state in self.windows.values()):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    # ------------------------------------------------------------------
+    # 事件
+    # ------------------------------------------------------------------
+    def _read_events(self):
+        conns = list(self._event_conns)
+        while conns:
+            for conn in wait_connections(conns):
+                try:
+                    batch = conn.recv()
+                except (EOFError, OSError):
+                    conns.remove(conn)
+                    self._fail_shard_windows(self._event_conns[conn])
+                    continue
+                self.event_batches += 1
+                self.event_count += len(batch)
+                for event in batch:
+                    self._apply_event(self._event_conns[conn], event)
+
+    def _fail_shard_windows(self, shard_index: int):
+        """工作进程退出时，把其上未结束的窗口标记为失败"""
+        with self._cond:
+            orphaned = [state.window_key for state in self.windows.values()
+                        if state.shard == shard_index and state.status != 'finished']
+        if orphaned:
+            logger.error(f"工作进程 {shard_index} 已退出，{len(orphaned)} 个窗口未正常结束")
+        for window_key in orphaned:
+            self._apply_event(shard_index, (EVT_FINISHED, window_key, False, "工作进程已退出", self.windows[window_key].cards_done))
+
+    def _apply_event(self, shard_index: int, event: Event):
+        kind, window_key = event[0], event[1]
+        with self._cond:
+            if kind == EVT_SHARD_READY:
+                self.shard_pids[shard_index] = event[3]
+            state = self.windows.get(window_key)
+            if state is not None:
+                if kind == EVT_STARTED:
+                    state.status = 'running'
+                elif kind == EVT_CARD:
+                    state.current_card_id = event[2]
+                elif kind == EVT_CARD_DONE:
+                    state.current_card_id = event[2]
+                    state.cards_done = event[4]
+                elif kind == EVT_FINISHED:
+                    state.status = 'finished'
+                    state.success, state.message, state.cards_done = event[2], event[3], event[4]
+                    state.finished_at = time.monotonic()
+                    self._cond.notify_all()
+        if self.on_event is not None:
+            try:
+                self.on_event(event)
+            except Exception as e:
+                logger.warning(f"处理分片事件出错: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'shards': self.num_shards,
+                'shard_pids': dict(self.shard_pids),
+                'windows': len(self.windows),
+                'running': sum(1 for state in self.windows.values() if state.status != 'finished'),
+                'cards_done': sum(state.cards_done for state in self.windows.values()),
+                'event_batches': self.event_batches,
+                'events': self.event_count,
+            }
+
+
+# ----------------------------------------------------------------------
+# 合成负载基准
+# ----------------------------------------------------------------------
+SYNTHETIC_TASK_TYPE = "合成负载"
+
+
+class _SyntheticLoadTask:
+    """合成负载任务：模拟参数处理/日志/结果处理的 Python 开销、一次截图和一段等待"""
+
+    @staticmethod
+    def execute_task(params, counters, execution_mode, target_hwnd, window_region=None, card_id=None,
+                     stop_checker=None, **kwargs):
+        from task_workflow.execution_backend import get_execution_backend
+        work = int(params.get('python_work', 300))
+        record = {'card_id': card_id, 'hwnd': target_hwnd, 'params': dict(params)}
+        for index in range(work):
+            record['step'] = index
+            json.dumps(record)
+            f"{card_id}:{index}:{target_hwnd}".encode('utf-8')
+        frame = get_execution_backend().capture.capture(target_hwnd)
+        if frame is not None:
+            counters['__synthetic_brightness__'] = float(frame[::8, ::8].mean())
+        wait_ms = float(params.get('wait_ms', 5))
+        if wait_ms > 0 and stop_checker is not None and stop_checker.wait(wait_ms / 1000.0):
+            return False, '停止工作流', None
+        return True, '执行下一步', None
+
+
+SYNTHETIC_TASK_MODULES = {SYNTHETIC_TASK_TYPE: _SyntheticLoadTask}
+
+
+def synthetic_backend(hwnd: int):
+    """合成负载的执行后端：单帧回放的假窗口"""
+    import numpy as np
+    from task_workflow.execution_backend import FakeWindowBackend
+    frame = np.random.default_rng(hwnd).integers(0, 255, (180, 320, 3), dtype=np.uint8)
+    return FakeWindowBackend({hwnd: [frame]})
+
+
+def synthetic_workflow(card_count: int, python_work: int, wait_ms: float):
+    """顺序连接的合成负载工作流，返回 (卡片字典, 连接列表, 起始卡片ID)"""
+    cards = {
+        card_id: {'id': card_id, 'task_type': SYNTHETIC_TASK_TYPE,
+                  'parameters': {'python_work': python_work, 'wait_ms': wait_ms}}
+        for card_id in range(1, card_count + 1)
+    }
+    connections = [{'start_card_id': card_id, 'end_card_id': card_id + 1, 'type': 'sequential'}
+                   for card_id in range(1, card_count)]
+    return cards, connections, 1
+
+
+def _bench_threads(window_count: int, workflow) -> float:
+    """对照组：所有窗口在本进程的线程中运行"""
+    from task_workflow.headless_executor import HeadlessWorkflowExecutor
+    cards, connections, start_card_id = workflow
+    executors = [
+        HeadlessWorkflowExecutor(cards, connections, SYNTHETIC_TASK_MODULES, start_card_id=start_card_id,
+                                 execution_mode='background', target_hwnd=1000 + index,
+                                 backend=synthetic_backend(1000 + index))
+        for index in range(window_count)
+    ]
+    threads = [threading.Thread(target=executor.run) for executor in executors]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def _bench_shards(window_count: int, workflow, executor: ShardedWindowExecutor) -> float:
+    cards, connections, start_card_id = workflow
+    executor.clear_finished()
+    start = time.perf_counter()
+    for index in range(window_count):
+        executor.start_window(f"bench-{index}", 1000 + index, cards, connections, start_card_id)
+    executor.wait_all()
+    return time.perf_counter() - start
+
+
+def run_benchmark(window_counts: List[int], num_shards: int, card_count: int = 100, python_work: int = 300,
+                  wait_ms: float = 5.0) -> List[Dict[str, Any]]:
+    """线程模式与分片模式的吞吐对比，返回每个窗口数的结果"""
+    from task_workflow.workflow_checkpoint import get_checkpoint_settings
+    get_checkpoint_settings().enabled = False
+    logging.getLogger().setLevel(logging.WARNING)
+
+    workflow = synthetic_workflow(card_count, python_work, wait_ms)
+    sharded = ShardedWindowExecutor(num_shards, task_modules_ref=f"{__name__}:SYNTHETIC_TASK_MODULES",
+                                    backend_factory_ref=f"{__name__}:synthetic_backend", checkpoints=False)
+    sharded.start()
+    # 预热：等待工作进程启动并导入模块
+    _bench_shards(num_shards, synthetic_workflow(1, 1, 0), sharded)
+
+    results = []
+    try:
+        for window_count in window_counts:
+            total_cards = window_count * card_count
+            thread_seconds = _bench_threads(window_count, workflow)
+            shard_seconds = _bench_shards(window_count, workflow, sharded)
+            results.append({
+                'windows': window_count,
+                'threads_cards_per_s': total_cards / thread_seconds,
+                'shards_cards_per_s': total_cards / shard_seconds,
+                'speedup': thread_seconds / shard_seconds,
+            })
+    finally:
+        sharded.shutdown()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="多进程分片执行合成负载基准")
+    parser.add_argument('--windows', default="1,5,10,20,40", help="窗口数列表（逗号分隔）")
+    parser.add_argument('--shards', type=int, default=None, help="工作进程数（默认 CPU 核心数 - 1）")
+    parser.add_argument('--cards', type=int, default=100, help="每个窗口执行的卡片数")
+    parser.add_argument('--python-work', type=int, default=300, help="每张卡片的 Python 开销（循环次数）")
+    parser.add_argument('--wait-ms', type=float, default=5.0, help="每张卡片的等待时间（毫秒）")
+    args = parser.parse_args(argv)
+
+    window_counts = [int(text) for text in args.windows.split(',') if text.strip()]
+    num_shards = args.shards or max(1, (os.cpu_count() or 2) - 1)
+    print(f"分片数: {num_shards}, 每窗口卡片数: {args.cards}, Python 开销: {args.python_work}, 等待: {args.wait_ms}ms")
+    print(f"{'窗口数':>6} {'线程 卡片/秒':>14} {'分片 卡片/秒':>14} {'加速比':>8}")
+    for row in run_benchmark(window_counts, num_shards, args.cards, args.python_work, args.wait_ms):
+        print(f"{row['windows']:>6} {row['threads_cards_per_s']:>14.0f} {row['shards_cards_per_s']:>14.0f} "
+              f"{row['speedup']:>8.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
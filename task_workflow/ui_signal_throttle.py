@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+"""
+执行器到UI的信号节流
+执行器线程不再为每张卡片直接发射 card_executing / card_finished / step_details 信号，
+而是把状态写入合并表（每个执行器每张卡片只保留最新状态，步骤详情只保留最新一条），
+由主线程按固定帧率（默认20Hz）统一发射，避免多窗口快速循环时主线程被跨线程信号淹没。
+
+- 卡片在一帧内从"执行中"变为"完成"时只投递最终状态
+- 工作流结束前调用 flush()，保证最终状态先于 execution_finished 到达
+- 错误信号（error_occurred）不经过节流，由执行器直接发射
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from PySide6.QtCore import QObject, Signal, QTimer, QCoreApplication
+
+logger = logging.getLogger(__name__)
+
+# 卡片状态：None 表示执行中，True/False 表示执行完成（成功/失败）
+_EXECUTING = None
+
+
+class _PendingUpdates:
+    """单个执行器待投递的状态"""
+
+    __slots__ = ('executor', 'cards', 'step_details')
+
+    def __init__(self, executor: QObject):
+        self.executor = executor
+        self.cards: "OrderedDict[Any, Optional[bool]]" = OrderedDict()
+        self.step_details: Optional[str] = None
+
+
+class UISignalThrottle(QObject):
+    """合并并按帧率投递执行器UI信号（对象始终位于主线程）"""
+
+    _schedule_requested = Signal()
+    _flush_requested = Signal()
+
+    def __init__(self, interval_ms: int = 50):
+        super().__init__()
+        app = QCoreApplication.instance()
+        self._has_event_loop = app is not None
+        if app is not None and self.thread() is not app.thread():
+            self.moveToThread(app.thread())
+
+        self.interval_ms = interval_ms
+        self._lock = threading.Lock()
+        self._pending: Dict[int, _PendingUpdates] = {}
+        self._drain_scheduled = False
+        self._last_drain = 0.0
+
+        # 统计
+        self._posted = 0
+        self._delivered = 0
+
+        self._schedule_requested.connect(self._on_schedule_requested)
+        self._flush_requested.connect(self._drain)
+
+    # ------------------------------------------------------------------
+    # 执行器线程调用
+    # ------------------------------------------------------------------
+    def post_card_executing(self, executor: QObject, card_id: Any):
+        """卡片开始执行"""
+        self._post(executor, card_id, _EXECUTING)
+
+    def post_card_finished(self, executor: QObject, card_id: Any, success: bool):
+        """卡片执行完成"""
+        self._post(executor, card_id, bool(success))
+
+    def post_step_details(self, executor: QObject, details: str):
+        """步骤详情（只保留最新一条）"""
+        self._post(executor, None, None, details)
+
+    def flush(self):
+        """请求主线程立即投递所有待发状态（排在随后发射的信号之前）"""
+        if not self._has_event_loop:
+            self._drain()
+            return
+        self._flush_requested.emit()
+
+    def _post(self, executor: QObject, card_id: Any, state: Optional[bool], details: Optional[str] = None):
+        schedule = False
+        with self._lock:
+            self._posted += 1
+            pending = self._pending.get(id(executor))
+            if pending is None:
+                pending = self._pending[id(executor)] = _PendingUpdates(executor)
+            if details is not None:
+                pending.step_details = details
+            else:
+                pending.cards.pop(card_id, None)
+                pending.cards[card_id] = state
+            if not self._drain_scheduled:
+                self._drain_scheduled = True
+                schedule = True
+
+        if not self._has_event_loop:
+            self._drain()
+        elif schedule:
+            self._schedule_requested.emit()
+
+    # ------------------------------------------------------------------
+    # 主线程
+    # ------------------------------------------------------------------
+    def _on_schedule_requested(self):
+        elapsed_ms = (time.monotonic() - self._last_drain) * 1000
+        QTimer.singleShot(max(0, int(self.interval_ms - elapsed_ms)), self._drain)
+
+    def _drain(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._drain_scheduled = False
+            self._last_drain = time.monotonic()
+
+        delivered = 0
+        for updates in pending.values():
+            executor = updates.executor
+            try:
+                for card_id, state in updates.cards.items():
+                    if state is _EXECUTING:
+                        executor.card_executing.emit(card_id)
+                    else:
+                        executor.card_finished.emit(card_id, state)
+                    delivered += 1
+                if updates.step_details is not None:
+                    executor.step_details.emit(updates.step_details)
+                    delivered += 1
+            except RuntimeError as e:
+                # 执行器已被 deleteLater 销毁
+                logger.debug(f"投递UI信号时执行器已销毁: {e}")
+        self._delivered += delivered
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取节流统计（posted-delivered 即被合并掉的更新数）"""
+        return {
+            'interval_ms': self.interval_ms,
+            'posted': self._posted,
+            'delivered': self._delivered,
+            'coalesced': self._posted - self._delivered,
+        }
+
+
+# 全局节流器
+_ui_signal_throttle: Optional[UISignalThrottle] = None
+_throttle_lock = threading.Lock()
+
+
+def get_ui_signal_throttle() -> UISignalThrottle:
+    """获取全局UI信号节流器"""
+    global _ui_signal_throttle
+    if _ui_signal_throttle is None:
+        with _throttle_lock:
+            if _ui_signal_throttle is None:
+                _ui_signal_throttle = UISignalThrottle()
+    return _ui_signal_throttle
@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+
+"""
+工作流检查点与快速恢复
+执行器按固定间隔把以下状态写入检查点文件，进程意外退出后可从检查点继续执行，而不必从起始卡片重跑：
+- 当前卡片ID（恢复时从这张卡片重新执行）
+- 持久计数器（_persistent_counters）
+- 工作流上下文的全局变量
+- 多组文字识别状态和多图识别记忆（card_data 中的进度键）
+
+文件格式为 JSON Lines：第一行是完整快照，之后每次只追加发生变化的键（增量记录）；
+增量记录达到一定数量后重写为单条完整快照（先写临时文件再替换）。最后一行写了一半（进程被杀）时忽略该行。
+
+恢复命令:
+    python -m task_workflow.workflow_checkpoint <检查点文件> [--workflow 工作流.json] [--hwnd 句柄] [--mode 执行模式]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_VERSION = 1
+
+# 需要保存的卡片数据键（多组文字识别状态、多图识别记忆）
+CHECKPOINT_CARD_DATA_KEYS = (
+    'multi_text_groups', 'current_text_index', 'clicked_texts',
+    'clicked_images', 'success_images',
+)
+# 以集合保存的卡片数据键：JSON 中存为排序后的列表，恢复时转回集合
+CHECKPOINT_SET_KEYS = ('clicked_images', 'success_images')
+
+# 记录类型
+_RECORD_FULL = 'full'
+_RECORD_DELTA = 'delta'
+
+# 状态分区: 计数器 / 全局变量 / 卡片数据
+_SECTIONS = ('c', 'g', 'd')
+
+
+def _json_default(value: Any) -> Any:
+    """集合编码为排序后的列表（保证相同内容的编码相同，增量比较才有效）"""
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+
+@dataclass
+class CheckpointSettings:
+    """检查点设置（全局）"""
+    enabled: bool = True
+    directory: str = "checkpoints"
+    interval: float = 5.0  # 两次写入的最小间隔（秒）
+    compact_after: int = 200  # 增量记录达到该数量后重写为完整快照
+    fsync: bool = False  # 每次写入后同步到磁盘（防断电，代价是每次写入多数毫秒）
+
+    def path_for(self, target_hwnd: Optional[int]) -> str:
+        """窗口对应的默认检查点文件"""
+        return os.path.join(self.directory, f"workflow_hwnd{target_hwnd or 0}.ckpt")
+
+
+_checkpoint_settings = CheckpointSettings()
+
+
+def get_checkpoint_settings() -> CheckpointSettings:
+    """获取全局检查点设置"""
+    return _checkpoint_settings
+
+
+@dataclass
+class WorkflowCheckpoint:
+    """从检查点文件读出的状态"""
+    card_id: Any
+    counters: Dict[str, Any] = field(default_factory=dict)
+    global_vars: Dict[str, Any] = field(default_factory=dict)
+    card_data: Dict[Any, Dict[str, Any]] = field(default_factory=dict)
+    meta: Dict[str, Any] = field(default_factory=dict)
+    sequence: int = 0
+    timestamp: float = 0.0
+
+    @property
+    def workflow_fingerprint(self) -> Optional[str]:
+        return self.meta.get('fingerprint')
+
+
+def _card_task_type(card: Any) -> str:
+    """卡片的任务类型（字典卡片和 TaskCard 对象取到相同的值）"""
+    if isinstance(card, dict):
+        task_type = card.get('task_type')
+    else:
+        task_type = getattr(card, 'task_type', None)
+    return str(task_type or '')
+
+
+def workflow_fingerprint(cards_data: Dict[Any, Any], connections_data: List[Dict[str, Any]]) -> str:
+    """工作流指纹（卡片ID、任务类型和连接），用于恢复时确认检查点属于同一个工作流"""
+    cards = sorted({(str(card_id), _card_task_type(card)) for card_id, card in cards_data.items()})
+    connections = sorted((str(conn.get('start_card_id')), str(conn.get('end_card_id')), str(conn.get('type')))
+                         for conn in connections_data if isinstance(conn, dict))
+    raw = json.dumps([cards, connections], ensure_ascii=False)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def _restore_card_id(value: Any) -> Any:
+    """JSON 对象键只能是字符串，卡片ID按整数还原"""
+    if isinstance(value, str) and value.lstrip('-').isdigit():
+        return int(value)
+    return value
+
+
+class CheckpointWriter:
+    """增量检查点写入器（只在执行线程上调用）"""
+
+    def __init__(self, path: str, meta: Optional[Dict[str, Any]] = None,
+                 settings: Optional[CheckpointSettings] = None):
+        self.path = path
+        self.meta = dict(meta or {})
+        self.settings = settings or get_checkpoint_settings()
+        self._file = None
+        self._sequence = 0
+        self._delta_count = 0
+        self._last_write = 0.0
+        self._last_card_id: Any = None
+        # 上次写入的各键编码结果 {分区: {键: JSON文本}}，用于计算增量
+        self._written: Dict[str, Dict[str, str]] = {section: {} for section in _SECTIONS}
+        self._unserializable: set = set()
+        self._closed = False
+
+        # 统计
+        self.write_count = 0
+        self.bytes_written = 0
+        self.write_time_ms = 0.0
+
+    # ------------------------------------------------------------------
+    # 状态采集
+    # ------------------------------------------------------------------
+    def _encode(self, section: str, key: str, value: Any) -> Optional[str]:
+        try:
+            return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(',', ':'),
+                              default=_json_default)
+        except (TypeError, ValueError):
+            if (section, key) not in self._unserializable:
+                self._unserializable.add((section, key))
+                logger.warning(f"检查点跳过无法序列化的值: {section}.{key} ({type(value).__name__})")
+            return None
+
+    def _collect(self, counters: Dict[str, Any], context) -> Dict[str, Dict[str, str]]:
+        """采集当前状态并编码（每个键单独编码，便于比较增量）"""
+        state: Dict[str, Dict[str, str]] = {section: {} for section in _SECTIONS}
+        for key, value in list(counters.items()):
+            encoded = self._encode('c', key, value)
+            if encoded is not None:
+                state['c'][str(key)] = encoded
+        if context is not None:
+            for key, value in list(context.global_vars.items()):
+                encoded = self._encode('g', key, value)
+                if encoded is not None:
+                    state['g'][str(key)] = encoded
+            for card_id, data in list(context.card_data.items()):
+                # 逐键编码，无法序列化的键只跳过该键，不丢弃整张卡片的进度
+                fields = []
+                for key in CHECKPOINT_CARD_DATA_KEYS:
+                    if key in data:
+                        encoded = self._encode('d', f"{card_id}.{key}", data[key])
+                        if encoded is not None:
+                            fields.append(f"{json.dumps(key)}:{encoded}")
+                if fields:
+                    state['d'][str(card_id)] = '{' + ','.join(fields) + '}'
+        return state
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    def maybe_write(self, card_id: Any, counters: Dict[str, Any], context) -> bool:
+        """距上次写入超过间隔时写入检查点（未到间隔时只有一次时钟读取的开销）"""
+        if self._closed or time.monotonic() - self._last_write < self.settings.interval:
+            return False
+        return self.write(card_id, counters, context)
+
+    def write(self, card_id: Any, counters: Dict[str, Any], context) -> bool:
+        """立即写入检查点（状态没有变化时不写）"""
+        if self._closed:
+            return False
+        start = time.perf_counter()
+        self._last_write = time.monotonic()
+        try:
+            state = self._collect(counters, context)
+            if self._file is None or self._delta_count >= self.settings.compact_after:
+                line = self._write_full(card_id, state)
+            else:
+                line = self._append_delta(card_id, state)
+        except Exception as e:
+            logger.warning(f"写入工作流检查点失败: {e}")
+            return False
+        if line is None:
+            return False
+
+        self._last_card_id = card_id
+        self._written = state
+        self.write_count += 1
+        self.bytes_written += len(line)
+        self.write_time_ms += (time.perf_counter() - start) * 1000
+        return True
+
+    def _record(self, kind: str, card_id: Any, body: Dict[str, Any]) -> str:
+        self._sequence += 1
+        record = {'k': kind, 'seq': self._sequence, 't': round(time.time(), 3), 'card': card_id}
+        record.update(body)
+        return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n"
+
+    @staticmethod
+    def _raw(encoded: Dict[str, str]) -> str:
+        """把已编码的值拼成 JSON 对象文本（避免重复编码）"""
+        return "{" + ",".join(f"{json.dumps(key, ensure_ascii=False)}:{value}" for key, value in encoded.items()) + "}"
+
+    def _write_full(self, card_id: Any, state: Dict[str, Dict[str, str]]) -> str:
+        """写入完整快照（新文件或压缩）：先写临时文件再替换，替换前旧文件仍然完整可用"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        header = self._record(_RECORD_FULL, card_id, {'v': CHECKPOINT_VERSION, 'meta': self.meta})
+        sections = ",".join(f'"{section}":{self._raw(state[section])}' for section in _SECTIONS)
+        line = header[:-2] + "," + sections + "}\n"
+
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._delta_count = 0
+        return line
+
+    def _append_delta(self, card_id: Any, state: Dict[str, Dict[str, str]]) -> Optional[str]:
+        """追加增量记录：只包含变化和删除的键"""
+        changed: Dict[str, Dict[str, str]] = {}
+        removed: Dict[str, List[str]] = {}
+        for section in _SECTIONS:
+            old, new = self._written[section], state[section]
+            diff = {key: value for key, value in new.items() if old.get(key) != value}
+            gone = [key for key in old if key not in new]
+            if diff:
+                changed[section] = diff
+            if gone:
+                removed[section] = gone
+        if not changed and not removed and card_id == self._last_card_id:
+            return None
+
+        header = self._record(_RECORD_DELTA, card_id, {'rm': removed} if removed else {})
+        if changed:
+            sections = ",".join(f'"{section}":{self._raw(diff)}' for section, diff in changed.items())
+            line = header[:-2] + "," + sections + "}\n"
+        else:
+            line = header
+        self._file.write(line)
+        self._file.flush()
+        if self.settings.fsync:
+            os.fsync(self._file.fileno())
+        self._delta_count += 1
+        return line
+
+    def close(self):
+        """停止写入（保留检查点文件）"""
+        self._closed = True
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """工作流正常完成：删除检查点文件"""
+        self.close()
+        for path in (self.path, self.path + ".tmp"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"删除检查点文件失败: {path}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """写入统计"""
+        return {
+            'path': self.path,
+            'writes': self.write_count,
+            'bytes': self.bytes_written,
+            'mean_write_ms': self.write_time_ms / self.write_count if self.write_count else 0.0,
+        }
+
+
+def load_checkpoint(path: str) -> Optional[WorkflowCheckpoint]:
+    """读取检查点文件（重放完整快照和之后的增量记录），文件不存在或没有完整快照时返回 None"""
+    if not os.path.exists(path):
+        return None
+
+    checkpoint: Optional[WorkflowCheckpoint] = None
+    state: Dict[str, Dict[str, Any]] = {section: {} for section in _SECTIONS}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 最后一行写到一半时进程退出
+                logger.warning(f"检查点文件第 {line_number} 行不完整，已忽略: {path}")
+                break
+
+            kind = record.get('k')
+            if kind == _RECORD_FULL:
+                state = {section: dict(record.get(section, {})) for section in _SECTIONS}
+                checkpoint = WorkflowCheckpoint(card_id=None, meta=record.get('meta', {}))
+            elif kind == _RECORD_DELTA and checkpoint is not None:
+                for section, keys in record.get('rm', {}).items():
+                    for key in keys:
+                        state.get(section, {}).pop(key, None)
+                for section in _SECTIONS:
+                    state[section].update(record.get(section, {}))
+            else:
+                continue
+            checkpoint.card_id = record.get('card')
+            checkpoint.sequence = record.get('seq', 0)
+            checkpoint.timestamp = record.get('t', 0.0)
+
+    if checkpoint is None:
+        return None
+    checkpoint.counters = state['c']
+    checkpoint.global_vars = state['g']
+    checkpoint.card_data = {_restore_card_id(card_id): data for card_id, data in state['d'].items()}
+    return checkpoint
+
+
+def apply_checkpoint(checkpoint: WorkflowCheckpoint, counters: Dict[str, Any], context) -> None:
+    """把检查点状态写回计数器和工作流上下文"""
+    counters.update(checkpoint.counters)
+    if context is not None:
+        context.global_vars.update(checkpoint.global_vars)
+        for card_id, data in checkpoint.card_data.items():
+            data = {key: set(value) if key in CHECKPOINT_SET_KEYS and isinstance(value, list) else value
+                    for key, value in data.items()}
+            context.card_data.setdefault(card_id, {}).update(data)
+
+
+# ----------------------------------------------------------------------
+# 恢复命令
+# ----------------------------------------------------------------------
+def load_workflow_file(path: str) -> Tuple[Dict[Any, Any], List[Dict[str, Any]], Any]:
+    """读取工作流文件，返回 (卡片字典, 连接列表, 起始卡片ID)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        workflow_data = json.load(f)
+
+    cards_data = {card['id']: card for card in workflow_data.get('cards', [])}
+    connections_data = workflow_data.get('connections', [])
+    start_card_id = next((card_id for card_id, card in cards_data.items() if card.get('task_type') == '起点'),
+                         next(iter(cards_data), None))
+    return cards_data, connections_data, start_card_id
+
+
+def resume_workflow(checkpoint_path: str, workflow_file: Optional[str] = None, target_hwnd: Optional[int] = None,
+                    execution_mode: Optional[str] = None, backend=None) -> Tuple[bool, str]:
+    """从检查点恢复并执行工作流（无界面执行器），返回 (是否成功, 结束消息)"""
+    from task_workflow.headless_executor import HeadlessWorkflowExecutor
+
+    checkpoint = load_checkpoint(checkpoint_path)
+    if checkpoint is None:
+        return False, f"找不到可用的检查点: {checkpoint_path}"
+
+    workflow_file = workflow_file or checkpoint.meta.get('workflow_file')
+    if not workflow_file:
+        return False, "检查点没有记录工作流文件，请用 --workflow 指定"
+
+    cards_data, connections_data, start_card_id = load_workflow_file(workflow_file)
+    executor = HeadlessWorkflowExecutor(
+        cards_data, connections_data,
+        target_window_title=checkpoint.meta.get('window_title'),
+        execution_mode=execution_mode or checkpoint.meta.get('execution_mode', 'background'),
+        start_card_id=start_card_id,
+        target_hwnd=target_hwnd or checkpoint.meta.get('hwnd'),
+        backend=backend,
+        workflow_file=workflow_file,
+        checkpoint_path=checkpoint_path,
+    )
+    if not executor.resume_from_checkpoint(checkpoint):
+        return False, "检查点与工作流不匹配"
+    return executor.run()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="从检查点恢复工作流")
+    parser.add_argument('checkpoint', help="检查点文件")
+    parser.add_argument('--workflow', help="工作流文件（默认使用检查点中记录的文件）")
+    parser.add_argument('--hwnd', type=int, help="目标窗口句柄（默认使用检查点中记录的句柄）")
+    parser.add_argument('--mode', help="执行模式（默认使用检查点中记录的模式）")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    success, message = resume_workflow(args.checkpoint, args.workflow, args.hwnd, args.mode)
+    print(message)
+    return 0 if success else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -5,6 +5,7 @@
 用于在工作流执行过程中在卡片间传递数据，特别是OCR识别结果
 """
 
+import functools
 import logging
 import threading
 import time
@@ -13,6 +14,16 @@ from dataclasses import dataclass, field
 
 logger = logging.getLogger(__name__)
 
+
+def _synchronized(method):
+    """在上下文的锁内执行（并行分支的多个线程会同时读写同一个上下文）"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 @dataclass
 class WorkflowContext:
     """工作流执行上下文"""
@@ -27,7 +38,11 @@ class WorkflowContext:
     
     # 全局变量存储
     global_vars: Dict[str, Any] = field(default_factory=dict)
-    
+
+    def __post_init__(self):
+        self._lock = threading.RLock()
+
+    @_synchronized
     def clear(self):
         """清空所有上下文数据"""
         self.ocr_results.clear()
@@ -36,6 +51,7 @@ class WorkflowContext:
         self.global_vars.clear()
         logger.debug("工作流上下文已清空")
     
+    @_synchronized
     def set_ocr_results(self, card_id: int, results: List[Dict[str, Any]]):
         """设置OCR识别结果"""
         self.ocr_results[card_id] = results
@@ -44,6 +60,7 @@ class WorkflowContext:
         self.set_global_var('latest_ocr_timestamp', time.time())
         logger.debug(f"设置卡片 {card_id} 的OCR结果: {len(results)} 个文字 (最新)")
     
+    @_synchronized
     def get_ocr_results(self, card_id: Optional[int] = None) -> List[Dict[str, Any]]:
         """获取OCR识别结果"""
         if card_id is not None:
@@ -56,6 +73,7 @@ class WorkflowContext:
         
         return []
     
+    @_synchronized
     def get_latest_ocr_results(self) -> List[Dict[str, Any]]:
         """获取最新的OCR识别结果"""
         # 优先使用记录的最新OCR卡片ID
@@ -72,6 +90,7 @@ class WorkflowContext:
 
         return []
     
+    @_synchronized
     def set_card_data(self, card_id: int, key: str, value: Any):
         """设置卡片数据"""
         if card_id not in self.card_data:
@@ -79,6 +98,7 @@ class WorkflowContext:
         self.card_data[card_id][key] = value
         logger.debug(f"设置卡片 {card_id} 数据: {key} = {value}")
 
+    @_synchronized
     def set_multi_text_recognition_state(self, card_id: int, text_groups: list, current_index: int = 0, clicked_texts: list = None):
         """设置多组文字识别状态"""
         if clicked_texts is None:
@@ -89,6 +109,7 @@ class WorkflowContext:
         self.set_card_data(card_id, 'clicked_texts', clicked_texts.copy())
         logger.info(f"设置多组文字识别状态: 卡片{card_id}, 当前组{current_index}/{len(text_groups)}, 已点击{len(clicked_texts)}个文字")
 
+    @_synchronized
     def get_multi_text_recognition_state(self, card_id: int):
         """获取多组文字识别状态"""
         if card_id not in self.card_data:
@@ -101,6 +122,7 @@ class WorkflowContext:
 
         return text_groups, current_index, clicked_texts
 
+    @_synchronized
     def advance_text_recognition_index(self, card_id: int):
         """推进到下一组文字识别"""
         text_groups, current_index, clicked_texts = self.get_multi_text_recognition_state(card_id)
@@ -113,6 +135,7 @@ class WorkflowContext:
             return new_index < len(text_groups)
         return False
 
+    @_synchronized
     def add_clicked_text(self, card_id: int, clicked_text: str):
         """添加已点击的文字"""
         text_groups, current_index, clicked_texts = self.get_multi_text_recognition_state(card_id)
@@ -121,6 +144,7 @@ class WorkflowContext:
             self.set_card_data(card_id, 'clicked_texts', clicked_texts)
             logger.info(f"添加已点击文字: 卡片{card_id}, 文字'{clicked_text}', 总计{len(clicked_texts)}个")
 
+    @_synchronized
     def is_multi_text_recognition_complete(self, card_id: int):
         """检查多组文字识别是否完成"""
         text_groups, current_index, clicked_texts = self.get_multi_text_recognition_state(card_id)
@@ -128,24 +152,29 @@ class WorkflowContext:
             return True
         return current_index >= len(text_groups) - 1
 
+    @_synchronized
     def reset_multi_text_recognition_state(self, card_id: int, text_groups: list):
         """重置多组文字识别状态"""
         self.set_multi_text_recognition_state(card_id, text_groups, 0, [])
         logger.info(f"重置多组文字识别状态: 卡片{card_id}, 共{len(text_groups)}组文字")
     
+    @_synchronized
     def get_card_data(self, card_id: int, key: str, default: Any = None) -> Any:
         """获取卡片数据"""
         return self.card_data.get(card_id, {}).get(key, default)
     
+    @_synchronized
     def set_global_var(self, key: str, value: Any):
         """设置全局变量"""
         self.global_vars[key] = value
         logger.debug(f"设置全局变量: {key} = {value}")
     
+    @_synchronized
     def get_global_var(self, key: str, default: Any = None) -> Any:
         """获取全局变量"""
         return self.global_vars.get(key, default)
 
+    @_synchronized
     def clear_card_ocr_context(self, card_id: int):
         """清除指定卡片的OCR上下文数据（不包括记忆）"""
         # 清除OCR识别结果（上下文）
@@ -162,6 +191,7 @@ class WorkflowContext:
                     del card_data[key]
                     logger.debug(f"清除卡片 {card_id} 的OCR上下文数据: {key}")
 
+    @_synchronized
     def clear_card_ocr_data(self, card_id: int):
         """清除指定卡片的所有OCR相关数据（包括记忆）"""
         # 清除OCR识别结果
@@ -184,6 +214,7 @@ class WorkflowContext:
                 del self.card_data[card_id]
                 logger.debug(f"清除卡片 {card_id} 的所有数据")
 
+    @_synchronized
     def clear_all_ocr_data(self):
         """清除所有OCR相关数据"""
         self.ocr_results.clear()
@@ -194,6 +225,7 @@ class WorkflowContext:
 
         logger.debug("清除所有OCR相关数据")
 
+    @_synchronized
     def clear_multi_image_memory(self):
         """清除所有多图识别记忆数据"""
         cleared_count = 0
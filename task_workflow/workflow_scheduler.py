@@ -0,0 +1,523 @@
+# -*- coding: utf-8 -*-
+
+"""
+工作流调度器
+在固定大小的工作线程池上运行大量工作流，避免几十个窗口的工作流同时运行互相抢占：
+- 优先级：数值越大越先运行；排队时间越长有效优先级越高（老化），低优先级不会被饿死
+- 触发器：立即运行一次 / 固定间隔 / 每天固定时刻
+- 窗口互斥：同一窗口同一时间只运行一个工作流
+- 公平共享：同优先级下，累计运行时间最少的窗口先运行
+- 准入限制：作业声明需要的重量级资源（OCR 实例、截图带宽），资源用满时排队等待
+- 循环工作流：含循环的工作流可能永不结束，在独立线程上运行，不占工作线程和资源配额
+  （其中的 OCR/截图等重量级操作仍由 heavy_op_admission 逐次准入），受窗口互斥约束，
+  同时运行的数量单独受 max_long_running 限制，超出时排队
+- 指标：队列深度、等待时间（平均/最大/P95）、运行中数量、资源占用
+"""
+
+import datetime
+import itertools
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from task_workflow.execution_plan import ACTION_JUMP, ACTION_REPEAT, parse_action
+from utils.cancellation import CancellationToken
+
+logger = logging.getLogger(__name__)
+
+# 重量级资源
+RESOURCE_OCR = 'ocr'
+RESOURCE_CAPTURE = 'capture'
+
+# 包含 OCR 的任务类型（估算工作流需要的资源）
+OCR_TASK_TYPES = frozenset({"OCR文字识别"})
+
+# 作业状态
+JOB_SCHEDULED = 'scheduled'  # 等待触发时间
+JOB_QUEUED = 'queued'  # 已到触发时间，等待工作线程/窗口/资源
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'  # 一次性作业已完成
+JOB_CANCELLED = 'cancelled'
+
+# 作业执行函数: (取消令牌) -> (是否成功, 结束消息)
+JobRunner = Callable[[CancellationToken], Tuple[bool, str]]
+
+
+def default_resource_limits() -> Dict[str, int]:
+    """按 CPU 核心数估算重量级资源的并发上限"""
+    cores = os.cpu_count() or 4
+    return {
+        RESOURCE_OCR: max(1, cores // 2),
+        RESOURCE_CAPTURE: max(2, cores),
+    }
+
+
+def _card_fields(card: Any) -> Tuple[Optional[str], Dict[str, Any]]:
+    """卡片的任务类型和参数（兼容 TaskCard 对象和字典）"""
+    if isinstance(card, dict):
+        return card.get('task_type'), card.get('parameters') or {}
+    return getattr(card, 'task_type', None), getattr(card, 'parameters', None) or {}
+
+
+def estimate_workflow_resources(cards_data: Dict[Any, Any]) -> Dict[str, int]:
+    """根据卡片类型估算工作流需要的重量级资源"""
+    resources = {RESOURCE_CAPTURE: 1}
+    for card in cards_data.values():
+        if _card_fields(card)[0] in OCR_TASK_TYPES:
+            resources[RESOURCE_OCR] = 1
+            break
+    return resources
+
+
+def workflow_has_loop(cards_data: Dict[Any, Any], connections_data: List[Dict[str, Any]]) -> bool:
+    """工作流是否含循环（连接成环、跳转到已执行过的步骤或“继续执行本步骤”），含循环的工作流可能永不结束"""
+    successors: Dict[str, set] = {}
+
+    def add_edge(start: Any, end: Any):
+        if start is not None and end is not None:
+            successors.setdefault(str(start), set()).add(str(end))
+
+    for connection in connections_data or []:
+        if isinstance(connection, dict):
+            add_edge(connection.get('start_card_id'), connection.get('end_card_id'))
+    for card_id, card in cards_data.items():
+        params = _card_fields(card)[1]
+        for action_key, target_key in (('on_success', 'success_jump_target_id'),
+                                       ('on_failure', 'failure_jump_target_id')):
+            action = parse_action(params.get(action_key))
+            if action == ACTION_REPEAT:
+                return True
+            if action == ACTION_JUMP:
+                add_edge(card_id, params.get(target_key))
+
+    # 迭代 DFS 找回边
+    visiting, done = set(), set()
+    for root in list(successors):
+        if root in done:
+            continue
+        stack = [(root, iter(successors.get(root, ())))]
+        visiting.add(root)
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                visiting.discard(node)
+                done.add(node)
+            elif child in visiting:
+                return True
+            elif child not in done:
+                visiting.add(child)
+                stack.append((child, iter(successors.get(child, ()))))
+    return False
+
+
+# ----------------------------------------------------------------------
+# 触发器
+# ----------------------------------------------------------------------
+class IntervalTrigger:
+    """固定间隔触发（上一次计划时间 + 间隔；运行超时则在运行结束后立即再次触发）"""
+
+    def __init__(self, seconds: float, start_delay: float = 0.0):
+        if float(seconds) <= 0:
+            raise ValueError(f"触发间隔必须大于0秒: {seconds}")
+        self.seconds = float(seconds)
+        self.start_delay = max(0.0, float(start_delay))
+
+    def first_fire(self, now: float) -> float:
+        return now + self.start_delay
+
+    def next_fire(self, previous: float, now: float) -> Optional[float]:
+        return max(now, previous + self.seconds)
+
+    def __repr__(self):
+        return f"IntervalTrigger({self.seconds}s)"
+
+
+class DailyTrigger:
+    """每天固定时刻触发（时刻格式 "HH:MM" 或 "HH:MM:SS"）"""
+
+    def __init__(self, times: Sequence[str]):
+        self.times: List[datetime.time] = sorted(self._parse(text) for text in times)
+        if not self.times:
+            raise ValueError("每日触发器至少需要一个时刻")
+
+    @staticmethod
+    def _parse(text: str) -> datetime.time:
+        parts = [int(part) for part in str(text).strip().split(':')]
+        while len(parts) < 3:
+            parts.append(0)
+        return datetime.time(parts[0], parts[1], parts[2])
+
+    def _after(self, moment: float) -> float:
+        current = datetime.datetime.fromtimestamp(moment)
+        for day_offset in (0, 1):
+            day = current.date() + datetime.timedelta(days=day_offset)
+            for time_of_day in self.times:
+                candidate = datetime.datetime.combine(day, time_of_day)
+                if candidate.timestamp() > moment:
+                    return candidate.timestamp()
+        return moment + 86400.0
+
+    def first_fire(self, now: float) -> float:
+        return self._after(now)
+
+    def next_fire(self, previous: float, now: float) -> Optional[float]:
+        return self._after(max(previous, now))
+
+    def __repr__(self):
+        return f"DailyTrigger({[t.strftime('%H:%M:%S') for t in self.times]})"
+
+
+# ----------------------------------------------------------------------
+# 作业
+# ----------------------------------------------------------------------
+@dataclass(eq=False)
+class ScheduledJob:
+    """调度作业"""
+    name: str
+    run: JobRunner
+    priority: int = 0
+    hwnd: Optional[int] = None  # 目标窗口（同一窗口互斥）
+    resources: Dict[str, int] = field(default_factory=dict)
+    trigger: Any = None  # None: 立即运行一次
+    long_running: bool = False  # 循环工作流：独立线程运行，不占工作线程和资源配额
+    on_started: Optional[Callable[['ScheduledJob'], None]] = None
+    on_finished: Optional[Callable[['ScheduledJob', bool, str], None]] = None
+
+    # 调度器维护的状态
+    job_id: int = 0
+    state: str = JOB_SCHEDULED
+    due_time: float = 0.0  # 下次触发时间（time.time）
+    enqueued_at: float = 0.0  # 进入就绪队列的时间（time.monotonic）
+    run_count: int = 0
+    last_wait_ms: float = 0.0
+    last_duration_ms: float = 0.0
+    last_result: Optional[Tuple[bool, str]] = None
+    token: Optional[CancellationToken] = None
+
+    @property
+    def fair_key(self) -> Any:
+        """公平共享的分组（窗口；没有窗口时按作业自身）"""
+        return self.hwnd if self.hwnd is not None else f"job-{self.job_id}"
+
+
+class WorkflowScheduler:
+    """工作流调度器"""
+
+    def __init__(self, max_workers: Optional[int] = None, resource_limits: Optional[Dict[str, int]] = None,
+                 aging_seconds: float = 30.0, max_long_running: Optional[int] = None):
+        """
+        Args:
+            max_workers: 工作线程数（默认按 CPU 核心数）
+            resource_limits: 重量级资源并发上限（默认按 CPU 核心数估算）
+            aging_seconds: 排队每满该秒数有效优先级 +1
+            max_long_running: 同时运行的循环工作流上限（默认与工作线程数相同）
+        """
+        self.max_workers = max_workers or max(2, min(8, os.cpu_count() or 4))
+        self.max_long_running = max_long_running or self.max_workers
+        self.resource_limits = dict(default_resource_limits())
+        if resource_limits:
+            self.resource_limits.update(resource_limits)
+        self.aging_seconds = aging_seconds
+
+        self._jobs: Dict[int, ScheduledJob] = {}
+        self._ready: List[ScheduledJob] = []
+        self._running: Dict[int, ScheduledJob] = {}
+        self._long_running_count = 0  # 运行中的循环工作流（不占工作线程）
+        self._busy_windows: set = set()
+        self._resources_in_use: Dict[str, int] = {}
+        self._window_runtime: Dict[Any, float] = {}
+        self._ids = itertools.count(1)
+
+        self._cond = threading.Condition()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._dispatcher: Optional[threading.Thread] = None
+        self._shutdown = False
+
+        # 指标
+        self._wait_samples: Deque[float] = deque(maxlen=1000)
+        self._max_wait_ms = 0.0
+        self._started_count = 0
+        self._finished_count = 0
+        self._max_queue_depth = 0
+
+    # ------------------------------------------------------------------
+    # 提交与取消
+    # ------------------------------------------------------------------
+    def submit(self, job: ScheduledJob) -> int:
+        """提交作业，返回作业ID"""
+        with self._cond:
+            self._ensure_started()
+            job.job_id = next(self._ids)
+            now = time.time()
+            job.due_time = job.trigger.first_fire(now) if job.trigger is not None else now
+            job.state = JOB_SCHEDULED
+            self._jobs[job.job_id] = job
+            self._cond.notify_all()
+        logger.info(f"调度作业已提交: {job.name} (ID={job.job_id}, 优先级={job.priority}, 窗口={job.hwnd}, "
+                    f"触发器={job.trigger}, 资源={job.resources})")
+        return job.job_id
+
+    def cancel(self, job_id: int) -> bool:
+        """取消作业：排队中的作业直接移除，运行中的作业通过取消令牌停止，周期作业不再触发"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            if job in self._ready:
+                self._ready.remove(job)
+            if job.token is not None:
+                job.token.cancel("调度作业已取消")
+            if job.state != JOB_RUNNING:
+                self._jobs.pop(job_id, None)
+            job.state = JOB_CANCELLED
+            self._cond.notify_all()
+        logger.info(f"调度作业已取消: {job.name} (ID={job_id})")
+        return True
+
+    def cancel_all(self):
+        """取消所有作业"""
+        with self._cond:
+            job_ids = list(self._jobs)
+        for job_id in job_ids:
+            self.cancel(job_id)
+
+    def get_job(self, job_id: int) -> Optional[ScheduledJob]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait: bool = False):
+        """取消所有作业并停止调度线程"""
+        self.cancel_all()
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+            pool, self._pool = self._pool, None
+            dispatcher, self._dispatcher = self._dispatcher, None
+        if dispatcher is not None and wait:
+            dispatcher.join(timeout=5.0)
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    # ------------------------------------------------------------------
+    # 调度
+    # ------------------------------------------------------------------
+    def _ensure_started(self):
+        if self._dispatcher is None or not self._dispatcher.is_alive():
+            self._shutdown = False
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="WorkflowScheduler")
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name="WorkflowSchedulerDispatch",
+                                                daemon=True)
+            self._dispatcher.start()
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while not self._shutdown:
+                now = time.time()
+                next_due = self._promote_due_jobs(now)
+                while True:
+                    job = self._pick_next(len(self._running) - self._long_running_count < self.max_workers,
+                                          self._long_running_count < self.max_long_running)
+                    if job is None:
+                        break
+                    self._start(job)
+                timeout = None if next_due is None else max(0.0, next_due - time.time())
+                self._cond.wait(timeout)
+
+    def _promote_due_jobs(self, now: float) -> Optional[float]:
+        """把到达触发时间的作业放入就绪队列，返回最近的下一次触发时间"""
+        next_due = None
+        for job in self._jobs.values():
+            if job.state != JOB_SCHEDULED:
+                continue
+            if job.due_time <= now:
+                job.state = JOB_QUEUED
+                job.enqueued_at = time.monotonic()
+                self._ready.append(job)
+            elif next_due is None or job.due_time < next_due:
+                next_due = job.due_time
+        self._max_queue_depth = max(self._max_queue_depth, len(self._ready))
+        return next_due
+
+    def _admissible(self, job: ScheduledJob) -> bool:
+        if job.hwnd is not None and job.hwnd in self._busy_windows:
+            return False
+        if job.long_running:
+            return True
+        for resource, amount in job.resources.items():
+            limit = self.resource_limits.get(resource)
+            if limit is not None and self._resources_in_use.get(resource, 0) + amount > limit:
+                return False
+        return True
+
+    def _pick_next(self, worker_available: bool, long_running_available: bool) -> Optional[ScheduledJob]:
+        """按 有效优先级 > 窗口累计运行时间 > 排队先后 选择下一个可运行的作业（普通作业需要空闲工作线程，循环工作流需要循环名额）"""
+        if not self._ready:
+            return None
+        now = time.monotonic()
+        best, best_key = None, None
+        for job in self._ready:
+            if not (long_running_available if job.long_running else worker_available):
+                continue
+            if not self._admissible(job):
+                continue
+            waited = now - job.enqueued_at
+            effective_priority = job.priority + (waited / self.aging_seconds if self.aging_seconds > 0 else 0)
+            key = (-math.floor(effective_priority), self._window_runtime.get(job.fair_key, 0.0), job.enqueued_at)
+            if best_key is None or key < best_key:
+                best, best_key = job, key
+        if best is not None:
+            self._ready.remove(best)
+        return best
+
+    def _start(self, job: ScheduledJob):
+        wait_ms = (time.monotonic() - job.enqueued_at) * 1000
+        job.last_wait_ms = wait_ms
+        self._wait_samples.append(wait_ms)
+        self._max_wait_ms = max(self._max_wait_ms, wait_ms)
+        self._started_count += 1
+
+        job.state = JOB_RUNNING
+        job.token = CancellationToken()
+        self._running[job.job_id] = job
+        if job.hwnd is not None:
+            self._busy_windows.add(job.hwnd)
+
+        logger.debug(f"调度作业开始: {job.name} (ID={job.job_id}, 等待 {wait_ms:.0f}ms)")
+        if job.long_running:
+            self._long_running_count += 1
+            threading.Thread(target=self._run_job, args=(job,), name=f"WorkflowSchedulerLoop-{job.job_id}",
+                             daemon=True).start()
+            return
+        for resource, amount in job.resources.items():
+            self._resources_in_use[resource] = self._resources_in_use.get(resource, 0) + amount
+        self._pool.submit(self._run_job, job)
+
+    def _run_job(self, job: ScheduledJob):
+        start = time.monotonic()
+        success, message = False, ""
+        try:
+            if job.on_started is not None:
+                job.on_started(job)
+            success, message = job.run(job.token)
+        except Exception as e:
+            logger.error(f"调度作业 {job.name} 执行出错: {e}", exc_info=True)
+            success, message = False, f"执行错误: {e}"
+        finally:
+            duration = time.monotonic() - start
+            self._finish(job, duration, success, message)
+
+        if job.on_finished is not None:
+            try:
+                job.on_finished(job, success, message)
+            except Exception as e:
+                logger.warning(f"调度作业 {job.name} 完成回调出错: {e}")
+
+    def _finish(self, job: ScheduledJob, duration: float, success: bool, message: str):
+        with self._cond:
+            self._running.pop(job.job_id, None)
+            if job.hwnd is not None:
+                self._busy_windows.discard(job.hwnd)
+            if job.long_running:
+                self._long_running_count -= 1
+            else:
+                for resource, amount in job.resources.items():
+                    self._resources_in_use[resource] = max(0, self._resources_in_use.get(resource, 0) - amount)
+            self._window_runtime[job.fair_key] = self._window_runtime.get(job.fair_key, 0.0) + duration
+            self._finished_count += 1
+
+            job.run_count += 1
+            job.last_duration_ms = duration * 1000
+            job.last_result = (success, message)
+            job.token = None
+
+            if job.state == JOB_CANCELLED:
+                self._jobs.pop(job.job_id, None)
+            elif job.trigger is not None:
+                next_due = job.trigger.next_fire(job.due_time, time.time())
+                if next_due is None:
+                    job.state = JOB_DONE
+                    self._jobs.pop(job.job_id, None)
+                else:
+                    job.due_time = next_due
+                    job.state = JOB_SCHEDULED
+            else:
+                job.state = JOB_DONE
+                self._jobs.pop(job.job_id, None)
+            self._cond.notify_all()
+        logger.debug(f"调度作业结束: {job.name} (ID={job.job_id}, 成功={success}, 耗时={duration * 1000:.0f}ms)")
+
+    # ------------------------------------------------------------------
+    # 指标
+    # ------------------------------------------------------------------
+    def get_metrics(self) -> Dict[str, Any]:
+        """调度指标"""
+        with self._cond:
+            samples = sorted(self._wait_samples)
+            now = time.monotonic()
+            return {
+                'queue_depth': len(self._ready),
+                'max_queue_depth': self._max_queue_depth,
+                'oldest_wait_ms': max(((now - job.enqueued_at) * 1000 for job in self._ready), default=0.0),
+                'scheduled': sum(1 for job in self._jobs.values() if job.state == JOB_SCHEDULED),
+                'running': len(self._running),
+                'long_running': self._long_running_count,
+                'max_long_running': self.max_long_running,
+                'max_workers': self.max_workers,
+                'started': self._started_count,
+                'finished': self._finished_count,
+                'mean_wait_ms': sum(samples) / len(samples) if samples else 0.0,
+                'p95_wait_ms': samples[int(len(samples) * 0.95)] if samples else 0.0,
+                'max_wait_ms': self._max_wait_ms,
+                'resources_in_use': dict(self._resources_in_use),
+                'resource_limits': dict(self.resource_limits),
+                'window_runtime_s': {str(key): round(value, 3) for key, value in self._window_runtime.items()},
+            }
+
+
+# ----------------------------------------------------------------------
+# 工作流作业
+# ----------------------------------------------------------------------
+def make_workflow_runner(cards_data: Dict[Any, Any], connections_data: List[Dict[str, Any]], start_card_id: Any,
+                         target_hwnd: Optional[int], execution_mode: str = 'background',
+                         target_window_title: Optional[str] = None, task_modules: Optional[Dict[str, Any]] = None,
+                         listener=None, backend=None, workflow_file: Optional[str] = None) -> JobRunner:
+    """创建在调度器工作线程上运行无界面执行器的作业函数"""
+
+    def run(token: CancellationToken) -> Tuple[bool, str]:
+        from task_workflow.headless_executor import HeadlessWorkflowExecutor
+        executor = HeadlessWorkflowExecutor(
+            cards_data, connections_data, task_modules,
+            target_window_title=target_window_title,
+            execution_mode=execution_mode,
+            start_card_id=start_card_id,
+            target_hwnd=target_hwnd,
+            backend=backend,
+            listener=listener,
+            cancel_token=token,
+            workflow_file=workflow_file,
+        )
+        return executor.run()
+
+    return run
+
+
+_workflow_scheduler: Optional[WorkflowScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_workflow_scheduler() -> WorkflowScheduler:
+    """获取全局工作流调度器"""
+    global _workflow_scheduler
+    if _workflow_scheduler is None:
+        with _scheduler_lock:
+            if _workflow_scheduler is None:
+                _workflow_scheduler = WorkflowScheduler()
+    return _workflow_scheduler
@@ -38,7 +38,9 @@ def _init_task_modules():
         'click_coordinate',
         'ocr_region_recognition',
         'mouse_click_simulation',  # 新增：整合的鼠标操作模块
-        'mumu_app_manager'  # 新增：MuMu应用管理模块
+        'mumu_app_manager',  # 新增：MuMu应用管理模块
+        'parallel_fork',
+        'parallel_join'
     ]
 
     # 导入每个模块
@@ -88,18 +90,28 @@ _init_task_modules()
 # -*- coding: utf-8 -*-
 # 显式导入所有需要的任务模块
 
+def _import_task_module(module_name: str):
+    """逐个导入任务模块；缺少依赖（如无界面环境中的 pyautogui、pywin32）时记录警告并跳过该模块"""
+    try:
+        return importlib.import_module(f"{__name__}.{module_name}")
+    except Exception as e:
+        logger.warning(f"任务模块 {module_name} 导入失败，已跳过: {e}")
+        return None
+
 # --- 保持和实际模块文件对应的导入 ---
-from . import delay_task          # <--- 修改：导入包含 execute_task 的模块
-from . import keyboard_input      # 对应 "模拟键盘操作"
+delay_task = _import_task_module('delay_task')          # <--- 修改：导入包含 execute_task 的模块
+keyboard_input = _import_task_module('keyboard_input')  # 对应 "模拟键盘操作"
 
 # --- 新增的或重命名的模块导入 ---
-from . import conditional_control
-from . import start_task # <<< ADDED: Import the module directly
-from . import ocr_region_recognition # <<< RE-ENABLED: Import ocr_region_recognition module
-from . import mouse_click_simulation # <<< ADDED: Import mouse_click_simulation module
-from . import find_color_task
-from . import ldplayer_app_manager # <<< ADDED: Import ldplayer_app_manager module
-from . import mumu_app_manager # <<< ADDED: Import mumu_app_manager module
+conditional_control = _import_task_module('conditional_control')
+start_task = _import_task_module('start_task')
+ocr_region_recognition = _import_task_module('ocr_region_recognition')
+mouse_click_simulation = _import_task_module('mouse_click_simulation')
+find_color_task = _import_task_module('find_color_task')
+ldplayer_app_manager = _import_task_module('ldplayer_app_manager')
+mumu_app_manager = _import_task_module('mumu_app_manager')
+parallel_fork = _import_task_module('parallel_fork')
+parallel_join = _import_task_module('parallel_join')
 
 # -----------------------------------------------------------
 
@@ -119,6 +131,8 @@ PRIMARY_TASK_MODULES = {
     # 控制流程
     "延迟": delay_task,
     "条件控制": conditional_control,
+    "并行分支": parallel_fork,
+    "并行汇合": parallel_join,
 
     # 图像识别
     "找色功能": find_color_task,
@@ -128,6 +142,8 @@ PRIMARY_TASK_MODULES = {
     "雷电应用管理": ldplayer_app_manager,
     "MuMu应用管理": mumu_app_manager,
 }
+# 导入失败的模块不注册
+PRIMARY_TASK_MODULES = {name: module for name, module in PRIMARY_TASK_MODULES.items() if module is not None}
 
 # ==================================
 #  完整任务注册表 (包含向后兼容映射)
@@ -143,6 +159,7 @@ TASK_MODULES_DICT = {
     "旋转视角": mouse_click_simulation,        # 向后兼容
     "键盘输入": keyboard_input,               # 向后兼容
 }
+TASK_MODULES_DICT = {name: module for name, module in TASK_MODULES_DICT.items() if module is not None}
 
 # ==================================
 #  执行器兼容性：提供列表和字典两种格式
@@ -62,7 +62,10 @@ try:
 except ImportError:
     INTERCEPTION_AVAILABLE = False
 
-
+# 窗口状态缓存（替代逐卡片的 IsWindow/GetWindowRect）
+from utils.window_state import is_window_valid
+# 后台点击走当前执行后端（桌面为 Win32，无界面回放为假窗口）
+from task_workflow.execution_backend import get_execution_backend, uses_native_input
 
 logger = logging.getLogger(__name__)
 
@@ -156,8 +159,9 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
                 f"按钮='{button}', 次数={clicks}, 模式='{mode_name}', 随机偏移={'禁用' if disable_random_offset else '启用'}")
     
     try:
-        # 使用通用坐标系统处理坐标
-        coord_system = get_universal_coordinate_system()
+        # 使用通用坐标系统处理坐标（非 Win32 后端的窗口坐标即客户区坐标，不经过依赖 Win32 DPI 查询的坐标系统）
+        native_input = uses_native_input()
+        coord_system = get_universal_coordinate_system() if native_input else None
 
         # 根据坐标模式创建正确的坐标信息
         if coordinate_mode == '客户区坐标':
@@ -201,7 +205,15 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
 
         # 应用随机偏移
         if not disable_random_offset and random_offset > 0:
-            coord_info = coord_system.apply_random_offset(coord_info, random_offset)
+            if coord_system is not None:
+                coord_info = coord_system.apply_random_offset(coord_info, random_offset)
+            else:
+                coord_info = CoordinateInfo(
+                    x=coord_info.x + random.randint(-random_offset, random_offset),
+                    y=coord_info.y + random.randint(-random_offset, random_offset),
+                    coord_type=coord_info.coord_type,
+                    source_window=coord_info.source_window
+                )
             logger.info(f"应用随机偏移: 原始({coordinate_x}, {coordinate_y}) -> 偏移后({coord_info.x}, {coord_info.y})")
 
         # 确定点击模式 - 使用标准化的执行模式判断
@@ -216,7 +228,9 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
         click_mode = ClickMode.BACKGROUND if normalized_mode == 'background' else ClickMode.FOREGROUND
 
         # 关键修复：前台模式下参考图片点击的处理方式
-        if normalized_mode == 'foreground':
+        if coord_system is None:
+            final_x, final_y = coord_info.x, coord_info.y
+        elif normalized_mode == 'foreground':
             # 前台模式：直接使用客户区坐标，避免通用坐标系统的双重转换
             logger.info(f"[前台模式] 直接使用客户区坐标，避免双重转换")
             client_x, client_y = coord_info.x, coord_info.y
@@ -286,8 +300,11 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
         logger.info(f"=== 坐标处理完成 ===")
         logger.info(f"最终点击坐标: ({final_x}, {final_y}), 模式: {execution_mode}")
 
-        # 执行点击 - 优先使用新的输入模拟模块
-        success = _click_with_new_simulator(target_hwnd, final_x, final_y, button, clicks, interval, execution_mode, _forced_emulator_type)
+        # 执行点击 - 优先使用新的输入模拟模块（非 Win32 后端直接交给执行后端）
+        if native_input:
+            success = _click_with_new_simulator(target_hwnd, final_x, final_y, button, clicks, interval, execution_mode, _forced_emulator_type)
+        else:
+            success = _click_background_universal(target_hwnd, final_x, final_y, button, clicks, interval)
 
         # 如果新模拟器不可用，回退到传统方法
         if success is None:
@@ -340,7 +357,7 @@ def _click_background(target_hwnd: Optional[int], x: int, y: int, coordinate_mod
         logger.error("后台模式需要有效的窗口句柄")
         return False
     
-    if not win32gui.IsWindow(target_hwnd):
+    if not is_window_valid(target_hwnd):
         logger.error(f"窗口句柄 {target_hwnd} 无效")
         return False
     
@@ -824,50 +841,33 @@ def _click_with_new_simulator(hwnd: int, x: int, y: int, button: str = 'left',
 
 def _click_background_universal(hwnd: int, x: int, y: int, button: str = 'left',
                                clicks: int = 1, interval: float = 0.1) -> bool:
-    """通用后台点击函数（使用处理后的坐标）"""
+    """通用后台点击函数（使用处理后的坐标，经当前执行后端发送）"""
     try:
-        if not PYWIN32_AVAILABLE:
-            logger.error("pywin32 不可用，无法执行后台点击")
+        backend = get_execution_backend()
+        if not backend.available:
+            logger.error(f"执行后端 {backend.name} 不可用，无法执行后台点击")
             return False
 
-        if not hwnd or not win32gui.IsWindow(hwnd):
+        if not hwnd or not is_window_valid(hwnd):
             logger.error(f"无效的窗口句柄: {hwnd}")
             return False
 
         # 转换按钮类型
         button_map = {
-            '左键': ('left', win32con.WM_LBUTTONDOWN, win32con.WM_LBUTTONUP),
-            '右键': ('right', win32con.WM_RBUTTONDOWN, win32con.WM_RBUTTONUP),
-            '中键': ('middle', win32con.WM_MBUTTONDOWN, win32con.WM_MBUTTONUP)
+            '左键': 'left',
+            '右键': 'right',
+            '中键': 'middle'
         }
 
         if button not in button_map:
             logger.error(f"不支持的按钮类型: {button}")
             return False
 
-        _, down_msg, up_msg = button_map[button]
-
-        # 构造lParam
-        lParam = win32api.MAKELONG(int(x), int(y))
-
         logger.info(f"[后台点击] 坐标: ({x}, {y}), 按钮: {button}, 次数: {clicks}")
 
-        # 执行点击
-        for i in range(clicks):
-            try:
-                # 发送按下消息
-                win32gui.SendMessage(hwnd, down_msg, 0, lParam)
-                time.sleep(0.01)  # 短暂延迟
-
-                # 发送释放消息
-                win32gui.SendMessage(hwnd, up_msg, 0, lParam)
-
-                if i < clicks - 1:  # 不是最后一次点击
-                    time.sleep(interval)
-
-            except Exception as e:
-                logger.error(f"发送点击消息失败 (第{i+1}次): {e}")
-                return False
+        if not backend.input.click(hwnd, int(x), int(y), button=button_map[button], clicks=clicks, interval=interval):
+            logger.error("[后台点击] 执行后端点击失败")
+            return False
 
         logger.info(f"[后台点击] 成功完成 {clicks} 次点击")
         return True
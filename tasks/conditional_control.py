@@ -43,6 +43,11 @@ except ImportError:
         capture_window_background = None
 # ---------------------------------------
 
+# 窗口状态缓存（替代逐卡片的 IsWindow/GetWindowRect）
+from utils.window_state import get_window_state, is_window_valid
+from utils.cancellation import wait_interruptibly
+from utils.heavy_op_admission import heavy_operation, OP_MATCH
+
 logger = logging.getLogger(__name__)
 
 # --- Comparison Operators Mapping ---
@@ -64,7 +69,7 @@ def _activate_window_foreground(target_hwnd: Optional[int], logger):
              logger.warning("无法激活目标窗口：缺少 'pywin32' 库。")
         return False
     try:
-        if not win32gui.IsWindow(target_hwnd):
+        if not is_window_valid(target_hwnd):
             logger.warning(f"无法激活目标窗口：句柄 {target_hwnd} 无效或已销毁。")
             return False
         current_foreground_hwnd = win32gui.GetForegroundWindow()
@@ -182,19 +187,16 @@ def _check_motion(params: Dict[str, Any], execution_mode: str, target_hwnd: Opti
 
             # 工具 修复：验证窗口句柄有效性
             try:
-                if not win32gui.IsWindow(target_hwnd):
+                window_state = get_window_state(target_hwnd)
+                if not window_state.valid:
                     logger.error(f"后台移动检测失败：窗口句柄 {target_hwnd} 无效或窗口已关闭。")
                     return False, prev_image
 
-                # 获取窗口信息用于调试
-                window_title = win32gui.GetWindowText(target_hwnd)
-                window_rect = win32gui.GetWindowRect(target_hwnd)
-                client_rect = win32gui.GetClientRect(target_hwnd)
-                logger.debug(f"  窗口信息: 标题='{window_title}', 窗口矩形={window_rect}, 客户区={client_rect}")
+                # 窗口信息用于调试（来自窗口状态缓存）
+                logger.debug(f"  窗口信息: 标题='{window_state.title}', 窗口矩形={window_state.window_rect}, 客户区={window_state.client_rect}")
 
                 # 检查客户区是否有效
-                client_width = client_rect[2] - client_rect[0]
-                client_height = client_rect[3] - client_rect[1]
+                client_width, client_height = window_state.client_size
                 if client_width <= 0 or client_height <= 0:
                     logger.error(f"后台移动检测失败：窗口客户区尺寸无效 ({client_width}x{client_height})。")
                     return False, prev_image
@@ -457,18 +459,10 @@ def execute(params: Dict[str, Any], counters: Dict[str, int], execution_mode: st
                  # logger.info(f"开始移动检测: 区域=(屏幕 {params.get('minimap_x')},{params.get('minimap_y')}), 间隔={interval}s, 阈值={params.get('motion_threshold')}像素")
                  logger.debug(f"等待间隔: {interval}s")
 
-                 # 可中断的等待
-                 elapsed_time = 0.0
-                 check_interval = 0.1  # 每100ms检查一次停止信号
-
-                 while elapsed_time < interval:
-                     if stop_checker and stop_checker():
-                         logger.info("移动检测等待被用户中断")
-                         return False, '停止工作流', None
-
-                     sleep_time = min(check_interval, interval - elapsed_time)
-                     time.sleep(sleep_time)
-                     elapsed_time += sleep_time
+                 # 可中断的等待（取消令牌上的 Event.wait，停止请求立即唤醒）
+                 if wait_interruptibly(interval, stop_checker):
+                     logger.info("移动检测等待被用户中断")
+                     return False, '停止工作流', None
                  condition_met, current_gray_image = _check_motion(params, execution_mode, target_hwnd, prev_image)
                  # ---------------------------------------------
 
@@ -1066,7 +1060,8 @@ def _evaluate_image_condition(params: Dict[str, Any], execution_mode: str, targe
 
             # Perform template matching
             match_method = cv2.TM_CCOEFF_NORMED
-            result = cv2.matchTemplate(processed_screenshot, processed_template, match_method)
+            with heavy_operation(OP_MATCH):
+                result = cv2.matchTemplate(processed_screenshot, processed_template, match_method)
             _, max_val, _, _ = cv2.minMaxLoc(result)
             actual_score = float(max_val) # Store the actual score as float
 
@@ -5,6 +5,8 @@ import random
 import logging
 from typing import Dict, Any, Optional, Tuple
 
+from .task_utils import interruptible_sleep
+
 # Task Class Definition
 class DelayTask(object):
     """
@@ -209,27 +211,14 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
 
         # 可中断的延迟执行
         if calculated_delay > 0:
-            elapsed_time = 0.0
-            check_interval = 0.1  # 每100ms检查一次停止信号
-
             logger.info(f"开始可中断延迟，总时长: {calculated_delay:.2f} 秒")
 
-            while elapsed_time < calculated_delay:
-                # 检查停止信号
-                if stop_checker and stop_checker():
-                    logger.info(f"延迟任务被用户中断，已延迟 {elapsed_time:.2f}/{calculated_delay:.2f} 秒")
-                    return False, '停止工作流', None
-
-                # 计算本次睡眠时间
-                remaining_time = calculated_delay - elapsed_time
-                sleep_time = min(check_interval, remaining_time)
-
-                time.sleep(sleep_time)
-                elapsed_time += sleep_time
-
-                # 每秒输出一次进度（可选）
-                if int(elapsed_time) != int(elapsed_time - sleep_time) and remaining_time > 1:
-                    logger.debug(f"延迟进度: {elapsed_time:.1f}/{calculated_delay:.1f} 秒")
+            # 在取消令牌上等待整段时长，停止请求立即唤醒（不再每100ms醒来检查）
+            start_time = time.monotonic()
+            interrupted = interruptible_sleep(calculated_delay, stop_checker)
+            if interrupted:
+                logger.info(f"延迟任务被用户中断，已延迟 {time.monotonic() - start_time:.2f}/{calculated_delay:.2f} 秒")
+                return False, '停止工作流', None
 
         logger.info("延迟执行完毕。")
         # Default success action is '执行下一步'
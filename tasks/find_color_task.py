@@ -6,16 +6,24 @@ from typing import Dict, Any, List, Optional, Tuple
 
 # Try importing necessary libraries
 try:
-    import pyautogui
     import numpy as np
-    # Pillow is needed by pyautogui for screenshots, cv2 for processing
-    from PIL import Image, ImageGrab # Import ImageGrab for potential fallback/comparison
     import cv2
+except ImportError:
+    print("错误：缺少必要的库。请运行 'pip install numpy opencv-python' 来安装。")
+    raise
+
+# 前台截图和按键需要 pyautogui/Pillow/mss；无界面环境（假窗口回放）可以没有，只有前台模式不可用
+try:
+    import pyautogui
+    # Pillow is needed by pyautogui for screenshots
+    from PIL import Image, ImageGrab # Import ImageGrab for potential fallback/comparison
     import mss # <-- Import mss
     import mss.tools
+    PYAUTOGUI_AVAILABLE = True
 except ImportError:
-    print("错误：缺少必要的库。请运行 'pip install pyautogui numpy opencv-python Pillow mss' 来安装。") # <-- Updated message
-    raise
+    pyautogui = None
+    Image = ImageGrab = None
+    PYAUTOGUI_AVAILABLE = False
 
 # --- UPDATED: pywin32 imports for background mode ---
 try:
@@ -65,18 +73,12 @@ TASK_TYPE = "找色功能" # Need logger even if pywin32 fails
 if not PYWIN32_AVAILABLE:
     logger.warning("pywin32 库未安装，后台模式将不可用。")
 
-# --- ADDED: Import background capture utility ---
-try:
-    from utils.win32_utils import capture_window_background
-except ImportError:
-    try:
-        import sys
-        import os
-        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        from utils.win32_utils import capture_window_background
-    except ImportError:
-        capture_window_background = None
-# ---------------------------------------------
+# 截图走当前执行后端（桌面为 Win32，无界面回放为假窗口）
+from task_workflow.execution_backend import get_execution_backend
+
+# 窗口状态缓存（替代逐卡片的 IsWindow/GetWindowRect）
+from utils.window_state import is_window_valid
+from utils.heavy_op_admission import heavy_operation, OP_KMEANS
 
 logger = logging.getLogger(__name__)
 
@@ -90,7 +92,7 @@ def _activate_window_foreground(target_hwnd: Optional[int], logger):
              logger.warning("无法激活目标窗口：缺少 'pywin32' 库。")
         return False
     try:
-        if not win32gui.IsWindow(target_hwnd):
+        if not is_window_valid(target_hwnd):
             logger.warning(f"无法激活目标窗口：句柄 {target_hwnd} 无效或已销毁。")
             return False
         current_foreground_hwnd = win32gui.GetForegroundWindow()
@@ -132,8 +134,9 @@ class FindColorTask:
         Returns:
             裁剪后的截图 (NumPy BGR array) 或 None 如果失败。
         """
-        if not PYWIN32_AVAILABLE:
-            logger.error("(截图裁剪助手) pywin32 不可用。")
+        backend = get_execution_backend()
+        if not backend.available:
+            logger.error(f"(截图裁剪助手) 执行后端 {backend.name} 不可用。")
             return None
         if not hwnd:
             logger.error("(截图裁剪助手) 无效的窗口句柄。")
@@ -141,12 +144,9 @@ class FindColorTask:
             
         logger.debug(f"(截图裁剪助手) 尝试为 HWND {hwnd} 截图并裁剪 {search_percentage}% 区域...")
         try:
-            if capture_window_background is None:
-                logger.error("(截图裁剪助手) capture_window_background 函数不可用")
-                return None
-            full_screenshot = capture_window_background(hwnd) # Use the utility directly
+            full_screenshot = backend.capture.capture(hwnd)
             if full_screenshot is None:
-                logger.error("(截图裁剪助手) capture_window_background 返回 None。")
+                logger.error("(截图裁剪助手) 执行后端截图返回 None。")
                 return None
             
             # --- Cropping Logic (Moved from execute) ---
@@ -623,7 +623,8 @@ class FindColorTask:
             # 使用K-means聚类
             k = min(8, len(np.unique(pixels.reshape(-1, 3), axis=0)))  # 最多8个聚类
             criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 1.0)
-            _, labels, centers = cv2.kmeans(pixels, k, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
+            with heavy_operation(OP_KMEANS):
+                _, labels, centers = cv2.kmeans(pixels, k, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
 
             # 找到与目标颜色最接近的聚类
             matched_clusters = []
@@ -1051,7 +1052,7 @@ class FindColorTask:
         # ------------------------
 
         # Validate window handle for background mode
-        if execution_mode == 'background' and (not target_hwnd or (PYWIN32_AVAILABLE and not win32gui.IsWindow(target_hwnd))):
+        if execution_mode == 'background' and (not target_hwnd or not is_window_valid(target_hwnd)):
              logger.error(f"后台模式需要有效的目标窗口句柄 (HWND), 但收到 {target_hwnd}。")
              return False, "窗口无效", None
 
@@ -1093,6 +1094,9 @@ class FindColorTask:
         screen_w, screen_h = 0, 0
         outer_search_region = None # Initialize
         if execution_mode == 'foreground':
+            if not PYAUTOGUI_AVAILABLE:
+                logger.error("pyautogui 未安装，前台模式不可用。")
+                return False, "前台模式不可用", None
             screen_w, screen_h = pyautogui.size()
             # For foreground, calculate search region based on primary monitor size
             center_x, center_y = screen_w // 2, screen_h // 2
@@ -1141,7 +1145,7 @@ class FindColorTask:
                     # 不再区分前台后台模式，统一使用后台识别方法以提高稳定性和准确性
                     logger.debug("统一使用后台识别方法进行条件图片查找...")
                     if target_hwnd:
-                        screenshot_for_image = capture_window_background(target_hwnd) # Capture full client area
+                        screenshot_for_image = get_execution_backend().capture.capture(target_hwnd) # Capture full client area
                         if screenshot_for_image is None:
                              logger.warning("统一后台截图失败，无法进行条件图片查找。")
                              image_check_passed = False # Treat as not found
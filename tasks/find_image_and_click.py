@@ -31,6 +31,17 @@ except ImportError:
 
 # 使用专门的截图助手
 from utils.screenshot_helper import take_screenshot_opencv, is_screenshot_available
+
+# 性能分析区间
+from utils.workflow_profiler import profile_span, SPAN_PREPROCESS, SPAN_MATCH, SPAN_SLEEP
+from utils.heavy_op_admission import heavy_operation, OP_MATCH
+
+# 窗口状态缓存（替代逐卡片的 IsWindow/GetWindowRect）
+from utils.window_state import is_window_valid
+from utils.cancellation import wait_interruptibly
+from utils.frame_change_detector import get_frame_change_detector, wait_for_frame_change, FRAME_CHANGED, FRAME_STOPPED
+# 截图和后台点击走当前执行后端（桌面为 Win32，无界面回放为假窗口）
+from task_workflow.execution_backend import get_execution_backend, uses_native_input
     # Print warning only if execution mode requires it later
     # print("警告: pywin32 模块未安装，后台模式将不可用。请运行 'pip install pywin32'")
 
@@ -88,7 +99,7 @@ def _activate_window_foreground(target_hwnd: Optional[int], logger):
              logger.warning("无法激活目标窗口：缺少 'pywin32' 库。")
         return False
     try:
-        if not win32gui.IsWindow(target_hwnd):
+        if not is_window_valid(target_hwnd):
             logger.warning(f"无法激活目标窗口：句柄 {target_hwnd} 无效或已销毁。")
             return False
         current_foreground_hwnd = win32gui.GetForegroundWindow()
@@ -172,6 +183,13 @@ def get_params_definition() -> Dict[str, Dict[str, Any]]:
             "tooltip": "每次重试之间的等待时间。",
             "condition": {"param": "enable_retry", "value": True}
         },
+        "retry_on_screen_change": {
+            "label": "画面变化时才重试",
+            "type": "bool",
+            "default": False,
+            "tooltip": "启用后重试前等待窗口画面发生变化：画面一变立即重试，画面静止时到重试期限再识别一次。总重试时间与固定间隔相同（重试次数 × 重试间隔）。",
+            "condition": {"param": "enable_retry", "value": True}
+        },
 
         # --- Post-Execution Actions ---
         "---post_exec---": {"type": "separator", "label": "执行后操作"},
@@ -211,6 +229,11 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
     enable_retry = params.get('enable_retry', False)
     max_attempts = params.get('retry_attempts', 3) if enable_retry else 1 # 如果不启用，只尝试1次
     retry_interval = params.get('retry_interval', 0.5)
+    retry_on_screen_change = params.get('retry_on_screen_change', False)
+    # 画面变化驱动的重试按期限计算：画面变化时立即重试且不消耗次数，总时长与固定间隔重试相同
+    frame_gated_retry = retry_on_screen_change and max_attempts > 1
+    retry_deadline = None
+    stop_checker = kwargs.get('stop_checker')
     # -------------------------
 
     on_success_action = params.get('on_success', '执行下一步')
@@ -267,7 +290,11 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
     # 根据搜索范围决定是否执行绑定窗口搜索
     if search_scope != '全屏搜索':
         # 绑定窗口搜索或智能搜索的第一阶段
-        for attempt in range(1, max_attempts + 1):
+        attempt = 0
+        while True:
+            attempt += 1
+            if retry_deadline is None:
+                retry_deadline = time.monotonic() + retry_interval * (max_attempts - 1)
             # 只显示图片名称，不显示路径前缀
             if absolute_image_path.startswith('memory://'):
                 image_name = absolute_image_path.replace('memory://', '')
@@ -278,7 +305,11 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
             # 执行模式中文映射
             mode_names = {'foreground': '前台', 'background': '后台'}
             mode_name = mode_names.get(execution_mode, execution_mode)
-            logger.info(f"[{mode_name}] 第 {attempt}/{max_attempts} 次尝试查找图片: '{image_name}'")
+            if frame_gated_retry:
+                logger.info(f"[{mode_name}] 第 {attempt} 次尝试查找图片: '{image_name}'")
+            else:
+                logger.info(f"[{mode_name}] 第 {attempt}/{max_attempts} 次尝试查找图片: '{image_name}'")
+            reference_frame = None  # 本次识别所用画面的缩略图（用于等待画面变化）
             try:
                 # --- Load Needle Image (using absolute path) ---
                 logger.debug(f"加载模板图片: {absolute_image_path}")
@@ -371,22 +402,26 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
 
                 # --- 工具 统一使用后台识别方法 ---
                 # 不再区分前台后台模式，统一使用后台识别方法以提高稳定性和准确性
-                logger.debug("统一使用后台识别方法 (Win32 API + OpenCV)")
+                logger.debug("统一使用后台识别方法 (执行后端截图 + OpenCV)")
+                backend = get_execution_backend()
                 if True:  # 原来的前台和后台模式都使用后台识别方法
-                    if not PYWIN32_AVAILABLE or not target_hwnd:
-                        logger.error("统一后台识别方法需要 pywin32 库和有效的窗口句柄。")
+                    if not backend.available or not target_hwnd:
+                        logger.error(f"统一后台识别方法需要可用的执行后端（{backend.name}）和有效的窗口句柄。")
                         found = False; location = None
                         break # Cannot proceed
 
                 logger.debug(f"截取后台窗口 {target_hwnd}...")
-                screenshot_img = capture_window_background(target_hwnd)
+                screenshot_img = backend.capture.capture(target_hwnd)
                 if screenshot_img is not None:
+                    if frame_gated_retry and time.monotonic() < retry_deadline:
+                        reference_frame = get_frame_change_detector(target_hwnd).thumbnail(screenshot_img)
                     logger.debug("预处理后台截图...")
                     try:
                         import importlib
                         preprocessing_module = importlib.import_module('utils.image_preprocessing')
                         apply_preprocessing = getattr(preprocessing_module, 'apply_preprocessing')
-                        haystack_processed = apply_preprocessing(screenshot_img, params)
+                        with profile_span(SPAN_PREPROCESS):
+                            haystack_processed = apply_preprocessing(screenshot_img, params)
                     except (ImportError, ModuleNotFoundError, AttributeError):
                         # 回退到无预处理
                         haystack_processed = screenshot_img
@@ -398,7 +433,8 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
                              # 标准OpenCV匹配
                              logger.debug(f"使用 OpenCV 查找图片 (置信度: {confidence}) ...")
                              match_method = cv2.TM_CCOEFF_NORMED
-                             result_matrix = cv2.matchTemplate(haystack_processed, needle_image_processed, match_method)
+                             with profile_span(SPAN_MATCH), heavy_operation(OP_MATCH, target_hwnd):
+                                 result_matrix = cv2.matchTemplate(haystack_processed, needle_image_processed, match_method)
                              _, max_val, _, max_loc = cv2.minMaxLoc(result_matrix)
                              match_score = max_val
                              match_location_tl = max_loc # Top-left corner
@@ -429,10 +465,40 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
                 logger.error(f"[{mode_name}] 第 {attempt} 次尝试查找图片 '{image_name}' 时发生意外错误: {find_err}", exc_info=True)
                 found = False # Ensure found is False on error
 
+            if found:
+                break
+
+            if frame_gated_retry:
+                # 等待画面变化后再重试，直到重试期限；画面一直静止时在期限到达时最后查找一次
+                remaining = retry_deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                logger.debug(f"等待画面变化后重试（最长 {remaining:.2f} 秒）...")
+                with profile_span(SPAN_SLEEP):
+                    if reference_frame is not None:
+                        outcome = wait_for_frame_change(target_hwnd, reference_frame, timeout=remaining,
+                                                        fallback_interval=retry_interval,
+                                                        stop_checker=stop_checker)
+                    else:
+                        outcome = FRAME_STOPPED if wait_interruptibly(min(retry_interval, remaining), stop_checker) \
+                            else FRAME_CHANGED
+                if outcome == FRAME_STOPPED:
+                    logger.info("用户按下停止按钮，终止找图重试循环")
+                    break
+                if outcome != FRAME_CHANGED:
+                    logger.info(f"[{mode_name}] 重试期间画面未变化，期限到达后最后查找一次")
+                continue
+
             # If not found and more attempts remain, wait
-            if not found and attempt < max_attempts:
-                logger.debug(f"等待 {retry_interval} 秒后重试...")
-                time.sleep(retry_interval)
+            if attempt >= max_attempts:
+                break
+            logger.debug(f"等待 {retry_interval} 秒后重试...")
+            # 未传入停止检查函数时在当前执行器的取消令牌上等待
+            with profile_span(SPAN_SLEEP):
+                interrupted = wait_interruptibly(retry_interval, stop_checker)
+            if interrupted:
+                logger.info("用户按下停止按钮，终止找图重试循环")
+                break
             
     # --- End Retry Loop ---
 
@@ -588,7 +654,10 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
         # 检查是否为前台模式（包括所有前台变体）
         is_foreground_mode = execution_mode.startswith('foreground')
 
-        if is_background_mode:
+        if not uses_native_input():
+            # 非 Win32 后端（假窗口回放）：匹配坐标即窗口客户区坐标
+            dpi_adjusted_click_x, dpi_adjusted_click_y = click_x, click_y
+        elif is_background_mode:
             # 后台模式：使用通用坐标系统处理
             try:
                 coord_system = get_universal_coordinate_system()
@@ -724,33 +793,12 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
             logger.info(f"[后台点击] 计算中心点: ({center_x}, {center_y}), 应用偏移: ({offset_x},{offset_y}), DPI调整后点击坐标: ({dpi_adjusted_click_x}, {dpi_adjusted_click_y}), 按钮={button_param} ({button_win32}), 次数={clicks}, 间隔={interval}")
             logger.info(f"[后台点击] 执行模式: {execution_mode}")
             try:
-                # 兼容旧执行器：检查click_background函数是否支持clicks参数
-                import inspect
-                click_bg_signature = inspect.signature(click_background)
-
-                if 'clicks' in click_bg_signature.parameters:
-                    # 新版本：支持clicks参数
-                    if click_background(hwnd=target_hwnd, x=dpi_adjusted_click_x, y=dpi_adjusted_click_y, button=button_win32, clicks=clicks, interval=interval):
-                        click_success = True
-                        logger.info("后台点击操作成功。")
-                    else:
-                        logger.warning("警告: 后台点击失败 (click_background 返回失败)。")
-                else:
-                    # 旧版本：不支持clicks参数，需要循环调用
-                    logger.info(f"使用兼容模式：循环执行{clicks}次点击")
+                if get_execution_backend().input.click(target_hwnd, dpi_adjusted_click_x, dpi_adjusted_click_y,
+                                                       button=button_win32, clicks=clicks, interval=interval):
                     click_success = True
-                    for i in range(clicks):
-                        if not click_background(target_hwnd, dpi_adjusted_click_x, dpi_adjusted_click_y, button_win32):
-                            click_success = False
-                            logger.warning(f"第{i+1}次后台点击失败")
-                            break
-                        if clicks > 1 and i < clicks - 1:
-                            time.sleep(interval)
-
-                    if click_success:
-                        logger.info(f"后台点击操作成功（兼容模式，{clicks}次点击）。")
-                    else:
-                        logger.warning("警告: 后台点击失败 (兼容模式)。")
+                    logger.info("后台点击操作成功。")
+                else:
+                    logger.warning("警告: 后台点击失败 (执行后端返回失败)。")
 
             except Exception as click_err:
                  logger.error(f"[后台点击] 点击操作时发生异常: {click_err}", exc_info=True)
@@ -1029,7 +1077,8 @@ def _search_image_fullscreen(needle_image: np.ndarray, confidence: float, params
             import importlib
             preprocessing_module = importlib.import_module('utils.image_preprocessing')
             apply_preprocessing = getattr(preprocessing_module, 'apply_preprocessing')
-            haystack_processed = apply_preprocessing(screenshot_np, params)
+            with profile_span(SPAN_PREPROCESS):
+                haystack_processed = apply_preprocessing(screenshot_np, params)
         except (ImportError, ModuleNotFoundError, AttributeError):
             haystack_processed = screenshot_np
             if len(screenshot_np.shape) == 3 and screenshot_np.shape[2] == 4:
@@ -1049,7 +1098,8 @@ def _search_image_fullscreen(needle_image: np.ndarray, confidence: float, params
 
         logger.debug(f"在全屏截图中查找图片 (置信度: {confidence})...")
         match_method = cv2.TM_CCOEFF_NORMED
-        result_matrix = cv2.matchTemplate(haystack_processed, needle_image, match_method)
+        with profile_span(SPAN_MATCH), heavy_operation(OP_MATCH):
+            result_matrix = cv2.matchTemplate(haystack_processed, needle_image, match_method)
         _, max_val, _, max_loc = cv2.minMaxLoc(result_matrix)
 
         logger.debug(f"全屏查找最高匹配分数: {max_val:.4f}")
@@ -1340,13 +1390,13 @@ def _search_in_window(needle_image: np.ndarray, confidence: float, params: Dict[
     """
     在指定窗口中搜索图片
     """
-    if not PYWIN32_AVAILABLE:
+    backend = get_execution_backend()
+    if not backend.available:
         return False, None
 
     try:
         # 获取窗口截图
-        from utils.win32_utils import capture_window_background
-        screenshot_img = capture_window_background(target_hwnd)
+        screenshot_img = backend.capture.capture(target_hwnd)
 
         if screenshot_img is None:
             return False, None
@@ -1356,7 +1406,8 @@ def _search_in_window(needle_image: np.ndarray, confidence: float, params: Dict[
             import importlib
             preprocessing_module = importlib.import_module('utils.image_preprocessing')
             apply_preprocessing = getattr(preprocessing_module, 'apply_preprocessing')
-            haystack_processed = apply_preprocessing(screenshot_img, params)
+            with profile_span(SPAN_PREPROCESS):
+                haystack_processed = apply_preprocessing(screenshot_img, params)
         except (ImportError, ModuleNotFoundError, AttributeError):
             haystack_processed = screenshot_img
             if len(screenshot_img.shape) == 3 and screenshot_img.shape[2] == 4:
@@ -1374,7 +1425,8 @@ def _search_in_window(needle_image: np.ndarray, confidence: float, params: Dict[
 
         # 执行图片匹配
         match_method = cv2.TM_CCOEFF_NORMED
-        result_matrix = cv2.matchTemplate(haystack_processed, needle_image, match_method)
+        with profile_span(SPAN_MATCH), heavy_operation(OP_MATCH):
+            result_matrix = cv2.matchTemplate(haystack_processed, needle_image, match_method)
         _, max_val, _, max_loc = cv2.minMaxLoc(result_matrix)
 
         if max_val >= confidence:
@@ -339,6 +339,9 @@ def _find_target_text_for_window(text_groups: List[str], window_index: int,
     if not text_groups:
         return "", -1
 
+    # 已完成组合转为集合，避免对列表反复线性查找
+    completed_combinations = set(completed_combinations)
+
     # 策略1：优先使用窗口索引对应的文本（如果未完成）
     preferred_index = window_index % len(text_groups)
     preferred_combination = f"window_{window_index}_text_{preferred_index}"
@@ -12,8 +12,40 @@ import os
 import re
 from typing import Dict, Any, Optional, Tuple, List
 
+from utils.cancellation import wait_interruptibly
+from utils.emulator_query_cache import EmulatorQueryCache
+
 logger = logging.getLogger(__name__)
 
+# ldconsole 查询缓存：每次卡片执行都会查实例列表、应用列表和主Activity，相同查询在多个窗口间合并
+_console_query_cache = EmulatorQueryCache("ldconsole")
+INSTANCE_LIST_TTL = 2.0
+APP_LIST_TTL = 30.0
+APP_DUMP_TTL = 300.0
+
+
+def invalidate_console_cache(instance_index=None):
+    """
+    使 ldconsole 查询缓存失效（启动/关闭/安装应用后调用）
+
+    Args:
+        instance_index: 只清除该实例的查询和实例列表；None 清除全部
+    """
+    if instance_index is None:
+        _console_query_cache.invalidate()
+        return
+    index = str(instance_index)
+    _console_query_cache.invalidate(
+        lambda key: key[1:2] == ('list2',) or (key[2:3] == ('--index',) and key[3:4] == (index,)))
+
+
+def _run_console_cached(cmd, ttl):
+    """执行 ldconsole 查询命令并缓存结果（只缓存成功且有输出的结果）"""
+    return _console_query_cache.get(
+        tuple(cmd), lambda: subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8'), ttl,
+        cacheable=lambda result: result.returncode == 0 and bool(result.stdout))
+
+
 def _get_unique_instance_index():
     """获取唯一的实例索引分配器（用于存储全局状态）"""
     pass
@@ -23,17 +55,10 @@ def _interruptible_sleep(duration: float, stop_checker=None):
     if duration <= 0:
         return
 
-    elapsed_time = 0.0
-    check_interval = 0.1  # 每100ms检查一次停止信号
-
-    while elapsed_time < duration:
-        if stop_checker and stop_checker():
-            logger.info(f"延迟被用户中断，已延迟 {elapsed_time:.2f}/{duration:.2f} 秒")
-            return
-
-        sleep_time = min(check_interval, duration - elapsed_time)
-        time.sleep(sleep_time)
-        elapsed_time += sleep_time
+    start_time = time.monotonic()
+    # 取消令牌上的 Event.wait，停止请求立即唤醒
+    if wait_interruptibly(duration, stop_checker):
+        logger.info(f"延迟被用户中断，已延迟 {time.monotonic() - start_time:.2f}/{duration:.2f} 秒")
 
 def _handle_delay_after_operation(params, stop_checker=None):
     """处理操作后延迟"""
@@ -141,7 +166,7 @@ def get_ldplayer_instance_by_hwnd(target_hwnd):
         logger.info(f"使用控制台程序: {console_path}")
 
         # 获取所有实例
-        result = subprocess.run([console_path, "list2"], capture_output=True, text=True, encoding='utf-8')
+        result = _run_console_cached([console_path, "list2"], INSTANCE_LIST_TTL)
         logger.info(f"控制台命令返回码: {result.returncode}")
         logger.info(f"控制台命令输出: {result.stdout}")
         if result.stderr:
@@ -296,7 +321,7 @@ def get_installed_apps(instance_index):
 
         # 方法1：获取第三方应用（推荐）
         cmd = [console_path, "adb", "--index", str(instance_index), "--command", "shell pm list packages -3"]
-        result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
+        result = _run_console_cached(cmd, APP_LIST_TTL)
 
         apps = []
         if result.returncode == 0:
@@ -312,7 +337,7 @@ def get_installed_apps(instance_index):
             # 回退到原方法
             logger.info("回退到基础方法获取应用列表")
             cmd = [console_path, "adb", "--index", str(instance_index), "--command", "shell pm list packages"]
-            result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
+            result = _run_console_cached(cmd, APP_LIST_TTL)
 
             if result.returncode != 0:
                 logger.error(f"获取应用列表失败: {result.stderr}")
@@ -358,7 +383,7 @@ def _get_app_info_enhanced(console_path, instance_index, package_name):
         # 方法1：尝试获取应用标签（显示名称）
         cmd = [console_path, "adb", "--index", str(instance_index), "--command",
                f"shell pm dump {package_name} | grep -E 'applicationLabel|versionName'"]
-        result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
+        result = _run_console_cached(cmd, APP_DUMP_TTL)
 
         app_name = package_name  # 默认使用包名
         version = ""
@@ -380,7 +405,7 @@ def _get_app_info_enhanced(console_path, instance_index, package_name):
         if app_name == package_name:
             cmd = [console_path, "adb", "--index", str(instance_index), "--command",
                    f"shell pm dump {package_name} | grep -A 3 'android.intent.action.MAIN'"]
-            result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
+            result = _run_console_cached(cmd, APP_DUMP_TTL)
 
             if result.returncode == 0 and result.stdout:
                 # 如果有MAIN activity，说明是可启动的应用
@@ -415,7 +440,7 @@ def _check_app_launchable(console_path, instance_index, package_name):
     try:
         cmd = [console_path, "adb", "--index", str(instance_index), "--command",
                f"shell pm dump {package_name} | grep -c 'android.intent.action.MAIN'"]
-        result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
+        result = _run_console_cached(cmd, APP_DUMP_TTL)
 
         if result.returncode == 0 and result.stdout.strip():
             count = int(result.stdout.strip())
@@ -496,6 +521,8 @@ def launch_app(instance_index, package_name):
     except Exception as e:
         logger.error(f"启动应用时出错: {e}")
         return False
+    finally:
+        invalidate_console_cache(instance_index)
 
 def close_app(instance_index, package_name):
     """关闭指定的应用（多种方法尝试）"""
@@ -563,13 +590,15 @@ def close_app(instance_index, package_name):
     except Exception as e:
         logger.error(f"关闭应用时出错: {e}")
         return False
+    finally:
+        invalidate_console_cache(instance_index)
 
 def _get_main_activity(console_path, instance_index, package_name):
     """获取应用的主Activity"""
     try:
         cmd = [console_path, "adb", "--index", str(instance_index), "--command",
                f"shell pm dump {package_name} | grep -A 5 'android.intent.action.MAIN'"]
-        result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
+        result = _run_console_cached(cmd, APP_DUMP_TTL)
 
         if result.returncode == 0 and result.stdout:
             for line in result.stdout.split('\n'):
@@ -1171,6 +1200,8 @@ def _restart_app_with_adb(adb_cmd, package_name, instance_index):
     except Exception as e:
         logger.error(f" [实例{instance_index}] ADB重启应用异常: {e}")
         return False
+    finally:
+        invalidate_console_cache(instance_index)
 
 def _close_app_with_adb(adb_cmd, package_name, instance_index):
     """使用ADB关闭应用"""
@@ -1260,6 +1291,8 @@ def _close_app_with_adb(adb_cmd, package_name, instance_index):
     except Exception as e:
         logger.error(f" [实例{instance_index}] ADB关闭应用异常: {e}")
         return False
+    finally:
+        invalidate_console_cache(instance_index)
 
 def _force_close_app_with_adb(adb_cmd, package_name, instance_index):
     """使用更强力的ADB方法关闭应用"""
@@ -1323,6 +1356,8 @@ def _force_close_app_with_adb(adb_cmd, package_name, instance_index):
     except Exception as e:
         logger.error(f" [实例{instance_index}] 强力关闭应用异常: {e}")
         return False
+    finally:
+        invalidate_console_cache(instance_index)
 
 def _launch_app_with_adb(adb_cmd, package_name, instance_index):
     """使用ADB启动应用"""
@@ -1408,3 +1443,5 @@ def _launch_app_with_adb(adb_cmd, package_name, instance_index):
     except Exception as e:
         logger.error(f"ADB启动应用异常: {e}")
         return False
+    finally:
+        invalidate_console_cache(instance_index)
@@ -23,6 +23,11 @@ from .task_utils import handle_next_step_delay as _handle_next_step_delay
 from utils.screenshot_helper import get_screen_size, take_screenshot_opencv
 from utils.interception_driver import get_driver
 
+# 窗口状态缓存（替代逐卡片的 IsWindow/GetWindowRect）
+from utils.window_state import get_window_state, is_window_valid
+# 截图走当前执行后端（桌面为 Win32，无界面回放为假窗口）
+from task_workflow.execution_backend import get_execution_backend
+
 # _interruptible_sleep 函数已移至 task_utils.py
 
 def safe_imread(image_path, flags=cv2.IMREAD_COLOR):
@@ -184,9 +189,9 @@ def get_params_definition() -> Dict[str, Dict[str, Any]]:
         "text_match_mode": {
             "label": "文字匹配模式",
             "type": "select",
-            "options": ["包含", "完全匹配"],
+            "options": ["包含", "完全匹配", "模糊匹配"],
             "default": "包含",
-            "tooltip": "文字匹配的方式\n包含：目标文字包含在识别文字中即可\n完全匹配：识别文字必须与目标文字完全一致",
+            "tooltip": "文字匹配的方式\n包含：目标文字包含在识别文字中即可\n完全匹配：识别文字必须与目标文字完全一致\n模糊匹配：允许少量OCR识别错误（如0/O、1/l）",
             "condition": {"param": "operation_mode", "value": "文字点击"}
         },
         "text_position_mode": {
@@ -1233,14 +1238,15 @@ def _execute_text_click(params: Dict[str, Any], execution_mode: str, target_hwnd
             return _handle_failure(on_failure_action, failure_jump_id, card_id)
 
         logger.info(f"获取到OCR识别结果: {len(ocr_results)} 个文字")
-        for i, result in enumerate(ocr_results):
-            text = result.get('text', '')
-            confidence = result.get('confidence', 0)
-            logger.info(f"  OCR结果{i+1}: '{text}' (置信度: {confidence:.3f})")
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, result in enumerate(ocr_results):
+                text = result.get('text', '')
+                confidence = result.get('confidence', 0)
+                logger.debug(f"  OCR结果{i+1}: '{text}' (置信度: {confidence:.3f})")
 
         # 从工作流上下文获取OCR的目标文字
         logger.info(f" [调试] 文字点击卡片{card_id}尝试获取OCR目标文字")
-        target_text, final_match_mode = _get_ocr_target_text_from_context(card_id)
+        target_text, final_match_mode, fuzzy_max_errors = _get_ocr_target_text_from_context(card_id)
         logger.info(f" [调试] 获取到的目标文字: '{target_text}', 匹配模式: {final_match_mode}")
 
         if not target_text:
@@ -1250,7 +1256,8 @@ def _execute_text_click(params: Dict[str, Any], execution_mode: str, target_hwnd
             logger.info(f" [调试] 使用OCR目标文字: '{target_text}', 匹配模式: {final_match_mode}")
 
         # 根据目标文字查找匹配的OCR结果
-        matched_result = _find_matching_text_in_ocr_results(ocr_results, target_text, final_match_mode)
+        matched_result = _find_matching_text_in_ocr_results(ocr_results, target_text, final_match_mode,
+                                                            fuzzy_max_errors)
 
         if not matched_result:
             if target_text:
@@ -1480,7 +1487,7 @@ def _execute_rotate_view(params: Dict[str, Any], execution_mode: str, target_hwn
                 import win32con
 
                 # 检查窗口是否有效
-                if not win32gui.IsWindow(target_hwnd):
+                if not is_window_valid(target_hwnd):
                     logger.warning(f"无法激活目标窗口：句柄 {target_hwnd} 无效或已销毁")
                 else:
                     # 检查是否已经是前台窗口
@@ -1525,13 +1532,13 @@ def _execute_rotate_view(params: Dict[str, Any], execution_mode: str, target_hwn
 
         # 如果有窗口句柄，尝试获取窗口中心
         if target_hwnd:
-            try:
-                import win32gui
-                rect = win32gui.GetWindowRect(target_hwnd)
+            window_state = get_window_state(target_hwnd)
+            if window_state.valid:
+                rect = window_state.window_rect
                 center_x = (rect[0] + rect[2]) // 2
                 center_y = (rect[1] + rect[3]) // 2
                 logger.debug(f"使用窗口中心: ({center_x}, {center_y})")
-            except:
+            else:
                 logger.debug(f"无法获取窗口中心，使用屏幕中心: ({center_x}, {center_y})")
 
         # 在旋转前进行一次图片识别测试（如果启用了识别）
@@ -1892,8 +1899,7 @@ def _recognition_worker(template_image, confidence: float, check_interval: float
             screenshot_bgr = None
             if target_hwnd:
                 try:
-                    from utils.win32_utils import capture_window_background
-                    screenshot_bgr = capture_window_background(target_hwnd)
+                    screenshot_bgr = get_execution_backend().capture.capture(target_hwnd)
                 except Exception as e:
                     logger.debug(f"后台截图失败: {e}")
 
@@ -1958,8 +1964,7 @@ def _continuous_image_recognition(template_image, confidence: float,
             # 使用后台截图（如果有窗口句柄）
             if target_hwnd:
                 try:
-                    from utils.win32_utils import capture_window_background
-                    screenshot_bgr = capture_window_background(target_hwnd)
+                    screenshot_bgr = get_execution_backend().capture.capture(target_hwnd)
                     if screenshot_bgr is not None:
                         # 模板匹配
                         result = cv2.matchTemplate(screenshot_bgr, template_image, cv2.TM_CCOEFF_NORMED)
@@ -2010,8 +2015,7 @@ def _check_image_during_rotation(target_hwnd: Optional[int], template_image, con
             return False
 
         # 快速截图
-        from utils.win32_utils import capture_window_background
-        screenshot = capture_window_background(target_hwnd)
+        screenshot = get_execution_backend().capture.capture(target_hwnd)
 
         if screenshot is None:
             return False
@@ -2593,7 +2597,7 @@ def _get_ocr_results_from_context(card_id: Optional[int]) -> list:
         return []
 
 def _get_ocr_target_text_from_context(card_id: Optional[int]) -> tuple:
-    """从工作流上下文中获取OCR的目标文字和匹配模式"""
+    """从工作流上下文中获取OCR的目标文字、匹配模式和模糊匹配允许的错字数"""
     try:
         from task_workflow.workflow_context import get_workflow_context
 
@@ -2610,7 +2614,7 @@ def _get_ocr_target_text_from_context(card_id: Optional[int]) -> tuple:
 
             if target_text:
                 logger.info(f" [调试] 从工作流上下文获取到最新OCR目标文字: '{target_text}' (卡片ID: {latest_ocr_card_id})")
-                return target_text, match_mode
+                return target_text, match_mode, context.get_card_data(latest_ocr_card_id, 'ocr_fuzzy_max_errors', 0)
             else:
                 logger.warning(f" [调试] 卡片{latest_ocr_card_id}的target_text为空")
 
@@ -2620,7 +2624,7 @@ def _get_ocr_target_text_from_context(card_id: Optional[int]) -> tuple:
             match_mode = context.get_card_data(card_id, 'ocr_match_mode', '包含')
             if target_text:
                 logger.info(f"从工作流上下文获取到卡片 {card_id} 的OCR目标文字: '{target_text}'")
-                return target_text, match_mode
+                return target_text, match_mode, context.get_card_data(card_id, 'ocr_fuzzy_max_errors', 0)
 
         # 如果都没有找到，查找任意有目标文字的OCR卡片（按卡片ID降序）
         sorted_card_ids = sorted(context.card_data.keys(), reverse=True)
@@ -2630,14 +2634,14 @@ def _get_ocr_target_text_from_context(card_id: Optional[int]) -> tuple:
                 target_text = data['ocr_target_text']
                 match_mode = data.get('ocr_match_mode', '包含')
                 logger.info(f"从工作流上下文获取到备用OCR目标文字: '{target_text}' (卡片ID: {cid})")
-                return target_text, match_mode
+                return target_text, match_mode, data.get('ocr_fuzzy_max_errors', 0)
 
         logger.debug("未找到OCR目标文字")
-        return '', '包含'
+        return '', '包含', 0
 
     except Exception as e:
         logger.error(f"获取OCR目标文字时发生错误: {e}")
-        return '', '包含'
+        return '', '包含', 0
 
 def _get_ocr_region_offset_from_context(card_id: Optional[int]) -> Optional[tuple]:
     """从工作流上下文中获取OCR识别区域的偏移量"""
@@ -2677,8 +2681,9 @@ def _get_ocr_region_offset_from_context(card_id: Optional[int]) -> Optional[tupl
         logger.error(f"获取OCR区域偏移时发生错误: {e}")
         return None
 
-def _find_matching_text_in_ocr_results(ocr_results: list, target_text: str, match_mode: str) -> Optional[dict]:
-    """在OCR结果中查找匹配的文字"""
+def _find_matching_text_in_ocr_results(ocr_results: list, target_text: str, match_mode: str,
+                                       max_errors: int = 0) -> Optional[dict]:
+    """在OCR结果中查找匹配的文字（max_errors: 模糊匹配允许的错字数）"""
     try:
         if not ocr_results:
             return None
@@ -2690,25 +2695,11 @@ def _find_matching_text_in_ocr_results(ocr_results: list, target_text: str, matc
 
         logger.debug(f"在 {len(ocr_results)} 个OCR结果中查找文字: '{target_text}', 匹配模式: {match_mode}")
 
-        for result in ocr_results:
-            text = result.get('text', '')
-            confidence = result.get('confidence', 0)
-
-            logger.debug(f"检查OCR结果: '{text}' (置信度: {confidence:.3f})")
-
-            if match_mode == "包含":
-                if target_text in text:
-                    logger.info(f"找到包含匹配的文字: '{target_text}' 在 '{text}' 中")
-                    return result
-            elif match_mode == "完全匹配":
-                if target_text == text.strip():
-                    logger.info(f"找到完全匹配的文字: '{target_text}'")
-                    return result
-            else:
-                # 默认使用包含模式
-                if target_text in text:
-                    logger.info(f"找到默认包含匹配的文字: '{target_text}' 在 '{text}' 中")
-                    return result
+        from utils.text_matcher import find_first_matching_result
+        result = find_first_matching_result(ocr_results, target_text, match_mode, max_errors)
+        if result is not None:
+            logger.info(f"找到{match_mode}匹配的文字: '{target_text}' 在 '{result.get('text', '')}' 中")
+            return result
 
         logger.warning(f"未找到匹配的文字: '{target_text}'")
         return None
@@ -2770,7 +2761,7 @@ def _get_clicked_text_from_context(card_id: Optional[int]) -> str:
         context = get_workflow_context()
 
         # 获取OCR目标文字作为已点击的文字
-        target_text, _ = _get_ocr_target_text_from_context(card_id)
+        target_text, _, _ = _get_ocr_target_text_from_context(card_id)
         return target_text
 
     except Exception as e:
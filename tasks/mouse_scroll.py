@@ -22,6 +22,9 @@ import numpy as np
 import os # For path checking if needed, though imdecode handles paths
 import traceback # For detailed error logging
 
+# 窗口状态缓存（替代逐卡片的 IsWindow/GetWindowRect）
+from utils.window_state import is_window_valid
+
 logger = logging.getLogger(__name__)
 
 try:
@@ -49,7 +52,7 @@ def _find_image_background(target_hwnd, full_image_path, template_processed_gray
     if not WINDOWS_AVAILABLE:
         logger.error("后台图片定位需要 pywin32。")
         return False, None, None, target_hwnd
-    if not win32gui.IsWindow(target_hwnd):
+    if not is_window_valid(target_hwnd):
         logger.error(f"后台模式错误：目标窗口句柄 {target_hwnd} 无效或已销毁。")
         return False, None, None, target_hwnd
 
@@ -9,6 +9,7 @@ import time
 import logging
 from typing import Dict, Any, Optional, Tuple, List
 from utils.mumu_manager import get_mumu_manager
+from utils.cancellation import wait_interruptibly
 
 logger = logging.getLogger(__name__)
 
@@ -204,17 +205,10 @@ def _interruptible_sleep(duration: float, stop_checker=None):
     if duration <= 0:
         return
 
-    elapsed_time = 0.0
-    check_interval = 0.1  # 每100ms检查一次停止信号
-
-    while elapsed_time < duration:
-        if stop_checker and stop_checker():
-            logger.info(f"延迟被用户中断，已延迟 {elapsed_time:.2f}/{duration:.2f} 秒")
-            return
-
-        sleep_time = min(check_interval, duration - elapsed_time)
-        time.sleep(sleep_time)
-        elapsed_time += sleep_time
+    start_time = time.monotonic()
+    # 取消令牌上的 Event.wait，停止请求立即唤醒
+    if wait_interruptibly(duration, stop_checker):
+        logger.info(f"延迟被用户中断，已延迟 {time.monotonic() - start_time:.2f}/{duration:.2f} 秒")
 
 
 def _handle_delay_after_operation(params, stop_checker=None):
@@ -32,18 +32,25 @@ from utils.universal_coordinate_system import (
     get_universal_coordinate_system, CoordinateInfo, CoordinateType
 )
 
+# 编译后的目标文字匹配器
+from utils.text_matcher import get_text_matcher, MATCH_MODE_OPTIONS
+
+# 结构化追踪（替代逐条结果的INFO日志）
+from utils.workflow_tracer import get_workflow_tracer, TRACE_INFO
+from utils.workflow_profiler import profile_span, SPAN_PREPROCESS, SPAN_MATCH, SPAN_SLEEP
+
+# 窗口状态缓存（替代逐卡片的 IsWindow/GetWindowRect）
+from utils.window_state import get_window_state
+from utils.cancellation import wait_interruptibly
+
 # 先初始化logger
 logger = logging.getLogger(__name__)
 
 # 并发OCR管理器已移除，直接使用统一OCR服务作为备选
 CONCURRENT_OCR_AVAILABLE = False
 
-# 导入现有的窗口捕获功能
-try:
-    from utils.win32_utils import capture_window_background
-    CAPTURE_AVAILABLE = True
-except ImportError:
-    CAPTURE_AVAILABLE = False
+# 截图走当前执行后端（桌面为 Win32，无界面回放为假窗口）
+from task_workflow.execution_backend import get_execution_backend
 
 # 任务类型标识
 TASK_TYPE = "OCR文字识别"
@@ -126,11 +133,12 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
     target_text = params.get('target_text', '')
     target_text_groups = params.get('target_text_groups', '')
     match_mode = params.get('match_mode', '包含')
+    fuzzy_max_errors = int(params.get('fuzzy_max_errors', 0) or 0)
     reset_clicked_texts_on_next_run = params.get('reset_clicked_texts_on_next_run', False)
 
     # 调试：打印参数信息
-    logger.info(f"[卡片{card_id}] 参数调试 - 识别模式: {text_recognition_mode}, 目标文字: '{target_text}', 多组文字: '{target_text_groups}', 匹配模式: {match_mode}")
-    logger.info(f"[卡片{card_id}] 原始参数字典: {params}")
+    logger.debug(f"[卡片{card_id}] 参数调试 - 识别模式: {text_recognition_mode}, 目标文字: '{target_text}', 多组文字: '{target_text_groups}', 匹配模式: {match_mode}")
+    logger.debug(f"[卡片{card_id}] 原始参数字典: {params}")
 
     # 解析多组文字
     if text_recognition_mode == '多组文字' and target_text_groups:
@@ -161,13 +169,7 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
     # 获取窗口信息用于并发OCR管理
     window_title = "unknown"
     if target_hwnd:
-        try:
-            import win32gui
-            window_title = win32gui.GetWindowText(target_hwnd)
-            if not window_title:
-                window_title = f"HWND_{target_hwnd}"
-        except:
-            window_title = f"HWND_{target_hwnd}"
+        window_title = get_window_state(target_hwnd).title or f"HWND_{target_hwnd}"
 
     # 将窗口标题添加到参数中，供OCR使用
     params['window_title'] = window_title
@@ -175,17 +177,18 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
     # 移除详细的print输出，避免敏感信息泄露
     # 保留基本的日志记录
 
-    logger.info(f"启动 [OCR任务] 开始执行OCR区域识别")
-    logger.info(f"列表 [OCR任务] 参数信息:")
-    logger.info(f"   区域模式: '{region_mode}'")
-    logger.info(f"   目标文字: '{target_text}'")
-    logger.info(f"   匹配模式: '{match_mode}'")
-    logger.info(f"   框选坐标: ({region_x}, {region_y}, {region_width}, {region_height})")
-    logger.info(f"🔗 [OCR任务] 执行环境:")
-    logger.info(f"   窗口句柄: {target_hwnd}")
-    logger.info(f"   窗口区域: {window_region}")
-    logger.info(f"   执行模式: {execution_mode}")
-    logger.info(f"   卡片ID: {card_id}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"启动 [OCR任务] 开始执行OCR区域识别")
+        logger.debug(f"列表 [OCR任务] 参数信息:")
+        logger.debug(f"   区域模式: '{region_mode}'")
+        logger.debug(f"   目标文字: '{target_text}'")
+        logger.debug(f"   匹配模式: '{match_mode}'")
+        logger.debug(f"   框选坐标: ({region_x}, {region_y}, {region_width}, {region_height})")
+        logger.debug(f"🔗 [OCR任务] 执行环境:")
+        logger.debug(f"   窗口句柄: {target_hwnd}")
+        logger.debug(f"   窗口区域: {window_region}")
+        logger.debug(f"   执行模式: {execution_mode}")
+        logger.debug(f"   卡片ID: {card_id}")
 
     try:
         # 1. 获取OCR引擎（支持打包后运行）
@@ -208,25 +211,22 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
         # 2. 捕获窗口截图
         logger.info(f"搜索 [OCR截图] 开始截图，窗口句柄: {target_hwnd}")
 
-        if not target_hwnd or not PYWIN32_AVAILABLE:
-            logger.error(f"错误 [OCR截图] 需要有效的窗口句柄和pywin32支持 (句柄: {target_hwnd}, pywin32: {PYWIN32_AVAILABLE})")
+        backend = get_execution_backend()
+        if not target_hwnd or not backend.available:
+            logger.error(f"错误 [OCR截图] 需要有效的窗口句柄和可用的执行后端 (句柄: {target_hwnd}, 后端: {backend.name})")
             return _handle_failure(on_failure_action, failure_jump_id, card_id, stop_checker)
 
-        if not win32gui.IsWindow(target_hwnd):
+        window_state = get_window_state(target_hwnd)
+        if not window_state.valid:
             logger.error(f"错误 [OCR截图] 窗口句柄 {target_hwnd} 无效")
             return _handle_failure(on_failure_action, failure_jump_id, card_id, stop_checker)
 
-        # 获取窗口信息用于调试
-        try:
-            window_title = win32gui.GetWindowText(target_hwnd)
-            window_rect = win32gui.GetWindowRect(target_hwnd)
-            logger.info(f"列表 [OCR截图] 目标窗口: '{window_title}', 位置: {window_rect}")
-        except Exception as e:
-            logger.warning(f"警告 [OCR截图] 无法获取窗口信息: {e}")
+        # 窗口信息用于调试（来自窗口状态缓存）
+        logger.info(f"列表 [OCR截图] 目标窗口: '{window_state.title}', 位置: {window_state.window_rect}")
 
         # 捕获窗口
         logger.info(f"照片 [OCR截图] 正在捕获窗口...")
-        window_image = capture_window_background(target_hwnd)
+        window_image = backend.capture.capture(target_hwnd)
         if window_image is None:
             logger.error(f"错误 [OCR截图] 无法捕获窗口截图，可能原因:")
             logger.error(f"   1. 窗口被最小化或隐藏")
@@ -313,7 +313,8 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
 
             # 直接放大2倍（最简单有效的方法）
             height, width = roi_image.shape[:2]
-            enlarged_2x = cv2.resize(roi_image, (width*2, height*2), interpolation=cv2.INTER_CUBIC)
+            with profile_span(SPAN_PREPROCESS):
+                enlarged_2x = cv2.resize(roi_image, (width*2, height*2), interpolation=cv2.INTER_CUBIC)
 
         except Exception as e:
             logger.error(f"错误 [图像预处理] 预处理失败: {e}")
@@ -362,18 +363,20 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
                 # 使用传入的target_hwnd参数，而不是从params中获取
                 window_hwnd = target_hwnd if target_hwnd else 0
 
-                results = multi_ocr_pool.recognize_text(
-                    window_title=window_title,
-                    window_hwnd=window_hwnd,
-                    image=enlarged_2x,
-                    confidence=0.1
-                )
+                with profile_span(SPAN_MATCH):
+                    results = multi_ocr_pool.recognize_text(
+                        window_title=window_title,
+                        window_hwnd=window_hwnd,
+                        image=enlarged_2x,
+                        confidence=0.1
+                    )
                 logger.debug(f"使用多OCR服务池识别: {window_title} (HWND: {window_hwnd})")
 
             except ImportError:
                 logger.debug("多OCR服务池不可用，使用统一OCR服务")
                 # 回退到统一OCR服务
-                results = recognize_text_with_unified_service(enlarged_2x, 0.1)  # 低置信度
+                with profile_span(SPAN_MATCH):
+                    results = recognize_text_with_unified_service(enlarged_2x, 0.1)  # 低置信度
 
             # 记录单次识别耗时
             single_ocr_time = (time.time() - single_ocr_start) * 1000  # 转换为毫秒
@@ -394,11 +397,12 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
                         result['bbox'] = scaled_bbox
                         logger.debug(f"坐标缩放还原: {original_bbox} -> {scaled_bbox}")
 
-                # 显示识别结果
-                for i, result in enumerate(results):
-                    text = result.get('text', '')
-                    confidence = result.get('confidence', 0)
-                    logger.info(f"   结果{i+1}: '{text}' (置信度: {confidence:.3f})")
+                # 显示识别结果（仅DEBUG级别时逐条输出）
+                if logger.isEnabledFor(logging.DEBUG):
+                    for i, result in enumerate(results):
+                        text = result.get('text', '')
+                        confidence = result.get('confidence', 0)
+                        logger.debug(f"   结果{i+1}: '{text}' (置信度: {confidence:.3f})")
 
                 current_best_count = len(results)
                 current_best_results = results
@@ -414,7 +418,7 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
                     # 有目标文字时，使用用户设置的置信度阈值
                     filtered_results = [r for r in current_best_results if r.get('confidence', 0) >= confidence_threshold]
                     # 检查是否包含目标文字
-                    if _check_target_text(filtered_results, target_text, match_mode):
+                    if _check_target_text(filtered_results, target_text, match_mode, fuzzy_max_errors):
                         logger.info(f"成功 [OCR重试] 第 {retry_count + 1} 次尝试成功找到目标文字!")
                         best_results = current_best_results
                         best_count = current_best_count
@@ -439,14 +443,12 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
             if retry_count < max_retry_count:
                 logger.info(f"⏳ [OCR重试] 等待 {retry_delay} 秒后重试...")
 
-                # 在等待期间检查停止请求（只在等待时检查，不影响正常识别）
-                sleep_time = 0
-                while sleep_time < retry_delay:
-                    if stop_checker and stop_checker():
-                        logger.info("用户按下停止按钮，终止OCR重试循环")
-                        return False, '停止工作流', None
-                    time.sleep(0.1)  # 每0.1秒检查一次停止按钮
-                    sleep_time += 0.1
+                # 在取消令牌上等待，停止请求立即唤醒（不影响正常识别）
+                with profile_span(SPAN_SLEEP):
+                    interrupted = wait_interruptibly(retry_delay, stop_checker)
+                if interrupted:
+                    logger.info("用户按下停止按钮，终止OCR重试循环")
+                    return False, '停止工作流', None
 
         # 使用最好的结果进行后续处理
         # 如果没有指定目标文字，使用较低的置信度阈值以识别更多文字
@@ -462,12 +464,15 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
         logger.info(f"编辑 [OCR识别] 经过 {retry_count} 次重试，最终识别到 {len(ocr_results)} 个有效文字结果")
 
         # 显示所有识别到的文字（用于调试）
+        get_workflow_tracer().record(TRACE_INFO, 'ocr', card_id, TASK_TYPE, outcome=len(ocr_results),
+                                     hwnd=target_hwnd, detail=lambda: [r.get('text', '') for r in ocr_results])
         if ocr_results:
-            logger.info("编辑 [OCR识别] 识别到的文字:")
-            for i, result in enumerate(ocr_results):
-                text = result.get('text', '')
-                confidence = result.get('confidence', 0)
-                logger.info(f"   文字{i+1}: '{text}' (置信度: {confidence:.3f})")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("编辑 [OCR识别] 识别到的文字:")
+                for i, result in enumerate(ocr_results):
+                    text = result.get('text', '')
+                    confidence = result.get('confidence', 0)
+                    logger.debug(f"   文字{i+1}: '{text}' (置信度: {confidence:.3f})")
         else:
             logger.warning("警告 [OCR识别] 未识别到任何文字，可能原因:")
             logger.warning("   1. 区域内没有文字")
@@ -481,12 +486,13 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
                 ocr_results, text_groups, match_mode, card_id,
                 final_x, final_y, on_success_action, success_jump_id,
                 on_failure_action, failure_jump_id, reset_clicked_texts_on_next_run,
-                stop_checker
+                stop_checker, fuzzy_max_errors
             )
         else:
             # 单组文字识别逻辑（保持原有逻辑）
             logger.info(f"[卡片{card_id}][单组文字] 查找目标文字: '{target_text}', 匹配模式: {match_mode}")
-            found_target, target_result = _check_target_text_with_position(ocr_results, target_text, match_mode)
+            found_target, target_result = _check_target_text_with_position(ocr_results, target_text, match_mode,
+                                                                           fuzzy_max_errors)
 
             if found_target:
                 logger.info(f"[卡片{card_id}][单组文字] 成功找到目标文字: '{target_text}'")
@@ -500,6 +506,7 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mod
                     context = get_workflow_context()
                     context.set_card_data(card_id, 'ocr_target_text', target_text)
                     context.set_card_data(card_id, 'ocr_match_mode', match_mode)
+                    context.set_card_data(card_id, 'ocr_fuzzy_max_errors', fuzzy_max_errors)
                     context.set_card_data(card_id, 'ocr_region_offset', (final_x, final_y))  # 保存识别区域的偏移
 
                     logger.info(f"OCR结果已保存到工作流上下文: 卡片ID={card_id}, 结果数={len(ocr_results)}")
@@ -614,8 +621,8 @@ def _extract_region(image: np.ndarray, x: int, y: int, width: int, height: int)
 
 
 
-def _check_target_text(results: List[dict], target_text: str, match_mode: str) -> bool:
-    """检查是否找到目标文字"""
+def _check_target_text(results: List[dict], target_text: str, match_mode: str, max_errors: int = 0) -> bool:
+    """检查是否找到目标文字（max_errors: 模糊匹配允许的错字数）"""
     if not results:
         return False
 
@@ -629,28 +636,17 @@ def _check_target_text(results: List[dict], target_text: str, match_mode: str) -
     logger.debug(f"搜索 [文字匹配] 目标: '{target_text}', 识别: '{all_text}', 模式: {match_mode}")
 
     try:
-        if match_mode == "包含":
-            result = target_text in all_text
-            if result:
-                logger.info(f"成功 [文字匹配] 包含匹配成功: '{target_text}' 在 '{all_text}' 中")
-            return result
-        elif match_mode == "完全匹配":
-            result = target_text == all_text.strip()
-            if result:
-                logger.info(f"成功 [文字匹配] 完全匹配成功")
-            return result
-        else:
-            # 默认使用包含模式
-            result = target_text in all_text
-            if result:
-                logger.info(f"成功 [文字匹配] 默认包含匹配成功")
-            return result
+        match = get_text_matcher((target_text,), match_mode, max_errors).find_first([all_text])
+        if match:
+            logger.info(f"成功 [文字匹配] {match_mode}匹配成功: '{target_text}' 在 '{all_text}' 中")
+        return match is not None
     except Exception as e:
         logger.warning(f"文字匹配失败: {e}")
         return False
 
-def _check_target_text_with_position(results: List[dict], target_text: str, match_mode: str) -> Tuple[bool, Optional[dict]]:
-    """检查OCR结果中是否包含目标文字，并返回位置信息"""
+def _check_target_text_with_position(results: List[dict], target_text: str, match_mode: str,
+                                     max_errors: int = 0) -> Tuple[bool, Optional[dict]]:
+    """检查OCR结果中是否包含目标文字，并返回位置信息（max_errors: 模糊匹配允许的错字数）"""
     if not results:
         return False, None
 
@@ -661,26 +657,17 @@ def _check_target_text_with_position(results: List[dict], target_text: str, matc
     logger.debug(f"搜索 [文字匹配] 目标: '{target_text}', 模式: {match_mode}")
 
     try:
-        for result in results:
-            text = result.get('text', '')
-            if match_mode == "包含":
-                if target_text in text:
-                    logger.info(f"成功 [文字匹配] 包含匹配成功: '{target_text}' 在 '{text}' 中")
-                    return True, result
-            elif match_mode == "完全匹配":
-                if target_text == text.strip():
-                    logger.info(f"成功 [文字匹配] 完全匹配成功")
-                    return True, result
-            else:
-                # 默认使用包含模式
-                if target_text in text:
-                    logger.info(f"成功 [文字匹配] 默认包含匹配成功")
-                    return True, result
+        match = get_text_matcher((target_text,), match_mode, max_errors).find_first([r.get('text', '') for r in results])
+        if match:
+            result = results[match.result_index]
+            logger.info(f"成功 [文字匹配] {match_mode}匹配成功: '{target_text}' 在 '{result.get('text', '')}' 中")
+            return True, result
 
         return False, None
     except Exception as e:
         logger.warning(f"文字匹配失败: {e}")
         return False, None
+
 def _handle_success(action: str, jump_id: Optional[int], card_id: Optional[int], stop_checker=None) -> Tuple[bool, str, Optional[int]]:
     """处理成功情况"""
     if action == '跳转到步骤':
@@ -715,7 +702,7 @@ def _handle_failure(action: str, jump_id: Optional[int], card_id: Optional[int],
 def _handle_multi_text_recognition(ocr_results, text_groups, match_mode, card_id,
                                  final_x, final_y, on_success_action, success_jump_id,
                                  on_failure_action, failure_jump_id, reset_clicked_texts_on_next_run=False,
-                                 stop_checker=None):
+                                 stop_checker=None, max_errors=0):
     """处理多组文字识别逻辑"""
     try:
         from task_workflow.workflow_context import get_workflow_context, set_ocr_results
@@ -754,26 +741,30 @@ def _handle_multi_text_recognition(ocr_results, text_groups, match_mode, card_id
         logger.info(f"[卡片{card_id}][多组文字] 第{current_index + 1}/{len(text_groups)}组 查找文字: '{current_target_text}'")
 
         # 过滤掉已点击的文字
-        filtered_results = []
-        for result in ocr_results:
-            result_text = result.get('text', '')
-            if result_text not in clicked_texts:
-                filtered_results.append(result)
-            else:
-                logger.debug(f"过滤已点击文字: '{result_text}'")
+        clicked_set = set(clicked_texts)
+        filtered_results = [r for r in ocr_results if r.get('text', '') not in clicked_set]
 
         logger.info(f"过滤后剩余{len(filtered_results)}个文字 (原{len(ocr_results)}个)")
 
-        # 在过滤后的结果中查找目标文字
-        found_target, target_result = _check_target_text_with_position(filtered_results, current_target_text, match_mode)
+        # 一次扫描得到所有文字组的匹配，按组顺序取当前组及之后第一个命中的组
+        matcher = get_text_matcher(text_groups, match_mode, max_errors)
+        group_matches = matcher.best_by_target([r.get('text', '') for r in filtered_results])
+        matched_index = next((i for i in range(current_index, len(text_groups)) if i in group_matches), None)
+
+        if matched_index is not None:
+            if matched_index != current_index:
+                logger.info(f"[卡片{card_id}][多组文字] 第{current_index + 1}~{matched_index}组识别失败，使用第{matched_index + 1}组")
+                context.set_multi_text_recognition_state(card_id, text_groups, matched_index, clicked_texts)
+                current_index = matched_index
+                current_target_text = text_groups[matched_index]
 
-        if found_target:
             logger.info(f"[卡片{card_id}][多组文字] 成功找到第{current_index + 1}组文字: '{current_target_text}'")
 
             # 保存OCR结果到上下文
             set_ocr_results(card_id, filtered_results)
             context.set_card_data(card_id, 'ocr_target_text', current_target_text)
             context.set_card_data(card_id, 'ocr_match_mode', match_mode)
+            context.set_card_data(card_id, 'ocr_fuzzy_max_errors', max_errors)
             context.set_card_data(card_id, 'ocr_region_offset', (final_x, final_y))
 
             logger.info(f"多组OCR结果已保存: 卡片ID={card_id}, 当前组={current_index + 1}, 结果数={len(filtered_results)}")
@@ -788,26 +779,9 @@ def _handle_multi_text_recognition(ocr_results, text_groups, match_mode, card_id
 
             return _handle_success(on_success_action, success_jump_id, card_id, stop_checker)
         else:
-            logger.warning(f"未找到第{current_index + 1}组文字: '{current_target_text}'")
-
-            # 工具 修复：多组文字识别失败时，尝试识别下一组文字
-            next_index = current_index + 1
-            if next_index < len(text_groups):
-                logger.info(f"[卡片{card_id}][多组文字] 第{current_index + 1}组识别失败，尝试识别下一组 (第{next_index + 1}组)")
-                # 更新到下一组
-                context.set_multi_text_recognition_state(card_id, text_groups, next_index, clicked_texts)
-
-                # 递归调用自己来处理下一组
-                return _handle_multi_text_recognition(
-                    ocr_results, text_groups, match_mode, card_id,
-                    final_x, final_y, on_success_action, success_jump_id,
-                    on_failure_action, failure_jump_id, reset_clicked_texts_on_next_run,
-                    stop_checker
-                )
-            else:
-                logger.warning(f"[卡片{card_id}][多组文字] 所有文字组都识别失败，重置状态")
-                # 所有组都失败了，重置状态
-                context.set_multi_text_recognition_state(card_id, text_groups, 0, [])
+            logger.warning(f"[卡片{card_id}][多组文字] 第{current_index + 1}~{len(text_groups)}组文字都识别失败，重置状态")
+            # 所有组都失败了，重置状态
+            context.set_multi_text_recognition_state(card_id, text_groups, 0, [])
 
             # 多组文字识别失败时不清除记忆，只清除上下文（保持当前组状态）
             try:
@@ -918,9 +892,18 @@ def get_params_definition() -> Dict[str, Dict[str, Any]]:
         "match_mode": {
             "label": "匹配模式",
             "type": "select",
-            "options": ["包含", "完全匹配"],
+            "options": list(MATCH_MODE_OPTIONS),
             "default": "包含",
-            "tooltip": "文字匹配的方式"
+            "tooltip": "文字匹配的方式\n包含：目标文字包含在识别文字中即可\n完全匹配：识别文字必须与目标文字完全一致\n模糊匹配：容忍常见OCR混淆字符（如0/O、1/l），可另外允许少量错字"
+        },
+        "fuzzy_max_errors": {
+            "label": "模糊匹配允许错字数",
+            "type": "int",
+            "default": 0,
+            "min": 0,
+            "max": 5,
+            "tooltip": "0 = 只容忍常见OCR混淆字符\n大于0时额外允许相应数量的错字、漏字或多字\n目标文字不超过3个字时始终不允许错字",
+            "condition": {"param": "match_mode", "value": "模糊匹配"}
         },
 
 
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+"""
+并行分支任务模块
+把若干条分支交给工作流执行器在共享线程池中并发执行，在"并行汇合"卡片处汇合。
+分支的执行由执行器完成（见 task_workflow/parallel_branches.py），本模块只提供参数定义，
+以及在不支持并行的环境（任务模块内工作流、旧多窗口执行器）中的顺序回退。
+"""
+
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+from task_workflow.parallel_branches import FORK_TASK_TYPE, JOIN_ALL, JOIN_FIRST, parse_branch_ids
+
+logger = logging.getLogger(__name__)
+
+# 任务类型标识
+TASK_TYPE = FORK_TASK_TYPE
+
+
+def get_params_definition() -> Dict[str, Dict[str, Any]]:
+    """获取参数定义"""
+    return {
+        "branch_card_ids": {
+            "label": "分支起始卡片ID",
+            "type": "text",
+            "default": "",
+            "tooltip": "每条分支的第一个卡片ID，用逗号分隔，例如: 5, 9, 12"
+        },
+        "join_card_id": {
+            "label": "汇合卡片",
+            "type": "int",
+            "required": False,
+            "widget_hint": "card_selector",
+            "tooltip": "分支到达该\"并行汇合\"卡片时结束，汇合后从该卡片继续执行"
+        },
+        "join_mode": {
+            "label": "汇合方式",
+            "type": "select",
+            "options": [JOIN_ALL, JOIN_FIRST],
+            "default": JOIN_ALL,
+            "tooltip": "全部完成：等待所有分支结束，全部成功才算成功；任一完成：第一个成功的分支获胜，其余分支立即停止"
+        },
+        "branch_timeout": {
+            "label": "分支超时(秒)",
+            "type": "float",
+            "default": 0.0,
+            "min": 0.0,
+            "decimals": 1,
+            "tooltip": "超时后停止所有未完成的分支，0 表示不限时"
+        },
+    }
+
+
+def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mode: str,
+                 target_hwnd: Optional[int], window_region=None, card_id: Optional[int] = None,
+                 **kwargs) -> Tuple[bool, str, Optional[int]]:
+    """
+    顺序回退：当前执行环境不支持并行分支时，按顺序执行第一条分支
+    （工作流执行器会直接处理并行分支卡片，不会调用这里）
+    """
+    branch_ids = parse_branch_ids(params.get('branch_card_ids'))
+    if not branch_ids:
+        logger.warning(f"并行分支卡片 {card_id} 没有配置分支起始卡片")
+        return False, '执行下一步', None
+    logger.warning(f"当前执行环境不支持并行分支，卡片 {card_id} 将顺序执行第一条分支: {branch_ids[0]}")
+    return True, '跳转到步骤', branch_ids[0]
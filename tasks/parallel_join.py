@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+"""
+并行汇合任务模块
+"并行分支"卡片的各条分支在此汇合。执行器把汇合结果（按汇合方式判定的成功/失败）写入计数器，
+本卡片读取后按 成功/失败 的执行后操作继续。
+"""
+
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+from task_workflow.parallel_branches import JOIN_TASK_TYPE, JOIN_RESULT_KEY
+from .task_utils import get_standard_action_params, handle_success_action, handle_failure_action
+
+logger = logging.getLogger(__name__)
+
+# 任务类型标识
+TASK_TYPE = JOIN_TASK_TYPE
+
+
+def get_params_definition() -> Dict[str, Dict[str, Any]]:
+    """获取参数定义"""
+    return get_standard_action_params()
+
+
+def execute_task(params: Dict[str, Any], counters: Dict[str, int], execution_mode: str,
+                 target_hwnd: Optional[int], window_region=None, card_id: Optional[int] = None,
+                 **kwargs) -> Tuple[bool, str, Optional[int]]:
+    """读取分支汇合结果（未经过并行分支直接到达时视为成功）"""
+    success = counters.pop(JOIN_RESULT_KEY.format(card_id), True)
+    logger.info(f"并行汇合卡片 {card_id}: 汇合结果={'成功' if success else '失败'}")
+    if success:
+        return handle_success_action(params, card_id, kwargs.get('stop_checker'))
+    return handle_failure_action(params, card_id)
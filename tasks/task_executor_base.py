@@ -3,11 +3,13 @@
 统一任务执行器基类 - 处理通用的延迟、跳转和结果处理逻辑
 """
 import logging
-import time
 import random
 from typing import Dict, Any, Tuple, Optional, Callable
 from abc import ABC, abstractmethod
 
+from utils.workflow_profiler import profiled, SPAN_SLEEP
+from utils.cancellation import wait_interruptibly
+
 logger = logging.getLogger(__name__)
 
 
@@ -101,17 +103,15 @@ class TaskExecutorBase(ABC):
         except Exception as e:
             logger.error(f"执行下一步延迟时发生错误: {e}")
     
+    @profiled(SPAN_SLEEP)
     def _interruptible_sleep(self, duration: float, stop_checker=None):
         """可中断的睡眠函数"""
         if duration <= 0:
             return
         
-        start_time = time.time()
-        while time.time() - start_time < duration:
-            if stop_checker and stop_checker():
-                logger.info("延迟被中断")
-                break
-            time.sleep(0.1)
+        # 取消令牌上的 Event.wait，停止请求立即唤醒
+        if wait_interruptibly(duration, stop_checker):
+            logger.info("延迟被中断")
     
     def _handle_success_action(self, action: str, jump_id: Optional[int], card_id: Optional[int]) -> Tuple[bool, str, Optional[int]]:
         """处理成功动作"""
@@ -5,11 +5,36 @@
 import json
 import logging
 import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
 from typing import Dict, Any, Tuple, Optional, List
 import copy
 
+from task_workflow.execution_plan import (
+    compile_workflow, ExecutionPlan, ACTION_NEXT, ACTION_STOP, ACTION_JUMP, ACTION_REPEAT,
+    CALL_EXECUTE_TASK, CALL_EXECUTE
+)
+
 logger = logging.getLogger(__name__)
 
+# 编译后的模块缓存：{模块文件绝对路径: CompiledModule}，按 (mtime, size) 判断是否过期
+_MODULE_CACHE_SIZE = 64
+_module_cache: "OrderedDict[str, CompiledModule]" = OrderedDict()
+_module_cache_lock = threading.Lock()
+
+# 当前线程正在执行的模块路径栈（用于嵌套模块的循环引用检测）
+_module_stack = threading.local()
+
+
+@dataclass(frozen=True)
+class CompiledModule:
+    """编译后的任务模块"""
+    path: str
+    file_stamp: Tuple[int, int]
+    name: str
+    plan: ExecutionPlan
+
 def get_params_definition() -> Dict[str, Dict[str, Any]]:
     """获取任务模块的参数定义"""
     return {
@@ -57,57 +82,45 @@ def get_params_definition() -> Dict[str, Dict[str, Any]]:
 
 def execute_task(params: Dict[str, Any], counters: Dict[str, int],
                 execution_mode='foreground', **kwargs) -> Tuple[bool, str, Optional[int]]:
-    """执行任务模块 - 简化版本，直接执行模块工作流"""
+    """执行任务模块 - 使用缓存的编译结果执行模块工作流"""
 
     # 从kwargs中获取card_id（与普通任务保持一致）
     card_id = kwargs.get('card_id')
-
-    # 添加详细的调试日志
-    logger.info(f"任务模块开始执行 - 卡片ID: {card_id}")
-    logger.debug(f"任务模块参数: {params}")
-    logger.debug(f"执行模式: {execution_mode}")
+    logger.debug(f"任务模块开始执行 - 卡片ID: {card_id}, 执行模式: {execution_mode}")
 
     module_file = params.get('module_file')
-    logger.info(f"模块文件路径: {module_file}")
-
     if not module_file:
         logger.error("模块文件路径为空")
         return False, "未选择有效的模块文件", None
 
-    if not os.path.exists(module_file):
-        logger.error(f"模块文件不存在: {module_file}")
-        return False, "未选择有效的模块文件", None
-
-    logger.info(f"模块文件验证通过: {module_file}")
-
     try:
-        # 加载模块配置
-        logger.info("开始加载模块配置文件")
-        with open(module_file, 'r', encoding='utf-8') as f:
-            module_config = json.load(f)
-        logger.info("模块配置文件加载成功")
-
-        # 验证基本格式
-        if 'workflow' not in module_config:
-            logger.error("模块文件格式错误：缺少workflow字段")
-            return False, "模块文件格式错误：缺少workflow字段", None
-
-        logger.info("模块文件格式验证通过")
-
-        # 直接执行模块内的工作流
-        workflow_data = module_config['workflow']
-        logger.info(f"准备执行内部工作流，工作流数据: {type(workflow_data)}")
-
-        success, internal_next_card_id = _execute_internal_workflow(
-            workflow_data, counters, execution_mode, card_id, **kwargs
-        )
-
-        logger.info(f"内部工作流执行完成: success={success}, next_card_id={internal_next_card_id}")
+        module, error = load_compiled_module(module_file)
+        if module is None:
+            return False, error, None
+
+        # 嵌套模块循环引用检测
+        stack = getattr(_module_stack, 'paths', None)
+        if stack is None:
+            stack = _module_stack.paths = []
+        if module.path in stack:
+            chain = ' -> '.join(os.path.basename(path) for path in stack + [module.path])
+            logger.error(f"检测到任务模块循环引用: {chain}")
+            return False, f"任务模块循环引用: {chain}", None
+
+        stack.append(module.path)
+        try:
+            success, internal_next_card_id = _execute_internal_workflow(
+                module, counters, execution_mode, card_id, **kwargs
+            )
+        finally:
+            stack.pop()
+
+        logger.debug(f"内部工作流执行完成: success={success}, next_card_id={internal_next_card_id}")
 
         # 如果内部工作流返回了跳转信息，需要特殊处理
         # 这里internal_next_card_id是内部模块的卡片ID，需要转换为外部逻辑
 
-        module_name = module_config.get('module_info', {}).get('name', '未知模块')
+        module_name = module.name
 
         # 处理跳转逻辑 - 根据模块整体执行结果决定跳转
         if success:
@@ -169,6 +182,88 @@ def execute_task(params: Dict[str, Any], counters: Dict[str, int],
         logger.error(f"任务模块执行失败: {e}", exc_info=True)
         return False, f"模块执行错误: {str(e)}", None
 
+def _file_stamp(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_compiled_module(module_file: str) -> Tuple[Optional[CompiledModule], Optional[str]]:
+    """
+    加载并编译模块文件（按路径和修改时间缓存）
+
+    Returns:
+        (编译后的模块, 错误信息)
+    """
+    path = os.path.abspath(module_file)
+    try:
+        stamp = _file_stamp(path)
+    except OSError:
+        logger.error(f"模块文件不存在: {module_file}")
+        return None, "未选择有效的模块文件"
+
+    with _module_cache_lock:
+        cached = _module_cache.get(path)
+        if cached is not None and cached.file_stamp == stamp:
+            _module_cache.move_to_end(path)
+            return cached, None
+
+    logger.info(f"编译任务模块: {module_file}")
+    with open(path, 'r', encoding='utf-8') as f:
+        module_config = json.load(f)
+
+    # 验证基本格式
+    if 'workflow' not in module_config:
+        logger.error("模块文件格式错误：缺少workflow字段")
+        return None, "模块文件格式错误：缺少workflow字段"
+
+    workflow_data = module_config['workflow']
+    cards = workflow_data.get('cards', [])
+    connections = workflow_data.get('connections', [])
+
+    # 导入任务模块
+    from tasks import TASK_MODULES
+
+    plan = compile_workflow(
+        {card['id']: card for card in cards},
+        connections,
+        TASK_MODULES,
+        start_card_id=_find_start_card_id(cards, connections),
+        source_key=(path, stamp),
+        untyped_connections=True,
+    )
+    module = CompiledModule(
+        path=path,
+        file_stamp=stamp,
+        name=module_config.get('module_info', {}).get('name', '未知模块'),
+        plan=plan,
+    )
+    logger.info(f"任务模块已编译: {module.name} ({len(plan)} 个卡片, {len(connections)} 个连接)")
+
+    with _module_cache_lock:
+        _module_cache[path] = module
+        _module_cache.move_to_end(path)
+        while len(_module_cache) > _MODULE_CACHE_SIZE:
+            _module_cache.popitem(last=False)
+    return module, None
+
+
+def clear_module_cache():
+    """清空编译后的模块缓存"""
+    with _module_cache_lock:
+        _module_cache.clear()
+
+
+def _find_start_card_id(cards: List[Dict[str, Any]], connections: List[Dict[str, Any]]) -> Optional[Any]:
+    """找到起点卡片（没有输入连接的卡片，或者ID最小的卡片）"""
+    if not cards:
+        return None
+    input_cards = {conn.get('end_card_id') for conn in connections if conn.get('end_card_id')}
+    for card in cards:
+        if card['id'] not in input_cards:
+            return card['id']
+    logger.warning("没有找到明确的起点卡片，使用ID最小的卡片")
+    return min(card['id'] for card in cards)
+
 def _validate_module_config(config: Dict) -> bool:
     """验证模块配置格式"""
     try:
@@ -207,182 +302,106 @@ def _validate_module_config(config: Dict) -> bool:
 
 # 移除参数替换功能，任务模块直接执行原始工作流
 
-def _execute_internal_workflow(workflow_data: Dict, counters: Dict,
+def _execute_internal_workflow(module: CompiledModule, counters: Dict,
                              execution_mode: str, parent_card_id: Optional[int], **kwargs) -> Tuple[bool, Optional[int]]:
-    """执行内嵌工作流，支持步骤跳转"""
+    """沿编译后的计划执行模块内工作流，支持步骤跳转"""
     try:
-        logger.info(f"开始执行内部工作流 - 父卡片ID: {parent_card_id}")
-
-        # 获取卡片数据和连接数据
-        cards = workflow_data.get('cards', [])
-        connections = workflow_data.get('connections', [])
-
-        logger.info(f"内部工作流包含 {len(cards)} 个卡片, {len(connections)} 个连接")
-
-        if not cards:
+        plan = module.plan
+        current_card_id = plan.start_card_id
+        if current_card_id is None:
             logger.warning("工作流中没有卡片")
             return True, None
 
-        # 导入任务模块
-        from tasks import TASK_MODULES
-
-        # 获取执行参数
-        target_hwnd = kwargs.get('target_hwnd')
-        images_dir = kwargs.get('images_dir', 'images')
-
-        # 构建卡片映射和连接映射
-        card_map = {card['id']: card for card in cards}
-
-        # 构建连接映射（从起始卡片ID到目标卡片ID）
-        connection_map = {}
-        for conn in connections:
-            start_id = conn.get('start_card_id')
-            end_id = conn.get('end_card_id')
-            if start_id and end_id:
-                connection_map[start_id] = end_id
-
-        # 找到起点卡片（没有输入连接的卡片，或者ID最小的卡片）
-        input_cards = {conn.get('end_card_id') for conn in connections if conn.get('end_card_id')}
-        start_cards = [card for card in cards if card['id'] not in input_cards]
-
-        logger.info(f"输入卡片ID集合: {input_cards}")
-        logger.info(f"候选起点卡片: {[card['id'] for card in start_cards]}")
+        logger.debug(f"模块 {module.name} 内工作流从卡片 {current_card_id} 开始执行 - 父卡片ID: {parent_card_id}")
 
-        if not start_cards:
-            # 如果没有明确的起点，使用ID最小的卡片
-            logger.warning("没有找到明确的起点卡片，使用ID最小的卡片")
-            current_card_id = min(card['id'] for card in cards)
-        else:
-            # 使用第一个起点卡片
-            current_card_id = start_cards[0]['id']
-
-        logger.info(f"模块内工作流从卡片 {current_card_id} 开始执行")
+        # 获取执行参数（传给模块内每张卡片）
+        exec_kwargs = kwargs.copy()
+        exec_kwargs.setdefault('target_hwnd', kwargs.get('target_hwnd'))
+        exec_kwargs['images_dir'] = kwargs.get('images_dir', 'images')
+        stop_checker = kwargs.get('stop_checker')
+        if not callable(stop_checker):
+            stop_checker = None
 
         # 执行工作流
         executed_cards = set()  # 防止无限循环
-        # 不设置最大迭代次数限制
-
-        while current_card_id is not None:  # 移除最大迭代次数限制
-            # 移除迭代计数
 
-            # 检查停止信号 - 从kwargs中获取停止检查函数
-            stop_checker = kwargs.get('stop_checker')
-            if stop_checker and callable(stop_checker):
-                if stop_checker():
-                    logger.info("任务模块内部工作流检测到停止请求，终止执行")
-                    return True, "STOP_WORKFLOW"
+        while current_card_id is not None:
+            # 检查停止信号
+            if stop_checker is not None and stop_checker():
+                logger.info("任务模块内部工作流检测到停止请求，终止执行")
+                return True, "STOP_WORKFLOW"
 
             if current_card_id in executed_cards:
                 logger.warning(f"检测到循环执行，停止在卡片 {current_card_id}")
                 break
 
-            if current_card_id not in card_map:
+            card = plan.get(current_card_id)
+            if card is None:
                 logger.error(f"卡片 {current_card_id} 不存在")
                 break
 
-            card = card_map[current_card_id]
-            task_type = card.get('task_type', '未知')
-            card_params = card.get('parameters', {})
-
-            logger.info(f"执行模块内卡片 {current_card_id}: {task_type}")
+            logger.debug(f"执行模块内卡片 {current_card_id}: {card.task_type}")
             executed_cards.add(current_card_id)
 
-            # 检查任务类型是否存在
-            if task_type not in TASK_MODULES:
-                logger.error(f"未知的任务类型: {task_type}")
+            # 检查任务类型是否存在（编译时已解析）
+            if card.module is None:
+                logger.error(f"未知的任务类型: {card.task_type}")
                 return False, None
 
-            # 获取任务模块
-            task_module = TASK_MODULES[task_type]
-
             # 执行任务
             try:
-                # 准备执行参数，避免重复传递
-                exec_kwargs = kwargs.copy()
-                # 防止重复传递target_hwnd参数
-                if 'target_hwnd' in exec_kwargs:
-                    # 使用已有的target_hwnd
-                    pass
-                else:
-                    # 添加target_hwnd参数
-                    exec_kwargs['target_hwnd'] = target_hwnd
-
-                exec_kwargs['images_dir'] = images_dir
                 exec_kwargs['card_id'] = current_card_id  # 传递当前卡片ID
+                card_params = dict(card.params)
+                if card.call_style == CALL_EXECUTE_TASK:
+                    result = card.execute(card_params, counters, execution_mode, **exec_kwargs)
+                elif card.call_style == CALL_EXECUTE:
+                    result = card.execute(card_params, counters, execution_mode,
+                                          exec_kwargs.get('target_hwnd'), current_card_id,
+                                          get_image_data=None, stop_checker=stop_checker)
+                else:
+                    logger.error(f"任务模块 '{card.task_type}' 没有 execute_task 或 execute 方法")
+                    return False, None
+                success, message, next_card_id = result
 
-                success, message, next_card_id = task_module.execute_task(
-                    card_params,
-                    counters,
-                    execution_mode,
-                    **exec_kwargs
-                )
-
-                logger.info(f"卡片 {current_card_id} 执行结果: {success}, 消息: {message}, 下一步: {next_card_id}")
+                logger.debug(f"卡片 {current_card_id} 执行结果: {success}, 消息: {message}, 下一步: {next_card_id}")
 
-                # 处理执行结果和跳转逻辑
+                # 处理执行结果和跳转逻辑（动作码和后继卡片在编译时已确定）
                 if success:
-                    # 成功时的跳转逻辑
-                    success_action = card_params.get('on_success', '执行下一步')
-                    if success_action == '跳转到步骤' and 'success_jump_target_id' in card_params:
-                        current_card_id = card_params['success_jump_target_id']
-                        logger.info(f"成功跳转到步骤: {current_card_id}")
-                    elif success_action == '继续本步骤' or success_action == '继续执行本步骤':
+                    action = card.on_success
+                    if action == ACTION_JUMP and card.success_jump_target_id is not None:
+                        current_card_id = card.success_jump_target_id
+                        logger.debug(f"成功跳转到步骤: {current_card_id}")
+                    elif action == ACTION_REPEAT:
                         # 重复执行当前卡片，但从executed_cards中移除以允许重复
                         executed_cards.discard(current_card_id)
-                        logger.info(f"继续执行本步骤: {current_card_id}")
-                        # current_card_id 保持不变，继续循环
                         continue
-                    elif success_action == '停止任务' or success_action == '停止工作流':
+                    elif action == ACTION_STOP:
                         logger.info(f"成功完成，停止任务执行")
                         return True, "STOP_WORKFLOW"
-                    elif success_action == '执行下一步':
-                        if next_card_id is not None:
-                            current_card_id = next_card_id
-                        elif current_card_id in connection_map:
-                            current_card_id = connection_map[current_card_id]
-                        else:
-                            # 没有下一步，结束执行
-                            current_card_id = None
+                    elif next_card_id is not None and action == ACTION_NEXT:
+                        current_card_id = next_card_id
                     else:
-                        # 默认执行下一步
-                        if current_card_id in connection_map:
-                            current_card_id = connection_map[current_card_id]
-                        else:
-                            current_card_id = None
+                        current_card_id = card.success_next
                 else:
-                    # 失败时的跳转逻辑
-                    failure_action = card_params.get('on_failure', '执行下一步')
-                    if failure_action == '停止任务' or failure_action == '停止工作流':
+                    action = card.on_failure
+                    if action == ACTION_STOP:
                         logger.error(f"卡片 {current_card_id} 执行失败，停止任务执行")
                         return False, "STOP_WORKFLOW"
-                    elif failure_action == '跳转到步骤' and 'failure_jump_target_id' in card_params:
-                        current_card_id = card_params['failure_jump_target_id']
-                        logger.info(f"失败跳转到步骤: {current_card_id}")
-                    elif failure_action == '继续本步骤' or failure_action == '继续执行本步骤':
+                    elif action == ACTION_JUMP and card.failure_jump_target_id is not None:
+                        current_card_id = card.failure_jump_target_id
+                        logger.debug(f"失败跳转到步骤: {current_card_id}")
+                    elif action == ACTION_REPEAT:
                         # 重复执行当前卡片
                         executed_cards.discard(current_card_id)
-                        logger.info(f"失败后继续执行本步骤: {current_card_id}")
-                        # current_card_id 保持不变，继续循环
                         continue
-                    elif failure_action == '执行下一步':
-                        if current_card_id in connection_map:
-                            current_card_id = connection_map[current_card_id]
-                        else:
-                            current_card_id = None
                     else:
-                        # 默认执行下一步
-                        if current_card_id in connection_map:
-                            current_card_id = connection_map[current_card_id]
-                        else:
-                            current_card_id = None
+                        current_card_id = card.failure_next
 
             except Exception as e:
                 logger.error(f"执行卡片 {current_card_id} 时发生异常: {e}", exc_info=True)
                 return False, None
 
-        # 移除最大迭代次数检查
-
-        logger.info("模块内工作流执行完成")
+        logger.debug("模块内工作流执行完成")
         return True, None
 
     except Exception as e:
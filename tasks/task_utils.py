@@ -3,10 +3,12 @@
 任务工具模块 - 提供统一的延迟处理、跳转处理和参数定义
 """
 import logging
-import time
 import random
 from typing import Dict, Any, Tuple, Optional
 
+from utils.workflow_profiler import profiled, SPAN_SLEEP
+from utils.cancellation import wait_interruptibly
+
 logger = logging.getLogger(__name__)
 
 
@@ -34,17 +36,17 @@ def handle_next_step_delay(params: Dict[str, Any], stop_checker=None):
         logger.error(f"执行下一步延迟时发生错误: {e}")
 
 
-def interruptible_sleep(duration: float, stop_checker=None):
-    """可中断的睡眠函数"""
+@profiled(SPAN_SLEEP)
+def interruptible_sleep(duration: float, stop_checker=None) -> bool:
+    """可中断的睡眠函数，返回是否被停止请求中断"""
     if duration <= 0:
-        return
+        return False
     
-    start_time = time.time()
-    while time.time() - start_time < duration:
-        if stop_checker and stop_checker():
-            logger.info("延迟被中断")
-            break
-        time.sleep(0.1)
+    # 取消令牌上的 Event.wait，停止请求立即唤醒
+    if wait_interruptibly(duration, stop_checker):
+        logger.info("延迟被中断")
+        return True
+    return False
 
 
 def handle_success_action(params: Dict[str, Any], card_id: Optional[int], stop_checker=None) -> Tuple[bool, str, Optional[int]]:
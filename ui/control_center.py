@@ -35,11 +35,12 @@ class WindowTaskRunner(QThread):
     step_updated = Signal(str, str)    # window_id, step_info
     task_completed = Signal(str, bool) # window_id, success
 
-    def __init__(self, window_info, workflow_data, task_modules):
+    def __init__(self, window_info, workflow_data, task_modules, workflow_file=None):
         super().__init__()
         self.window_info = window_info
         self.workflow_data = workflow_data
         self.task_modules = task_modules
+        self.workflow_file = workflow_file  # 工作流文件路径（记录到检查点）
 
         # 状态管理
         self._current_state = TaskState.IDLE
@@ -189,7 +190,8 @@ class WindowTaskRunner(QThread):
                 target_window_title=window_title,
                 target_hwnd=window_hwnd,
                 execution_mode='background',  # 强制使用后台模式确保窗口隔离
-                start_card_id=start_card_id
+                start_card_id=start_card_id,
+                workflow_file=self.workflow_file
             )
 
             # 连接信号 - 使用Qt.QueuedConnection确保跨线程安全
@@ -891,9 +893,10 @@ class ControlCenterWindow(QMainWindow):
 
         # 获取工作流数据
         workflow_data = self.window_workflows[window_id]['data']
+        workflow_file = self.window_workflows[window_id].get('file_path')
 
         # 创建任务运行器
-        runner = WindowTaskRunner(window_info, workflow_data, self.task_modules)
+        runner = WindowTaskRunner(window_info, workflow_data, self.task_modules, workflow_file)
         runner.status_updated.connect(self.on_window_status_updated)
         runner.step_updated.connect(self.on_window_step_updated)
         runner.task_completed.connect(self.on_window_task_completed)
@@ -49,6 +49,7 @@ from .parameter_panel import ParameterPanel # <<< ADDED: Import parameter panel
 
 # Import the executor
 from task_workflow.executor import WorkflowExecutor
+from task_workflow.execution_backend import get_capture_settings
 
 # 导入通用窗口管理器
 from utils.universal_window_manager import get_universal_window_manager
@@ -298,6 +299,28 @@ class GlobalSettingsDialog(QDialog):
         resolution_layout.addRow("高度:", self.height_spinbox)
         main_layout.addWidget(resolution_group)
 
+        # --- Capture Group ---
+        capture_group = QGroupBox("截图")
+        capture_layout = QVBoxLayout(capture_group)
+        capture_layout.setContentsMargins(15, 10, 15, 10)
+        self.adb_capture_checkbox = QCheckBox("模拟器窗口使用ADB帧缓冲截图")
+        self.adb_capture_checkbox.setToolTip("MuMu/雷电 模拟器窗口直接读取设备画面，适用于GDI截图黑屏或画面不更新的情况")
+        self.adb_capture_checkbox.setChecked(bool(current_config.get('adb_framebuffer_capture', False)))
+        capture_layout.addWidget(self.adb_capture_checkbox)
+        main_layout.addWidget(capture_group)
+
+        # --- Process Sharding Group ---
+        sharding_group = QGroupBox("多窗口执行")
+        sharding_layout = QFormLayout(sharding_group)
+        sharding_layout.setContentsMargins(15, 10, 15, 10)
+        self.process_shards_spinbox = QSpinBox()
+        self.process_shards_spinbox.setRange(0, max(1, os.cpu_count() or 1))
+        self.process_shards_spinbox.setSpecialValueText("禁用")
+        self.process_shards_spinbox.setToolTip("多窗口时把窗口分配到多个工作进程执行，0 = 禁用（所有窗口在本进程中执行）")
+        self.process_shards_spinbox.setValue(int(current_config.get('process_shards', 0) or 0))
+        sharding_layout.addRow("工作进程数:", self.process_shards_spinbox)
+        main_layout.addWidget(sharding_group)
+
         # --- Dialog Buttons ---
         button_box = QDialogButtonBox()
         button_layout = QHBoxLayout()
@@ -2379,6 +2402,8 @@ class GlobalSettingsDialog(QDialog):
             'window_binding_mode': window_binding_mode,
             'bound_windows': self.get_bound_windows(),
             'multi_window_delay': self.multi_window_delay,
+            'adb_framebuffer_capture': self.adb_capture_checkbox.isChecked(),
+            'process_shards': self.process_shards_spinbox.value(),
             # 快捷键设置
             'start_task_hotkey': self.start_task_hotkey.text().strip() or 'F9',
             'stop_task_hotkey': self.stop_task_hotkey.text().strip() or 'F10',
@@ -2548,6 +2573,10 @@ class MainWindow(QMainWindow):
         self.window_binding_mode = self.config.get('window_binding_mode', 'single')
         self.bound_windows = self.config.get('bound_windows', [])
         self.multi_window_delay = self.config.get('multi_window_delay', 500)
+        self.process_shards = int(self.config.get('process_shards', 0) or 0)
+
+        # 截图设置
+        get_capture_settings().adb_framebuffer = bool(self.config.get('adb_framebuffer_capture', False))
 
         # 操作模式配置 - 默认使用自动检测
         self.operation_mode = 'auto'
@@ -2661,7 +2690,7 @@ class MainWindow(QMainWindow):
         
         # --- Custom Title Bar ---
         # Create the list of actions AFTER _create_actions has run
-        title_bar_actions = [self.toggle_action, self.save_action, self.load_action, self.new_workflow_action, self.run_action, self.debug_run_action, self.global_settings_action]
+        title_bar_actions = [self.toggle_action, self.save_action, self.load_action, self.new_workflow_action, self.run_action, self.debug_run_action, self.global_settings_action, self.profiler_action]
         self.title_bar = CustomTitleBar(self, actions=title_bar_actions)
         self.main_layout.addWidget(self.title_bar)
         self.title_bar.set_file_actions_visible(self.file_actions_visible)
@@ -2837,6 +2866,12 @@ class MainWindow(QMainWindow):
         self.global_settings_action.setToolTip("配置目标窗口、执行模式和自定义分辨率等全局选项")
         self.global_settings_action.triggered.connect(self.open_global_settings)
 
+        # --- Profiler Action ---
+        profiler_icon = style.standardIcon(QStyle.StandardPixmap.SP_FileDialogInfoView)
+        self.profiler_action = QAction(profiler_icon, "性能分析", self)
+        self.profiler_action.setToolTip("开关性能分析，查看最耗时的卡片并导出 Chrome trace")
+        self.profiler_action.triggered.connect(self.open_profiler_dialog)
+
 
 
 
@@ -3040,6 +3075,12 @@ class MainWindow(QMainWindow):
             logging.error(f"启动中控软件失败: {e}")
             QMessageBox.warning(self, "错误", f"启动中控软件失败: {e}")
 
+    def open_profiler_dialog(self):
+        """打开性能分析对话框"""
+        from .profiler_dialog import ProfilerDialog
+        dialog = ProfilerDialog(self)
+        dialog.exec()
+
     def open_global_settings(self):
         """打开全局设置对话框"""
         try:
@@ -3064,6 +3105,10 @@ class MainWindow(QMainWindow):
                 self.window_binding_mode = settings.get('window_binding_mode', 'single')
                 self.bound_windows = settings.get('bound_windows', [])
                 self.multi_window_delay = settings.get('multi_window_delay', 500)
+                self.process_shards = int(settings.get('process_shards', 0) or 0)
+                if getattr(self, 'multi_executor', None) is not None:
+                    self.multi_executor.set_process_sharding(self.process_shards)
+                get_capture_settings().adb_framebuffer = bool(settings.get('adb_framebuffer_capture', False))
 
                 logger.info(f"更新后 MainWindow.bound_windows: {len(self.bound_windows)} 个")
 
@@ -3575,7 +3620,8 @@ class MainWindow(QMainWindow):
                     execution_mode=self.current_execution_mode, # <<< 确保参数名是 execution_mode
                     start_card_id=start_card_id, # <<< 将找到的 start_card_id 传递进去
                     images_dir=self.images_dir,   # <<< ADDED: Pass images_dir
-                    target_hwnd=target_hwnd       # 工具 修复：传递目标窗口句柄
+                    target_hwnd=target_hwnd,      # 工具 修复：传递目标窗口句柄
+                    workflow_file=self.current_save_path  # 记录到检查点，供恢复使用
                 )
                 logging.debug("run_workflow: WorkflowExecutor created successfully.")
             except Exception as exec_init_e:
@@ -6058,6 +6104,8 @@ class MainWindow(QMainWindow):
         # 保存工作流（如果需要）
         if not self._save_before_execution():
             return
+        # 工作流文件路径随数据传给各窗口的执行器（记录到检查点）
+        workflow_data['workflow_file'] = self.current_save_path
 
         # 多窗口模式强制使用后台模式
         if self.current_execution_mode != 'background':
@@ -6096,6 +6144,7 @@ class MainWindow(QMainWindow):
             from .unified_multi_window_executor import UnifiedMultiWindowExecutor
             logger.info("启动 创建新的多窗口执行器...")
             self.multi_executor = UnifiedMultiWindowExecutor(self)
+            self.multi_executor.set_process_sharding(self.process_shards)
 
             # 工具 关键修复：添加所有窗口（包括禁用的），正确传递enabled状态
             successfully_added = 0
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能分析对话框
+开关工作流性能分析，显示最耗时的N个卡片，并导出 Chrome trace
+"""
+
+import logging
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
+                               QTableWidget, QTableWidgetItem, QHeaderView,
+                               QLabel, QCheckBox, QSpinBox, QFileDialog)
+from PySide6.QtCore import Qt, QTimer
+
+from utils.workflow_profiler import get_workflow_profiler
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilerDialog(QDialog):
+    """
+    性能分析对话框
+
+    表格格式：卡片ID | 任务类型 | 次数 | 平均ms | P95ms | 总计ms | 主要子区间
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.profiler = get_workflow_profiler()
+
+        self._init_ui()
+        self._refresh()
+
+        # 打开期间每秒刷新一次
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.timeout.connect(self._refresh)
+        self._refresh_timer.start(1000)
+
+    def _init_ui(self):
+        """初始化UI"""
+        self.setWindowTitle("性能分析")
+        self.setMinimumSize(820, 420)
+
+        layout = QVBoxLayout(self)
+        layout.setSpacing(10)
+        layout.setContentsMargins(15, 15, 15, 15)
+
+        # 开关和显示数量
+        top_layout = QHBoxLayout()
+        self.enable_checkbox = QCheckBox("记录性能数据")
+        self.enable_checkbox.setChecked(self.profiler.enabled)
+        self.enable_checkbox.toggled.connect(self._on_toggled)
+        top_layout.addWidget(self.enable_checkbox)
+        top_layout.addStretch()
+        top_layout.addWidget(QLabel("显示最耗时的"))
+        self.top_n_spin = QSpinBox()
+        self.top_n_spin.setRange(1, 100)
+        self.top_n_spin.setValue(10)
+        self.top_n_spin.valueChanged.connect(self._refresh)
+        top_layout.addWidget(self.top_n_spin)
+        top_layout.addWidget(QLabel("个卡片"))
+        layout.addLayout(top_layout)
+
+        info_label = QLabel("开启后每个窗口的工作流结束时会自动导出 Chrome trace 到 profiles 目录（可用 chrome://tracing 打开）")
+        info_label.setStyleSheet("color: #666666; font-size: 10pt; padding: 5px;")
+        layout.addWidget(info_label)
+
+        # 统计表格
+        self.table = QTableWidget()
+        self.table.setColumnCount(7)
+        self.table.setHorizontalHeaderLabels(["卡片ID", "任务类型", "次数", "平均ms", "P95ms", "总计ms", "主要子区间(平均ms)"])
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(6, QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setAlternatingRowColors(True)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        # 底部按钮
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+
+        reset_button = QPushButton("清空")
+        reset_button.clicked.connect(self._on_reset)
+        button_layout.addWidget(reset_button)
+
+        export_button = QPushButton("导出 Chrome trace")
+        export_button.clicked.connect(self._on_export)
+        button_layout.addWidget(export_button)
+
+        close_button = QPushButton("关闭")
+        close_button.clicked.connect(self.accept)
+        button_layout.addWidget(close_button)
+
+        layout.addLayout(button_layout)
+
+    def _refresh(self):
+        """刷新最耗时卡片表"""
+        rows = self.profiler.top_cards(self.top_n_spin.value())
+        self.table.setRowCount(len(rows))
+        for row_index, row in enumerate(rows):
+            stages = sorted(row['stages'].items(), key=lambda item: item[1]['total_ms'], reverse=True)[:4]
+            values = [
+                str(row['card_id']),
+                str(row['task_type']),
+                str(row['count']),
+                f"{row['mean_ms']:.2f}",
+                f"{row['p95_ms']:.2f}",
+                f"{row['total_ms']:.1f}",
+                ', '.join(f"{name}={stats['mean_ms']:.1f}" for name, stats in stages),
+            ]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if 2 <= column <= 5:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.table.setItem(row_index, column, item)
+
+    def _on_toggled(self, checked: bool):
+        self.profiler.set_enabled(checked)
+        self._refresh()
+
+    def _on_reset(self):
+        self.profiler.reset()
+        self._refresh()
+
+    def _on_export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "导出 Chrome trace", "profile.json", "JSON 文件 (*.json)")
+        if path:
+            self.profiler.export_chrome_trace(path)
+
+    def done(self, result):
+        self._refresh_timer.stop()
+        super().done(result)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+调度设置对话框
+为每个任务配置调度执行模式下的优先级和触发方式
+"""
+
+import logging
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
+                               QTableWidget, QComboBox, QHeaderView, QLabel,
+                               QMessageBox, QSpinBox, QLineEdit)
+from PySide6.QtCore import Signal
+
+from task_workflow.workflow_scheduler import IntervalTrigger, DailyTrigger
+from .workflow_task_manager import WorkflowTaskManager
+
+logger = logging.getLogger(__name__)
+
+# 触发方式
+TRIGGER_ONCE = "立即运行一次"
+TRIGGER_INTERVAL = "固定间隔"
+TRIGGER_DAILY = "每日定时"
+
+
+class ScheduleSettingsDialog(QDialog):
+    """
+    调度设置对话框
+
+    显示当前所有任务的调度配置表格
+    格式：任务 | 优先级 | 触发方式 | 间隔(秒) | 每日时刻
+    """
+
+    settings_changed = Signal()  # 设置修改信号
+
+    def __init__(self, task_manager: WorkflowTaskManager, parent=None):
+        """
+        初始化对话框
+
+        Args:
+            task_manager: 任务管理器
+            parent: 父窗口
+        """
+        super().__init__(parent)
+
+        self.task_manager = task_manager
+
+        self._init_ui()
+        self._load_settings()
+
+    def _init_ui(self):
+        """初始化UI"""
+        self.setWindowTitle("调度设置")
+        self.setMinimumSize(820, 400)
+
+        layout = QVBoxLayout(self)
+        layout.setSpacing(10)
+        layout.setContentsMargins(15, 15, 15, 15)
+
+        # 说明文字
+        info_label = QLabel("调度执行模式下生效：优先级数值越大越先运行；每日时刻用逗号分隔，如 08:00,20:30")
+        info_label.setStyleSheet("color: #666666; font-size: 10pt; padding: 5px;")
+        layout.addWidget(info_label)
+
+        # 调度设置表格
+        self.table = QTableWidget()
+        self.table.setColumnCount(5)
+        self.table.setHorizontalHeaderLabels(["任务", "优先级", "触发方式", "间隔(秒)", "每日时刻"])
+
+        header = self.table.horizontalHeader()
+        column_widths = [200, 100, 150, 120, 200]  # 各列宽度
+        for i, width in enumerate(column_widths):
+            header.setSectionResizeMode(i, QHeaderView.ResizeMode.Fixed)
+            self.table.setColumnWidth(i, width)
+
+        self.table.verticalHeader().setVisible(False)
+        self.table.setAlternatingRowColors(True)
+
+        layout.addWidget(self.table)
+
+        # 底部按钮
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+
+        self.apply_button = QPushButton("应用")
+        self.apply_button.setMinimumWidth(80)
+        self.apply_button.clicked.connect(self._on_apply)
+
+        self.close_button = QPushButton("关闭")
+        self.close_button.setMinimumWidth(80)
+        self.close_button.clicked.connect(self.accept)
+
+        button_layout.addWidget(self.apply_button)
+        button_layout.addWidget(self.close_button)
+
+        layout.addLayout(button_layout)
+
+    def _load_settings(self):
+        """加载当前调度设置"""
+        tasks = self.task_manager.get_all_tasks()
+        self.table.setRowCount(len(tasks))
+
+        for row, task in enumerate(tasks):
+            # 任务名称（使用禁用的ComboBox确保样式一致）
+            name_combo = QComboBox()
+            name_combo.addItem(task.name)
+            name_combo.setEnabled(False)  # 禁用，仅显示
+            self.table.setCellWidget(row, 0, name_combo)
+
+            priority_spin = QSpinBox()
+            priority_spin.setRange(-100, 100)
+            priority_spin.setValue(getattr(task, 'priority', 0))
+            self.table.setCellWidget(row, 1, priority_spin)
+
+            trigger = getattr(task, 'schedule_trigger', None)
+            trigger_combo = QComboBox()
+            trigger_combo.addItems([TRIGGER_ONCE, TRIGGER_INTERVAL, TRIGGER_DAILY])
+            self.table.setCellWidget(row, 2, trigger_combo)
+
+            interval_spin = QSpinBox()
+            interval_spin.setRange(1, 86400)
+            interval_spin.setValue(60)
+            self.table.setCellWidget(row, 3, interval_spin)
+
+            daily_edit = QLineEdit()
+            daily_edit.setPlaceholderText("08:00,20:30")
+            self.table.setCellWidget(row, 4, daily_edit)
+
+            if isinstance(trigger, IntervalTrigger):
+                trigger_combo.setCurrentText(TRIGGER_INTERVAL)
+                interval_spin.setValue(max(1, int(trigger.seconds)))
+            elif isinstance(trigger, DailyTrigger):
+                trigger_combo.setCurrentText(TRIGGER_DAILY)
+                daily_edit.setText(",".join(t.strftime('%H:%M') if not t.second else t.strftime('%H:%M:%S')
+                                            for t in trigger.times))
+
+            trigger_combo.currentTextChanged.connect(
+                lambda text, spin=interval_spin, edit=daily_edit: self._update_row_state(text, spin, edit))
+            self._update_row_state(trigger_combo.currentText(), interval_spin, daily_edit)
+
+    @staticmethod
+    def _update_row_state(trigger_text: str, interval_spin: QSpinBox, daily_edit: QLineEdit):
+        """只启用当前触发方式需要的输入框"""
+        interval_spin.setEnabled(trigger_text == TRIGGER_INTERVAL)
+        daily_edit.setEnabled(trigger_text == TRIGGER_DAILY)
+
+    def _on_apply(self):
+        """应用调度设置"""
+        tasks = self.task_manager.get_all_tasks()
+
+        # 先全部解析，任何一行有误都不修改任务
+        settings = []
+        for row, task in enumerate(tasks):
+            priority = self.table.cellWidget(row, 1).value()
+            trigger_text = self.table.cellWidget(row, 2).currentText()
+            trigger = None
+            if trigger_text == TRIGGER_INTERVAL:
+                try:
+                    trigger = IntervalTrigger(self.table.cellWidget(row, 3).value())
+                except ValueError as e:
+                    QMessageBox.warning(self, "错误", f"任务 '{task.name}' 的触发间隔无效: {e}")
+                    return
+            elif trigger_text == TRIGGER_DAILY:
+                times = [text.strip() for text in self.table.cellWidget(row, 4).text().replace('，', ',').split(',')
+                         if text.strip()]
+                try:
+                    trigger = DailyTrigger(times)
+                except ValueError as e:
+                    QMessageBox.warning(self, "错误", f"任务 '{task.name}' 的每日时刻无效: {e}")
+                    return
+            settings.append((task, priority, trigger))
+
+        for task, priority, trigger in settings:
+            task.priority = priority
+            task.schedule_trigger = trigger
+
+        logger.info("调度设置已应用")
+        self.settings_changed.emit()
+
+        QMessageBox.information(self, "成功", "调度设置已保存，下次调度执行时生效")
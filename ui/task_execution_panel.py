@@ -53,8 +53,11 @@ class TaskExecutionPanel(QWidget):
         current_mode = self.task_manager.execution_mode
         if current_mode == 'async':
             self.mode_combo.setCurrentIndex(1)  # 异步执行
+        elif current_mode == 'scheduled':
+            self.mode_combo.setCurrentIndex(2)  # 调度执行
         else:
             self.mode_combo.setCurrentIndex(0)  # 同步执行
+        self.schedule_settings_button.setEnabled(self.mode_combo.currentData() == 'scheduled')
 
     def _init_ui(self):
         """初始化UI"""
@@ -109,6 +112,8 @@ class TaskExecutionPanel(QWidget):
         self.mode_combo = QComboBox()
         self.mode_combo.addItem("同步执行", "sync")
         self.mode_combo.addItem("异步执行", "async")
+        self.mode_combo.addItem("调度执行", "scheduled")
+        self.mode_combo.setItemData(2, "按优先级在有限的工作线程上运行，同一窗口互斥，OCR/截图资源限流", Qt.ItemDataRole.ToolTipRole)
         self.mode_combo.setMinimumHeight(24)
         self.mode_combo.setMinimumWidth(100)
 
@@ -125,6 +130,13 @@ class TaskExecutionPanel(QWidget):
         self.jump_rules_button.setToolTip("配置任务间的跳转规则")
         main_layout.addWidget(self.jump_rules_button)
 
+        # === 调度设置按钮（调度执行模式下可用） ===
+        self.schedule_settings_button = QPushButton("调度设置")
+        self.schedule_settings_button.setMinimumHeight(26)
+        self.schedule_settings_button.setMinimumWidth(80)
+        self.schedule_settings_button.setToolTip("配置调度执行模式下各任务的优先级和触发方式")
+        main_layout.addWidget(self.schedule_settings_button)
+
         # 弹性空间
         main_layout.addStretch()
 
@@ -153,6 +165,9 @@ class TaskExecutionPanel(QWidget):
         # 跳转规则按钮
         self.jump_rules_button.clicked.connect(self._on_jump_rules_clicked)
 
+        # 调度设置按钮
+        self.schedule_settings_button.clicked.connect(self._on_schedule_settings_clicked)
+
         # 任务管理器信号
         self.task_manager.task_added.connect(self._update_ui_state)
         self.task_manager.task_removed.connect(self._update_ui_state)
@@ -163,6 +178,7 @@ class TaskExecutionPanel(QWidget):
         """执行模式变化"""
         mode = self.mode_combo.currentData()
         self.task_manager.set_execution_mode(mode)
+        self.schedule_settings_button.setEnabled(mode == 'scheduled')
 
         # 保存到配置文件
         self.task_manager.config['task_execution_mode'] = mode
@@ -178,6 +194,13 @@ class TaskExecutionPanel(QWidget):
         dialog = JumpRulesDialog(self.task_manager, self)
         dialog.exec()
 
+    def _on_schedule_settings_clicked(self):
+        """打开调度设置对话框"""
+        from .schedule_settings_dialog import ScheduleSettingsDialog
+
+        dialog = ScheduleSettingsDialog(self.task_manager, self)
+        dialog.exec()
+
     def _update_ui_state(self, *args):
         """更新UI状态"""
         # 获取任务统计
@@ -142,8 +142,11 @@ class SynchronizationConfig:
 class AsyncResourceManager:
     """现代异步资源管理器"""
 
-    def __init__(self, max_concurrent_windows: int = 10, max_ocr_concurrent: int = 3):
-        # 异步信号量控制
+    def __init__(self, max_concurrent_windows: int = 10, max_ocr_concurrent: Optional[int] = None):
+        # 异步信号量控制（OCR 上限默认与进程级重量级操作准入门一致）
+        if max_ocr_concurrent is None:
+            from utils.heavy_op_admission import get_heavy_op_gate, OP_OCR
+            max_ocr_concurrent = get_heavy_op_gate().get_stats()[OP_OCR]['limit']
         self.window_semaphore = asyncio.Semaphore(max_concurrent_windows)
         self.ocr_semaphore = asyncio.Semaphore(max_ocr_concurrent)
         self.network_semaphore = asyncio.Semaphore(5)
@@ -773,6 +776,10 @@ class UnifiedMultiWindowExecutor(QObject):
         self._execution_futures = []
         self._main_lock = threading.RLock()
 
+        # 多进程分片执行（0 = 禁用，窗口在本进程线程中执行）
+        self.process_shards = 0
+        self._sharded_executor = None
+
         # 注册消息处理器
         self._setup_message_handlers()
 
@@ -799,6 +806,23 @@ class UnifiedMultiWindowExecutor(QObject):
         strategy_name = "一个完成就停止所有" if auto_stop_on_first else "等待所有窗口完成"
         logger.info(f"多窗口完成策略已设置为: {strategy_name}")
 
+    def set_process_sharding(self, shard_count: int = 0):
+        """
+        设置多进程分片执行
+
+        Args:
+            shard_count: 工作进程数，0 = 禁用（窗口在本进程线程中执行）
+        """
+        if self.is_running:
+            logger.warning("执行中无法修改分片设置")
+            return False
+        if self._sharded_executor is not None and self._sharded_executor.num_shards != shard_count:
+            self._sharded_executor.shutdown()
+            self._sharded_executor = None
+        self.process_shards = max(0, int(shard_count))
+        logger.info(f"多进程分片执行已{'启用，工作进程数: ' + str(self.process_shards) if self.process_shards else '禁用'}")
+        return True
+
     def _setup_message_handlers(self):
         """设置消息处理器"""
         self.communication_hub.register_handler("window_progress", self._handle_window_progress)
@@ -902,6 +926,10 @@ class UnifiedMultiWindowExecutor(QObject):
 
         logger.info(f"策略选择: 总窗口数={total_windows}, 启用窗口数={window_count}, 模式={mode.value}")
 
+        # 启用多进程分片时，多窗口分配到工作进程执行
+        if self.process_shards > 0 and window_count > 1:
+            return "process_sharded"
+
         # 如果有多个绑定窗口，强制使用并行模式
         if total_windows > 1:
             logger.info(f"检测到{total_windows}个绑定窗口，强制使用并行模式")
@@ -1050,6 +1078,8 @@ class UnifiedMultiWindowExecutor(QObject):
                     success = self._execute_batch_processing(enabled_windows, workflow_data, delay_ms)
                 elif strategy == "synchronized_execution":
                     success = self._execute_synchronized(enabled_windows, workflow_data, delay_ms)
+                elif strategy == "process_sharded":
+                    success = self._execute_process_sharded(enabled_windows, workflow_data, delay_ms)
                 else:
                     logger.error(f"未知的执行策略: {strategy}")
                     success = False
@@ -1340,6 +1370,108 @@ class UnifiedMultiWindowExecutor(QObject):
             logger.error(f"简单并行执行失败: {e}", exc_info=True)
             return False
 
+    def _execute_process_sharded(self, windows: List[WindowExecutionState], workflow_data: dict, delay_ms: int) -> bool:
+        """多进程分片执行：窗口分配到工作进程，状态事件通过管道回传"""
+        try:
+            from task_workflow.sharded_executor import ShardedWindowExecutor
+
+            cards_data, start_card_id = self._extract_workflow_cards(workflow_data)
+            if start_card_id is None:
+                return False
+
+            if self._sharded_executor is None:
+                self._sharded_executor = ShardedWindowExecutor(self.process_shards, on_event=self._on_sharded_event)
+            self._sharded_executor.clear_finished()
+            logger.info(f"开始多进程分片执行，窗口数: {len(windows)}，工作进程数: {self._sharded_executor.num_shards}")
+
+            connections_data = workflow_data.get('connections', [])
+            images_dir = workflow_data.get('images_dir', None)
+            for i, window in enumerate(windows):
+                window_key = f"{window.title}_{window.hwnd}"
+                window.status = TaskStatus.RUNNING
+                window.start_time = time.time()
+                window_delay = delay_ms + (i * 100)  # 每个窗口间隔100ms
+                shard_index = self._sharded_executor.start_window(
+                    window_key, window.hwnd, cards_data, connections_data, start_card_id,
+                    title=window.title, execution_mode="background", images_dir=images_dir,
+                    start_delay=window_delay / 1000.0,
+                )
+                logger.info(f"窗口{i+1} {window.title} 已分配到分片 {shard_index}, 延迟: {window_delay}ms")
+            return True
+
+        except Exception as e:
+            logger.error(f"多进程分片执行失败: {e}", exc_info=True)
+            return False
+
+    def _on_sharded_event(self, event: tuple):
+        """处理分片事件（在事件读取线程中调用，信号跨线程排队到界面线程）"""
+        from task_workflow.sharded_executor import EVT_CARD, EVT_CARD_DONE, EVT_ERROR, EVT_FINISHED
+
+        kind, window_key = event[0], event[1]
+        if kind == EVT_CARD:
+            self.card_executing.emit(event[2])
+        elif kind == EVT_CARD_DONE:
+            self.card_finished.emit(event[2], event[3])
+        elif kind == EVT_ERROR:
+            self.error_occurred.emit(event[2], event[3])
+        elif kind == EVT_FINISHED:
+            _, _, success, message, cards_done = event
+            with self._main_lock:
+                window = self.windows.get(window_key)
+                if window is not None:
+                    window.execution_completed = True
+                    window.status = TaskStatus.COMPLETED if success else TaskStatus.FAILED
+                    window.end_time = time.time()
+                logger.info(f"分片窗口执行完成: {window_key} - {message} (已执行卡片: {cards_done})")
+
+                if not self.is_running:
+                    return
+                if self._sharded_executor.all_finished():
+                    logger.info("所有分片窗口执行完成")
+                    self.is_running = False
+                    self._finalize_execution()
+                    self.execution_completed.emit(True, "所有窗口执行完成")
+                elif self.auto_stop_on_first_completion:
+                    logger.warning("检测到一个完成就停止配置，自动停止所有分片窗口")
+                    self._sharded_executor.stop_all()
+
+    def _extract_workflow_cards(self, workflow_data: dict):
+        """把工作流卡片转换为字典格式并查找起始卡片，返回 (cards_data, start_card_id)"""
+        cards_data_raw = workflow_data.get('cards', {})
+
+        # 工具 关键修复：转换cards_data格式并查找起始卡片ID
+        start_card_id = None
+        cards_data = {}  # WorkflowExecutor期望字典格式
+
+        if isinstance(cards_data_raw, list):
+            # cards_data是列表格式，转换为字典格式
+            logger.debug(f"转换列表格式cards_data，共{len(cards_data_raw)}个卡片")
+            for card in cards_data_raw:
+                card_id = card.get('id')
+                if card_id is not None:
+                    cards_data[card_id] = card
+                    if card.get('task_type') == '起点':
+                        start_card_id = card_id
+                        logger.debug(f"找到起点卡片: ID={card_id}, 类型={card.get('task_type')}")
+        elif isinstance(cards_data_raw, dict):
+            # cards_data已经是字典格式
+            logger.debug(f"使用字典格式cards_data，共{len(cards_data_raw)}个卡片")
+            cards_data = cards_data_raw
+            for card_id, card in cards_data.items():
+                if card.get('task_type') == '起点':
+                    start_card_id = card_id
+                    break
+
+        if start_card_id is None:
+            logger.error(f"未找到起始卡片，原始数据类型: {type(cards_data_raw)}")
+            if isinstance(cards_data_raw, list) and len(cards_data_raw) > 0:
+                logger.debug(f"第一个卡片示例: {cards_data_raw[0]}")
+            logger.debug(f"转换后cards_data: {list(cards_data.keys())}")
+        else:
+            logger.info(f"找到起始卡片ID: {start_card_id}，转换后cards_data包含{len(cards_data)}个卡片")
+
+        return cards_data, start_card_id
+
     async def _execute_parallel_async(self, windows: List[WindowExecutionState], workflow_data: dict, delay_ms: int) -> bool:
         """异步并行执行"""
         try:
@@ -1874,44 +2006,15 @@ class UnifiedMultiWindowExecutor(QObject):
 
             # 创建执行器实例
             # 从workflow_data中提取必要的参数
-            cards_data_raw = workflow_data.get('cards', {})
             connections_data = workflow_data.get('connections', [])
             task_modules = workflow_data.get('task_modules', {})
             target_window_title = window.title
             images_dir = workflow_data.get('images_dir', None)
 
-            # 工具 关键修复：转换cards_data格式并查找起始卡片ID
-            start_card_id = None
-            cards_data = {}  # WorkflowExecutor期望字典格式
-
-            if isinstance(cards_data_raw, list):
-                # cards_data是列表格式，转换为字典格式
-                logger.debug(f"转换列表格式cards_data，共{len(cards_data_raw)}个卡片")
-                for card in cards_data_raw:
-                    card_id = card.get('id')
-                    if card_id is not None:
-                        cards_data[card_id] = card
-                        if card.get('task_type') == '起点':
-                            start_card_id = card_id
-                            logger.debug(f"找到起点卡片: ID={card_id}, 类型={card.get('task_type')}")
-            elif isinstance(cards_data_raw, dict):
-                # cards_data已经是字典格式
-                logger.debug(f"使用字典格式cards_data，共{len(cards_data_raw)}个卡片")
-                cards_data = cards_data_raw
-                for card_id, card in cards_data.items():
-                    if card.get('task_type') == '起点':
-                        start_card_id = card_id
-                        break
-
+            cards_data, start_card_id = self._extract_workflow_cards(workflow_data)
             if start_card_id is None:
-                logger.error(f"未找到起始卡片，原始数据类型: {type(cards_data_raw)}")
-                if isinstance(cards_data_raw, list) and len(cards_data_raw) > 0:
-                    logger.debug(f"第一个卡片示例: {cards_data_raw[0]}")
-                logger.debug(f"转换后cards_data: {list(cards_data.keys())}")
                 return None
 
-            logger.info(f"找到起始卡片ID: {start_card_id}，转换后cards_data包含{len(cards_data)}个卡片")
-
             executor = WorkflowExecutor(
                 cards_data=cards_data,
                 connections_data=connections_data,
@@ -1921,6 +2024,7 @@ class UnifiedMultiWindowExecutor(QObject):
                 start_card_id=start_card_id,  # 工具 添加起始卡片ID
                 target_hwnd=window.hwnd,
                 images_dir=images_dir,
+                workflow_file=workflow_data.get('workflow_file'),
                 parent=self
             )
 
@@ -1967,6 +2071,13 @@ class UnifiedMultiWindowExecutor(QObject):
     def stop_all(self):
         """停止所有执行 - 增强版本"""
         try:
+            # 多进程分片执行：通过命令管道停止，工作进程结束后由事件触发完成信号
+            if self._sharded_executor is not None and not self._sharded_executor.all_finished():
+                logger.info("停止所有分片窗口")
+                self._stop_requested = True
+                self._sharded_executor.stop_all()
+                return
+
             # 使用增强停止管理器（如果可用）
             if hasattr(self, 'stop_integration') and self.stop_integration:
                 logger.info("使用增强停止管理器停止所有窗口")
@@ -2154,6 +2265,11 @@ class UnifiedMultiWindowExecutor(QObject):
             logger.error(f"异步停止失败: {e}", exc_info=True)
             return False
 
+    def get_heavy_operation_stats(self) -> Dict[str, Any]:
+        """重量级操作（OCR/匹配/K-means/截图）的准入统计，含各窗口的等待时间"""
+        from utils.heavy_op_admission import get_heavy_op_gate
+        return get_heavy_op_gate().get_stats()
+
     async def get_async_performance_stats(self) -> Dict[str, Any]:
         """获取异步性能统计"""
         try:
@@ -2163,6 +2279,7 @@ class UnifiedMultiWindowExecutor(QObject):
             return {
                 'performance': performance_stats,
                 'resources': resource_stats,
+                'heavy_operations': self.get_heavy_operation_stats(),
                 'async_tasks': {
                     'total': len(self._async_tasks),
                     'running': sum(1 for task in self._async_tasks.values() if not task.done()),
@@ -2194,6 +2311,9 @@ class UnifiedMultiWindowExecutor(QObject):
             # 清理同步资源
             self.sync_manager.cleanup()
             self.thread_pool.shutdown()
+            if self._sharded_executor is not None:
+                self._sharded_executor.shutdown()
+                self._sharded_executor = None
             self.communication_hub.cleanup()
 
             # 清理异步资源（同步方式）
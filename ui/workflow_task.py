@@ -11,15 +11,26 @@ from typing import Dict, Any, Optional
 from PySide6.QtCore import QObject, Signal, QThread
 
 from task_workflow.executor import WorkflowExecutor
+from task_workflow.headless_executor import ExecutionListener
 
 logger = logging.getLogger(__name__)
 
 
+class _TaskProgressListener(ExecutionListener):
+    """调度执行时把步骤详情转发为任务的进度信号"""
+
+    def __init__(self, task: 'WorkflowTask'):
+        self._task = task
+
+    def step_details(self, details: str):
+        self._task.progress_updated.emit(details)
+
+
 class WorkflowTask(QObject):
     """单个工作流任务"""
 
     # 信号定义
-    status_changed = Signal(str)  # status: 'idle', 'running', 'completed', 'failed', 'stopped'
+    status_changed = Signal(str)  # status: 'idle', 'queued', 'running', 'completed', 'failed', 'stopped'
     progress_updated = Signal(str)  # progress_message
     execution_finished = Signal(bool, str, str)  # success, message, stop_reason ('success', 'failed', 'no_next')
 
@@ -58,6 +69,11 @@ class WorkflowTask(QObject):
         self.executor: Optional[WorkflowExecutor] = None
         self.executor_thread: Optional[QThread] = None
 
+        # 调度执行配置（调度模式下使用）
+        self.priority = 0  # 优先级，数值越大越先运行
+        self.schedule_trigger = None  # 触发器（IntervalTrigger / DailyTrigger），None 表示立即运行一次
+        self._scheduled_job_id: Optional[int] = None
+
         # 执行配置（继承全局配置）
         self.execution_mode = config.get('execution_mode', 'foreground')
         self.target_hwnd = None
@@ -92,7 +108,7 @@ class WorkflowTask(QObject):
 
     def can_stop(self) -> bool:
         """检查是否可以停止"""
-        return self.status == 'running'
+        return self.status in ['running', 'queued']
 
     def execute_sync(self) -> bool:
         """
@@ -247,14 +263,76 @@ class WorkflowTask(QObject):
 
         logger.info(f"请求停止任务: {self.name}")
 
+        if self._scheduled_job_id is not None:
+            from task_workflow.workflow_scheduler import get_workflow_scheduler
+            get_workflow_scheduler().cancel(self._scheduled_job_id)
+            self._scheduled_job_id = None
+
         if self.executor:
             self.executor.request_stop()
 
         self.status = 'stopped'
         self.stop_reason = 'stopped'  # 用户手动停止
 
-    def _create_executor(self):
-        """创建工作流执行器"""
+    def execute_scheduled(self, scheduler=None) -> Optional[int]:
+        """
+        提交到工作流调度器执行（由调度器按优先级、窗口互斥和资源限制决定何时运行）
+
+        Returns:
+            调度作业ID，提交失败时返回 None
+        """
+        if not self.can_execute():
+            logger.warning(f"任务 '{self.name}' 当前状态 '{self.status}' 不允许执行")
+            return None
+
+        from task_workflow.workflow_scheduler import (
+            ScheduledJob, estimate_workflow_resources, get_workflow_scheduler, make_workflow_runner, workflow_has_loop
+        )
+        scheduler = scheduler or get_workflow_scheduler()
+
+        try:
+            cards_dict, connections_list, start_card_id = self._build_execution_data()
+        except Exception as e:
+            logger.error(f"任务 '{self.name}' 提交调度失败: {e}", exc_info=True)
+            self.status = 'failed'
+            self.stop_reason = 'failed'
+            self.execution_finished.emit(False, f"任务 '{self.name}' 提交调度失败: {e}", 'failed')
+            return None
+
+        job = ScheduledJob(
+            name=self.name,
+            run=make_workflow_runner(cards_dict, connections_list, start_card_id, self.target_hwnd,
+                                     self.execution_mode, self.target_window_title,
+                                     listener=_TaskProgressListener(self), workflow_file=self.filepath),
+            priority=self.priority,
+            hwnd=self.target_hwnd,
+            resources=estimate_workflow_resources(cards_dict),
+            trigger=self.schedule_trigger,
+            long_running=workflow_has_loop(cards_dict, connections_list),
+            on_started=lambda _job: setattr(self, 'status', 'running'),
+            on_finished=lambda _job, success, message: self._on_scheduled_execution_finished(success, message),
+        )
+        self.status = 'queued'
+        self._scheduled_job_id = scheduler.submit(job)
+        logger.info(f"任务 '{self.name}' 已提交调度 (作业ID={self._scheduled_job_id}, 优先级={self.priority})")
+        return self._scheduled_job_id
+
+    def _on_scheduled_execution_finished(self, success: bool, message: str):
+        """调度执行完成回调（在调度器工作线程中调用，信号跨线程排队投递）"""
+        if self.status == 'stopped':
+            return
+        if self.schedule_trigger is not None and self._scheduled_job_id is not None:
+            # 周期任务：记录本次结果后直接回到等待下一次触发，不经过 completed/failed，
+            # 避免状态来回跳变，也不触发任务完成后的跳转规则
+            self.stop_reason = self._detect_stop_reason(success, message)
+            self.progress_updated.emit(f"本次运行{'完成' if success else '失败'}: {message}，等待下一次触发")
+            self.status = 'queued'
+            return
+        self._scheduled_job_id = None
+        self._on_async_execution_finished(message, success)
+
+    def _build_execution_data(self):
+        """转换工作流数据，返回 (卡片字典, 连接列表, 起始卡片ID)"""
         # 转换数据格式
         cards_dict = {}
         for card in self.workflow_data.get('cards', []):
@@ -285,6 +363,12 @@ class WorkflowTask(QObject):
         if start_card_id is None:
             raise ValueError(f"任务 '{self.name}' 找不到起始卡片")
 
+        return cards_dict, connections_list, start_card_id
+
+    def _create_executor(self):
+        """创建工作流执行器"""
+        cards_dict, connections_list, start_card_id = self._build_execution_data()
+
         # 创建执行器
         self.executor = WorkflowExecutor(
             cards_data=cards_dict,
@@ -295,6 +379,7 @@ class WorkflowTask(QObject):
             execution_mode=self.execution_mode,
             start_card_id=start_card_id,
             images_dir=self.images_dir,
+            workflow_file=self.filepath,
             parent=None  # 🔧 修复：不设置parent，避免moveToThread错误
         )
 
@@ -315,10 +400,10 @@ class WorkflowTask(QObject):
         self.executor = None
         self.executor_thread = None
 
-    def _on_async_execution_finished(self, message: str):
-        """异步执行完成回调"""
-        # 判断是否成功（简单判断）
-        success = '成功' in message or '完成' in message
+    def _on_async_execution_finished(self, message: str, success: Optional[bool] = None):
+        """异步执行完成回调（success 为 None 时按结束消息判断，执行器信号只带消息）"""
+        if success is None:
+            success = '成功' in message or '完成' in message
 
         # 🔧 检测停止原因
         stop_reason = self._detect_stop_reason(success, message)
@@ -43,7 +43,7 @@ class WorkflowTaskManager(QObject):
         self.next_task_id = 1
 
         # 执行模式（从配置中读取）
-        self.execution_mode = config.get('task_execution_mode', 'sync')  # 'sync' (串行) 或 'async' (并行)
+        self.execution_mode = config.get('task_execution_mode', 'sync')  # 'sync' (串行)、'async' (并行) 或 'scheduled' (调度)
 
         # 当前执行状态
         self._is_executing = False
@@ -142,14 +142,15 @@ class WorkflowTaskManager(QObject):
         设置执行模式
 
         Args:
-            mode: 'sync' (同步/串行) 或 'async' (异步/并行)
+            mode: 'sync' (同步/串行)、'async' (异步/并行) 或 'scheduled' (调度器按优先级和资源限制执行)
         """
-        if mode not in ['sync', 'async']:
+        mode_names = {'sync': '同步（串行）', 'async': '异步（并行）', 'scheduled': '调度'}
+        if mode not in mode_names:
             logger.error(f"无效的执行模式: {mode}")
             return
 
         self.execution_mode = mode
-        logger.info(f"执行模式已设置为: {'同步（串行）' if mode == 'sync' else '异步（并行）'}")
+        logger.info(f"执行模式已设置为: {mode_names[mode]}")
 
     def execute_all(self) -> bool:
         """
@@ -175,6 +176,8 @@ class WorkflowTaskManager(QObject):
 
         if self.execution_mode == 'sync':
             return self._execute_sync(executable_tasks)
+        elif self.execution_mode == 'scheduled':
+            return self._execute_scheduled(executable_tasks)
         else:
             return self._execute_async(executable_tasks)
 
@@ -238,6 +241,35 @@ class WorkflowTaskManager(QObject):
 
         return started_count > 0
 
+    def _execute_scheduled(self, tasks: List[WorkflowTask]) -> bool:
+        """
+        提交任务列表到工作流调度器（按优先级、窗口互斥、资源限制在有限的工作线程上运行）
+
+        Args:
+            tasks: 任务列表
+
+        Returns:
+            是否有任务提交成功
+        """
+        from task_workflow.workflow_scheduler import get_workflow_scheduler
+        scheduler = get_workflow_scheduler()
+
+        logger.info(f"开始调度执行 {len(tasks)} 个任务 (工作线程 {scheduler.max_workers} 个, "
+                    f"资源上限 {scheduler.resource_limits})")
+
+        submitted_count = 0
+        for task in sorted(tasks, key=lambda t: -t.priority):
+            if task.execute_scheduled(scheduler) is not None:
+                submitted_count += 1
+
+        logger.info(f"调度执行：{submitted_count}/{len(tasks)} 个任务已提交")
+        return submitted_count > 0
+
+    def get_scheduler_metrics(self) -> Dict[str, Any]:
+        """获取调度器指标（队列深度、等待时间、资源占用）"""
+        from task_workflow.workflow_scheduler import get_workflow_scheduler
+        return get_workflow_scheduler().get_metrics()
+
     def execute_task(self, task_id: int) -> bool:
         """
         执行单个任务
@@ -275,7 +307,7 @@ class WorkflowTaskManager(QObject):
 
         stopped_count = 0
         for task in self.get_all_tasks():
-            if task.status == 'running':
+            if task.can_stop():
                 task.stop()
                 stopped_count += 1
 
@@ -315,7 +347,7 @@ class WorkflowTaskManager(QObject):
         self.task_status_changed.emit(task_id, status)
 
         # 检查是否所有异步任务都已完成
-        if self.execution_mode == 'async' and self._is_executing:
+        if self.execution_mode in ['async', 'scheduled'] and self._is_executing:
             all_completed = all(
                 self.tasks[tid].status in ['completed', 'failed', 'stopped']
                 for tid in self._executing_task_ids
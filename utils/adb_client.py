@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+ADB 主机协议客户端
+直接通过 TCP 与本机 adb server（默认 127.0.0.1:5037）通信，不再为每条命令启动 adb.exe 进程：
+- host:version / host:devices / host:connect / host:disconnect / get-state
+- host:transport:<serial> 后接 shell: / exec: 服务
+- sync: 推送文件（SEND/DATA/DONE）和查询文件状态（STAT）
+- 同步连接可复用，按设备保留空闲连接；shell/exec 服务是一次性流，每次使用新的本机连接
+- adb server 不可用时由调用方回退到 adb 命令行
+
+可以用 utils.fake_adb_server.FakeAdbServer 在进程内测试。
+"""
+
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADB_HOST = '127.0.0.1'
+DEFAULT_ADB_PORT = 5037
+
+# sync 协议每个 DATA 包的最大长度
+SYNC_DATA_MAX = 64 * 1024
+
+# shell_with_status 在输出末尾追加的退出码标记
+_EXIT_MARKER = '__TM_EXIT__'
+
+
+class AdbError(Exception):
+    """adb server 返回 FAIL 或协议异常"""
+
+
+class AdbConnection:
+    """到 adb server 的一条 TCP 连接"""
+
+    def __init__(self, host: str, port: int, timeout: Optional[float]):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def settimeout(self, timeout: Optional[float]):
+        self.sock.settimeout(timeout)
+
+    def send_request(self, request: str):
+        payload = request.encode('utf-8')
+        self.sock.sendall(b'%04x' % len(payload) + payload)
+
+    def read_exact(self, size: int) -> bytes:
+        chunks = []
+        remaining = size
+        while remaining > 0:
+            chunk = self.sock.recv(remaining)
+            if not chunk:
+                raise AdbError(f"连接被关闭（还需 {remaining} 字节）")
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b''.join(chunks)
+
+    def read_into(self, view: memoryview) -> None:
+        """把数据直接读入缓冲区（不产生中间 bytes 对象）"""
+        offset = 0
+        while offset < len(view):
+            received = self.sock.recv_into(view[offset:])
+            if not received:
+                raise AdbError(f"连接被关闭（还需 {len(view) - offset} 字节）")
+            offset += received
+
+    def read_hex_block(self) -> bytes:
+        size = int(self.read_exact(4), 16)
+        return self.read_exact(size) if size else b''
+
+    def read_status(self):
+        status = self.read_exact(4)
+        if status == b'OKAY':
+            return
+        if status == b'FAIL':
+            raise AdbError(self.read_hex_block().decode('utf-8', errors='ignore'))
+        raise AdbError(f"未知的响应状态: {status!r}")
+
+    def read_all(self) -> bytes:
+        """读取到连接关闭为止（shell: / exec: 服务的输出）"""
+        chunks = []
+        while True:
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                return b''.join(chunks)
+            chunks.append(chunk)
+
+    # sync 协议
+    def send_sync(self, command: bytes, data: bytes):
+        self.sock.sendall(command + struct.pack('<I', len(data)) + data)
+
+    def read_sync_header(self) -> Tuple[bytes, int]:
+        header = self.read_exact(8)
+        return header[:4], struct.unpack('<I', header[4:])[0]
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class AdbClient:
+    """ADB 主机协议客户端"""
+
+    def __init__(self, host: str = DEFAULT_ADB_HOST, port: int = DEFAULT_ADB_PORT, timeout: float = 5.0,
+                 max_idle_per_device: int = 2):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.max_idle_per_device = max_idle_per_device
+
+        # 按设备保留的空闲 sync 连接
+        self._idle_sync: Dict[str, List[AdbConnection]] = {}
+        self._pool_lock = threading.Lock()
+
+        # adb server 可用性缓存 (是否可用, 检查时间)
+        self._server_state: Optional[Tuple[bool, float]] = None
+        self._server_state_ttl = 2.0
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'connections': 0,
+            'requests': 0,
+            'failures': 0,
+            'sync_reused': 0,
+            'total_ms': 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # 连接
+    # ------------------------------------------------------------------
+    def _connect(self) -> AdbConnection:
+        connection = AdbConnection(self.host, self.port, self.timeout)
+        with self._stats_lock:
+            self._stats['connections'] += 1
+        return connection
+
+    @contextmanager
+    def _request(self):
+        """统计一次请求的耗时和失败"""
+        start = time.perf_counter()
+        try:
+            yield
+        except (AdbError, OSError):
+            with self._stats_lock:
+                self._stats['failures'] += 1
+            raise
+        finally:
+            with self._stats_lock:
+                self._stats['requests'] += 1
+                self._stats['total_ms'] += (time.perf_counter() - start) * 1000
+
+    def is_server_available(self) -> bool:
+        """adb server 是否在监听（结果缓存 2 秒）"""
+        now = time.monotonic()
+        if self._server_state is not None and now - self._server_state[1] < self._server_state_ttl:
+            return self._server_state[0]
+        try:
+            self.version()
+            available = True
+        except (AdbError, OSError):
+            available = False
+        self._server_state = (available, now)
+        return available
+
+    def _host_query(self, request: str) -> str:
+        """发送主机请求并读取长度前缀的响应"""
+        with self._request():
+            connection = self._connect()
+            try:
+                connection.send_request(request)
+                connection.read_status()
+                return connection.read_hex_block().decode('utf-8', errors='ignore')
+            finally:
+                connection.close()
+
+    def open_transport(self, serial: str, timeout: Optional[float] = None) -> AdbConnection:
+        """打开一条已切换到指定设备的连接（之后可发送一个服务请求）"""
+        connection = self._connect()
+        try:
+            if timeout is not None:
+                connection.settimeout(timeout)
+            connection.send_request(f"host:transport:{serial}")
+            connection.read_status()
+            return connection
+        except BaseException:
+            connection.close()
+            raise
+
+    def open_service(self, serial: str, service: str, timeout: Optional[float] = None) -> AdbConnection:
+        """打开设备服务流（如 shell:xxx、exec:xxx），调用方负责关闭"""
+        connection = self.open_transport(serial, timeout)
+        try:
+            connection.send_request(service)
+            connection.read_status()
+            return connection
+        except BaseException:
+            connection.close()
+            raise
+
+    # ------------------------------------------------------------------
+    # 主机服务
+    # ------------------------------------------------------------------
+    def version(self) -> int:
+        return int(self._host_query("host:version"), 16)
+
+    def devices(self) -> List[Tuple[str, str]]:
+        """返回 [(序列号, 状态)]"""
+        devices = []
+        for line in self._host_query("host:devices").splitlines():
+            parts = line.split('\t')
+            if len(parts) >= 2:
+                devices.append((parts[0], parts[1]))
+        return devices
+
+    def get_state(self, serial: str) -> str:
+        return self._host_query(f"host-serial:{serial}:get-state").strip()
+
+    def connect_device(self, address: str) -> Tuple[bool, str]:
+        """adb connect，返回 (是否已连接, 消息)"""
+        message = self._host_query(f"host:connect:{address}")
+        return 'connected' in message.lower() and 'failed' not in message.lower(), message
+
+    def disconnect_device(self, address: str) -> str:
+        return self._host_query(f"host:disconnect:{address}")
+
+    # ------------------------------------------------------------------
+    # 设备服务
+    # ------------------------------------------------------------------
+    def exec_out(self, serial: str, command: str, timeout: Optional[float] = None) -> bytes:
+        """exec:（原始字节输出，不经过 PTY 换行转换）"""
+        with self._request():
+            connection = self.open_service(serial, f"exec:{command}", timeout)
+            try:
+                return connection.read_all()
+            finally:
+                connection.close()
+
+    def shell(self, serial: str, command: str, timeout: Optional[float] = None) -> str:
+        """shell:，返回命令输出"""
+        with self._request():
+            connection = self.open_service(serial, f"shell:{command}", timeout)
+            try:
+                return connection.read_all().decode('utf-8', errors='ignore')
+            finally:
+                connection.close()
+
+    def shell_with_status(self, serial: str, command: str, timeout: Optional[float] = None) -> Tuple[int, str]:
+        """shell: 并取得退出码，返回 (退出码, 输出)"""
+        output = self.shell(serial, f"{command}; echo {_EXIT_MARKER}$?", timeout)
+        head, marker, tail = output.rpartition(_EXIT_MARKER)
+        if not marker:
+            raise AdbError("未取得命令退出码")
+        try:
+            exit_code = int(tail.strip())
+        except ValueError:
+            raise AdbError(f"无法解析命令退出码: {tail!r}")
+        return exit_code, head
+
+    def getprop(self, serial: str, name: str) -> str:
+        return self.shell(serial, f"getprop {name}").strip()
+
+    # ------------------------------------------------------------------
+    # sync 服务
+    # ------------------------------------------------------------------
+    @contextmanager
+    def _sync_connection(self, serial: str):
+        """取得设备的 sync 连接（优先复用空闲连接），出错的连接不放回"""
+        connection = None
+        with self._pool_lock:
+            idle = self._idle_sync.get(serial)
+            if idle:
+                connection = idle.pop()
+        if connection is not None:
+            with self._stats_lock:
+                self._stats['sync_reused'] += 1
+        else:
+            connection = self.open_transport(serial)
+            try:
+                connection.send_request("sync:")
+                connection.read_status()
+            except BaseException:
+                connection.close()
+                raise
+        try:
+            yield connection
+        except BaseException:
+            connection.close()
+            raise
+        with self._pool_lock:
+            idle = self._idle_sync.setdefault(serial, [])
+            if len(idle) < self.max_idle_per_device:
+                idle.append(connection)
+                connection = None
+        if connection is not None:
+            connection.close()
+
+    def push(self, serial: str, source: Union[bytes, str], remote_path: str, mode: int = 0o644,
+             mtime: Optional[int] = None):
+        """推送文件（source 为 bytes 或本地文件路径）"""
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                data = f.read()
+            if mtime is None:
+                mtime = int(os.path.getmtime(source))
+        else:
+            data = source
+        mtime = int(time.time()) if mtime is None else mtime
+
+        with self._request(), self._sync_connection(serial) as connection:
+            connection.send_sync(b'SEND', f"{remote_path},{mode}".encode('utf-8'))
+            view = memoryview(data)
+            for offset in range(0, len(data), SYNC_DATA_MAX):
+                connection.send_sync(b'DATA', bytes(view[offset:offset + SYNC_DATA_MAX]))
+            connection.sock.sendall(b'DONE' + struct.pack('<I', mtime))
+            status, size = connection.read_sync_header()
+            if status == b'FAIL':
+                raise AdbError(connection.read_exact(size).decode('utf-8', errors='ignore'))
+            if status != b'OKAY':
+                raise AdbError(f"推送文件的响应异常: {status!r}")
+
+    def stat(self, serial: str, remote_path: str) -> Tuple[int, int, int]:
+        """文件状态 (mode, size, mtime)；文件不存在时 mode 为 0"""
+        with self._request(), self._sync_connection(serial) as connection:
+            connection.send_sync(b'STAT', remote_path.encode('utf-8'))
+            header = connection.read_exact(16)
+            if header[:4] != b'STAT':
+                raise AdbError(f"查询文件状态的响应异常: {header[:4]!r}")
+            return struct.unpack('<III', header[4:])
+
+    # ------------------------------------------------------------------
+    # 管理
+    # ------------------------------------------------------------------
+    def close(self):
+        """关闭所有空闲连接"""
+        with self._pool_lock:
+            connections = [connection for idle in self._idle_sync.values() for connection in idle]
+            self._idle_sync.clear()
+        for connection in connections:
+            try:
+                connection.send_sync(b'QUIT', b'')
+            except OSError:
+                pass
+            connection.close()
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['avg_ms'] = stats['total_ms'] / stats['requests'] if stats['requests'] else 0.0
+        with self._pool_lock:
+            stats['idle_sync_connections'] = sum(len(idle) for idle in self._idle_sync.values())
+        return stats
+
+
+_adb_client: Optional[AdbClient] = None
+_adb_client_lock = threading.Lock()
+
+
+def get_adb_client() -> AdbClient:
+    """获取全局 ADB 主机协议客户端（ADB_SERVER_PORT 环境变量可指定端口）"""
+    global _adb_client
+    if _adb_client is None:
+        with _adb_client_lock:
+            if _adb_client is None:
+                port = int(os.environ.get('ADB_SERVER_PORT', DEFAULT_ADB_PORT))
+                _adb_client = AdbClient(port=port)
+    return _adb_client
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+并发 ADB 设备发现
+绑定多个模拟器时，原来的发现流程依次查询端口监听、MuMuManager、雷电控制台，再逐个端口 `adb connect`（每个 10 秒超时）。
+这里把发现拆成可以并发的几步，并缓存结果：
+- 各个端口来源的查询在线程池中并发执行
+- 候选端口用 asyncio 并发做 TCP 连接探测
+- 只对正在监听的端口并发执行 connect + get-state
+- 整轮发现有一个总的截止时间，超时未完成的探测按失败处理（结果完成后仍写入缓存）
+- 结果按端口缓存 TTL 秒；重新绑定时只探测新端口、过期端口和监听状态发生变化的端口
+
+基准（本机空闲端口）:
+    python -m utils.adb_discovery --ports 20
+"""
+
+import argparse
+import asyncio
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _PortEntry:
+    """单个端口的缓存"""
+    listening: bool = False
+    probed_at: float = 0.0
+    connected: Any = None  # connect 回调的结果（None 表示未连接）
+    connected_at: float = 0.0
+
+
+class AdbDiscovery:
+    """并发端口探测和连接，结果按端口缓存"""
+
+    def __init__(self, host: str = '127.0.0.1', ttl: float = 10.0, probe_timeout: float = 0.5,
+                 max_workers: int = 16):
+        self.host = host
+        self.ttl = ttl
+        self.probe_timeout = probe_timeout
+        self.max_workers = max_workers
+        self._entries: Dict[int, _PortEntry] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        self.probes = 0
+        self.probe_cache_hits = 0
+        self.connects = 0
+        self.connect_cache_hits = 0
+        self.deadline_misses = 0
+        self.last_discovery_ms = 0.0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix="AdbDiscovery")
+        return self._executor
+
+    def _entry(self, port: int) -> _PortEntry:
+        entry = self._entries.get(port)
+        if entry is None:
+            entry = self._entries[port] = _PortEntry()
+        return entry
+
+    # ------------------------------------------------------------------
+    # 并发执行
+    # ------------------------------------------------------------------
+    def run_concurrently(self, calls: Dict[str, Callable[[], Any]], deadline: float = 5.0) -> Dict[str, Any]:
+        """在线程池中并发执行多个查询，截止时间内未完成或出错的结果为 None"""
+        futures = {name: self.executor.submit(call) for name, call in calls.items()}
+        wait(list(futures.values()), timeout=max(0.0, deadline))
+        results = {}
+        for name, future in futures.items():
+            if not future.done():
+                self.deadline_misses += 1
+                logger.warning(f"设备发现查询超时: {name}")
+                results[name] = None
+            elif future.exception() is not None:
+                logger.debug(f"设备发现查询失败 {name}: {future.exception()}")
+                results[name] = None
+            else:
+                results[name] = future.result()
+        return results
+
+    # ------------------------------------------------------------------
+    # 端口探测
+    # ------------------------------------------------------------------
+    async def _probe_one(self, port: int) -> bool:
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(self.host, port), self.probe_timeout)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return True
+
+    async def _probe_all(self, ports: List[int], deadline: float) -> Dict[int, bool]:
+        tasks = {port: asyncio.ensure_future(self._probe_one(port)) for port in ports}
+        done, pending = await asyncio.wait(list(tasks.values()), timeout=max(0.0, deadline))
+        for task in pending:
+            task.cancel()
+        if pending:
+            self.deadline_misses += len(pending)
+            await asyncio.gather(*pending, return_exceptions=True)
+        return {port: task.done() and not task.cancelled() and task.result() for port, task in tasks.items()}
+
+    def probe_ports(self, ports: Iterable[int], deadline: float = 2.0, force: bool = False) -> Dict[int, bool]:
+        """
+        并发探测端口是否在监听
+
+        Args:
+            deadline: 整轮探测的截止时间（秒）
+            force: 忽略缓存重新探测
+        """
+        ports = sorted(set(ports))
+        now = time.monotonic()
+        results: Dict[int, bool] = {}
+        stale: List[int] = []
+        with self._lock:
+            for port in ports:
+                entry = self._entries.get(port)
+                if not force and entry is not None and now - entry.probed_at < self.ttl:
+                    results[port] = entry.listening
+                    self.probe_cache_hits += 1
+                else:
+                    stale.append(port)
+
+        if stale:
+            loop = asyncio.new_event_loop()
+            try:
+                probed = loop.run_until_complete(self._probe_all(stale, deadline))
+            finally:
+                loop.close()
+            now = time.monotonic()
+            with self._lock:
+                for port, listening in probed.items():
+                    entry = self._entry(port)
+                    entry.listening, entry.probed_at = listening, now
+                self.probes += len(stale)
+            results.update(probed)
+        return results
+
+    # ------------------------------------------------------------------
+    # 连接
+    # ------------------------------------------------------------------
+    def connect_ports(self, ports: Iterable[int], connect: Callable[[int], Any], deadline: float = 5.0,
+                      force: bool = False, require_listening: bool = True) -> Dict[int, Any]:
+        """
+        并发连接端口，返回 {端口: connect(端口) 的结果}（未连接为 None）
+
+        先探测端口（走缓存），不在监听的端口不连接并清除其连接缓存；缓存中已连接的端口在 TTL 内直接复用结果。
+        截止时间按整轮计算，探测也计入其中。
+        """
+        started = time.monotonic()
+        ports = sorted(set(ports))
+        listening = self.probe_ports(ports, min(deadline, 2.0), force) if require_listening else \
+            {port: True for port in ports}
+
+        now = time.monotonic()
+        results: Dict[int, Any] = {}
+        pending: List[int] = []
+        with self._lock:
+            for port in ports:
+                entry = self._entry(port)
+                if not listening.get(port):
+                    entry.connected = None
+                    results[port] = None
+                elif not force and entry.connected is not None and now - entry.connected_at < self.ttl:
+                    results[port] = entry.connected
+                    self.connect_cache_hits += 1
+                else:
+                    pending.append(port)
+
+        def store(port: int, future: Future):
+            result = None if future.cancelled() or future.exception() is not None else future.result()
+            with self._lock:
+                entry = self._entry(port)
+                entry.connected, entry.connected_at = result, time.monotonic()
+
+        futures: Dict[int, Future] = {}
+        for port in pending:
+            future = self.executor.submit(connect, port)
+            future.add_done_callback(lambda f, p=port: store(p, f))
+            futures[port] = future
+        self.connects += len(futures)
+
+        wait(list(futures.values()), timeout=max(0.0, deadline - (time.monotonic() - started)))
+        for port, future in futures.items():
+            if not future.done():
+                self.deadline_misses += 1
+                logger.warning(f"连接端口 {port} 超过截止时间")
+                results[port] = None
+            elif future.exception() is not None:
+                logger.debug(f"连接端口 {port} 失败: {future.exception()}")
+                results[port] = None
+            else:
+                results[port] = future.result()
+
+        self.last_discovery_ms = (time.monotonic() - started) * 1000
+        return results
+
+    # ------------------------------------------------------------------
+    # 管理
+    # ------------------------------------------------------------------
+    def invalidate(self, ports: Optional[Iterable[int]] = None):
+        """清除指定端口（None 为全部）的缓存"""
+        with self._lock:
+            if ports is None:
+                self._entries.clear()
+            else:
+                for port in ports:
+                    self._entries.pop(port, None)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cached = len(self._entries)
+            connected = sum(1 for entry in self._entries.values() if entry.connected is not None)
+        return {
+            'cached_ports': cached,
+            'connected_ports': connected,
+            'probes': self.probes,
+            'probe_cache_hits': self.probe_cache_hits,
+            'connects': self.connects,
+            'connect_cache_hits': self.connect_cache_hits,
+            'deadline_misses': self.deadline_misses,
+            'last_discovery_ms': round(self.last_discovery_ms, 2),
+        }
+
+
+_discovery: Optional[AdbDiscovery] = None
+_discovery_lock = threading.Lock()
+
+
+def get_adb_discovery() -> AdbDiscovery:
+    """获取全局设备发现器（缓存在多次绑定之间共享）"""
+    global _discovery
+    if _discovery is None:
+        with _discovery_lock:
+            if _discovery is None:
+                _discovery = AdbDiscovery()
+    return _discovery
+
+
+# ----------------------------------------------------------------------
+# 基准
+# ----------------------------------------------------------------------
+def run_benchmark(port_count: int = 20, listening_count: int = 5, connect_latency_ms: float = 200.0) -> Dict[str, float]:
+    """本机端口上对比逐个探测+连接与并发探测+连接（连接用固定延迟模拟 adb connect）"""
+    servers = []
+    ports = []
+    for _ in range(port_count):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        ports.append(sock.getsockname()[1])
+        servers.append(sock)
+    for sock in servers[:listening_count]:
+        sock.listen(8)
+    for sock in servers[listening_count:]:
+        sock.close()
+
+    def fake_connect(port: int) -> str:
+        time.sleep(connect_latency_ms / 1000.0)
+        return f"127.0.0.1:{port}"
+
+    try:
+        start = time.perf_counter()
+        for port in ports:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                sock.settimeout(1)
+                if sock.connect_ex(('127.0.0.1', port)) == 0:
+                    fake_connect(port)
+        sequential = time.perf_counter() - start
+
+        discovery = AdbDiscovery()
+        start = time.perf_counter()
+        first = discovery.connect_ports(ports, fake_connect)
+        concurrent = time.perf_counter() - start
+
+        start = time.perf_counter()
+        discovery.connect_ports(ports, fake_connect)
+        cached = time.perf_counter() - start
+        discovery.shutdown()
+    finally:
+        for sock in servers:
+            sock.close()
+
+    return {
+        'sequential_ms': sequential * 1000,
+        'concurrent_ms': concurrent * 1000,
+        'cached_ms': cached * 1000,
+        'connected': sum(1 for value in first.values() if value),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="并发ADB设备发现基准（本机端口）")
+    parser.add_argument('--ports', type=int, default=20, help="候选端口数")
+    parser.add_argument('--listening', type=int, default=5, help="其中在监听的端口数")
+    parser.add_argument('--connect-latency-ms', type=float, default=200.0, help="模拟每次 adb connect 的耗时（毫秒）")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(args.ports, args.listening, args.connect_latency_ms)
+    print(f"逐个探测+连接: {result['sequential_ms']:.1f} ms")
+    print(f"并发探测+连接: {result['concurrent_ms']:.1f} ms (连接 {result['connected']} 个)")
+    print(f"缓存命中重绑:  {result['cached_ms']:.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+ADB 帧缓冲截图
+部分模拟器的渲染窗口用 GDI 截不到画面（黑屏/旧帧），改为从设备直接读取帧缓冲：
+- `exec:screencap` 原始格式（不编码 PNG、不落临时文件），读出头部后把像素直接读入复用的 numpy 缓冲区
+- 每台设备一个后台循环持续截图，只保留最新一帧（双缓冲交换，取帧时复制）
+- 长时间没有取帧时循环自动停止，下次取帧时重新启动（旧帧丢弃）
+- 窗口有输入后（utils.input_lock 记录的输入时间），只返回输入完成之后才开始截取的帧，不会拿到点击前的画面
+- 统计每台设备的帧率、每帧字节数和单帧耗时
+
+窗口通过 register_window(hwnd, 序列号) 登记后，capture_window_background(hwnd) 和
+AdbCaptureBackend 会直接返回该设备的最新帧（BGR，与 GDI 截图相同的格式）。
+
+基准（假设备）:
+    python -m utils.adb_framebuffer --seconds 3 --size 1280x720
+"""
+
+import argparse
+import logging
+import struct
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from utils.adb_client import AdbClient, AdbError, get_adb_client
+from utils.input_lock import get_last_input_time
+
+logger = logging.getLogger(__name__)
+
+# screencap 像素格式 -> (每像素字节数, 转 BGR 的 cv2 转换码)
+SCREENCAP_FORMATS = {
+    1: (4, cv2.COLOR_RGBA2BGR),  # RGBA_8888
+    2: (4, cv2.COLOR_RGBA2BGR),  # RGBX_8888
+    3: (3, cv2.COLOR_RGB2BGR),  # RGB_888
+    4: (2, cv2.COLOR_BGR5652BGR),  # RGB_565（小端，R 在高位）
+    5: (4, cv2.COLOR_BGRA2BGR),  # BGRA_8888
+}
+
+# Android 9（API 28）起 screencap 头部多一个 4 字节的色彩空间字段
+_COLORSPACE_HEADER_SDK = 28
+
+
+class AdbFramebufferStream:
+    """单台设备的后台截图循环"""
+
+    def __init__(self, client: AdbClient, serial: str, max_fps: float = 30.0, idle_timeout: float = 10.0):
+        self.client = client
+        self.serial = serial
+        self.max_fps = max_fps
+        self.idle_timeout = idle_timeout
+
+        self._header_size: Optional[int] = None
+        self._raw: Optional[np.ndarray] = None  # 复用的原始像素缓冲区
+        self._front: Optional[np.ndarray] = None  # 最新的 BGR 帧
+        self._front_started = 0.0  # 最新帧开始截取的时间（time.monotonic）
+        self._back: Optional[np.ndarray] = None  # 正在转换的 BGR 帧
+        self._front_shared = False  # 最新帧已经以 copy=False 交给调用方，不能再作为转换缓冲区复用
+        self._sequence = 0
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._last_request = 0.0
+
+        # 统计
+        self.frames = 0
+        self.errors = 0
+        self.bytes_per_frame = 0
+        self.last_error: Optional[str] = None
+        self._frame_times: Deque[float] = deque(maxlen=60)
+        self._frame_ms: Deque[float] = deque(maxlen=60)
+
+    # ------------------------------------------------------------------
+    # 循环
+    # ------------------------------------------------------------------
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._last_request = time.monotonic()
+            self._front = None  # 上次运行留下的帧已过时
+            self._thread = threading.Thread(target=self._run, name=f"AdbFramebuffer-{self.serial}", daemon=True)
+            self._thread.start()
+        logger.info(f"ADB帧缓冲截图已启动: {self.serial}")
+
+    def stop(self, wait: bool = True):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+            thread = self._thread
+        if wait and thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5.0)
+
+    def _run(self):
+        min_interval = 1.0 / self.max_fps if self.max_fps > 0 else 0.0
+        failures = 0
+        while self._running:
+            if time.monotonic() - self._last_request > self.idle_timeout:
+                logger.info(f"ADB帧缓冲截图空闲超时，停止: {self.serial}")
+                with self._cond:
+                    self._running = False
+                break
+            started = time.perf_counter()
+            try:
+                self._capture_frame()
+                failures = 0
+            except (AdbError, OSError, ValueError) as e:
+                self.errors += 1
+                self.last_error = str(e)
+                failures += 1
+                logger.debug(f"ADB帧缓冲截图失败 {self.serial}: {e}")
+                # 唤醒等待首帧的调用方，连续失败时退避，避免空转
+                with self._cond:
+                    self._cond.notify_all()
+                    self._cond.wait(min(2.0, 0.1 * failures))
+                continue
+            elapsed = time.perf_counter() - started
+            if elapsed < min_interval:
+                with self._cond:
+                    self._cond.wait(min_interval - elapsed)
+
+    def _get_header_size(self) -> int:
+        if self._header_size is None:
+            try:
+                sdk = int(self.client.getprop(self.serial, 'ro.build.version.sdk') or 0)
+            except ValueError:
+                sdk = 0
+            self._header_size = 16 if sdk >= _COLORSPACE_HEADER_SDK else 12
+        return self._header_size
+
+    def _capture_frame(self):
+        header_size = self._get_header_size()
+        started_at = time.monotonic()
+        started = time.perf_counter()
+        connection = self.client.open_service(self.serial, "exec:screencap")
+        try:
+            width, height, pixel_format = struct.unpack('<III', connection.read_exact(header_size)[:12])
+            if pixel_format not in SCREENCAP_FORMATS:
+                raise ValueError(f"不支持的像素格式: {pixel_format}")
+            bytes_per_pixel, conversion = SCREENCAP_FORMATS[pixel_format]
+            shape = (height, width, bytes_per_pixel)
+            if self._raw is None or self._raw.shape != shape:
+                self._raw = np.empty(shape, dtype=np.uint8)
+            connection.read_into(memoryview(self._raw.reshape(-1)))
+        finally:
+            connection.close()
+
+        if self._back is None or self._back.shape[:2] != (height, width):
+            self._back = np.empty((height, width, 3), dtype=np.uint8)
+        cv2.cvtColor(self._raw, conversion, dst=self._back)
+
+        now = time.perf_counter()
+        with self._cond:
+            previous = self._front
+            self._front = self._back
+            self._back = None if self._front_shared else previous
+            self._front_shared = False
+            self._front_started = started_at
+            self._sequence += 1
+            self._cond.notify_all()
+        self.frames += 1
+        self.bytes_per_frame = header_size + self._raw.nbytes
+        self._frame_times.append(now)
+        self._frame_ms.append((now - started) * 1000)
+
+    # ------------------------------------------------------------------
+    # 取帧
+    # ------------------------------------------------------------------
+    def latest(self, timeout: float = 2.0, copy: bool = True, since: float = 0.0) -> Optional[np.ndarray]:
+        """
+        取最新帧（循环未运行时启动；还没有合格的帧时最多等待 timeout 秒，截图失败时立即返回 None）
+
+        Args:
+            copy: False 时不复制，直接返回截图线程的帧缓冲区（只读）；该缓冲区此后不再被截图线程复用，
+                  下一帧会分配新的缓冲区，所以返回的数组在调用方手里保持不变，但调用方不能修改它
+            since: 只接受在该时间（time.monotonic）之后才开始截取的帧，用于丢弃输入之前的画面
+        """
+        self._last_request = time.monotonic()
+        if not self._running:
+            self.start()
+        with self._cond:
+            if self._front is None or self._front_started < since:
+                deadline = time.monotonic() + timeout
+                errors = self.errors
+                while ((self._front is None or self._front_started < since)
+                       and self._running and self.errors == errors):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            if self._front is None or self._front_started < since:
+                return None
+            if copy:
+                return self._front.copy()
+            self._front_shared = True
+            self._front.flags.writeable = False
+            return self._front
+
+    def wait_next(self, timeout: float = 2.0) -> Optional[np.ndarray]:
+        """等待下一帧（比调用时更新的帧）"""
+        self._last_request = time.monotonic()
+        if not self._running:
+            self.start()
+        with self._cond:
+            sequence = self._sequence
+            deadline = time.monotonic() + timeout
+            while self._sequence == sequence and self._running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return None if self._front is None else self._front.copy()
+
+    def get_stats(self) -> Dict[str, float]:
+        times = list(self._frame_times)
+        fps = (len(times) - 1) / (times[-1] - times[0]) if len(times) > 1 and times[-1] > times[0] else 0.0
+        frame_ms = list(self._frame_ms)
+        return {
+            'running': self._running,
+            'frames': self.frames,
+            'errors': self.errors,
+            'fps': round(fps, 2),
+            'bytes_per_frame': self.bytes_per_frame,
+            'avg_frame_ms': round(sum(frame_ms) / len(frame_ms), 3) if frame_ms else 0.0,
+            'last_error': self.last_error,
+        }
+
+
+class AdbCaptureManager:
+    """窗口与设备帧缓冲的对应关系，以及每台设备的截图循环"""
+
+    def __init__(self, client: Optional[AdbClient] = None, max_fps: float = 30.0, idle_timeout: float = 10.0):
+        self._client = client
+        self.max_fps = max_fps
+        self.idle_timeout = idle_timeout
+        self._windows: Dict[int, Tuple[str, Optional[Tuple[int, int]]]] = {}  # hwnd -> (序列号, 输出尺寸)
+        self._streams: Dict[str, AdbFramebufferStream] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> AdbClient:
+        return self._client or get_adb_client()
+
+    def register_window(self, hwnd: int, serial: str, output_size: Optional[Tuple[int, int]] = None):
+        """
+        登记窗口使用 ADB 帧缓冲截图
+
+        Args:
+            output_size: 输出尺寸 (宽, 高)；设备分辨率与窗口客户区不同时缩放到客户区尺寸
+        """
+        with self._lock:
+            self._windows[hwnd] = (serial, output_size)
+        logger.info(f"窗口 {hwnd} 使用ADB帧缓冲截图: {serial}")
+
+    def unregister_window(self, hwnd: int):
+        with self._lock:
+            entry = self._windows.pop(hwnd, None)
+            still_used = entry is not None and any(serial == entry[0] for serial, _ in self._windows.values())
+        if entry is not None and not still_used:
+            self.stop_stream(entry[0])
+
+    def is_registered(self, hwnd: int) -> bool:
+        return hwnd in self._windows
+
+    def get_stream(self, serial: str) -> AdbFramebufferStream:
+        with self._lock:
+            stream = self._streams.get(serial)
+            if stream is None:
+                stream = self._streams[serial] = AdbFramebufferStream(self.client, serial, self.max_fps,
+                                                                      self.idle_timeout)
+            return stream
+
+    def capture(self, hwnd: int, timeout: float = 2.0) -> Optional[np.ndarray]:
+        """已登记窗口的最新帧（BGR，窗口有输入时为输入之后的帧）；未登记或取不到帧时返回 None"""
+        entry = self._windows.get(hwnd)
+        if entry is None:
+            return None
+        serial, output_size = entry
+        frame = self.get_stream(serial).latest(timeout, since=get_last_input_time(hwnd))
+        if frame is not None and output_size and (frame.shape[1], frame.shape[0]) != tuple(output_size):
+            frame = cv2.resize(frame, tuple(output_size), interpolation=cv2.INTER_AREA)
+        return frame
+
+    def stop_stream(self, serial: str):
+        with self._lock:
+            stream = self._streams.pop(serial, None)
+        if stream is not None:
+            stream.stop()
+
+    def stop_all(self):
+        with self._lock:
+            streams = list(self._streams.values())
+            self._streams.clear()
+        for stream in streams:
+            stream.stop()
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            streams = dict(self._streams)
+        return {serial: stream.get_stats() for serial, stream in streams.items()}
+
+
+_capture_manager: Optional[AdbCaptureManager] = None
+_capture_manager_lock = threading.Lock()
+
+
+def get_adb_capture_manager() -> AdbCaptureManager:
+    """获取全局 ADB 帧缓冲截图管理器"""
+    global _capture_manager
+    if _capture_manager is None:
+        with _capture_manager_lock:
+            if _capture_manager is None:
+                _capture_manager = AdbCaptureManager()
+    return _capture_manager
+
+
+def capture_registered_window(hwnd: int) -> Optional[np.ndarray]:
+    """已登记 ADB 截图的窗口返回设备最新帧，其他窗口返回 None（供 GDI 截图入口调用，未登记时开销只是一次字典查找）"""
+    manager = _capture_manager
+    if manager is None or not manager.is_registered(hwnd):
+        return None
+    return manager.capture(hwnd)
+
+
+# ----------------------------------------------------------------------
+# 基准
+# ----------------------------------------------------------------------
+def run_benchmark(seconds: float = 3.0, width: int = 1280, height: int = 720, max_fps: float = 0.0,
+                  sdk: int = 32) -> Dict[str, float]:
+    """在假设备上运行截图循环，返回帧率和每帧字节数"""
+    from utils.fake_adb_server import FakeAdbDevice, FakeAdbServer
+
+    framebuffer = np.random.default_rng(0).integers(0, 255, (height, width, 4), dtype=np.uint8)
+    device = FakeAdbDevice('emulator-5554', props={'ro.build.version.sdk': str(sdk)})
+    device.framebuffer = framebuffer
+    with FakeAdbServer([device]) as server:
+        manager = AdbCaptureManager(AdbClient(port=server.port), max_fps=max_fps, idle_timeout=seconds + 5)
+        manager.register_window(1, device.serial)
+        first = manager.capture(1)
+        if first is None or not np.array_equal(first, cv2.cvtColor(framebuffer, cv2.COLOR_RGBA2BGR)):
+            raise RuntimeError("帧内容与假设备帧缓冲不一致")
+        deadline = time.monotonic() + seconds
+        consumer_frames = 0
+        while time.monotonic() < deadline:
+            if manager.capture(1) is not None:
+                consumer_frames += 1
+            time.sleep(0.01)
+        stats = manager.get_stats()[device.serial]
+        manager.stop_all()
+    stats['consumer_captures'] = consumer_frames
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="ADB帧缓冲截图基准（假设备）")
+    parser.add_argument('--seconds', type=float, default=3.0, help="运行时长（秒）")
+    parser.add_argument('--size', default="1280x720", help="帧尺寸 宽x高")
+    parser.add_argument('--max-fps', type=float, default=0.0, help="截图帧率上限（0 = 不限）")
+    args = parser.parse_args(argv)
+
+    width, height = (int(value) for value in args.size.lower().split('x'))
+    stats = run_benchmark(args.seconds, width, height, args.max_fps)
+    print(f"帧率: {stats['fps']:.1f} fps, 每帧字节数: {stats['bytes_per_frame']}, "
+          f"单帧耗时: {stats['avg_frame_ms']:.2f} ms, 总帧数: {stats['frames']}, 错误: {stats['errors']}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
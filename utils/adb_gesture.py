@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+设备端手势脚本
+多点拖拽原来每次都要生成临时脚本、推送、chmod、执行、删除，一次手势要启动四个进程。
+这里把路径和时长编译成紧凑的 `input motionevent` 脚本：
+- 脚本按内容哈希命名，每台设备只在第一次用到时通过 sync 服务推送（不落本地临时文件）
+- 之后相同的手势只需在持久 shell 会话里执行一条 `sh <脚本>`
+- 设备上的脚本被清理（模拟器重启等）时自动重新推送
+- 每台设备缓存的脚本数有上限，超出时删除最早推送的脚本
+
+基准（假设备）:
+    python -m utils.adb_gesture --gestures 200 --distinct 10
+"""
+
+import argparse
+import functools
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from utils.adb_client import AdbClient, AdbError, get_adb_client
+from utils.adb_shell_session import AdbCommandNotSent, AdbShellSessionManager, get_adb_shell_manager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REMOTE_DIR = "/data/local/tmp"
+
+# 设备端每条 motionevent 的大致耗时（秒）：估算执行超时，编译手势时从每段的等待中扣除
+_EVENT_COST_ESTIMATE = 0.15
+
+_SLEEP_PATTERN = re.compile(r'\bsleep\s+(\d+(?:\.\d+)?)')
+_USLEEP_PATTERN = re.compile(r'\busleep\s+(\d+)')
+_INPUT_PATTERN = re.compile(r'\binput\s+(\w+)((?:\s+-?\d+)*)')
+
+
+def estimate_shell_timeout(command: str, margin: float = 3.0) -> float:
+    """按命令内容估算执行超时：sleep/usleep 总时长 + 每条 input 的设备端耗时 + swipe 的持续时间 + 余量（秒）"""
+    seconds = margin
+    for value in _SLEEP_PATTERN.findall(command):
+        seconds += float(value)
+    for value in _USLEEP_PATTERN.findall(command):
+        seconds += int(value) / 1e6
+    for action, numbers in _INPUT_PATTERN.findall(command):
+        seconds += _EVENT_COST_ESTIMATE
+        args = numbers.split()
+        if action in ('swipe', 'draganddrop') and len(args) >= 5:
+            seconds += int(args[4]) / 1000.0
+    return seconds
+
+
+@dataclass(frozen=True)
+class CompiledGesture:
+    """编译好的手势脚本"""
+    script: str
+    digest: str
+    event_count: int
+    duration_ms: int
+
+    @property
+    def file_name(self) -> str:
+        return f"tm_gesture_{self.digest}.sh"
+
+
+def _sample_points(points: List[Tuple[int, int]], max_points: int) -> List[Tuple[int, int]]:
+    """均匀抽取不超过 max_points 个点（保留首尾）"""
+    if max_points < 2 or len(points) <= max_points:
+        return points
+    step = (len(points) - 1) / (max_points - 1)
+    return [points[round(index * step)] for index in range(max_points)]
+
+
+@functools.lru_cache(maxsize=256)
+def _compile(points: Tuple[Tuple[int, int], ...], duration_ms: int, max_points: int) -> CompiledGesture:
+    # 去掉连续重复的点；全部重合时为长按
+    unique = [points[0]]
+    for point in points[1:]:
+        if point != unique[-1]:
+            unique.append(point)
+    unique = _sample_points(unique, max_points)
+
+    # 每段等待 = 平均段时长 - 一条 motionevent 的设备端耗时，使总时长接近 duration_ms；
+    # 用整数微秒的 usleep（老的 toolbox 系统镜像的 sleep 不支持小数）
+    segments = max(1, len(unique) - 1)
+    delay_us = round((duration_ms / segments - _EVENT_COST_ESTIMATE * 1000) * 1000)
+    delay = f"usleep {delay_us}" if delay_us > 0 else None
+    lines = [f"input motionevent DOWN {unique[0][0]} {unique[0][1]}"]
+    for x, y in unique[1:-1]:
+        if delay:
+            lines.append(delay)
+        lines.append(f"input motionevent MOVE {x} {y}")
+    if delay:
+        lines.append(delay)
+    lines.append(f"input motionevent UP {unique[-1][0]} {unique[-1][1]}")
+
+    script = "\n".join(lines) + "\n"
+    digest = hashlib.sha1(script.encode('utf-8')).hexdigest()[:16]
+    return CompiledGesture(script, digest, len(unique) + (1 if len(unique) == 1 else 0), duration_ms)
+
+
+def compile_gesture(path_points: Sequence[Sequence[float]], duration_ms: int,
+                    max_points: int = 0) -> CompiledGesture:
+    """
+    把路径编译成 motionevent 脚本
+
+    Args:
+        path_points: 路径点 [(x1, y1), (x2, y2), ...]，至少 1 个（1 个点为长按）
+        duration_ms: 总时长（毫秒），平均分配到各段（每段扣除一条 motionevent 的设备端耗时）
+        max_points: 路径点上限（0 = 不限），超出时均匀抽样
+    """
+    if not path_points:
+        raise ValueError("路径点为空")
+    points = tuple((int(round(point[0])), int(round(point[1]))) for point in path_points)
+    return _compile(points, max(0, int(duration_ms)), max_points)
+
+
+class GestureRunner:
+    """按设备缓存手势脚本并在持久 shell 会话中执行"""
+
+    def __init__(self, client: Optional[AdbClient] = None, shell_manager: Optional[AdbShellSessionManager] = None,
+                 remote_dir: str = DEFAULT_REMOTE_DIR, max_scripts_per_device: int = 128):
+        self._client = client
+        self._shell_manager = shell_manager
+        self.remote_dir = remote_dir.rstrip('/')
+        self.max_scripts_per_device = max_scripts_per_device
+        self._pushed: Dict[str, 'OrderedDict[str, None]'] = {}  # 序列号 -> 已推送的脚本哈希（按推送顺序）
+        self._lock = threading.Lock()
+
+        self.runs = 0
+        self.pushes = 0
+        self.repushes = 0
+        self.evictions = 0
+
+    @property
+    def client(self) -> AdbClient:
+        return self._client or get_adb_client()
+
+    @property
+    def shell_manager(self) -> AdbShellSessionManager:
+        return self._shell_manager or get_adb_shell_manager()
+
+    def remote_path(self, gesture: CompiledGesture) -> str:
+        return f"{self.remote_dir}/{gesture.file_name}"
+
+    def run(self, serial: str, path_points: Sequence[Sequence[float]], duration_ms: int,
+            timeout: Optional[float] = None, max_points: int = 0) -> Tuple[bool, str]:
+        """编译并执行手势，返回 (是否成功, 输出)"""
+        return self.run_compiled(serial, compile_gesture(path_points, duration_ms, max_points), timeout)
+
+    def run_compiled(self, serial: str, gesture: CompiledGesture, timeout: Optional[float] = None) -> Tuple[bool, str]:
+        """
+        执行编译好的手势（脚本不在设备上时先推送），AdbError 由调用方处理
+
+        推送失败或脚本推送后仍不存在时抛出 AdbCommandNotSent（设备上没有执行任何输入）。
+        """
+        if timeout is None:
+            timeout = gesture.duration_ms / 1000.0 + gesture.event_count * _EVENT_COST_ESTIMATE + 2.0
+        path = self.remote_path(gesture)
+        output = ""
+        for attempt in (0, 1):
+            self._ensure_pushed(serial, gesture)
+            exit_code, output = self.shell_manager.run(serial, f"sh {path}", timeout)
+            if exit_code != 0 and ("No such file" in output or "can't open" in output):
+                # 设备上的脚本已被清理，重新推送
+                logger.debug(f"设备 {serial} 上的手势脚本已不存在，重新推送: {gesture.file_name}")
+                self._forget(serial, gesture.digest)
+                self.repushes += 1
+                continue
+            self.runs += 1
+            if exit_code != 0:
+                logger.warning(f"手势脚本执行失败 {serial} (退出码 {exit_code}): {output.strip()[:200]}")
+            return exit_code == 0, output
+        raise AdbCommandNotSent(f"手势脚本推送后仍不存在 {serial}: {output.strip()[:200]}")
+
+    def _ensure_pushed(self, serial: str, gesture: CompiledGesture):
+        with self._lock:
+            pushed = self._pushed.setdefault(serial, OrderedDict())
+            if gesture.digest in pushed:
+                pushed.move_to_end(gesture.digest)
+                return
+        try:
+            self.client.push(serial, gesture.script.encode('utf-8'), self.remote_path(gesture))
+        except AdbError as e:
+            raise AdbCommandNotSent(f"推送手势脚本失败 {serial}: {e}") from e
+        self.pushes += 1
+        with self._lock:
+            pushed[gesture.digest] = None
+            evicted = []
+            while len(pushed) > self.max_scripts_per_device:
+                evicted.append(pushed.popitem(last=False)[0])
+        if evicted:
+            self.evictions += len(evicted)
+            paths = ' '.join(f"{self.remote_dir}/tm_gesture_{digest}.sh" for digest in evicted)
+            try:
+                self.shell_manager.run(serial, f"rm -f {paths}", 5.0)
+            except AdbError as e:
+                logger.debug(f"清理设备 {serial} 上的旧手势脚本失败: {e}")
+
+    def _forget(self, serial: str, digest: str):
+        with self._lock:
+            self._pushed.get(serial, OrderedDict()).pop(digest, None)
+
+    def forget_device(self, serial: str):
+        """清除设备的脚本缓存记录（设备重建后调用）"""
+        with self._lock:
+            self._pushed.pop(serial, None)
+
+    def get_stats(self) -> Dict[str, int]:
+        compile_info = _compile.cache_info()
+        with self._lock:
+            cached = sum(len(pushed) for pushed in self._pushed.values())
+        return {
+            'runs': self.runs,
+            'pushes': self.pushes,
+            'repushes': self.repushes,
+            'evictions': self.evictions,
+            'cached_scripts': cached,
+            'compile_hits': compile_info.hits,
+            'compile_misses': compile_info.misses,
+        }
+
+
+_gesture_runner: Optional[GestureRunner] = None
+_gesture_runner_lock = threading.Lock()
+
+
+def get_gesture_runner() -> GestureRunner:
+    """获取全局手势执行器"""
+    global _gesture_runner
+    if _gesture_runner is None:
+        with _gesture_runner_lock:
+            if _gesture_runner is None:
+                _gesture_runner = GestureRunner()
+    return _gesture_runner
+
+
+# ----------------------------------------------------------------------
+# 基准
+# ----------------------------------------------------------------------
+def run_benchmark(gestures: int = 200, distinct: int = 10, points: int = 20,
+                  device_latency_ms: float = 0.0) -> Dict[str, float]:
+    """在假设备上对比：每次推送临时脚本再执行（push + chmod + sh + rm）/ 哈希缓存的手势脚本"""
+    from utils.fake_adb_server import FakeAdbDevice, FakeAdbServer
+
+    device = FakeAdbDevice('emulator-5554', command_latency=device_latency_ms / 1000.0)
+    paths = [[(100 + index * 5 + step * 10, 300 + step * 3) for step in range(points)] for index in range(distinct)]
+    with FakeAdbServer([device]) as server:
+        client = AdbClient(port=server.port)
+        manager = AdbShellSessionManager(client)
+
+        start = time.perf_counter()
+        for index in range(gestures):
+            remote = f"{DEFAULT_REMOTE_DIR}/swipe_script.sh"
+            client.push(device.serial, compile_gesture(paths[index % distinct], 0).script.encode('utf-8'), remote)
+            client.shell(device.serial, f"chmod +x {remote}")
+            client.shell(device.serial, f"sh {remote}")
+            client.shell(device.serial, f"rm {remote}")
+        per_gesture_push = time.perf_counter() - start
+
+        runner = GestureRunner(client, manager)
+        start = time.perf_counter()
+        for index in range(gestures):
+            runner.run(device.serial, paths[index % distinct], 0)
+        cached = time.perf_counter() - start
+        manager.close_all()
+
+    return {
+        'push_each_ms': per_gesture_push / gestures * 1000,
+        'cached_ms': cached / gestures * 1000,
+        'pushes': runner.pushes,
+        'runs': runner.runs,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="设备端手势脚本基准（假设备）")
+    parser.add_argument('--gestures', type=int, default=200, help="手势次数")
+    parser.add_argument('--distinct', type=int, default=10, help="不同路径的数量")
+    parser.add_argument('--points', type=int, default=20, help="每条路径的点数")
+    parser.add_argument('--device-latency-ms', type=float, default=0.0, help="假设备每条命令的耗时（毫秒）")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(args.gestures, args.distinct, args.points, args.device_latency_ms)
+    print(f"每次推送临时脚本: {result['push_each_ms']:.3f} ms/次")
+    print(f"哈希缓存脚本:     {result['cached_ms']:.3f} ms/次 (推送 {result['pushes']} 次, 执行 {result['runs']} 次)")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
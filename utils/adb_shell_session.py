@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+ADB 持久 shell 会话
+每条 `adb shell input tap` 都会启动一个主机端 adb 进程和一个设备端 shell 进程，输入密集的卡片延迟明显。
+每台设备保持一个长连接的 `shell:sh`，命令写入同一个 shell：
+- 命令输出以带会话令牌和序号的哨兵行结束，哨兵行同时携带退出码
+- 命令经 shlex.quote 引用后在 `( eval '...' ) </dev/null 2>&1` 子 shell 中执行：写入会话的总是完整的一行，
+  引号不完整等语法错误只让这条命令失败（不会让会话一直等待后续输入），命令中的 exit/cd 也不影响会话；
+  不会读走后续命令，stderr 合并到输出
+- 超时后会话输出状态未知，关闭会话并在下一条命令时重连
+- 写入前连接已断开时自动重连并重试一次；命令写出后才断开的不重试（避免重复执行输入）
+- 多个线程共享同一设备的会话，按调用顺序串行执行
+
+run_adb_command() 是与 subprocess.run 返回值兼容的入口：`[adb, -s, 设备, shell, ...]` 走持久会话，
+adb connect/disconnect 走主机协议，其他命令或 adb server 不可用时仍启动 adb 进程。
+
+基准（假设备）:
+    python -m utils.adb_shell_session --commands 500
+"""
+
+import argparse
+import logging
+import os
+import shlex
+import socket
+import subprocess
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from utils.adb_client import AdbClient, AdbConnection, AdbError, get_adb_client
+
+logger = logging.getLogger(__name__)
+
+
+class AdbShellTimeout(AdbError):
+    """命令在超时时间内没有结束"""
+
+
+class AdbCommandNotSent(AdbError):
+    """命令没有送到设备（会话打不开、写入失败），设备上什么都没有执行，调用方可以安全地改用其他方式"""
+
+
+class AdbShellSession:
+    """单台设备的持久 shell 会话"""
+
+    def __init__(self, client: AdbClient, serial: str, default_timeout: float = 10.0):
+        self.client = client
+        self.serial = serial
+        self.default_timeout = default_timeout
+        self._connection: Optional[AdbConnection] = None
+        self._buffer = b''
+        self._token = uuid.uuid4().hex[:12]
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+        self.commands = 0
+        self.reconnects = 0
+        self.timeouts = 0
+        self.last_used = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        return self._connection is not None
+
+    def _open(self):
+        self._connection = self.client.open_service(self.serial, "shell:sh")
+        self._buffer = b''
+        self.reconnects += 1 if self.commands else 0
+        logger.debug(f"已打开持久shell会话: {self.serial}")
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._connection is not None:
+            try:
+                self._connection.sock.sendall(b"exit\n")
+            except OSError:
+                pass
+            self._connection.close()
+            self._connection = None
+        self._buffer = b''
+
+    def run(self, command: str, timeout: Optional[float] = None) -> Tuple[int, str]:
+        """
+        执行命令，返回 (退出码, 输出)
+
+        会话打不开或命令写不进去时抛出 AdbCommandNotSent；命令写入后超时抛出 AdbShellTimeout，
+        读取失败抛出 AdbError，这两种情况下命令可能已经执行。
+        """
+        timeout = self.default_timeout if timeout is None else timeout
+        with self._lock:
+            self._sequence += 1
+            sentinel = f"__TM_{self._token}_{self._sequence}__".encode('ascii')
+            payload = (f"( eval {shlex.quote(command)} ) </dev/null 2>&1; __tm_status=$?; echo; "
+                       f"echo {sentinel.decode('ascii')} $__tm_status\n").encode('utf-8')
+
+            for attempt in (0, 1):
+                try:
+                    if self._connection is None:
+                        self._open()
+                    self._connection.sock.sendall(payload)
+                    break
+                except (AdbError, OSError) as e:
+                    self._close()
+                    if attempt:
+                        raise AdbCommandNotSent(f"持久shell会话写入失败 {self.serial}: {e}")
+                    logger.debug(f"持久shell会话已断开，重连 {self.serial}: {e}")
+
+            try:
+                exit_code, output = self._read_until(sentinel, time.monotonic() + timeout)
+            except AdbShellTimeout:
+                self.timeouts += 1
+                self._close()
+                raise
+            except (AdbError, OSError) as e:
+                self._close()
+                raise AdbError(f"持久shell会话读取失败 {self.serial}: {e}")
+
+            self.commands += 1
+            self.last_used = time.monotonic()
+            return exit_code, output
+
+    def _read_until(self, sentinel: bytes, deadline: float) -> Tuple[int, str]:
+        marker = b'\n' + sentinel + b' '
+        while True:
+            index = self._buffer.find(marker)
+            if index >= 0:
+                end = self._buffer.find(b'\n', index + len(marker))
+                if end >= 0:
+                    output = self._buffer[:index]
+                    status = self._buffer[index + len(marker):end]
+                    self._buffer = self._buffer[end + 1:]
+                    return int(status.strip() or b'0'), output.decode('utf-8', errors='ignore').replace('\r\n', '\n')
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise AdbShellTimeout(f"命令超时: {self.serial}")
+            self._connection.settimeout(remaining)
+            try:
+                chunk = self._connection.sock.recv(65536)
+            except socket.timeout:
+                raise AdbShellTimeout(f"命令超时: {self.serial}")
+            if not chunk:
+                raise AdbError("shell会话被关闭")
+            self._buffer += chunk
+
+
+class AdbShellSessionManager:
+    """按设备管理持久 shell 会话"""
+
+    def __init__(self, client: Optional[AdbClient] = None, default_timeout: float = 10.0,
+                 idle_timeout: float = 300.0):
+        self._client = client
+        self.default_timeout = default_timeout
+        self.idle_timeout = idle_timeout
+        self._sessions: Dict[str, AdbShellSession] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> AdbClient:
+        return self._client or get_adb_client()
+
+    def is_available(self) -> bool:
+        return self.client.is_server_available()
+
+    def get_session(self, serial: str) -> AdbShellSession:
+        with self._lock:
+            session = self._sessions.get(serial)
+            if session is None:
+                session = self._sessions[serial] = AdbShellSession(self.client, serial, self.default_timeout)
+            return session
+
+    def run(self, serial: str, command: str, timeout: Optional[float] = None) -> Tuple[int, str]:
+        """在设备的持久会话中执行命令，返回 (退出码, 输出)"""
+        self.close_idle()
+        return self.get_session(serial).run(command, timeout)
+
+    def close_session(self, serial: str):
+        with self._lock:
+            session = self._sessions.pop(serial, None)
+        if session is not None:
+            session.close()
+
+    def close_idle(self):
+        """关闭空闲超时的会话"""
+        now = time.monotonic()
+        with self._lock:
+            idle = [serial for serial, session in self._sessions.items()
+                    if session.is_open and session.last_used and now - session.last_used > self.idle_timeout]
+        for serial in idle:
+            logger.debug(f"关闭空闲shell会话: {serial}")
+            self.get_session(serial).close()
+
+    def close_all(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {
+                serial: {'open': session.is_open, 'commands': session.commands,
+                         'reconnects': session.reconnects, 'timeouts': session.timeouts}
+                for serial, session in self._sessions.items()
+            }
+
+
+_shell_manager: Optional[AdbShellSessionManager] = None
+_shell_manager_lock = threading.Lock()
+
+
+def get_adb_shell_manager() -> AdbShellSessionManager:
+    """获取全局持久 shell 会话管理器"""
+    global _shell_manager
+    if _shell_manager is None:
+        with _shell_manager_lock:
+            if _shell_manager is None:
+                _shell_manager = AdbShellSessionManager()
+    return _shell_manager
+
+
+def run_adb_command(cmd: Sequence[str], timeout: float = 10.0, **subprocess_kwargs) -> subprocess.CompletedProcess:
+    """
+    执行 adb 命令（返回值与 subprocess.run(capture_output=True, text=True) 兼容）
+
+    `[adb, -s, 设备, shell, ...]` 在设备的持久会话中执行（参数与 adb 命令行一样以空格拼接后交给设备 shell 解释，
+    拼接结果整体引用后写入会话，引号不完整时命令失败而不会挂起会话），`[adb, connect|disconnect, 地址]` 走主机协议；
+    其他命令、adb server 不可用或会话失败时启动 adb 进程（subprocess_kwargs 传给 subprocess.run）。
+    """
+    cmd = list(cmd)
+    manager = get_adb_shell_manager()
+    native = len(cmd) >= 5 and cmd[1] == '-s' and cmd[3] == 'shell' or \
+        len(cmd) == 3 and cmd[1] in ('connect', 'disconnect')
+    if native and manager.is_available():
+        try:
+            if cmd[1] == '-s':
+                exit_code, output = manager.run(cmd[2], ' '.join(cmd[4:]), timeout)
+                return subprocess.CompletedProcess(cmd, exit_code, output, '')
+            if cmd[1] == 'connect':
+                connected, message = manager.client.connect_device(cmd[2])
+                return subprocess.CompletedProcess(cmd, 0 if connected else 1, message + '\n', '')
+            return subprocess.CompletedProcess(cmd, 0, manager.client.disconnect_device(cmd[2]) + '\n', '')
+        except AdbShellTimeout:
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        except (AdbError, OSError) as e:
+            logger.debug(f"主机协议执行失败，回退到adb命令行: {e}")
+
+    if os.name == 'nt':
+        subprocess_kwargs.setdefault('creationflags', subprocess.CREATE_NO_WINDOW)
+    return subprocess.run(cmd, capture_output=True, text=True, timeout=timeout, **subprocess_kwargs)
+
+
+# ----------------------------------------------------------------------
+# 基准
+# ----------------------------------------------------------------------
+def run_benchmark(commands: int = 500, device_latency_ms: float = 0.0, spawn_samples: int = 20) -> Dict[str, float]:
+    """在假设备上对比：每条命令新开 shell: 服务 / 持久会话 / 启动进程（仅作参照）"""
+    from utils.fake_adb_server import FakeAdbDevice, FakeAdbServer
+
+    device = FakeAdbDevice('emulator-5554', command_latency=device_latency_ms / 1000.0)
+    with FakeAdbServer([device]) as server:
+        client = AdbClient(port=server.port)
+        manager = AdbShellSessionManager(client)
+
+        start = time.perf_counter()
+        for index in range(commands):
+            client.shell(device.serial, f"input tap {index} 100")
+        one_shot = time.perf_counter() - start
+
+        manager.run(device.serial, "true")  # 打开会话
+        latencies: List[float] = []
+        start = time.perf_counter()
+        for index in range(commands):
+            begin = time.perf_counter()
+            manager.run(device.serial, f"input tap {index} 100")
+            latencies.append((time.perf_counter() - begin) * 1000)
+        persistent = time.perf_counter() - start
+        manager.close_all()
+
+    start = time.perf_counter()
+    for _ in range(spawn_samples):
+        subprocess.run([os.environ.get('COMSPEC', 'cmd') if os.name == 'nt' else 'true'] +
+                       (['/c', 'exit'] if os.name == 'nt' else []), capture_output=True)
+    spawn_ms = (time.perf_counter() - start) / spawn_samples * 1000
+
+    latencies.sort()
+    return {
+        'one_shot_ms': one_shot / commands * 1000,
+        'persistent_ms': persistent / commands * 1000,
+        'persistent_p95_ms': latencies[int(len(latencies) * 0.95) - 1],
+        'persistent_commands_per_s': commands / persistent,
+        'one_shot_commands_per_s': commands / one_shot,
+        'process_spawn_ms': spawn_ms,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="持久shell会话基准（假设备）")
+    parser.add_argument('--commands', type=int, default=500, help="命令数")
+    parser.add_argument('--device-latency-ms', type=float, default=0.0, help="假设备每条命令的耗时（毫秒）")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(args.commands, args.device_latency_ms)
+    print(f"每条命令新开 shell: 服务: {result['one_shot_ms']:.3f} ms/条, {result['one_shot_commands_per_s']:.0f} 条/秒")
+    print(f"持久会话:              {result['persistent_ms']:.3f} ms/条 (P95 {result['persistent_p95_ms']:.3f} ms), "
+          f"{result['persistent_commands_per_s']:.0f} 条/秒")
+    print(f"启动空进程（参照）:    {result['process_spawn_ms']:.3f} ms/次")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
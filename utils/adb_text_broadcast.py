@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+多设备并发文本输入
+原来给多台模拟器输入文字时逐台执行：检查 ADBKeyboard 是否安装、ime enable、ime set、am broadcast，
+每一步都启动一个 adb 进程，20 台设备的耗时随设备数线性增长。
+这里把一轮输入改为并发执行：
+- 每台设备的命令在线程池中并发执行，走持久 shell 会话（adb server 不可用时启动 adb 进程）
+- ADBKeyboard 的安装/启用状态记录在状态表中，TTL 内不再重复查询；需要设置时只用一条命令完成检查和设置
+- 使用状态表时，发送命令先在设备上确认 ADBKeyboard 仍是当前输入法（am broadcast 在没有接收方时也返回 0），
+  已被切换时不发送，重新设置输入法后再发
+- 文本用 ADB_INPUT_B64 发送，不受引号、空格和中文的影响
+- 返回每台设备的结果和耗时（输入法准备、发送、总计）
+
+基准（假设备）:
+    python -m utils.adb_text_broadcast --devices 20
+"""
+
+import argparse
+import base64
+import logging
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.adb_client import AdbClient, AdbError
+from utils.adb_shell_session import AdbShellSessionManager, AdbShellTimeout, get_adb_shell_manager
+
+logger = logging.getLogger(__name__)
+
+ADB_KEYBOARD_PACKAGE = "com.android.adbkeyboard"
+ADB_KEYBOARD_IME = "com.android.adbkeyboard/.AdbIME"
+
+_IME_MARKER = "__TM_IME__"
+_IME_INACTIVE_MARKER = "__TM_IME_INACTIVE__"
+# 一条命令完成：检查安装、启用、设为当前输入法、读取当前输入法
+_IME_SETUP_COMMAND = (f"pm list packages {ADB_KEYBOARD_PACKAGE}; ime enable {ADB_KEYBOARD_IME}; "
+                      f"ime set {ADB_KEYBOARD_IME}; echo {_IME_MARKER}; settings get secure default_input_method")
+
+
+def _broadcast_command(text_b64: str, verify_ime: bool) -> str:
+    """发送文本的命令；verify_ime 时 ADBKeyboard 不是当前输入法则不发送，只输出 _IME_INACTIVE_MARKER"""
+    broadcast = f"am broadcast -a ADB_INPUT_B64 --es msg {text_b64}"
+    if not verify_ime:
+        return broadcast
+    return (f'[ "$(settings get secure default_input_method)" = "{ADB_KEYBOARD_IME}" ] '
+            f'&& {broadcast} || echo {_IME_INACTIVE_MARKER}')
+
+
+@dataclass
+class ImeState:
+    """设备的 ADBKeyboard 状态"""
+    installed: bool
+    active: bool  # 是否为当前输入法
+    checked_at: float  # time.monotonic()
+
+
+@dataclass
+class TextInputResult:
+    """单台设备的输入结果"""
+    serial: str
+    success: bool
+    elapsed_ms: float = 0.0
+    ime_ms: float = 0.0
+    send_ms: float = 0.0
+    ime_cached: bool = False
+    error: str = ""
+
+
+class AdbTextBroadcaster:
+    """并发向多台设备发送 ADBKeyboard 文本"""
+
+    def __init__(self, shell_manager: Optional[AdbShellSessionManager] = None, adb_path: str = "adb",
+                 ime_ttl: float = 300.0, max_workers: int = 16):
+        self._shell_manager = shell_manager
+        self.adb_path = adb_path
+        self.ime_ttl = ime_ttl
+        self.max_workers = max_workers
+        self._ime_states: Dict[str, ImeState] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        self.sends = 0
+        self.failures = 0
+        self.ime_checks = 0
+        self.ime_cache_hits = 0
+        self.stale_ime_states = 0
+        self.last_broadcast_ms = 0.0
+
+    @property
+    def shell_manager(self) -> AdbShellSessionManager:
+        return self._shell_manager or get_adb_shell_manager()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix="AdbTextInput")
+        return self._executor
+
+    def _shell(self, serial: str, command: str, timeout: float, adb_path: Optional[str] = None) -> Tuple[int, str]:
+        """在设备上执行 shell 命令，返回 (退出码, 输出)；超时抛出 subprocess.TimeoutExpired"""
+        manager = self.shell_manager
+        if manager.is_available():
+            try:
+                return manager.run(serial, command, timeout)
+            except AdbShellTimeout:
+                raise subprocess.TimeoutExpired(command, timeout)
+            except (AdbError, OSError) as e:
+                logger.debug(f"主机协议执行失败，回退到adb命令行: {e}")
+
+        kwargs = {'creationflags': subprocess.CREATE_NO_WINDOW} if os.name == 'nt' else {}
+        result = subprocess.run([adb_path or self.adb_path, '-s', serial, 'shell', command],
+                                capture_output=True, text=True, encoding='utf-8', errors='ignore',
+                                timeout=timeout, **kwargs)
+        return result.returncode, result.stdout + result.stderr
+
+    # ------------------------------------------------------------------
+    # 输入法状态
+    # ------------------------------------------------------------------
+    def get_ime_state(self, serial: str) -> Optional[ImeState]:
+        """状态表中未过期的输入法状态"""
+        with self._lock:
+            state = self._ime_states.get(serial)
+        if state is not None and time.monotonic() - state.checked_at < self.ime_ttl:
+            return state
+        return None
+
+    def ensure_ime(self, serial: str, force: bool = False, timeout: float = 10.0,
+                   adb_path: Optional[str] = None) -> Tuple[bool, bool]:
+        """
+        确保 ADBKeyboard 已安装并为当前输入法
+
+        Returns:
+            (是否就绪, 是否来自状态表)
+        """
+        state = None if force else self.get_ime_state(serial)
+        if state is not None and state.installed and state.active:
+            self.ime_cache_hits += 1
+            return True, True
+
+        self.ime_checks += 1
+        _, output = self._shell(serial, _IME_SETUP_COMMAND, timeout, adb_path)
+        head, _, tail = output.partition(_IME_MARKER)
+        installed = f"package:{ADB_KEYBOARD_PACKAGE}" in head
+        active = installed and tail.strip() == ADB_KEYBOARD_IME
+        with self._lock:
+            self._ime_states[serial] = ImeState(installed, active, time.monotonic())
+        if not installed:
+            logger.warning(f"设备 {serial} 上ADBKeyboard未安装")
+        elif not active:
+            logger.warning(f"设备 {serial} 设置ADBKeyboard输入法失败，当前输入法: {tail.strip()}")
+        return active, False
+
+    def invalidate(self, serials: Optional[Iterable[str]] = None):
+        """清除输入法状态（None 为全部），设备重启或用户切换输入法后调用"""
+        with self._lock:
+            if serials is None:
+                self._ime_states.clear()
+            else:
+                for serial in serials:
+                    self._ime_states.pop(serial, None)
+
+    # ------------------------------------------------------------------
+    # 发送
+    # ------------------------------------------------------------------
+    def send_text(self, serial: str, text: str, timeout: float = 15.0,
+                  adb_path: Optional[str] = None) -> TextInputResult:
+        """向单台设备发送文本"""
+        result = TextInputResult(serial, False)
+        start = time.perf_counter()
+        try:
+            ready, result.ime_cached = self.ensure_ime(serial, timeout=min(timeout, 10.0), adb_path=adb_path)
+            result.ime_ms = (time.perf_counter() - start) * 1000
+            if not ready:
+                result.error = "ADBKeyboard未就绪"
+            else:
+                send_start = time.perf_counter()
+                text_b64 = base64.b64encode(text.encode('utf-8')).decode('ascii')
+                exit_code, output = self._shell(serial, _broadcast_command(text_b64, result.ime_cached),
+                                                timeout, adb_path)
+                if result.ime_cached and _IME_INACTIVE_MARKER in output and "Broadcasting" not in output:
+                    # 状态表中的状态已过时（输入法被切换），文本没有发出：重新设置输入法后再发送
+                    logger.info(f"设备 {serial} 当前输入法已不是ADBKeyboard，重新设置")
+                    self.stale_ime_states += 1
+                    self.invalidate([serial])
+                    ready, result.ime_cached = self.ensure_ime(serial, force=True, timeout=min(timeout, 10.0),
+                                                               adb_path=adb_path)
+                    if ready:
+                        exit_code, output = self._shell(serial, _broadcast_command(text_b64, False),
+                                                        timeout, adb_path)
+                result.send_ms = (time.perf_counter() - send_start) * 1000
+                if not ready:
+                    result.error = "ADBKeyboard未就绪"
+                else:
+                    # am broadcast 送达后输出 "Broadcast completed: result=..."
+                    result.success = exit_code == 0 and "result=" in output
+                    if not result.success:
+                        result.error = output.strip()[:200] or f"退出码 {exit_code}"
+        except subprocess.TimeoutExpired:
+            result.error = "超时"
+        except (AdbError, OSError) as e:
+            result.error = str(e)
+        result.elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self.sends += 1
+        if not result.success:
+            self.failures += 1
+            if result.ime_cached:
+                # 状态表中的输入法状态可能已过时（用户切换了输入法），下次重新检查
+                self.invalidate([serial])
+        return result
+
+    def broadcast(self, texts: Dict[str, str], timeout: float = 15.0,
+                  adb_path: Optional[str] = None) -> Dict[str, TextInputResult]:
+        """
+        并发向多台设备发送文本
+
+        Args:
+            texts: {设备序列号: 文本}，单组文本时各设备的文本相同
+            timeout: 整轮的截止时间（秒），未完成的设备结果为失败
+        """
+        start = time.perf_counter()
+        futures = {serial: self.executor.submit(self.send_text, serial, text, timeout, adb_path)
+                   for serial, text in texts.items()}
+        wait(list(futures.values()), timeout=timeout)
+
+        results: Dict[str, TextInputResult] = {}
+        for serial, future in futures.items():
+            if not future.done():
+                results[serial] = TextInputResult(serial, False, timeout * 1000, error="超过截止时间")
+            elif future.exception() is not None:
+                results[serial] = TextInputResult(serial, False, error=str(future.exception()))
+            else:
+                results[serial] = future.result()
+
+        self.last_broadcast_ms = (time.perf_counter() - start) * 1000
+        succeeded = sum(1 for result in results.values() if result.success)
+        logger.info(f"多设备文本输入: {succeeded}/{len(results)} 成功，耗时 {self.last_broadcast_ms:.1f}ms")
+        for result in results.values():
+            if not result.success:
+                logger.warning(f"设备 {result.serial} 文本输入失败: {result.error}")
+        return results
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            cached = len(self._ime_states)
+        return {
+            'sends': self.sends,
+            'failures': self.failures,
+            'ime_checks': self.ime_checks,
+            'ime_cache_hits': self.ime_cache_hits,
+            'stale_ime_states': self.stale_ime_states,
+            'cached_devices': cached,
+            'last_broadcast_ms': round(self.last_broadcast_ms, 2),
+        }
+
+
+_text_broadcaster: Optional[AdbTextBroadcaster] = None
+_text_broadcaster_lock = threading.Lock()
+
+
+def get_text_broadcaster() -> AdbTextBroadcaster:
+    """获取全局多设备文本输入器（输入法状态表在各窗口间共享）"""
+    global _text_broadcaster
+    if _text_broadcaster is None:
+        with _text_broadcaster_lock:
+            if _text_broadcaster is None:
+                _text_broadcaster = AdbTextBroadcaster()
+    return _text_broadcaster
+
+
+# ----------------------------------------------------------------------
+# 基准
+# ----------------------------------------------------------------------
+def _fake_ime_handler():
+    """假设备上的 pm / ime / settings 命令"""
+    state = {'ime': 'com.android.inputmethod.latin/.LatinIME'}
+
+    def handler(command: str):
+        if command.startswith('[ "$(settings get secure default_input_method)"'):
+            # _broadcast_command 的输入法确认
+            if state['ime'] != ADB_KEYBOARD_IME:
+                return f"{_IME_INACTIVE_MARKER}\n"
+            command = command.split('&& ', 1)[1].rsplit(' || ', 1)[0]
+        if command.startswith('pm list packages'):
+            return f"package:{ADB_KEYBOARD_PACKAGE}\n"
+        if command.startswith('ime set '):
+            state['ime'] = command.split()[-1]
+            return f"Input method {state['ime']} selected for user #0\n"
+        if command.startswith('ime enable '):
+            return f"Input method {command.split()[-1]}: already enabled for user #0\n"
+        if command == 'settings get secure default_input_method':
+            return state['ime'] + "\n"
+        if command.startswith('am broadcast'):
+            return "Broadcasting: Intent { act=ADB_INPUT_B64 flg=0x400000 }\nBroadcast completed: result=0\n"
+        return None
+    return handler
+
+
+def run_benchmark(devices: int = 20, device_latency_ms: float = 20.0, text: str = "测试文本 hello") -> Dict[str, float]:
+    """在假设备上对比：逐台执行（检查安装、enable、set、broadcast）/ 并发发送（首次和输入法状态命中）"""
+    from utils.fake_adb_server import FakeAdbDevice, FakeAdbServer
+
+    fakes = [FakeAdbDevice(f"127.0.0.1:{16384 + index * 32}", shell_handler=_fake_ime_handler(),
+                           command_latency=device_latency_ms / 1000.0) for index in range(devices)]
+    with FakeAdbServer(fakes) as server:
+        client = AdbClient(port=server.port)
+        text_b64 = base64.b64encode(text.encode('utf-8')).decode('ascii')
+
+        start = time.perf_counter()
+        for fake in fakes:
+            client.shell(fake.serial, f"pm list packages {ADB_KEYBOARD_PACKAGE}")
+            client.shell(fake.serial, f"ime enable {ADB_KEYBOARD_IME}")
+            client.shell(fake.serial, f"ime set {ADB_KEYBOARD_IME}")
+            client.shell(fake.serial, f"am broadcast -a ADB_INPUT_B64 --es msg {text_b64}")
+        sequential = time.perf_counter() - start
+
+        manager = AdbShellSessionManager(client)
+        broadcaster = AdbTextBroadcaster(manager, max_workers=devices)
+        texts = {fake.serial: text for fake in fakes}
+        first = broadcaster.broadcast(texts)
+        cold = broadcaster.last_broadcast_ms
+        broadcaster.broadcast(texts)
+        warm = broadcaster.last_broadcast_ms
+        broadcaster.shutdown()
+        manager.close_all()
+
+    return {
+        'sequential_ms': sequential * 1000,
+        'concurrent_cold_ms': cold,
+        'concurrent_warm_ms': warm,
+        'succeeded': sum(1 for result in first.values() if result.success),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="多设备并发文本输入基准（假设备）")
+    parser.add_argument('--devices', type=int, default=20, help="设备数")
+    parser.add_argument('--device-latency-ms', type=float, default=20.0, help="假设备每条命令的耗时（毫秒）")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(args.devices, args.device_latency_ms)
+    print(f"逐台执行:           {result['sequential_ms']:.1f} ms")
+    print(f"并发发送（首次）:   {result['concurrent_cold_ms']:.1f} ms (成功 {result['succeeded']} 台)")
+    print(f"并发发送（状态表）: {result['concurrent_warm_ms']:.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -2,9 +2,16 @@
 """
 先进的ADB连接管理器
 实现企业级ADB连接池、自动重连、健康监控等功能
+
+健康监控：
+- 到期的设备检查提交到一个复用的线程池并发执行，单台设备卡住不影响其他设备
+- 检查失败按设备指数退避（带抖动），模拟器重启后不会同时涌入大量重连
+- 每台设备一个熔断器：连续失败达到阈值后熔断（命令直接失败），退避到期后半开重试一次，成功后恢复
+- get_healthy_devices 直接读取缓存的状态，离线设备只登记检查请求，不阻塞调用方
 """
 
 import asyncio
+import random
 import threading
 import time
 import subprocess
@@ -17,6 +24,9 @@ import queue
 import weakref
 from pathlib import Path
 
+from utils.adb_client import AdbClient, AdbError, get_adb_client
+from utils.adb_shell_session import AdbShellTimeout, get_adb_shell_manager
+
 logger = logging.getLogger(__name__)
 
 
@@ -36,6 +46,13 @@ class ConnectionHealth(Enum):
     CRITICAL = "critical"
 
 
+class CircuitState(Enum):
+    """设备熔断器状态"""
+    CLOSED = "closed"  # 正常
+    OPEN = "open"  # 熔断：命令直接失败，等待退避到期
+    HALF_OPEN = "half_open"  # 退避到期，正在试探重连
+
+
 @dataclass
 class DeviceInfo:
     """设备信息"""
@@ -48,6 +65,10 @@ class DeviceInfo:
     success_count: int = 0
     health: ConnectionHealth = ConnectionHealth.HEALTHY
     properties: Dict[str, str] = field(default_factory=dict)
+    circuit: CircuitState = CircuitState.CLOSED
+    consecutive_failures: int = 0
+    next_check_at: float = 0.0  # 下次健康检查时间（time.monotonic）
+    last_check_ms: float = 0.0
 
 
 @dataclass
@@ -65,9 +86,14 @@ class ADBCommand:
 class AdvancedADBConnectionPool:
     """先进的ADB连接池"""
     
-    def __init__(self, max_connections: int = 50, health_check_interval: float = 30.0):
+    def __init__(self, max_connections: int = 50, health_check_interval: float = 30.0,
+                 failure_threshold: int = 3, backoff_base: float = 2.0, backoff_max: float = 120.0,
+                 health_workers: int = 8):
         self.max_connections = max_connections
         self.health_check_interval = health_check_interval
+        self.failure_threshold = failure_threshold  # 连续失败多少次后熔断
+        self.backoff_base = backoff_base  # 首次失败后的退避时间（秒）
+        self.backoff_max = backoff_max
         
         # 连接池
         self._connections: Dict[str, DeviceInfo] = {}
@@ -80,6 +106,9 @@ class AdvancedADBConnectionPool:
         # 健康监控
         self._health_monitor_thread = None
         self._health_monitor_running = False
+        self._health_executor = ThreadPoolExecutor(max_workers=health_workers, thread_name_prefix="ADB-Health")
+        self._health_inflight: Dict[str, Future] = {}
+        self._health_wakeup = threading.Event()
         
         # 统计信息
         self._stats = {
@@ -87,7 +116,10 @@ class AdvancedADBConnectionPool:
             'successful_commands': 0,
             'failed_commands': 0,
             'reconnections': 0,
-            'devices_discovered': 0
+            'devices_discovered': 0,
+            'health_checks': 0,
+            'health_check_failures': 0,
+            'circuit_opens': 0
         }
         
         # ADB路径缓存
@@ -154,6 +186,11 @@ class AdvancedADBConnectionPool:
         
         return self._adb_paths.get('generic')
     
+    def _native_client(self) -> Optional[AdbClient]:
+        """adb server 在监听时返回主机协议客户端（免去 adb.exe 进程启动），否则返回 None 回退到命令行"""
+        client = get_adb_client()
+        return client if client.is_server_available() else None
+
     def create_devices_from_list(self, device_list: List[str]) -> List[DeviceInfo]:
         """根据提供的设备列表创建DeviceInfo对象（职责：底层ADB操作）"""
         discovered_devices = []
@@ -171,18 +208,25 @@ class AdvancedADBConnectionPool:
                     status = self._check_mumu_device_status(device_id, adb_path)
                 else:
                     # 检查设备状态
-                    result = subprocess.run(
-                        [adb_path, '-s', device_id, 'get-state'],
-                        capture_output=True,
-                        text=True,
-                        timeout=5,
-                        creationflags=subprocess.CREATE_NO_WINDOW,
-                        encoding='utf-8',
-                        errors='ignore'
-                    )
+                    client = self._native_client()
+                    if client is not None:
+                        try:
+                            status_str = client.get_state(device_id)
+                        except (AdbError, OSError):
+                            status_str = None
+                    else:
+                        result = subprocess.run(
+                            [adb_path, '-s', device_id, 'get-state'],
+                            capture_output=True,
+                            text=True,
+                            timeout=5,
+                            creationflags=subprocess.CREATE_NO_WINDOW,
+                            encoding='utf-8',
+                            errors='ignore'
+                        )
+                        status_str = result.stdout.strip() if result.returncode == 0 else None
 
-                    if result.returncode == 0:
-                        status_str = result.stdout.strip()
+                    if status_str is not None:
                         if status_str == 'device':
                             status = DeviceStatus.ONLINE
                         elif status_str == 'offline':
@@ -453,6 +497,9 @@ class AdvancedADBConnectionPool:
             for device in devices:
                 if device.device_id not in self._connections:
                     self._connections[device.device_id] = device
+                    # 在线设备按正常间隔检查，其他设备立即检查
+                    if device.status == DeviceStatus.ONLINE:
+                        device.next_check_at = time.monotonic() + self.health_check_interval
                     self._stats['devices_discovered'] += 1
                     logger.info(f"发现新设备: {device.device_id} ({device.status.value})")
                 else:
@@ -462,6 +509,7 @@ class AdvancedADBConnectionPool:
                         logger.info(f"设备状态变更: {device.device_id} {existing.status.value} -> {device.status.value}")
                         existing.status = device.status
                     existing.last_seen = time.time()
+        self._health_wakeup.set()
 
     def _determine_adb_path_for_device(self, device_id: str) -> str:
         """根据设备ID确定应该使用的ADB路径（职责：ADB路径管理）"""
@@ -589,6 +637,8 @@ class AdvancedADBConnectionPool:
         device_info = self._connections.get(command.device_id)
         if not device_info:
             return False, "", "设备不在连接池中"
+        if device_info.circuit == CircuitState.OPEN:
+            return False, "", "设备连接已熔断，等待健康检查恢复"
         
         adb_path = device_info.adb_path
         full_command = [adb_path, '-s', command.device_id] + command.command
@@ -600,18 +650,22 @@ class AdvancedADBConnectionPool:
         start_time = time.time()
         
         try:
-            result = subprocess.run(
-                full_command,
-                capture_output=True,
-                text=True,
-                timeout=command.timeout,
-                creationflags=subprocess.CREATE_NO_WINDOW,
-                encoding='utf-8',
-                errors='ignore'
-            )
+            native_result = self._execute_shell_native(command)
+            if native_result is not None:
+                success, stdout, stderr = native_result
+            else:
+                result = subprocess.run(
+                    full_command,
+                    capture_output=True,
+                    text=True,
+                    timeout=command.timeout,
+                    creationflags=subprocess.CREATE_NO_WINDOW,
+                    encoding='utf-8',
+                    errors='ignore'
+                )
+                success, stdout, stderr = result.returncode == 0, result.stdout, result.stderr
             
             execution_time = time.time() - start_time
-            success = result.returncode == 0
             
             # 更新统计
             with self._connection_lock:
@@ -629,7 +683,7 @@ class AdvancedADBConnectionPool:
             # 更新设备健康状态
             self._update_device_health(device_info)
             
-            return success, result.stdout, result.stderr
+            return success, stdout, stderr
             
         except subprocess.TimeoutExpired:
             logger.warning(f"命令超时: {' '.join(full_command)}")
@@ -637,6 +691,8 @@ class AdvancedADBConnectionPool:
                 device_info.error_count += 1
                 self._stats['failed_commands'] += 1
                 self._stats['total_commands'] += 1
+            # 让健康监控尽快确认设备状态
+            self.request_health_check([command.device_id])
             return False, "", "命令执行超时"
             
         except Exception as e:
@@ -647,6 +703,22 @@ class AdvancedADBConnectionPool:
                 self._stats['total_commands'] += 1
             return False, "", str(e)
     
+    def _execute_shell_native(self, command: ADBCommand) -> Optional[Tuple[bool, str, str]]:
+        """shell 命令在设备的持久shell会话中执行；adb server 不可用或设备不在该 server 上时返回 None（回退到命令行）"""
+        if not command.command or command.command[0] != 'shell' or len(command.command) < 2:
+            return None
+        if self._native_client() is None:
+            return None
+        try:
+            exit_code, output = get_adb_shell_manager().run(command.device_id, ' '.join(command.command[1:]),
+                                                            timeout=command.timeout)
+        except AdbShellTimeout:
+            raise subprocess.TimeoutExpired(command.command, command.timeout)
+        except (AdbError, OSError) as e:
+            logger.debug(f"主机协议执行失败，回退到adb命令行 {command.device_id}: {e}")
+            return None
+        return exit_code == 0, output, ""
+
     def execute_command_async(self, command: ADBCommand) -> Future:
         """异步执行ADB命令"""
         future = self._executor.submit(self._execute_with_retry, command)
@@ -719,62 +791,153 @@ class AdvancedADBConnectionPool:
         logger.info("ADB健康监控已启动")
     
     def _health_monitor_loop(self):
-        """健康监控循环"""
+        """健康监控循环：只负责调度，检查在线程池中并发执行"""
         while self._health_monitor_running:
             try:
                 # 健康监控不再主动发现设备，只检查现有设备状态
                 # 设备发现由 intelligent_adb_connector 负责
-                
-                # 检查设备健康状态
-                with self._connection_lock:
-                    current_time = time.time()
-                    unhealthy_devices = []
-                    
-                    for device_id, device_info in self._connections.items():
-                        # 检查设备是否长时间未响应
-                        if current_time - device_info.last_seen > 300:  # 5分钟
-                            device_info.health = ConnectionHealth.CRITICAL
-                            unhealthy_devices.append(device_id)
-                        
-                        # 尝试重连不健康的设备
-                        if device_info.health in [ConnectionHealth.UNHEALTHY, ConnectionHealth.CRITICAL]:
-                            if device_info.status == DeviceStatus.OFFLINE:
-                                if self.attempt_device_connection(device_id, device_info.adb_path):
-                                    device_info.status = DeviceStatus.ONLINE
-                                    device_info.health = ConnectionHealth.HEALTHY
-                                    device_info.error_count = 0
-                                    self._stats['reconnections'] += 1
-                                    logger.info(f"设备重连成功: {device_id}")
-                
-                time.sleep(self.health_check_interval)
-                
+                delay = self._schedule_health_checks()
             except Exception as e:
                 logger.error(f"健康监控异常: {e}")
-                time.sleep(5)
-    
-    def get_healthy_devices(self) -> List[DeviceInfo]:
-        """获取健康的设备列表，智能处理离线设备"""
+                delay = 5.0
+            self._health_wakeup.wait(delay)
+            self._health_wakeup.clear()
+
+    def _schedule_health_checks(self) -> float:
+        """提交到期的设备检查，返回距离下一次到期的秒数"""
+        now = time.monotonic()
+        next_due = now + self.health_check_interval
+        due = []
         with self._connection_lock:
-            healthy = []
-            offline_devices = []
-
-            for device in self._connections.values():
-                # 收集离线设备
-                if device.status == DeviceStatus.OFFLINE:
-                    offline_devices.append(device)
-                # 收集健康的在线设备
-                elif (device.status == DeviceStatus.ONLINE and
-                      device.health in [ConnectionHealth.HEALTHY, ConnectionHealth.DEGRADED]):
-                    healthy.append(device)
-
-            # 如果有离线设备，尝试批量重连
-            if offline_devices:
-                logger.info(f"🔄 发现 {len(offline_devices)} 个离线设备，尝试批量重连...")
-                reconnected = self._batch_reconnect_devices(offline_devices)
-                healthy.extend(reconnected)
-
-                if reconnected:
-                    logger.info(f"✅ 成功重连 {len(reconnected)} 个设备")
+            for device_id, device_info in self._connections.items():
+                # 检查设备是否长时间未响应
+                if time.time() - device_info.last_seen > 300:  # 5分钟
+                    device_info.health = ConnectionHealth.CRITICAL
+                if device_id in self._health_inflight:
+                    continue
+                if device_info.next_check_at > now:
+                    next_due = min(next_due, device_info.next_check_at)
+                    continue
+                if device_info.circuit == CircuitState.OPEN:
+                    device_info.circuit = CircuitState.HALF_OPEN
+                due.append(device_info)
+
+            for device_info in due:
+                future = self._health_executor.submit(self._check_device_health, device_info)
+                self._health_inflight[device_info.device_id] = future
+                future.add_done_callback(lambda f, d=device_info: self._on_health_checked(d, f))
+
+        return max(0.05, next_due - time.monotonic())
+
+    def _check_device_health(self, device: DeviceInfo) -> bool:
+        """检查单台设备：离线或半开的设备尝试重连，在线设备查询状态"""
+        started = time.perf_counter()
+        try:
+            if device.status != DeviceStatus.ONLINE or device.circuit == CircuitState.HALF_OPEN:
+                return self._try_reconnect_device(device)
+            return self._probe_device_state(device)
+        finally:
+            device.last_check_ms = (time.perf_counter() - started) * 1000
+
+    def _probe_device_state(self, device: DeviceInfo) -> bool:
+        """查询设备状态是否为 device"""
+        client = self._native_client()
+        if client is not None:
+            try:
+                return client.get_state(device.device_id) == 'device'
+            except (AdbError, OSError) as e:
+                logger.debug(f"主机协议查询设备状态失败 {device.device_id}: {e}")
+                return False
+        result = subprocess.run(
+            [device.adb_path, '-s', device.device_id, 'get-state'],
+            capture_output=True,
+            text=True,
+            timeout=5,
+            creationflags=subprocess.CREATE_NO_WINDOW,
+            encoding='utf-8',
+            errors='ignore'
+        )
+        return result.returncode == 0 and result.stdout.strip() == 'device'
+
+    def _on_health_checked(self, device: DeviceInfo, future: Future):
+        """记录检查结果，更新熔断器和下次检查时间"""
+        error = None if future.cancelled() else future.exception()
+        healthy = not future.cancelled() and error is None and bool(future.result())
+        if error is not None:
+            logger.debug(f"设备健康检查异常 {device.device_id}: {error}")
+
+        with self._connection_lock:
+            self._health_inflight.pop(device.device_id, None)
+            self._stats['health_checks'] += 1
+            now = time.monotonic()
+            if healthy:
+                recovered = device.status != DeviceStatus.ONLINE or device.circuit != CircuitState.CLOSED
+                device.status = DeviceStatus.ONLINE
+                device.circuit = CircuitState.CLOSED
+                device.consecutive_failures = 0
+                device.last_seen = time.time()
+                device.next_check_at = now + self.health_check_interval * random.uniform(0.9, 1.1)
+                if recovered:
+                    device.health = ConnectionHealth.HEALTHY
+                    device.error_count = 0
+                    self._stats['reconnections'] += 1
+                    logger.info(f"设备重连成功: {device.device_id}")
+                return
+
+            self._stats['health_check_failures'] += 1
+            device.consecutive_failures += 1
+            if device.circuit == CircuitState.HALF_OPEN or device.consecutive_failures >= self.failure_threshold:
+                if device.circuit == CircuitState.CLOSED:
+                    self._stats['circuit_opens'] += 1
+                    logger.warning(f"设备连续 {device.consecutive_failures} 次检查失败，熔断: {device.device_id}")
+                device.circuit = CircuitState.OPEN
+                device.status = DeviceStatus.OFFLINE
+                device.health = ConnectionHealth.CRITICAL
+            device.next_check_at = now + self._backoff_delay(device.consecutive_failures)
+
+    def _backoff_delay(self, failures: int) -> float:
+        """指数退避（一半固定、一半随机抖动）"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** max(0, failures - 1)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def request_health_check(self, device_ids: List[str]):
+        """请求尽快检查设备（熔断中的设备仍按退避时间检查）"""
+        with self._connection_lock:
+            for device_id in device_ids:
+                device_info = self._connections.get(device_id)
+                if device_info is not None and device_info.circuit == CircuitState.CLOSED:
+                    device_info.next_check_at = 0.0
+        self._health_wakeup.set()
+
+    def get_healthy_devices(self, wait: float = 0.0) -> List[DeviceInfo]:
+        """
+        获取健康的设备列表（读取缓存的健康状态，不阻塞）
+
+        离线设备只登记检查请求，由健康监控并发重连；wait > 0 时最多等待 wait 秒让这些检查完成。
+        """
+        with self._connection_lock:
+            offline_devices = [device.device_id for device in self._connections.values()
+                               if device.status == DeviceStatus.OFFLINE or device.circuit != CircuitState.CLOSED]
+
+        # 离线设备交给健康监控重连
+        if offline_devices:
+            logger.debug(f"🔄 {len(offline_devices)} 个离线设备等待健康监控重连: {offline_devices}")
+            self.request_health_check(offline_devices)
+            if wait > 0:
+                deadline = time.monotonic() + wait
+                while time.monotonic() < deadline:
+                    with self._connection_lock:
+                        pending = [device_id for device_id in offline_devices
+                                   if device_id in self._health_inflight or
+                                   self._connections[device_id].next_check_at == 0.0]
+                    if not pending:
+                        break
+                    time.sleep(0.05)
+
+        with self._connection_lock:
+            healthy = [device for device in self._connections.values()
+                       if device.status == DeviceStatus.ONLINE and device.circuit != CircuitState.OPEN and
+                       device.health in [ConnectionHealth.HEALTHY, ConnectionHealth.DEGRADED]]
 
             # 去重处理（避免端口重复映射的设备）
             unique_healthy = self._deduplicate_devices(healthy)
@@ -789,6 +952,14 @@ class AdvancedADBConnectionPool:
         try:
             # 对于网络设备，尝试重新连接
             if '127.0.0.1:' in device.device_id:
+                client = self._native_client()
+                if client is not None:
+                    try:
+                        connected, _ = client.connect_device(device.device_id)
+                        return connected and client.shell_with_status(device.device_id, 'echo test', timeout=5)[0] == 0
+                    except (AdbError, OSError) as e:
+                        logger.debug(f"主机协议重连失败，回退到adb命令行 {device.device_id}: {e}")
+
                 result = subprocess.run(
                     [device.adb_path, 'connect', device.device_id],
                     capture_output=True,
@@ -818,20 +989,6 @@ class AdvancedADBConnectionPool:
             logger.debug(f"设备重连失败 {device.device_id}: {e}")
             return False
 
-    def _batch_reconnect_devices(self, offline_devices: List[DeviceInfo]) -> List[DeviceInfo]:
-        """批量重连离线设备"""
-        reconnected = []
-
-        for device in offline_devices:
-            if self._try_reconnect_device(device):
-                device.status = DeviceStatus.ONLINE
-                device.health = ConnectionHealth.HEALTHY
-                device.error_count = 0
-                reconnected.append(device)
-                logger.info(f"✅ 设备重连成功: {device.device_id}")
-
-        return reconnected
-
     def _deduplicate_devices(self, devices: List[DeviceInfo]) -> List[DeviceInfo]:
         """去重设备列表，根据模拟器类型过滤端口"""
         if not devices:
@@ -1017,6 +1174,10 @@ class AdvancedADBConnectionPool:
                 device_stats[device_id] = {
                     'status': device_info.status.value,
                     'health': device_info.health.value,
+                    'circuit': device_info.circuit.value,
+                    'consecutive_failures': device_info.consecutive_failures,
+                    'next_check_in': max(0.0, device_info.next_check_at - time.monotonic()),
+                    'last_check_ms': device_info.last_check_ms,
                     'connection_count': device_info.connection_count,
                     'success_count': device_info.success_count,
                     'error_count': device_info.error_count,
@@ -1035,10 +1196,13 @@ class AdvancedADBConnectionPool:
         logger.info("关闭ADB连接池...")
         
         self._health_monitor_running = False
+        self._health_wakeup.set()
         if self._health_monitor_thread:
             self._health_monitor_thread.join(timeout=5)
         
+        self._health_executor.shutdown(wait=False)
         self._executor.shutdown(wait=True)
+        get_adb_shell_manager().close_all()
         logger.info("ADB连接池已关闭")
 
 
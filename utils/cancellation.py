@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+"""
+基于 threading.Event 的取消令牌
+每个执行器持有一个令牌，所有可中断等待都通过 Event.wait(timeout) 实现：
+- 停止请求立即唤醒所有等待，不再每0.1秒轮询 stop_checker
+- 令牌本身可调用（返回是否已取消），可以直接作为 stop_checker 传给任务模块
+- 执行器线程会登记当前令牌，未传入 stop_checker 的等待也能被停止
+
+运行 `python -m utils.cancellation` 可测量从执行器 request_stop() 到执行结束回调的延迟：
+工作流为 起点 -> 延迟 卡片，延迟卡片在 interruptible_sleep 中等待时请求停止。
+"""
+
+import logging
+import statistics
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Union
+
+logger = logging.getLogger(__name__)
+
+
+class CancellationToken:
+    """取消令牌（可派生子令牌：父令牌取消时子令牌一并取消）"""
+
+    __slots__ = ('_event', 'reason', '_children', '_lock')
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+        self._children: Set['CancellationToken'] = set()
+        self._lock = threading.Lock()
+
+    def cancel(self, reason: Optional[str] = None):
+        """请求取消（唤醒所有等待者，并取消所有子令牌）"""
+        with self._lock:
+            self.reason = reason
+            self._event.set()
+            children = list(self._children)
+        for child in children:
+            child.cancel(reason)
+
+    def reset(self):
+        """重置为未取消状态（执行器重新运行时调用）"""
+        with self._lock:
+            self.reason = None
+            self._event.clear()
+            self._children.clear()
+
+    def create_child(self) -> 'CancellationToken':
+        """派生子令牌（例如并行分支各自的令牌），父令牌已取消时子令牌直接处于取消状态"""
+        child = CancellationToken()
+        with self._lock:
+            if self._event.is_set():
+                child.cancel(self.reason)
+            else:
+                self._children.add(child)
+        return child
+
+    def release_child(self, child: 'CancellationToken'):
+        """解除子令牌关联（子令牌用完后调用）"""
+        with self._lock:
+            self._children.discard(child)
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def __call__(self) -> bool:
+        """兼容 stop_checker 接口"""
+        return self._event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待至多 timeout 秒，被取消时立即返回 True"""
+        return self._event.wait(timeout)
+
+
+StopChecker = Union[CancellationToken, Callable[[], bool], None]
+
+# 无法唤醒的普通 stop_checker 的回退轮询间隔（秒）
+_FALLBACK_POLL_INTERVAL = 0.1
+
+# 当前线程的令牌（由执行器在运行期间登记）
+_current = threading.local()
+
+
+def set_current_token(token: Optional[CancellationToken]):
+    """登记当前线程的取消令牌"""
+    _current.token = token
+
+
+def get_current_token() -> Optional[CancellationToken]:
+    """获取当前线程的取消令牌"""
+    return getattr(_current, 'token', None)
+
+
+def wait_interruptibly(duration: float, stop_checker: StopChecker = None) -> bool:
+    """
+    可中断的等待
+
+    Args:
+        duration: 等待时长（秒）
+        stop_checker: 取消令牌或返回是否停止的函数；为空时使用当前线程登记的令牌
+
+    Returns:
+        bool: 等待是否被停止请求中断
+    """
+    if stop_checker is None:
+        stop_checker = get_current_token()
+
+    wait = getattr(stop_checker, 'wait', None)
+    if wait is not None:
+        if duration <= 0:
+            return stop_checker()
+        return wait(duration)
+
+    if stop_checker is None:
+        if duration > 0:
+            time.sleep(duration)
+        return False
+
+    # 普通函数无法被唤醒：若当前线程有令牌则在令牌上等待，否则回退为分片轮询
+    token = get_current_token()
+    deadline = time.monotonic() + duration
+    while True:
+        if stop_checker():
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        if token is not None:
+            if token.wait(remaining):
+                return True
+        else:
+            time.sleep(min(_FALLBACK_POLL_INTERVAL, remaining))
+
+
+# ----------------------------------------------------------------------
+# 停止延迟测量
+# ----------------------------------------------------------------------
+def measure_stop_latency(trials: int = 20, delay_seconds: float = 5.0, stop_after: float = 0.2,
+                         max_latency_ms: float = 50.0) -> Dict[str, float]:
+    """
+    测量从执行器请求停止到执行结束回调的延迟
+
+    每次运行一个真实工作流（起点 -> 延迟卡片，假窗口后端），延迟卡片在 interruptible_sleep 中等待时
+    调用 request_stop()，记录到 execution_finished 回调的时间。
+
+    Args:
+        trials: 测量次数
+        delay_seconds: 延迟卡片的等待时长（远大于停止时刻）
+        stop_after: 开始运行后多久请求停止（此时延迟卡片正在等待）
+        max_latency_ms: 延迟上限，结果中的 within_bound 表示最大延迟是否不超过该值
+    """
+    from task_workflow.execution_backend import FakeWindowBackend
+    from task_workflow.headless_executor import ExecutionListener, HeadlessWorkflowExecutor
+    from tasks import delay_task, start_task
+
+    class _FinishedListener(ExecutionListener):
+        def __init__(self):
+            self.finished = threading.Event()
+            self.finished_at = 0.0
+            self.message = ""
+
+        def execution_finished(self, message: str):
+            self.finished_at = time.perf_counter()
+            self.message = message
+            self.finished.set()
+
+    cards = {
+        1: {'id': 1, 'task_type': '起点', 'parameters': {}},
+        2: {'id': 2, 'task_type': delay_task.TASK_NAME,
+            'parameters': {'delay_mode': 'fixed', 'fixed_delay': delay_seconds}},
+    }
+    connections = [{'start_card_id': 1, 'end_card_id': 2, 'type': 'sequential'}]
+    task_modules = {'起点': start_task, delay_task.TASK_NAME: delay_task}
+    hwnd = 1
+
+    latencies: List[float] = []
+    for _ in range(trials):
+        listener = _FinishedListener()
+        executor = HeadlessWorkflowExecutor(cards, connections, task_modules, execution_mode='background',
+                                            start_card_id=1, target_hwnd=hwnd,
+                                            backend=FakeWindowBackend({hwnd: [_blank_frame()]}),
+                                            listener=listener)
+        thread = threading.Thread(target=executor.run, daemon=True)
+        thread.start()
+        time.sleep(stop_after)
+        stop_at = time.perf_counter()
+        executor.request_stop()
+        if not listener.finished.wait(delay_seconds + 1):
+            raise RuntimeError("停止后执行器未结束")
+        thread.join(1)
+        latencies.append((listener.finished_at - stop_at) * 1000)
+
+    latencies.sort()
+    return {
+        'trials': trials,
+        'mean_ms': statistics.mean(latencies),
+        'p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        'max_ms': latencies[-1],
+        'max_latency_ms': max_latency_ms,
+        'within_bound': latencies[-1] <= max_latency_ms,
+    }
+
+
+def _blank_frame():
+    import numpy as np
+    return np.zeros((64, 64, 3), dtype=np.uint8)
+
+
+if __name__ == '__main__':
+    import sys
+    logging.basicConfig(level=logging.WARNING)
+    from task_workflow.workflow_checkpoint import get_checkpoint_settings
+    get_checkpoint_settings().enabled = False  # 测量时被停止的工作流不写检查点
+    result = measure_stop_latency()
+    print(f"停止延迟: 平均 {result['mean_ms']:.2f} ms, P95 {result['p95_ms']:.2f} ms, "
+          f"最大 {result['max_ms']:.2f} ms ({result['trials']} 次), 上限 {result['max_latency_ms']:.0f} ms: "
+          f"{'通过' if result['within_bound'] else '超出'}")
+    sys.exit(0 if result['within_bound'] else 1)
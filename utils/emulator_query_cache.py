@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+模拟器管理器查询缓存
+MuMuManager.exe / ldconsole.exe 每次查询都要启动一个进程（几十到几百毫秒），多个窗口同时执行卡片时还会重复查询同样的内容。
+管理器查询统一经过这里：
+- 结果按键缓存 TTL 秒（启动/关闭/改分辨率等操作后由管理器显式失效）
+- 多个线程同时发起相同的查询时只执行一次，其他线程等待并共享结果
+- 查询进行中发生失效时，该结果只返回给本轮等待者，不写入缓存
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _InFlight:
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class EmulatorQueryCache:
+    """带 TTL 的查询缓存，合并相同的并发查询"""
+
+    def __init__(self, name: str = "", default_ttl: float = 2.0):
+        self.name = name
+        self.default_ttl = default_ttl
+        self._entries: Dict[Hashable, tuple] = {}  # 键 -> (值, 过期时间)
+        self._inflight: Dict[Hashable, _InFlight] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None,
+            force: bool = False, cache_empty: bool = True,
+            cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        取缓存的查询结果，没有或已过期时调用 loader
+
+        Args:
+            force: 忽略缓存重新查询（仍与进行中的相同查询合并）
+            cache_empty: 是否缓存空结果（None / 空容器）；管理器临时失败时不应缓存
+            cacheable: 判断结果是否写入缓存（例如只缓存返回码为 0 的命令结果）
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        with self._lock:
+            entry = self._entries.get(key)
+            if not force and entry is not None and entry[1] > time.monotonic():
+                self.hits += 1
+                return entry[0]
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                inflight = self._inflight[key] = _InFlight()
+                generation = self._generation
+                self.misses += 1
+                leader = True
+
+        if not leader:
+            inflight.event.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            return inflight.value
+
+        try:
+            inflight.value = loader()
+        except BaseException as e:
+            inflight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if (inflight.error is None and generation == self._generation and ttl > 0 and
+                        (cache_empty or inflight.value) and (cacheable is None or cacheable(inflight.value))):
+                    self._entries[key] = (inflight.value, time.monotonic() + ttl)
+            inflight.event.set()
+        return inflight.value
+
+    def peek(self, key: Hashable) -> Any:
+        """取未过期的缓存值（不触发查询），没有时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry is not None and entry[1] > time.monotonic() else None
+
+    def invalidate(self, match: Optional[Callable[[Hashable], bool]] = None):
+        """清除匹配的缓存（None 为全部）；进行中的查询结果不再写入缓存"""
+        with self._lock:
+            if match is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if match(key)]:
+                    del self._entries[key]
+            self._generation += 1
+            self.invalidations += 1
+        logger.debug(f"{self.name}查询缓存已失效")
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'invalidations': self.invalidations,
+            }
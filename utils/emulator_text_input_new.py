@@ -12,6 +12,10 @@ import subprocess
 import logging
 from typing import Optional, Dict, Any
 
+from utils.adb_client import AdbError, get_adb_client
+from utils.adb_shell_session import run_adb_command
+from utils.adb_text_broadcast import TextInputResult, get_text_broadcaster
+
 logger = logging.getLogger(__name__)
 
 # 导入新的按键映射模块
@@ -208,8 +212,7 @@ class EmulatorTextInputManager:
                     try:
                         cmd = [adb_path, '-s', device_id, 'shell', 'am', 'broadcast',
                                '-a', 'ADB_INPUT_B64', '--es', 'msg', text_b64]
-                        result = subprocess.run(cmd, capture_output=True, text=True, timeout=15,
-                                              creationflags=subprocess.CREATE_NO_WINDOW)
+                        result = run_adb_command(cmd, timeout=15)
 
                         if result.returncode == 0:
                             logger.info(f"✅ Base64输入成功: 窗口{window_index}->设备{device_id}")
@@ -243,8 +246,7 @@ class EmulatorTextInputManager:
                     subprocess.CREATE_NEW_PROCESS_GROUP
                 )
 
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=15,
-                                      creationflags=creation_flags, startupinfo=startupinfo)
+                result = run_adb_command(cmd, timeout=15, creationflags=creation_flags, startupinfo=startupinfo)
 
                 if result.returncode == 0:
                     logger.info(f"✅ Base64多组输入成功: 窗口{window_index}->设备{device_id}")
@@ -289,8 +291,7 @@ class EmulatorTextInputManager:
                     try:
                         cmd = [adb_path, '-s', device_id, 'shell', 'am', 'broadcast',
                                '-a', 'ADB_INPUT_CHARS', '--eia', 'chars', char_codes_str]
-                        result = subprocess.run(cmd, capture_output=True, text=True, timeout=15,
-                                              creationflags=subprocess.CREATE_NO_WINDOW)
+                        result = run_adb_command(cmd, timeout=15)
 
                         if result.returncode == 0:
                             logger.info(f"✅ Unicode输入成功: 窗口{window_index}->设备{device_id}")
@@ -313,8 +314,7 @@ class EmulatorTextInputManager:
 
                 cmd = [adb_path, '-s', device_id, 'shell', 'am', 'broadcast',
                        '-a', 'ADB_INPUT_CHARS', '--eia', 'chars', char_codes_str]
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=15,
-                                      creationflags=subprocess.CREATE_NO_WINDOW)
+                result = run_adb_command(cmd, timeout=15)
 
                 if result.returncode == 0:
                     logger.info(f"✅ Unicode多组输入成功: 窗口{window_index}->设备{device_id}")
@@ -374,21 +374,12 @@ class EmulatorTextInputManager:
 
                 logger.info(f"多设备单组文字输入: 窗口{window_index}->设备{target_device}")
 
-                # 确保ADBKeyboard已安装并设置
-                if not self._ensure_adb_keyboard_ready(adb_path, target_device):
-                    logger.debug(f"设备 {target_device} ADBKeyboard准备失败")
-                    return False
-
-                cmd = [adb_path, '-s', target_device, 'shell', 'am', 'broadcast',
-                       '-a', 'ADB_INPUT_TEXT', '--es', 'msg', text]
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=15,
-                                      creationflags=subprocess.CREATE_NO_WINDOW)
-
-                if result.returncode == 0:
-                    logger.info(f"✅ 多设备单组文字输入成功: 窗口{window_index}->设备{target_device}")
+                result = get_text_broadcaster().send_text(target_device, text, adb_path=adb_path)
+                if result.success:
+                    logger.info(f"✅ 多设备单组文字输入成功: 窗口{window_index}->设备{target_device} ({result.elapsed_ms:.0f}ms)")
                     return True
                 else:
-                    logger.debug(f"多设备单组文字输入失败: {result.stderr}")
+                    logger.debug(f"多设备单组文字输入失败: {result.error}")
                     return False
             else:
                 # 单设备情况：只让第一个窗口发送，其他窗口模拟成功
@@ -398,21 +389,12 @@ class EmulatorTextInputManager:
                     # 第一个窗口：实际发送
                     logger.info(f"单设备单组文字输入: 窗口{window_index}实际发送到设备{base_device}")
 
-                    # 确保ADBKeyboard已安装并设置
-                    if not self._ensure_adb_keyboard_ready(adb_path, base_device):
-                        logger.debug(f"设备 {base_device} ADBKeyboard准备失败")
-                        return False
-
-                    cmd = [adb_path, '-s', base_device, 'shell', 'am', 'broadcast',
-                           '-a', 'ADB_INPUT_TEXT', '--es', 'msg', text]
-                    result = subprocess.run(cmd, capture_output=True, text=True, timeout=15,
-                                          creationflags=subprocess.CREATE_NO_WINDOW)
-
-                    if result.returncode == 0:
-                        logger.info(f"✅ 单设备单组文字输入成功: 窗口{window_index}->设备{base_device}")
+                    result = get_text_broadcaster().send_text(base_device, text, adb_path=adb_path)
+                    if result.success:
+                        logger.info(f"✅ 单设备单组文字输入成功: 窗口{window_index}->设备{base_device} ({result.elapsed_ms:.0f}ms)")
                         return True
                     else:
-                        logger.debug(f"单设备单组文字输入失败: {result.stderr}")
+                        logger.debug(f"单设备单组文字输入失败: {result.error}")
                         return False
                 else:
                     # 其他窗口：模拟成功，避免重复输入
@@ -439,21 +421,12 @@ class EmulatorTextInputManager:
             else:
                 device_id = devices[window_index % len(devices)]
 
-            # 确保ADBKeyboard已安装并设置
-            if not self._ensure_adb_keyboard_ready(adb_path, device_id):
-                logger.debug(f"设备 {device_id} ADBKeyboard准备失败")
-                return False
-
-            cmd = [adb_path, '-s', device_id, 'shell', 'am', 'broadcast',
-                   '-a', 'ADB_INPUT_TEXT', '--es', 'msg', text]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=15,
-                                  creationflags=subprocess.CREATE_NO_WINDOW)
-
-            if result.returncode == 0:
-                logger.info(f"✅ ADBKeyboard增强多组输入成功: 窗口{window_index}->设备{device_id}")
+            result = get_text_broadcaster().send_text(device_id, text, adb_path=adb_path)
+            if result.success:
+                logger.info(f"✅ ADBKeyboard增强多组输入成功: 窗口{window_index}->设备{device_id} ({result.elapsed_ms:.0f}ms)")
                 return True
             else:
-                logger.debug(f"ADBKeyboard增强多组输入失败: {result.stderr}")
+                logger.debug(f"ADBKeyboard增强多组输入失败: {result.error}")
                 return False
 
         except Exception as e:
@@ -461,34 +434,27 @@ class EmulatorTextInputManager:
             return False
 
     def _ensure_adb_keyboard_ready(self, adb_path: str, device_id: str) -> bool:
-        """确保ADBKeyboard已安装、启用并设置为当前输入法"""
+        """确保ADBKeyboard已安装、启用并设置为当前输入法（状态表 TTL 内不重复查询）"""
         try:
-            # 检查是否已安装
-            if not self._check_adb_keyboard_installed(adb_path, device_id):
-                logger.debug(f"设备 {device_id} 上ADBKeyboard未安装")
-                return False
-
-            # 启用ADBKeyboard
-            enable_cmd = [adb_path, '-s', device_id, 'shell', 'ime', 'enable', 'com.android.adbkeyboard/.AdbIME']
-            result = subprocess.run(enable_cmd, capture_output=True, text=True, timeout=10,
-                                  creationflags=subprocess.CREATE_NO_WINDOW)
-
-            # 设置为当前输入法
-            set_cmd = [adb_path, '-s', device_id, 'shell', 'ime', 'set', 'com.android.adbkeyboard/.AdbIME']
-            result = subprocess.run(set_cmd, capture_output=True, text=True, timeout=10,
-                                  creationflags=subprocess.CREATE_NO_WINDOW)
-
-            if result.returncode == 0:
-                logger.debug(f"设备 {device_id} ADBKeyboard设置成功")
-                return True
-            else:
-                logger.debug(f"设备 {device_id} ADBKeyboard设置失败: {result.stderr}")
-                return False
-
+            ready, _ = get_text_broadcaster().ensure_ime(device_id, adb_path=adb_path)
+            return ready
         except Exception as e:
             logger.debug(f"设备 {device_id} ADBKeyboard准备异常: {e}")
             return False
 
+    def broadcast_text(self, texts: Dict[str, str], timeout: float = 15.0) -> Dict[str, TextInputResult]:
+        """
+        并发向多台设备输入文本
+
+        Args:
+            texts: {设备序列号: 文本}，单组文本时各设备的文本相同
+            timeout: 整轮的截止时间（秒）
+
+        Returns:
+            {设备序列号: TextInputResult}，包含是否成功、输入法准备/发送/总耗时和错误信息
+        """
+        return get_text_broadcaster().broadcast(texts, timeout, self._find_adb_program())
+
     def _create_virtual_adb_devices(self, adb_path: str, window_count: int) -> list:
         """创建虚拟ADB设备连接 - 通过端口转发实现多连接"""
         try:
@@ -514,14 +480,12 @@ class EmulatorTextInputManager:
                     # 创建端口转发
                     forward_cmd = [adb_path, '-s', base_device, 'forward',
                                  f'tcp:{virtual_port}', f'tcp:5555']
-                    result = subprocess.run(forward_cmd, capture_output=True, text=True, timeout=10,
-                                          creationflags=subprocess.CREATE_NO_WINDOW)
+                    result = run_adb_command(forward_cmd, timeout=10)
 
                     if result.returncode == 0:
                         # 连接到虚拟设备
                         connect_cmd = [adb_path, 'connect', virtual_device]
-                        result = subprocess.run(connect_cmd, capture_output=True, text=True, timeout=10,
-                                              creationflags=subprocess.CREATE_NO_WINDOW)
+                        result = run_adb_command(connect_cmd, timeout=10)
 
                         if result.returncode == 0:
                             virtual_devices.append(virtual_device)
@@ -554,8 +518,7 @@ class EmulatorTextInputManager:
                     try:
                         # 断开连接
                         disconnect_cmd = [adb_path, 'disconnect', device]
-                        subprocess.run(disconnect_cmd, capture_output=True, text=True, timeout=5,
-                                     creationflags=subprocess.CREATE_NO_WINDOW)
+                        run_adb_command(disconnect_cmd, timeout=5)
                         logger.debug(f"清理虚拟设备: {device}")
                     except:
                         pass
@@ -590,8 +553,7 @@ class EmulatorTextInputManager:
                 for device_id in devices:
                     try:
                         cmd = [adb_path, '-s', device_id, 'shell', 'input', 'text', escaped_text]
-                        result = subprocess.run(cmd, capture_output=True, text=True, timeout=10,
-                                              creationflags=subprocess.CREATE_NO_WINDOW)
+                        result = run_adb_command(cmd, timeout=10)
 
                         if result.returncode == 0:
                             logger.info(f"✅ 通用ADB输入成功: 窗口{window_index}->设备{device_id}")
@@ -613,8 +575,7 @@ class EmulatorTextInputManager:
                     device_id = devices[window_index % len(devices)]
 
                 cmd = [adb_path, '-s', device_id, 'shell', 'input', 'text', escaped_text]
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=10,
-                                      creationflags=subprocess.CREATE_NO_WINDOW)
+                result = run_adb_command(cmd, timeout=10)
 
                 if result.returncode == 0:
                     logger.info(f"✅ 通用ADB多组输入成功: 窗口{window_index}->设备{device_id}")
@@ -697,8 +658,7 @@ class EmulatorTextInputManager:
 
             # 执行ADB输入命令
             cmd = [adb_path, '-s', device_id, 'shell', 'input', 'text', escaped_text]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10,
-                                  creationflags=subprocess.CREATE_NO_WINDOW)
+            result = run_adb_command(cmd, timeout=10)
 
             if result.returncode == 0:
                 logger.info(f"通用ADB文本输入成功: {text} -> 设备{device_id}")
@@ -798,81 +758,17 @@ class EmulatorTextInputManager:
                 window_index = self._get_window_index_for_hwnd(hwnd)
                 logger.info(f"单组文字输入: 窗口{window_index}给所有{len(devices)}个设备发送文字'{text}'")
 
-                success_count = 0
-                for i, device_id in enumerate(devices):
-                    try:
-                        # 检查ADBKeyboard是否已安装
-                        if not self._check_adb_keyboard_installed(adb_path, device_id):
-                            logger.warning(f"设备 {device_id} 上ADBKeyboard未安装，跳过")
-                            continue
-
-                        # 设置ADBKeyboard为当前输入法
-                        if not self._set_adb_keyboard_ime(adb_path, device_id):
-                            logger.warning(f"设备 {device_id} 设置ADBKeyboard输入法失败，跳过")
-                            continue
-
-                        # 发送中文文本
-                        logger.info(f"窗口{window_index}向设备{device_id}发送文字: '{text}'")
-                        cmd = [adb_path, '-s', device_id, 'shell', 'am', 'broadcast', '-a', 'ADB_INPUT_TEXT', '--es', 'msg', text]
-                        result = subprocess.run(cmd, capture_output=True, text=True, timeout=15,
-                                              creationflags=subprocess.CREATE_NO_WINDOW)
-
-                        if result.returncode == 0:
-                            logger.info(f"✅ 窗口{window_index}->设备{device_id}输入成功: '{text}'")
-                            success_count += 1
-                        else:
-                            logger.error(f"❌ 窗口{window_index}->设备{device_id}输入失败: {result.stderr}")
-
-                    except Exception as e:
-                        logger.error(f"❌ 窗口{window_index}->设备{device_id}处理异常: {e}")
-                        continue
-
-                # 只要有一个设备成功就算成功
-                return success_count > 0
-                for device_id in devices:
-                    try:
-                        logger.info(f"=== 处理设备 {device_id} ===")
-
-                        # 检查ADBKeyboard是否已安装
-                        keyboard_installed = self._check_adb_keyboard_installed(adb_path, device_id)
-                        logger.info(f"设备 {device_id} ADBKeyboard安装状态: {keyboard_installed}")
-                        if not keyboard_installed:
-                            logger.warning(f"设备 {device_id} 上ADBKeyboard未安装，跳过")
-                            continue
-
-                        # 设置ADBKeyboard为当前输入法
-                        ime_set = self._set_adb_keyboard_ime(adb_path, device_id)
-                        logger.info(f"设备 {device_id} ADBKeyboard输入法设置状态: {ime_set}")
-                        if not ime_set:
-                            logger.warning(f"设备 {device_id} 设置ADBKeyboard输入法失败，跳过")
-                            continue
-
-                        # 发送中文文本
-                        logger.info(f"向设备 {device_id} 发送文字: '{text}'")
-                        cmd = [adb_path, '-s', device_id, 'shell', 'am', 'broadcast', '-a', 'ADB_INPUT_TEXT', '--es', 'msg', text]
-                        result = subprocess.run(cmd, capture_output=True, text=True, timeout=15,
-                                              creationflags=subprocess.CREATE_NO_WINDOW)
-
-                        logger.info(f"设备 {device_id} 命令执行结果: returncode={result.returncode}")
-                        if result.stdout:
-                            logger.info(f"设备 {device_id} stdout: {result.stdout}")
-                        if result.stderr:
-                            logger.info(f"设备 {device_id} stderr: {result.stderr}")
-
-                        if result.returncode == 0:
-                            logger.info(f"✅ 单组模式ADBKeyboard输入成功: 设备{device_id} <- '{text}'")
-                            success_count += 1
-                        else:
-                            logger.error(f"❌ 设备 {device_id} ADBKeyboard输入失败: {result.stderr}")
-
-                    except Exception as e:
-                        logger.error(f"❌ 设备 {device_id} 处理异常: {e}")
-                        import traceback
-                        logger.debug(f"设备 {device_id} 异常详情: {traceback.format_exc()}")
-                        continue
+                # 各设备并发发送，输入法状态走状态表
+                results = get_text_broadcaster().broadcast({device_id: text for device_id in devices},
+                                                           adb_path=adb_path)
+                for device_id, result in results.items():
+                    if result.success:
+                        logger.info(f"✅ 窗口{window_index}->设备{device_id}输入成功: '{text}' ({result.elapsed_ms:.0f}ms)")
+                    else:
+                        logger.error(f"❌ 窗口{window_index}->设备{device_id}输入失败: {result.error}")
 
                 # 只要有一个设备成功就算成功
-                return success_count > 0
+                return any(result.success for result in results.values())
 
             else:
                 # 多组文字输入：根据窗口索引选择对应的设备
@@ -888,26 +784,13 @@ class EmulatorTextInputManager:
                     device_id = devices[device_index]
                     logger.info(f"多组文字输入: 窗口索引{window_index} -> 设备索引{device_index} -> 设备{device_id}")
 
-                # 检查ADBKeyboard是否已安装
-                if not self._check_adb_keyboard_installed(adb_path, device_id):
-                    logger.debug(f"设备 {device_id} 上ADBKeyboard未安装")
-                    return False
-
-                # 设置ADBKeyboard为当前输入法
-                if not self._set_adb_keyboard_ime(adb_path, device_id):
-                    logger.debug(f"设备 {device_id} 设置ADBKeyboard输入法失败")
-                    return False
-
-                # 发送中文文本
-                cmd = [adb_path, '-s', device_id, 'shell', 'am', 'broadcast', '-a', 'ADB_INPUT_TEXT', '--es', 'msg', text]
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=15,
-                                      creationflags=subprocess.CREATE_NO_WINDOW)
-
-                if result.returncode == 0:
+                # 发送中文文本（ADBKeyboard未就绪时失败）
+                result = get_text_broadcaster().send_text(device_id, text, adb_path=adb_path)
+                if result.success:
                     logger.info(f"多组模式ADBKeyboard输入成功: HWND={hwnd} -> 设备{device_id} -> 文字'{text}'")
                     return True
                 else:
-                    logger.debug(f"ADBKeyboard中文输入失败: {result.stderr}")
+                    logger.debug(f"ADBKeyboard中文输入失败: {result.error}")
                     return False
 
         except Exception as e:
@@ -945,8 +828,7 @@ class EmulatorTextInputManager:
 
                 # 使用广播方式发送中文
                 cmd = [adb_path, '-s', device_id, 'shell', 'am', 'broadcast', '-a', 'com.android.inputmethod.latin.SEND_TEXT', '--es', 'text', text]
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=15,
-                                      creationflags=subprocess.CREATE_NO_WINDOW)
+                result = run_adb_command(cmd, timeout=15)
 
                 if result.returncode == 0:
                     logger.info(f"✅ 单组模式广播输入成功: 窗口{window_index} -> 设备{device_id} <- '{text}'")
@@ -958,8 +840,7 @@ class EmulatorTextInputManager:
                     try:
                         # 使用广播方式发送中文
                         cmd = [adb_path, '-s', device_id, 'shell', 'am', 'broadcast', '-a', 'com.android.inputmethod.latin.SEND_TEXT', '--es', 'text', text]
-                        result = subprocess.run(cmd, capture_output=True, text=True, timeout=15,
-                                              creationflags=subprocess.CREATE_NO_WINDOW)
+                        result = run_adb_command(cmd, timeout=15)
 
                         if result.returncode == 0:
                             logger.info(f"单组模式广播输入成功: 设备{device_id} <- '{text}'")
@@ -989,8 +870,7 @@ class EmulatorTextInputManager:
 
                 # 使用广播方式发送中文
                 cmd = [adb_path, '-s', device_id, 'shell', 'am', 'broadcast', '-a', 'com.android.inputmethod.latin.SEND_TEXT', '--es', 'text', text]
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=15,
-                                      creationflags=subprocess.CREATE_NO_WINDOW)
+                result = run_adb_command(cmd, timeout=15)
 
                 if result.returncode == 0:
                     logger.info(f"多组模式广播输入成功: {text} -> 设备{device_id}")
@@ -1003,37 +883,6 @@ class EmulatorTextInputManager:
             logger.debug(f"广播中文输入异常: {e}")
             return False
 
-    def _check_adb_keyboard_installed(self, adb_path: str, device_id: str) -> bool:
-        """检查ADBKeyboard是否已安装"""
-        try:
-            cmd = [adb_path, '-s', device_id, 'shell', 'pm', 'list', 'packages', 'com.android.adbkeyboard']
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10,
-                                  creationflags=subprocess.CREATE_NO_WINDOW)
-            return 'com.android.adbkeyboard' in result.stdout
-
-        except Exception as e:
-            logger.debug(f"检查ADBKeyboard安装状态失败: {e}")
-            return False
-
-    def _set_adb_keyboard_ime(self, adb_path: str, device_id: str) -> bool:
-        """设置ADBKeyboard为当前输入法"""
-        try:
-            # 启用ADBKeyboard输入法
-            cmd1 = [adb_path, '-s', device_id, 'shell', 'ime', 'enable', 'com.android.adbkeyboard/.AdbIME']
-            result1 = subprocess.run(cmd1, capture_output=True, text=True, timeout=10,
-                                   creationflags=subprocess.CREATE_NO_WINDOW)
-
-            # 设置为默认输入法
-            cmd2 = [adb_path, '-s', device_id, 'shell', 'ime', 'set', 'com.android.adbkeyboard/.AdbIME']
-            result2 = subprocess.run(cmd2, capture_output=True, text=True, timeout=10,
-                                   creationflags=subprocess.CREATE_NO_WINDOW)
-
-            return result1.returncode == 0 and result2.returncode == 0
-
-        except Exception as e:
-            logger.debug(f"设置ADBKeyboard输入法失败: {e}")
-            return False
-
     def _get_ldplayer_console_path(self) -> Optional[str]:
         """获取雷电模拟器控制台程序路径"""
         if 'console_path' in self.console_cache:
@@ -1346,6 +1195,16 @@ class EmulatorTextInputManager:
 
     def _get_adb_devices(self, adb_path: str) -> list:
         """获取ADB连接的设备列表"""
+        # adb server 在监听时直接通过主机协议查询，不启动adb进程
+        client = get_adb_client()
+        if client.is_server_available():
+            try:
+                devices = [serial for serial, state in client.devices() if state == 'device']
+                logger.debug(f"找到ADB设备: {devices}")
+                return devices
+            except (AdbError, OSError) as e:
+                logger.debug(f"主机协议查询设备失败，回退到adb命令行: {e}")
+
         try:
             result = subprocess.run([adb_path, 'devices'], capture_output=True, text=True, timeout=10,
                                   creationflags=subprocess.CREATE_NO_WINDOW)
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+进程内的假 adb server
+实现 ADB 主机协议的一个子集，用于在没有模拟器的环境里测试和基准测试 utils.adb_client：
+- host:version / host:devices / host:connect / host:disconnect / host-serial:<serial>:get-state
+- host:transport:<serial> 后接 shell:<命令> / exec:<命令>，shell:sh 为逐行读取的交互 shell
+- sync: 的 SEND/DATA/DONE、STAT、QUIT（文件保存在假设备的内存里）
+- exec:screencap 输出原始格式帧（假设备的 framebuffer，API 28 起头部带色彩空间字段）
+
+假设备的 shell 是一个极简解释器：按 ';' 和换行拆分语句，支持 echo（含 $? 和变量替换）、变量赋值、
+`{ ...\n} 重定向` 命令组、`( eval '...' ) 重定向` 子 shell、getprop、cat、sh <文件>、rm、true/false、exit，
+其他命令记录到 shell_log 并返回空输出；可以传入 shell_handler 覆盖任意命令。
+"""
+
+import logging
+import re
+import shlex
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+ADB_SERVER_VERSION = 41
+
+# shell_handler(命令) -> None（交给默认处理）/ 输出 / (输出, 退出码)
+ShellHandler = Callable[[str], Union[None, str, bytes, Tuple[Union[str, bytes], int]]]
+
+
+class FakeAdbDevice:
+    """假设备：属性、文件和 shell 命令记录"""
+
+    def __init__(self, serial: str, state: str = 'device', props: Optional[Dict[str, str]] = None,
+                 shell_handler: Optional[ShellHandler] = None, command_latency: float = 0.0):
+        self.serial = serial
+        self.state = state
+        self.props = dict(props or {'ro.product.model': 'FakeDevice', 'ro.build.version.sdk': '32'})
+        self.shell_handler = shell_handler
+        self.command_latency = command_latency  # 每条命令模拟的设备端耗时（秒）
+        self.files: Dict[str, Tuple[bytes, int, int]] = {}  # 路径 -> (内容, mode, mtime)
+        self.shell_log: List[str] = []
+        # screencap 帧：形如 (高, 宽, 每像素字节数) 的 uint8 数组（或返回数组的函数），格式见 framebuffer_format
+        self.framebuffer = None
+        self.framebuffer_format = 1  # RGBA_8888
+        self._lock = threading.Lock()
+
+    def run_command(self, command: str, last_status: int = 0, env: Optional[Dict[str, str]] = None) -> Tuple[bytes, int]:
+        """执行一条简单命令，返回 (输出, 退出码)"""
+        env = {} if env is None else env
+        subshell = _EVAL_SUBSHELL.match(command)
+        if subshell:
+            # 子 shell：变量赋值不带回父 shell，重定向被忽略
+            try:
+                script = ' '.join(shlex.split(subshell.group(1)))
+            except ValueError:
+                return b"syntax error\n", 2
+            return self.run_script(script, last_status, dict(env))
+        assignment = _ASSIGNMENT.match(command)
+        if assignment:
+            env[assignment.group(1)] = _expand(assignment.group(2), last_status, env)
+            return b'', 0
+        with self._lock:
+            self.shell_log.append(command)
+        if self.command_latency:
+            time.sleep(self.command_latency)
+        if self.shell_handler is not None:
+            result = self.shell_handler(command)
+            if result is not None:
+                output, status = result if isinstance(result, tuple) else (result, 0)
+                return (output.encode('utf-8') if isinstance(output, str) else output), status
+
+        try:
+            argv = shlex.split(command)
+        except ValueError:
+            return b"syntax error\n", 2
+        if not argv:
+            return b'', last_status
+        name, args = argv[0], argv[1:]
+        if name == 'echo':
+            return (_expand(' '.join(args), last_status, env) + '\n').encode('utf-8'), 0
+        if name == 'getprop':
+            return (self.props.get(args[0], '') + '\n').encode('utf-8') if args else b'', 0
+        if name == 'cat' and args:
+            entry = self.files.get(args[0])
+            if entry is None:
+                return f"cat: {args[0]}: No such file or directory\n".encode('utf-8'), 1
+            return entry[0], 0
+        if name == 'sh' and args:
+            entry = self.files.get(args[0])
+            if entry is None:
+                return f"sh: {args[0]}: No such file or directory\n".encode('utf-8'), 127
+            return self.run_script(entry[0].decode('utf-8', errors='ignore'))
+        if name == 'rm':
+            with self._lock:
+                for path in args:
+                    self.files.pop(path, None)
+            return b'', 0
+        if name == 'true':
+            return b'', 0
+        if name == 'false':
+            return b'', 1
+        return b'', 0
+
+    def run_script(self, script: str, status: int = 0, env: Optional[Dict[str, str]] = None) -> Tuple[bytes, int]:
+        """按 ';' 和换行拆分语句依次执行"""
+        output = []
+        env = {} if env is None else env
+        for line in script.splitlines() or ['']:
+            for statement in _split_statements(line):
+                chunk, status = self.run_command(statement, status, env)
+                output.append(chunk)
+        return b''.join(output), status
+
+
+_ASSIGNMENT = re.compile(r'^([A-Za-z_]\w*)=(\S*)$')
+_EVAL_SUBSHELL = re.compile(r'^\(\s*eval\s+(.+)\)((?:\s*\d?[<>]&?\S*)*)\s*$')
+_VARIABLE = re.compile(r'\$(\?|[A-Za-z_]\w*)')
+
+
+def _expand(text: str, last_status: int, env: Dict[str, str]) -> str:
+    return _VARIABLE.sub(lambda m: str(last_status) if m.group(1) == '?' else env.get(m.group(1), ''), text)
+
+
+def _screencap(sock: socket.socket, device: FakeAdbDevice, command: str):
+    """exec:screencap —— 原始格式：宽、高、格式（API 28 起再加色彩空间）+ 像素"""
+    framebuffer = device.framebuffer() if callable(device.framebuffer) else device.framebuffer
+    if framebuffer is None:
+        return
+    height, width = framebuffer.shape[:2]
+    header = struct.pack('<III', width, height, device.framebuffer_format)
+    if int(device.props.get('ro.build.version.sdk', '0')) >= 28:
+        header += struct.pack('<I', 0)
+    sock.sendall(header + framebuffer.tobytes())
+
+
+def _interactive_shell(sock: socket.socket, device: FakeAdbDevice, command: str):
+    """shell:sh —— 逐行读取并执行，支持 `{ ...` 到 `} ...` 的命令组（组后的重定向被忽略）；sh <文件> 执行设备上的脚本"""
+    argv = command.split()
+    if len(argv) > 1:
+        entry = device.files.get(argv[1])
+        if entry is None:
+            sock.sendall(f"sh: {argv[1]}: No such file or directory\n".encode('utf-8'))
+        else:
+            sock.sendall(device.run_script(entry[0].decode('utf-8', errors='ignore'))[0])
+        return
+    buffer = b''
+    group: Optional[List[str]] = None
+    status = 0
+    env: Dict[str, str] = {}
+    while True:
+        newline = _complete_line_end(buffer)
+        if newline < 0:
+            chunk = sock.recv(65536)
+            if not chunk:
+                return
+            buffer += chunk
+            continue
+        line = buffer[:newline].decode('utf-8', errors='ignore')
+        buffer = buffer[newline + 1:]
+        if group is not None:
+            if line.startswith('}'):
+                output, status = device.run_script('\n'.join(group), status, env)
+                group = None
+                rest = line[1:]
+                # 跳过组后的重定向，执行后续语句
+                statements = _split_statements(rest)
+                if statements and statements[0].startswith(('<', '>', '2>')):
+                    statements = statements[1:]
+                for statement in statements:
+                    chunk, status = device.run_command(statement, status, env)
+                    output += chunk
+                sock.sendall(output)
+            else:
+                group.append(line)
+            continue
+        if line.startswith('{ '):
+            group = [line[2:]]
+            continue
+        if line.strip() == 'exit':
+            return
+        output, status = device.run_script(line, status, env)
+        sock.sendall(output)
+
+
+def _complete_line_end(buffer: bytes) -> int:
+    """第一个不在引号内的换行位置（引号内的换行属于同一条命令），没有时返回 -1"""
+    quote = None
+    for index, char in enumerate(buffer):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in (0x22, 0x27):
+            quote = char
+        elif char == 0x0A:
+            return index
+    return -1
+
+
+def _split_statements(line: str) -> List[str]:
+    """按不在引号内的 ';' 拆分语句"""
+    statements, current, quote = [], [], None
+    for char in line:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ('"', "'"):
+            quote = char
+        elif char == ';':
+            statements.append(''.join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    statements.append(''.join(current).strip())
+    return [statement for statement in statements if statement]
+
+
+class _ClientHandler(socketserver.BaseRequestHandler):
+    """一条客户端连接"""
+
+    server: '_ThreadingServer'
+
+    def handle(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        fake: FakeAdbServer = self.server.fake
+        device: Optional[FakeAdbDevice] = None
+        try:
+            while True:
+                request = self._read_request()
+                if request is None:
+                    return
+                with fake._lock:
+                    fake.request_log.append(request)
+                if device is None:
+                    if request.startswith('host:transport:'):
+                        device = fake.devices.get(request[len('host:transport:'):])
+                        if device is None or device.state != 'device':
+                            self._fail(f"device '{request[len('host:transport:'):]}' not found")
+                            return
+                        self.request.sendall(b'OKAY')
+                        continue
+                    self._handle_host(fake, request)
+                    return
+                self._handle_service(fake, device, request)
+                return
+        except (ConnectionError, OSError):
+            return
+
+    # 协议读写
+    def _read_exact(self, size: int) -> Optional[bytes]:
+        data = b''
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def _read_request(self) -> Optional[str]:
+        header = self._read_exact(4)
+        if header is None:
+            return None
+        payload = self._read_exact(int(header, 16))
+        return None if payload is None else payload.decode('utf-8')
+
+    def _okay_block(self, text: str):
+        payload = text.encode('utf-8')
+        self.request.sendall(b'OKAY' + b'%04x' % len(payload) + payload)
+
+    def _fail(self, message: str):
+        payload = message.encode('utf-8')
+        self.request.sendall(b'FAIL' + b'%04x' % len(payload) + payload)
+
+    # 主机服务
+    def _handle_host(self, fake: 'FakeAdbServer', request: str):
+        if request == 'host:version':
+            self._okay_block('%04x' % ADB_SERVER_VERSION)
+        elif request in ('host:devices', 'host:devices-l'):
+            with fake._lock:
+                lines = [f"{serial}\t{device.state}\n" for serial, device in fake.devices.items()]
+            self._okay_block(''.join(lines))
+        elif request.startswith('host:connect:'):
+            self._okay_block(fake.connect(request[len('host:connect:'):]))
+        elif request.startswith('host:disconnect:'):
+            self._okay_block(fake.disconnect(request[len('host:disconnect:'):]))
+        elif request.startswith('host-serial:') and request.endswith(':get-state'):
+            device = fake.devices.get(request[len('host-serial:'):-len(':get-state')])
+            if device is None:
+                self._fail("device not found")
+            else:
+                self._okay_block(device.state)
+        else:
+            self._fail(f"unknown host service: {request}")
+
+    # 设备服务
+    def _handle_service(self, fake: 'FakeAdbServer', device: FakeAdbDevice, request: str):
+        if request.startswith('shell:') or request.startswith('exec:'):
+            command = request.split(':', 1)[1]
+            handler = fake.service_handlers.get(command.split(' ', 1)[0])
+            self.request.sendall(b'OKAY')
+            if handler is not None:
+                handler(self.request, device, command)
+            else:
+                output, _ = device.run_script(command)
+                if request.startswith('shell:'):
+                    output = output.replace(b'\n', b'\r\n') if fake.pty_newlines else output
+                self.request.sendall(output)
+        elif request == 'sync:':
+            self.request.sendall(b'OKAY')
+            self._handle_sync(device)
+        else:
+            self._fail(f"unknown device service: {request}")
+
+    def _handle_sync(self, device: FakeAdbDevice):
+        while True:
+            header = self._read_exact(8)
+            if header is None:
+                return
+            command, size = header[:4], struct.unpack('<I', header[4:])[0]
+            if command == b'QUIT':
+                return
+            payload = self._read_exact(size) if size else b''
+            if command == b'STAT':
+                entry = device.files.get(payload.decode('utf-8'))
+                if entry is None:
+                    self.request.sendall(b'STAT' + struct.pack('<III', 0, 0, 0))
+                else:
+                    self.request.sendall(b'STAT' + struct.pack('<III', 0o100000 | entry[1], len(entry[0]), entry[2]))
+            elif command == b'SEND':
+                path, _, mode = payload.decode('utf-8').rpartition(',')
+                chunks = []
+                while True:
+                    sub_header = self._read_exact(8)
+                    if sub_header is None:
+                        return
+                    sub_command, sub_size = sub_header[:4], struct.unpack('<I', sub_header[4:])[0]
+                    if sub_command == b'DATA':
+                        chunks.append(self._read_exact(sub_size))
+                    elif sub_command == b'DONE':
+                        device.files[path] = (b''.join(chunks), int(mode) & 0o7777, sub_size)
+                        self.request.sendall(b'OKAY' + struct.pack('<I', 0))
+                        break
+                    else:
+                        message = b'unexpected sync packet'
+                        self.request.sendall(b'FAIL' + struct.pack('<I', len(message)) + message)
+                        return
+            else:
+                message = b'unsupported sync command'
+                self.request.sendall(b'FAIL' + struct.pack('<I', len(message)) + message)
+                return
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128  # 多设备并发建连时默认的 5 会让多余的连接等待 SYN 重传
+
+
+class FakeAdbServer:
+    """进程内的假 adb server（在随机端口上监听）"""
+
+    def __init__(self, devices: Optional[List[FakeAdbDevice]] = None, host: str = '127.0.0.1', port: int = 0,
+                 connectable: Optional[List[str]] = None, pty_newlines: bool = False):
+        """
+        Args:
+            devices: 初始设备
+            connectable: host:connect 可以连上的地址（连上后成为新设备）
+            pty_newlines: shell: 输出是否把 \\n 换成 \\r\\n（模拟旧设备的 PTY）
+        """
+        self.devices: Dict[str, FakeAdbDevice] = {device.serial: device for device in (devices or [])}
+        self.connectable = set(connectable or [])
+        self.pty_newlines = pty_newlines
+        self.request_log: List[str] = []
+        # 特殊服务处理器 {命令名: handler(socket, device, 命令)}，如交互 shell、screencap
+        self.service_handlers: Dict[str, Callable[[socket.socket, FakeAdbDevice, str], None]] = {
+            'sh': _interactive_shell,
+            'screencap': _screencap,
+        }
+        self._lock = threading.Lock()
+        self._server = _ThreadingServer((host, port), _ClientHandler)
+        self._server.fake = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def add_device(self, device: FakeAdbDevice) -> FakeAdbDevice:
+        with self._lock:
+            self.devices[device.serial] = device
+        return device
+
+    def remove_device(self, serial: str):
+        with self._lock:
+            self.devices.pop(serial, None)
+
+    def connect(self, address: str) -> str:
+        with self._lock:
+            if address in self.devices:
+                return f"already connected to {address}"
+            if address in self.connectable:
+                self.devices[address] = FakeAdbDevice(address)
+                return f"connected to {address}"
+        return f"failed to connect to {address}"
+
+    def disconnect(self, address: str) -> str:
+        with self._lock:
+            if self.devices.pop(address, None) is None:
+                return f"no such device '{address}'"
+        return f"disconnected {address}"
+
+    def start(self) -> 'FakeAdbServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name="FakeAdbServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+    def __enter__(self) -> 'FakeAdbServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.stop()
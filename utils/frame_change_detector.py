@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+
+"""
+窗口画面变化检测
+每个窗口一个检测器，把截图缩成小尺寸灰度缩略图后做差分，用于"等待直到"类卡片：
+- 条件不满足时不再按固定间隔重试，而是等到相关区域的画面发生变化再重新判断
+- 画面静止时采样间隔按倍数退避，变化后立即恢复最短间隔，兼顾识别开销和响应延迟
+- 同一窗口的多个等待者共享采样结果（采样间隔内不重复截图）
+- 截图不可用时退化为原来的固定间隔等待
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from utils.cancellation import wait_interruptibly
+
+logger = logging.getLogger(__name__)
+
+# wait_for_frame_change 的返回结果
+FRAME_CHANGED = 'changed'
+FRAME_TIMEOUT = 'timeout'
+FRAME_STOPPED = 'stopped'
+# wait_until 条件满足
+WAIT_SATISFIED = 'satisfied'
+
+Region = Tuple[int, int, int, int]  # 客户区坐标 (x, y, 宽, 高)
+
+
+@dataclass(frozen=True)
+class FrameThumbnail:
+    """画面缩略图（灰度）"""
+    image: np.ndarray
+    scale: float            # 缩略图宽度 / 原图宽度
+    source_size: Tuple[int, int]
+    captured_at: float
+
+    def crop(self, region: Optional[Region]) -> np.ndarray:
+        """按客户区坐标裁剪缩略图（区域至少保留1个像素）"""
+        if region is None:
+            return self.image
+        x, y, w, h = region
+        height, width = self.image.shape[:2]
+        left = min(max(int(x * self.scale), 0), width - 1)
+        top = min(max(int(y * self.scale), 0), height - 1)
+        right = min(max(int(np.ceil((x + w) * self.scale)), left + 1), width)
+        bottom = min(max(int(np.ceil((y + h) * self.scale)), top + 1), height)
+        return self.image[top:bottom, left:right]
+
+
+def make_thumbnail(frame: np.ndarray, width: int = 160) -> Optional[FrameThumbnail]:
+    """把截图缩成指定宽度的灰度缩略图"""
+    if frame is None or frame.size == 0:
+        return None
+    if frame.ndim == 3:
+        code = cv2.COLOR_BGRA2GRAY if frame.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+        frame = cv2.cvtColor(frame, code)
+    source_h, source_w = frame.shape[:2]
+    scale = min(1.0, width / float(source_w))
+    size = (max(1, int(round(source_w * scale))), max(1, int(round(source_h * scale))))
+    image = cv2.resize(frame, size, interpolation=cv2.INTER_AREA) if scale < 1.0 else frame.copy()
+    return FrameThumbnail(image, scale, (source_w, source_h), time.monotonic())
+
+
+def frame_difference(old: FrameThumbnail, new: FrameThumbnail, region: Optional[Region] = None,
+                     pixel_tolerance: int = 10) -> float:
+    """计算区域内变化像素的比例（0~1）；窗口尺寸变化时视为完全变化"""
+    if old.source_size != new.source_size:
+        return 1.0
+    old_roi = old.crop(region)
+    new_roi = new.crop(region)
+    if old_roi.shape != new_roi.shape or old_roi.size == 0:
+        return 1.0
+    diff = cv2.absdiff(old_roi, new_roi)
+    return float(np.count_nonzero(diff > pixel_tolerance)) / diff.size
+
+
+def _default_capture(hwnd: int) -> Optional[np.ndarray]:
+    # 通过当前执行后端截图（无界面执行时使用回放帧）
+    from task_workflow.execution_backend import get_execution_backend
+    return get_execution_backend().capture.capture(hwnd)
+
+
+class FrameChangeDetector:
+    """单个窗口的画面变化检测器"""
+
+    def __init__(self, hwnd: int, capture_func: Optional[Callable[[int], Optional[np.ndarray]]] = None,
+                 thumbnail_width: int = 160, min_sample_interval: float = 0.03):
+        self.hwnd = hwnd
+        self.capture_func = capture_func or _default_capture
+        self.thumbnail_width = thumbnail_width
+        self.min_sample_interval = min_sample_interval
+        self._latest: Optional[FrameThumbnail] = None
+        self._lock = threading.Lock()
+
+        # 统计
+        self.sample_count = 0
+        self.shared_sample_count = 0
+        self.change_count = 0
+
+    def thumbnail(self, frame: np.ndarray) -> Optional[FrameThumbnail]:
+        """由任务自己的截图生成参考缩略图（不额外截图），同时作为最新采样供其他等待者复用"""
+        thumb = make_thumbnail(frame, self.thumbnail_width)
+        if thumb is not None:
+            with self._lock:
+                self._latest = thumb
+        return thumb
+
+    def sample(self) -> Optional[FrameThumbnail]:
+        """采样当前画面（距上次采样不足最短间隔时直接复用）"""
+        with self._lock:
+            latest = self._latest
+            if latest is not None and time.monotonic() - latest.captured_at < self.min_sample_interval:
+                self.shared_sample_count += 1
+                return latest
+            try:
+                frame = self.capture_func(self.hwnd)
+            except Exception as e:
+                logger.debug(f"窗口 {self.hwnd} 变化检测截图失败: {e}")
+                frame = None
+            thumb = make_thumbnail(frame, self.thumbnail_width) if frame is not None else None
+            self.sample_count += 1
+            if thumb is not None:
+                self._latest = thumb
+            return thumb
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'hwnd': self.hwnd,
+            'samples': self.sample_count,
+            'shared_samples': self.shared_sample_count,
+            'changes': self.change_count,
+        }
+
+
+# 每个窗口一个检测器
+_detectors: Dict[int, FrameChangeDetector] = {}
+_detectors_lock = threading.Lock()
+_capture_func: Optional[Callable[[int], Optional[np.ndarray]]] = None
+
+
+def get_frame_change_detector(hwnd: int) -> FrameChangeDetector:
+    """获取窗口的画面变化检测器"""
+    detector = _detectors.get(hwnd)
+    if detector is None:
+        with _detectors_lock:
+            detector = _detectors.get(hwnd)
+            if detector is None:
+                detector = _detectors[hwnd] = FrameChangeDetector(hwnd, _capture_func)
+    return detector
+
+
+def set_frame_capture_func(capture_func: Optional[Callable[[int], Optional[np.ndarray]]]):
+    """替换所有检测器的截图函数（例如测试时使用假画面），None 恢复默认"""
+    global _capture_func
+    with _detectors_lock:
+        _capture_func = capture_func
+        _detectors.clear()
+
+
+def wait_for_frame_change(hwnd: int, reference: Optional[FrameThumbnail] = None,
+                          region: Optional[Region] = None, timeout: float = 5.0,
+                          change_ratio: float = 0.0005, min_interval: float = 0.05,
+                          max_interval: float = 0.5, backoff: float = 1.5,
+                          fallback_interval: Optional[float] = None, stop_checker=None) -> str:
+    """
+    等待窗口画面（或指定区域）相对参考缩略图发生变化
+
+    Args:
+        hwnd: 窗口句柄
+        reference: 参考缩略图（通常由上次判断时的截图生成），为空时以首次采样为参考
+        region: 关注的客户区区域，为空时检测整个画面
+        timeout: 最长等待时间（秒）
+        change_ratio: 变化像素比例达到该值即认为画面变化
+        min_interval / max_interval / backoff: 采样间隔从最短开始，画面静止时按倍数退避到最长
+        fallback_interval: 无法截图时的固定等待时间（默认等于 timeout），等待结束按"已变化"返回
+        stop_checker: 取消令牌或停止检查函数
+
+    Returns:
+        FRAME_CHANGED / FRAME_TIMEOUT / FRAME_STOPPED
+    """
+    detector = get_frame_change_detector(hwnd)
+    deadline = time.monotonic() + timeout
+
+    if reference is None:
+        reference = detector.sample()
+    if reference is None:
+        # 截图不可用，退化为固定间隔等待
+        wait_time = timeout if fallback_interval is None else min(fallback_interval, timeout)
+        return FRAME_STOPPED if wait_interruptibly(wait_time, stop_checker) else FRAME_CHANGED
+
+    interval = min_interval
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return FRAME_TIMEOUT
+        if wait_interruptibly(min(interval, remaining), stop_checker):
+            return FRAME_STOPPED
+
+        current = detector.sample()
+        if current is None:
+            continue
+        if frame_difference(reference, current, region) >= change_ratio:
+            detector.change_count += 1
+            return FRAME_CHANGED
+        # 画面静止：退避采样间隔
+        interval = min(interval * backoff, max_interval)
+
+
+def wait_until(condition: Callable[[], Any], hwnd: int, region: Optional[Region] = None,
+               timeout: float = 10.0, stop_checker=None, **wait_options) -> Tuple[Any, str]:
+    """
+    等待直到条件满足：条件不满足时等待画面变化后再重新判断
+
+    Args:
+        condition: 判断函数，返回真值表示满足（返回值原样返回）
+        hwnd: 窗口句柄
+        region: 条件关注的客户区区域
+        timeout: 总超时（秒）
+        stop_checker: 取消令牌或停止检查函数
+        wait_options: 透传给 wait_for_frame_change 的采样参数
+
+    Returns:
+        (最后一次判断结果, WAIT_SATISFIED / FRAME_TIMEOUT / FRAME_STOPPED)
+    """
+    detector = get_frame_change_detector(hwnd)
+    deadline = time.monotonic() + timeout
+    while True:
+        reference = detector.sample()
+        result = condition()
+        if result:
+            return result, WAIT_SATISFIED
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return result, FRAME_TIMEOUT
+        outcome = wait_for_frame_change(hwnd, reference, region, remaining,
+                                        stop_checker=stop_checker, **wait_options)
+        if outcome != FRAME_CHANGED:
+            return result, outcome
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+
+"""
+重量级操作准入控制
+所有窗口同时进入 OCR / 大图匹配卡片时 CPU 瞬间打满，每个窗口的延迟都会变长。
+进程内所有窗口的重量级操作（OCR、全图模板匹配、K-means、截图）经过同一个准入门：
+- 每类操作有独立的并发上限（按 CPU 核心数估算）
+- 空出名额时在有等待者的窗口之间轮转分配，窗口按到达顺序排队，不会被某个窗口的连续请求饿死
+- 同一线程嵌套申请同类操作时直接通过，不会自锁
+- 按窗口记录等待次数和等待时间
+- 等待期间工作流被停止时放行（不占名额），由任务自己的停止检查结束
+"""
+
+import contextlib
+import functools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 操作类别
+OP_OCR = 'ocr'
+OP_MATCH = 'match'
+OP_KMEANS = 'kmeans'
+OP_CAPTURE = 'capture'
+
+_NULL_ADMISSION = contextlib.nullcontext()
+
+# 等待期间检查停止请求的间隔（秒）
+_CANCEL_POLL_INTERVAL = 0.05
+
+_current = threading.local()
+
+
+def set_current_window(hwnd: Optional[int]):
+    """设置当前线程正在执行的窗口（执行器在工作流线程和分支线程中调用）"""
+    _current.hwnd = hwnd
+
+
+def get_current_window() -> Optional[int]:
+    return getattr(_current, 'hwnd', None)
+
+
+def default_op_limits() -> Dict[str, int]:
+    """按 CPU 核心数估算各类操作的并发上限"""
+    cores = os.cpu_count() or 4
+    return {
+        OP_OCR: max(1, cores // 2),
+        OP_MATCH: max(1, cores // 2),  # OpenCV 匹配内部已多线程
+        OP_KMEANS: max(1, cores // 4),
+        OP_CAPTURE: max(2, cores),
+    }
+
+
+class _Waiter:
+    __slots__ = ('event', 'granted', 'enqueued_at')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+        self.enqueued_at = time.perf_counter()
+
+
+class _WindowWaitStats:
+    __slots__ = ('count', 'waited', 'total_ms', 'max_ms')
+
+    def __init__(self):
+        self.count = 0
+        self.waited = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, wait_ms: float):
+        self.count += 1
+        if wait_ms > 0:
+            self.waited += 1
+            self.total_ms += wait_ms
+            if wait_ms > self.max_ms:
+                self.max_ms = wait_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'waited': self.waited,
+            'total_wait_ms': round(self.total_ms, 2),
+            'mean_wait_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'max_wait_ms': round(self.max_ms, 2),
+        }
+
+
+class _OperationClass:
+    """单类操作的名额和按窗口排队的等待者"""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.active = 0
+        # 有等待者的窗口，按轮转顺序排列 {窗口: 等待队列}
+        self.queues: 'OrderedDict[Any, Deque[_Waiter]]' = OrderedDict()
+        self.queued = 0
+        self.max_queued = 0
+        self.window_stats: Dict[Any, _WindowWaitStats] = {}
+
+    def grant_next(self):
+        """把空出的名额按窗口轮转分配给等待者（调用方持有锁）"""
+        while self.active < self.limit and self.queues:
+            window, queue = next(iter(self.queues.items()))
+            waiter = queue.popleft()
+            if queue:
+                self.queues.move_to_end(window)
+            else:
+                del self.queues[window]
+            self.queued -= 1
+            self.active += 1
+            waiter.granted = True
+            waiter.event.set()
+
+
+class HeavyOperationGate:
+    """进程级重量级操作准入门"""
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None):
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._classes: Dict[str, _OperationClass] = {}
+        self._held = threading.local()
+        for name, limit in (limits or default_op_limits()).items():
+            self._classes[name] = _OperationClass(name, max(1, int(limit)))
+
+    def set_limit(self, op: str, limit: int):
+        """调整某类操作的并发上限"""
+        with self._lock:
+            op_class = self._get_class(op)
+            op_class.limit = max(1, int(limit))
+            op_class.grant_next()
+        logger.info(f"重量级操作 {op} 并发上限: {op_class.limit}")
+
+    def set_enabled(self, enabled: bool):
+        self.enabled = enabled
+        logger.info(f"重量级操作准入控制已{'启用' if enabled else '禁用'}")
+
+    def _get_class(self, op: str) -> _OperationClass:
+        op_class = self._classes.get(op)
+        if op_class is None:
+            op_class = self._classes[op] = _OperationClass(op, max(1, os.cpu_count() or 4))
+        return op_class
+
+    def _held_counts(self) -> Dict[str, int]:
+        counts = getattr(self._held, 'counts', None)
+        if counts is None:
+            counts = self._held.counts = {}
+        return counts
+
+    def acquire(self, op: str, hwnd: Optional[int] = None) -> bool:
+        """
+        申请一个操作名额（阻塞直到获得，或工作流被停止）
+
+        Returns:
+            bool: 是否占用了名额（True 时必须调用 release）
+        """
+        held = self._held_counts()
+        if held.get(op):
+            held[op] += 1
+            return True
+
+        window = hwnd if hwnd is not None else get_current_window()
+        with self._lock:
+            op_class = self._get_class(op)
+            stats = op_class.window_stats.get(window)
+            if stats is None:
+                stats = op_class.window_stats[window] = _WindowWaitStats()
+            if op_class.active < op_class.limit and not op_class.queues:
+                op_class.active += 1
+                stats.add(0.0)
+                held[op] = 1
+                return True
+            waiter = _Waiter()
+            queue = op_class.queues.get(window)
+            if queue is None:
+                queue = op_class.queues[window] = deque()
+            queue.append(waiter)
+            op_class.queued += 1
+            op_class.max_queued = max(op_class.max_queued, op_class.queued)
+
+        from utils.cancellation import get_current_token
+        token = get_current_token()
+        while not waiter.event.wait(_CANCEL_POLL_INTERVAL if token is not None else None):
+            if token is not None and token.is_cancelled:
+                with self._lock:
+                    if not waiter.granted:
+                        queue = op_class.queues.get(window)
+                        if queue is not None and waiter in queue:
+                            queue.remove(waiter)
+                            op_class.queued -= 1
+                            if not queue:
+                                del op_class.queues[window]
+                        return False
+                break
+
+        wait_ms = (time.perf_counter() - waiter.enqueued_at) * 1000
+        with self._lock:
+            stats.add(wait_ms)
+        held[op] = 1
+        return True
+
+    def release(self, op: str):
+        held = self._held_counts()
+        held[op] -= 1
+        if held[op] > 0:
+            return
+        del held[op]
+        with self._lock:
+            op_class = self._classes[op]
+            op_class.active -= 1
+            op_class.grant_next()
+
+    @contextlib.contextmanager
+    def _admission(self, op: str, hwnd: Optional[int]):
+        acquired = self.acquire(op, hwnd)
+        try:
+            yield
+        finally:
+            if acquired:
+                self.release(op)
+
+    def admit(self, op: str, hwnd: Optional[int] = None):
+        """上下文管理器：在操作名额内执行（禁用时直接通过）"""
+        if not self.enabled:
+            return _NULL_ADMISSION
+        return self._admission(op, hwnd)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """各类操作的名额占用、排队和按窗口的等待时间"""
+        with self._lock:
+            return {
+                name: {
+                    'limit': op_class.limit,
+                    'active': op_class.active,
+                    'queued': op_class.queued,
+                    'max_queued': op_class.max_queued,
+                    'windows': {window: stats.to_dict() for window, stats in op_class.window_stats.items()},
+                }
+                for name, op_class in self._classes.items()
+            }
+
+    def get_window_wait_stats(self, hwnd: Optional[int]) -> Dict[str, Dict[str, Any]]:
+        """单个窗口在各类操作上的等待时间"""
+        with self._lock:
+            return {
+                name: op_class.window_stats[hwnd].to_dict()
+                for name, op_class in self._classes.items() if hwnd in op_class.window_stats
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            for op_class in self._classes.values():
+                op_class.window_stats.clear()
+                op_class.max_queued = op_class.queued
+
+
+_heavy_op_gate = HeavyOperationGate()
+
+
+def get_heavy_op_gate() -> HeavyOperationGate:
+    """获取全局重量级操作准入门"""
+    return _heavy_op_gate
+
+
+def heavy_operation(op: str, hwnd: Optional[int] = None):
+    """在全局准入门上申请操作名额（窗口默认取当前线程正在执行的窗口）"""
+    return _heavy_op_gate.admit(op, hwnd)
+
+
+def admitted(op: str) -> Callable[[Callable], Callable]:
+    """函数装饰器：在操作名额内执行，窗口取函数的第一个参数/hwnd 关键字参数（如 capture_window_background(hwnd)）"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _heavy_op_gate.enabled:
+                return func(*args, **kwargs)
+            hwnd = args[0] if args else kwargs.get('hwnd')
+            with _heavy_op_gate.admit(op, hwnd if isinstance(hwnd, int) else None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -6,6 +6,9 @@ import logging
 import numpy as np
 from typing import Optional, Tuple, Union
 
+from utils.workflow_profiler import profile_span, SPAN_MATCH
+from utils.heavy_op_admission import heavy_operation, OP_MATCH
+
 logger = logging.getLogger(__name__)
 
 try:
@@ -186,7 +189,8 @@ class ImageOperations:
             
             # 执行模板匹配
             match_method = cv2.TM_CCOEFF_NORMED
-            result_matrix = cv2.matchTemplate(haystack, needle, match_method)
+            with profile_span(SPAN_MATCH), heavy_operation(OP_MATCH):
+                result_matrix = cv2.matchTemplate(haystack, needle, match_method)
             _, max_val, _, max_loc = cv2.minMaxLoc(result_matrix)
             
             if max_val >= confidence:
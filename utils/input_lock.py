@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+"""
+窗口输入串行化
+同一窗口内并行执行的分支共享一个可重入输入锁：
+- 每个输入原语（点击、拖拽、滚轮、按键、文本）在锁内执行，互不穿插
+- 鼠标/键盘操作类卡片在分支中整卡持有锁，多步输入序列不会被其他分支打断
+- 没有并行分支时锁无竞争，开销可忽略
+- 记录每个窗口最近一次输入完成的时间，截图方据此丢弃输入之前截取的旧帧
+"""
+
+import functools
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+_input_locks: Dict[int, threading.RLock] = {}
+_registry_lock = threading.Lock()
+_last_input: Dict[int, float] = {}  # hwnd -> 最近一次输入完成的时间（time.monotonic）
+
+
+def get_input_lock(hwnd: Optional[int]) -> threading.RLock:
+    """获取窗口的输入锁（hwnd 为空时使用全局锁）"""
+    key = hwnd or 0
+    lock = _input_locks.get(key)
+    if lock is None:
+        with _registry_lock:
+            lock = _input_locks.get(key)
+            if lock is None:
+                lock = _input_locks[key] = threading.RLock()
+    return lock
+
+
+def mark_input(hwnd: Optional[int]):
+    """记录窗口刚完成一次输入（未经 serialized_input 的输入路径手动调用）"""
+    _last_input[hwnd or 0] = time.monotonic()
+
+
+def get_last_input_time(hwnd: Optional[int]) -> float:
+    """窗口最近一次输入完成的时间（time.monotonic），没有输入时为 0"""
+    return _last_input.get(hwnd or 0, 0.0)
+
+
+def serialized_input(func: Callable) -> Callable:
+    """
+    输入原语装饰器：在目标窗口的输入锁内执行
+
+    窗口句柄取自模拟器实例的 hwnd 属性，或函数的第一个参数/hwnd 关键字参数（如 click_background(hwnd, ...)）。
+    执行结束后记录该窗口的输入时间。
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        target = args[0] if args else kwargs.get('hwnd')
+        hwnd = getattr(target, 'hwnd', target)
+        hwnd = hwnd if isinstance(hwnd, int) else None
+        with get_input_lock(hwnd):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                mark_input(hwnd)
+    return wrapper
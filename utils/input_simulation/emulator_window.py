@@ -8,6 +8,8 @@ import win32gui
 import win32con
 import win32api
 from typing import Optional, List
+from utils.workflow_profiler import profiled, SPAN_INPUT
+from utils.input_lock import serialized_input
 from .base import BaseInputSimulator
 
 
@@ -66,6 +68,8 @@ class EmulatorWindowInputSimulator(BaseInputSimulator):
             self.logger.error(f"初始化模拟器文本输入管理器失败: {e}")
             self._emulator_manager = None
     
+    @profiled(SPAN_INPUT)
+    @serialized_input
     def click(self, x: int, y: int, button: str = 'left', clicks: int = 1, interval: float = 0.1) -> bool:
         """鼠标点击 - 根据执行模式选择方法"""
         try:
@@ -221,6 +225,8 @@ class EmulatorWindowInputSimulator(BaseInputSimulator):
         """鼠标双击"""
         return self.click(x, y, button, clicks=2, interval=0.1)
     
+    @profiled(SPAN_INPUT)
+    @serialized_input
     def drag(self, start_x: int, start_y: int, end_x: int, end_y: int,
              duration: float = 1.0, button: str = 'left') -> bool:
         """鼠标拖拽 - 根据模拟器类型选择方法"""
@@ -268,6 +274,8 @@ class EmulatorWindowInputSimulator(BaseInputSimulator):
             self.logger.error(f"MuMu模拟器拖拽异常: {e}")
             return False
 
+    @profiled(SPAN_INPUT)
+    @serialized_input
     def drag_path(self, path_points: list, duration: float = 1.0) -> bool:
         """多点路径拖拽 - 根据模拟器类型选择方法
 
@@ -402,6 +410,8 @@ class EmulatorWindowInputSimulator(BaseInputSimulator):
             self.logger.error(f"传统多点拖拽异常: {e}")
             return False
 
+    @profiled(SPAN_INPUT)
+    @serialized_input
     def scroll(self, x: int, y: int, delta: int) -> bool:
         """鼠标滚轮 - 根据模拟器类型选择方法"""
         try:
@@ -475,6 +485,8 @@ class EmulatorWindowInputSimulator(BaseInputSimulator):
             self.logger.error(f"传统滚轮失败: {e}")
             return False
 
+    @profiled(SPAN_INPUT)
+    @serialized_input
     def send_key(self, vk_code: int, scan_code: int = 0, extended: bool = False, hold_duration: float = 0.0) -> bool:
         """发送按键 - 根据模拟器类型选择方法"""
         try:
@@ -613,6 +625,8 @@ class EmulatorWindowInputSimulator(BaseInputSimulator):
             self.logger.error(f"模拟器窗口发送按键释放失败: {e}")
             return False
     
+    @profiled(SPAN_INPUT)
+    @serialized_input
     def send_text(self, text: str) -> bool:
         """发送文本"""
         try:
@@ -710,6 +724,8 @@ class EmulatorWindowInputSimulator(BaseInputSimulator):
                 win32gui.PostMessage(self.hwnd, win32con.WM_CHAR, ord(char), 0)
         return True
 
+    @profiled(SPAN_INPUT)
+    @serialized_input
     def send_key_combination(self, keys: list, hold_duration: float = 0.1) -> bool:
         """发送组合键 - 根据模拟器类型选择方法"""
         try:
@@ -9,6 +9,8 @@ import win32con
 import win32api
 from utils.interception_driver import get_driver
 from typing import Optional, List
+from utils.workflow_profiler import profiled, SPAN_INPUT
+from utils.input_lock import serialized_input
 from .base import BaseInputSimulator
 
 
@@ -27,6 +29,8 @@ class StandardWindowInputSimulator(BaseInputSimulator):
         self.use_foreground = use_foreground
         self.driver = get_driver() if use_foreground else None
         
+    @profiled(SPAN_INPUT)
+    @serialized_input
     def click(self, x: int, y: int, button: str = 'left', clicks: int = 1, interval: float = 0.1) -> bool:
         """鼠标点击"""
         try:
@@ -104,6 +108,8 @@ class StandardWindowInputSimulator(BaseInputSimulator):
             self.logger.error(f"普通窗口双击失败: {e}")
             return False
     
+    @profiled(SPAN_INPUT)
+    @serialized_input
     def drag(self, start_x: int, start_y: int, end_x: int, end_y: int, 
              duration: float = 1.0, button: str = 'left') -> bool:
         """鼠标拖拽"""
@@ -160,6 +166,8 @@ class StandardWindowInputSimulator(BaseInputSimulator):
         
         return True
     
+    @profiled(SPAN_INPUT)
+    @serialized_input
     def scroll(self, x: int, y: int, delta: int) -> bool:
         """鼠标滚轮"""
         try:
@@ -182,6 +190,8 @@ class StandardWindowInputSimulator(BaseInputSimulator):
             self.logger.error(f"普通窗口滚轮失败: {e}")
             return False
     
+    @profiled(SPAN_INPUT)
+    @serialized_input
     def send_key(self, vk_code: int, scan_code: int = 0, extended: bool = False) -> bool:
         """发送按键"""
         try:
@@ -248,6 +258,8 @@ class StandardWindowInputSimulator(BaseInputSimulator):
             self.logger.error(f"普通窗口发送按键释放失败: {e}")
             return False
 
+    @profiled(SPAN_INPUT)
+    @serialized_input
     def send_text(self, text: str) -> bool:
         """发送文本"""
         try:
@@ -274,6 +286,8 @@ class StandardWindowInputSimulator(BaseInputSimulator):
             self.logger.error(f"普通窗口发送文本失败: {e}")
             return False
 
+    @profiled(SPAN_INPUT)
+    @serialized_input
     def send_key_combination(self, keys: list, hold_duration: float = 0.1) -> bool:
         """发送组合键"""
         try:
@@ -14,10 +14,14 @@ import win32gui
 import win32process
 import psutil
 import re
+import time
 from typing import Dict, List, Optional, Tuple, Set
 from dataclasses import dataclass
 from pathlib import Path
 
+from utils.adb_client import AdbError, get_adb_client
+from utils.adb_discovery import get_adb_discovery
+
 logger = logging.getLogger(__name__)
 
 
@@ -196,78 +200,34 @@ class IntelligentADBConnector:
         
         return None
     
-    def discover_active_ports(self) -> Set[int]:
-        """智能发现所有真实存在的ADB端口"""
+    def discover_active_ports(self, deadline: float = 8.0) -> Set[int]:
+        """智能发现所有真实存在的ADB端口（各来源并发查询，候选端口并发探测，整轮不超过 deadline 秒）"""
         active_ports = set()
+        discovery = get_adb_discovery()
+        started = time.monotonic()
 
         try:
-            # 1. 首先检查网络监听端口（最可靠的方法）
-            connections = psutil.net_connections(kind='inet')
-
-            for conn in connections:
-                if (conn.laddr and conn.laddr.ip == '127.0.0.1' and
-                    conn.status == psutil.CONN_LISTEN):
-                    port = conn.laddr.port
-
-                    # 检查是否是ADB相关端口
-                    if self._is_adb_port(port):
-                        active_ports.add(port)
-                        logger.debug(f"发现真实监听ADB端口: {port}")
-
-            # 2. 动态获取模拟器端口
-            # 2.1 获取MuMu模拟器端口
-            try:
-                from utils.mumu_manager import get_mumu_manager
-                mumu_manager = get_mumu_manager()
-                if mumu_manager.is_available():
-                    vm_info = mumu_manager.get_all_vm_info()
-                    logger.info(f"MuMu管理器返回的VM信息: {vm_info}")
-
-                    # 记录所有MuMu端口用于智能类型判断
-                    self._mumu_ports = set()
-
-                    if vm_info:
-                        for vm_index_str, vm_data in vm_info.items():
-                            adb_port = vm_data.get('adb_port')
-                            vm_state = vm_data.get('player_state', 'unknown')
-                            is_started = vm_data.get('is_android_started', False)
-                            logger.info(f"VM{vm_index_str}: 端口={adb_port}, 状态={vm_state}, Android启动={is_started}")
-
-                            # 记录所有MuMu端口（无论是否启动）
-                            if adb_port:
-                                self._mumu_ports.add(adb_port)
-
-                            # 只添加已启动的VM端口到活跃端口
-                            if adb_port and is_started and vm_state == 'start_finished':
-                                active_ports.add(adb_port)
-                                logger.info(f"✅ 从MuMu VM{vm_index_str}发现活跃端口: {adb_port}")
-                            elif adb_port:
-                                logger.warning(f"⚠️ VM{vm_index_str} 端口{adb_port}存在但未完全启动 (状态:{vm_state}, Android:{is_started})")
-                    else:
-                        logger.warning("MuMu管理器返回空的VM信息")
-
-                    # MuMu管理器已经提供了所有活跃VM的准确端口信息
-                    # 不需要硬编码扫描，完全依赖管理器的权威数据
-                else:
-                    logger.warning("MuMu管理器不可用")
-            except Exception as e:
-                logger.error(f"获取MuMu端口失败: {e}")
-
-            # 2.2 获取雷电模拟器端口
-            try:
-                from utils.ldplayer_manager import get_ldplayer_manager
-                ldplayer_manager = get_ldplayer_manager()
-                if ldplayer_manager.is_available():
-                    ldplayer_ports = ldplayer_manager.get_active_ports()
-                    for port in ldplayer_ports:
-                        active_ports.add(port)
-                        logger.debug(f"从雷电模拟器发现端口: {port}")
-            except Exception as e:
-                logger.debug(f"获取雷电端口失败: {e}")
-
-            # 3. 使用ADB命令检查已连接设备
-            existing_devices = self._get_existing_adb_devices()
-            for device_id in existing_devices:
+            sources = discovery.run_concurrently({
+                'listening': self._query_listening_ports,
+                'mumu': self._query_mumu_ports,
+                'ldplayer': self._query_ldplayer_ports,
+                'adb_devices': self._get_existing_adb_devices,
+            }, deadline)
+
+            # 1. 网络监听端口（最可靠的方法）
+            active_ports.update(sources['listening'] or ())
+
+            # 2.1 MuMu模拟器端口（只添加已启动的VM，全部端口用于智能类型判断）
+            mumu_ports = sources['mumu']
+            if mumu_ports is not None:
+                started_ports, self._mumu_ports = mumu_ports
+                active_ports.update(started_ports)
+
+            # 2.2 雷电模拟器端口
+            active_ports.update(sources['ldplayer'] or ())
+
+            # 3. 已连接设备的端口
+            for device_id in sources['adb_devices'] or ():
                 if ':' in device_id and device_id.startswith('127.0.0.1:'):
                     try:
                         port = int(device_id.split(':')[1])
@@ -276,38 +236,105 @@ class IntelligentADBConnector:
                     except ValueError:
                         pass
 
-            # 3. 验证推断的端口是否真实存在
+            # 4. 并发验证推断的端口是否真实存在
             if self.emulator_windows:
                 logger.debug("验证推断端口的真实性...")
+                candidate_ports = set()
                 for window in self.emulator_windows:
-                    candidate_ports = self._get_candidate_ports_for_window(window)
-                    for port in candidate_ports:
-                        if self._verify_port_exists(port):
-                            active_ports.add(port)
-                            logger.debug(f"验证端口 {port} 存在，来自窗口 {window.title}")
+                    if window.emulator_type == 'mumu' and mumu_ports is not None:
+                        candidate_ports.update(self._mumu_ports)
+                    else:
+                        candidate_ports.update(self._get_candidate_ports_for_window(window))
+                remaining = deadline - (time.monotonic() - started)
+                probed = discovery.probe_ports(candidate_ports - active_ports, max(0.1, min(2.0, remaining)))
+                for port, listening in probed.items():
+                    if listening:
+                        active_ports.add(port)
+                        logger.debug(f"验证端口 {port} 存在")
 
         except Exception as e:
             logger.warning(f"智能端口发现失败: {e}")
 
-        # 4. 如果仍然没有发现端口，使用保守的默认端口
+        # 5. 如果仍然没有发现端口，使用保守的默认端口
         if not active_ports:
             logger.info("未发现任何真实端口，使用保守的默认端口")
             # 只使用最常见的、最可能存在的端口，避免重复
             conservative_ports = [7555, 16384]  # 移除5555避免与MuMu重复
-            for port in conservative_ports:
-                if self._verify_port_exists(port):
+            for port, listening in get_adb_discovery().probe_ports(conservative_ports, 1.0).items():
+                if listening:
                     active_ports.add(port)
                     logger.info(f"验证默认端口 {port} 存在")
 
-        # 5. 去重：移除可能指向同一模拟器的重复端口
+        # 6. 去重：移除可能指向同一模拟器的重复端口
         deduplicated_ports = self._deduplicate_ports(active_ports)
 
-        logger.info(f"发现 {len(active_ports)} 个真实的ADB端口: {sorted(active_ports)}")
+        logger.info(f"发现 {len(active_ports)} 个真实的ADB端口: {sorted(active_ports)} "
+                    f"(耗时 {(time.monotonic() - started) * 1000:.0f}ms)")
         if len(deduplicated_ports) != len(active_ports):
             logger.info(f"去重后剩余 {len(deduplicated_ports)} 个端口: {sorted(deduplicated_ports)}")
 
         return deduplicated_ports
 
+    def _query_listening_ports(self) -> Set[int]:
+        """本机正在监听的ADB相关端口"""
+        ports = set()
+        for conn in psutil.net_connections(kind='inet'):
+            if (conn.laddr and conn.laddr.ip == '127.0.0.1' and
+                conn.status == psutil.CONN_LISTEN):
+                port = conn.laddr.port
+
+                # 检查是否是ADB相关端口
+                if self._is_adb_port(port):
+                    ports.add(port)
+                    logger.debug(f"发现真实监听ADB端口: {port}")
+        return ports
+
+    def _query_mumu_ports(self) -> Optional[Tuple[Set[int], Set[int]]]:
+        """MuMu管理器报告的端口，返回 (已启动VM的端口, 全部VM端口)；管理器不可用时返回None"""
+        from utils.mumu_manager import get_mumu_manager
+        mumu_manager = get_mumu_manager()
+        if not mumu_manager.is_available():
+            logger.warning("MuMu管理器不可用")
+            return None
+
+        vm_info = mumu_manager.get_all_vm_info()
+        logger.info(f"MuMu管理器返回的VM信息: {vm_info}")
+        started_ports, all_ports = set(), set()
+        if not vm_info:
+            logger.warning("MuMu管理器返回空的VM信息")
+            return started_ports, all_ports
+
+        for vm_index_str, vm_data in vm_info.items():
+            adb_port = vm_data.get('adb_port')
+            vm_state = vm_data.get('player_state', 'unknown')
+            is_started = vm_data.get('is_android_started', False)
+            logger.info(f"VM{vm_index_str}: 端口={adb_port}, 状态={vm_state}, Android启动={is_started}")
+
+            # 记录所有MuMu端口（无论是否启动）
+            if adb_port:
+                all_ports.add(adb_port)
+
+            # 只添加已启动的VM端口到活跃端口
+            if adb_port and is_started and vm_state == 'start_finished':
+                started_ports.add(adb_port)
+                logger.info(f"✅ 从MuMu VM{vm_index_str}发现活跃端口: {adb_port}")
+            elif adb_port:
+                logger.warning(f"⚠️ VM{vm_index_str} 端口{adb_port}存在但未完全启动 (状态:{vm_state}, Android:{is_started})")
+
+        # MuMu管理器已经提供了所有活跃VM的准确端口信息，不需要硬编码扫描
+        return started_ports, all_ports
+
+    def _query_ldplayer_ports(self) -> Set[int]:
+        """雷电控制台报告的活跃端口"""
+        from utils.ldplayer_manager import get_ldplayer_manager
+        ldplayer_manager = get_ldplayer_manager()
+        if not ldplayer_manager.is_available():
+            return set()
+        ports = set(ldplayer_manager.get_active_ports())
+        for port in ports:
+            logger.debug(f"从雷电模拟器发现端口: {port}")
+        return ports
+
     def discover_device_list(self) -> List[str]:
         """发现所有可用设备列表（职责：设备发现和窗口匹配）"""
         device_list = []
@@ -429,19 +456,9 @@ class IntelligentADBConnector:
         return candidates
 
     def _verify_port_exists(self, port: int) -> bool:
-        """验证端口是否真实存在并可连接"""
+        """验证端口是否真实存在并可连接（结果按TTL缓存）"""
         try:
-            import socket
-
-            # 尝试连接端口
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(1)  # 1秒超时
-            result = sock.connect_ex(('127.0.0.1', port))
-            sock.close()
-
-            # 如果连接成功或被拒绝，说明端口存在
-            return result == 0 or result == 10061  # 10061 = Connection refused (端口存在但服务拒绝)
-
+            return get_adb_discovery().probe_ports([port], 1.0).get(port, False)
         except Exception:
             return False
 
@@ -523,6 +540,14 @@ class IntelligentADBConnector:
         """获取已连接的ADB设备"""
         devices = []
 
+        # adb server 在监听时直接通过主机协议查询，不启动adb进程
+        client = get_adb_client()
+        if client.is_server_available():
+            try:
+                return [serial for serial, state in client.devices() if state == 'device']
+            except (AdbError, OSError) as e:
+                logger.debug(f"主机协议查询设备失败，回退到adb命令行: {e}")
+
         try:
             # 尝试使用不同的ADB路径
             for adb_type, adb_path in self.adb_paths.items():
@@ -615,62 +640,81 @@ class IntelligentADBConnector:
         
         return False
     
-    def connect_all_devices(self) -> List[ADBConnection]:
-        """智能连接所有设备 - 避免重复连接"""
+    def connect_all_devices(self, deadline: float = 15.0) -> List[ADBConnection]:
+        """智能连接所有设备 - 避免重复连接（端口并发连接，结果按TTL缓存，重新绑定只连接变化的端口）"""
+        started = time.monotonic()
+        discovery = get_adb_discovery()
         connections = []
         used_ports = set()
 
         # 获取活跃端口
         active_ports = self.discover_active_ports()
 
-        # 为每个模拟器窗口分配唯一端口
+        # 为每个模拟器窗口分配唯一端口（避免重复）
+        assignments: List[Tuple[EmulatorWindow, int]] = []
         for window in self.emulator_windows:
             if not window.adb_path:
                 logger.warning(f"窗口 {window.title} 没有可用的ADB路径")
                 continue
 
-            # 为该窗口找到最佳端口（避免重复）
             best_port = self._find_best_port_for_window(window, active_ports, used_ports)
-
             if best_port:
-                conn = self._try_connect_port(best_port, window.adb_path, window.emulator_type)
-                if conn:
-                    connections.append(conn)
-                    used_ports.add(best_port)
-                    window.device_id = conn.device_id
-                    logger.info(f"✅ 窗口 {window.title} 连接到设备: {conn.device_id}")
-                else:
-                    logger.warning(f"⚠️ 窗口 {window.title} 连接端口 {best_port} 失败")
+                assignments.append((window, best_port))
+                used_ports.add(best_port)
             else:
                 logger.warning(f"⚠️ 窗口 {window.title} 未找到可用端口")
 
+        # 并发连接分配到的端口
+        port_windows = {port: window for window, port in assignments}
+        results = discovery.connect_ports(
+            port_windows.keys(),
+            lambda port: self._try_connect_port(port, port_windows[port].adb_path, port_windows[port].emulator_type),
+            deadline - (time.monotonic() - started))
+        for window, port in assignments:
+            conn = results.get(port)
+            if conn:
+                connections.append(conn)
+                window.device_id = conn.device_id
+                logger.info(f"✅ 窗口 {window.title} 连接到设备: {conn.device_id}")
+            else:
+                used_ports.discard(port)
+                logger.warning(f"⚠️ 窗口 {window.title} 连接端口 {port} 失败")
+
         # 对于剩余端口，使用通用ADB连接（如果有必要）
         remaining_ports = active_ports - used_ports
 
         if remaining_ports and len(connections) < len(self.emulator_windows):
             logger.info(f"尝试连接剩余端口以匹配未连接的窗口: {sorted(remaining_ports)}")
 
-            # 只连接与窗口数量相匹配的设备数
+            # 只连接与窗口数量相匹配的设备数：每轮最多并发连接还缺的数量，失败的端口由下一轮的端口补上
             max_additional = len(self.emulator_windows) - len(connections)
+            candidates = sorted(remaining_ports)
             connected_additional = 0
-
-            for port in sorted(remaining_ports):
-                if connected_additional >= max_additional:
-                    break
-
+            while (candidates and connected_additional < max_additional
+                   and deadline - (time.monotonic() - started) > 0):
+                needed = max_additional - connected_additional
+                batch, candidates = candidates[:needed], candidates[needed:]
                 # 使用最合适的ADB路径
-                best_adb = self._get_best_adb_for_port(port)
-                if best_adb:
-                    conn = self._try_connect_port(port, best_adb, 'unknown')
+                port_adb_paths = {port: self._get_best_adb_for_port(port) for port in batch}
+                port_adb_paths = {port: adb_path for port, adb_path in port_adb_paths.items() if adb_path}
+                if not port_adb_paths:
+                    continue
+                results = discovery.connect_ports(
+                    port_adb_paths.keys(),
+                    lambda port, paths=port_adb_paths: self._try_connect_port(port, paths[port], 'unknown'),
+                    deadline - (time.monotonic() - started))
+
+                for port in sorted(port_adb_paths):
+                    conn = results.get(port)
                     if conn:
                         connections.append(conn)
                         connected_additional += 1
                         logger.info(f"✅ 额外连接设备: {conn.device_id}")
 
         self.adb_connections = connections
-        logger.info(f"智能连接完成: {len(connections)} 个唯一设备")
+        logger.info(f"智能连接完成: {len(connections)} 个唯一设备 (耗时 {(time.monotonic() - started) * 1000:.0f}ms)")
         return connections
-    
+
     def _find_best_port_for_window(self, window: EmulatorWindow, active_ports: Set[int], used_ports: Set[int]) -> Optional[int]:
         """为窗口找到最佳端口（避免重复使用）"""
         available_ports = active_ports - used_ports
@@ -728,6 +772,28 @@ class IntelligentADBConnector:
         """尝试连接指定端口"""
         device_id = f"127.0.0.1:{port}"
         
+        client = get_adb_client()
+        if client.is_server_available():
+            try:
+                client.connect_device(device_id)
+                status = client.get_state(device_id)
+                if status == 'device':
+                    logger.info(f"✅ 成功连接: {device_id} ({emulator_type})")
+                    return ADBConnection(
+                        device_id=device_id,
+                        status=status,
+                        adb_path=adb_path,
+                        emulator_type=emulator_type,
+                        port=port
+                    )
+                logger.debug(f"设备状态异常: {device_id} -> {status}")
+                return None
+            except AdbError as e:
+                logger.debug(f"连接端口 {port} 失败: {e}")
+                return None
+            except OSError as e:
+                logger.debug(f"主机协议连接端口 {port} 失败，回退到adb命令行: {e}")
+
         try:
             # 尝试连接
             result = subprocess.run(
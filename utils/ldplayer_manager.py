@@ -1,6 +1,9 @@
 """
 雷电模拟器管理器
 用于动态获取雷电模拟器实例信息和ADB端口
+
+实例列表（list2）缓存 INSTANCES_TTL 秒，多个窗口同时查询时只启动一次 ldconsole；
+启动/停止实例后失效，窗口句柄 -> 实例的查找在内存中完成。
 """
 
 import os
@@ -9,13 +12,20 @@ import subprocess
 from typing import Optional, List, Dict, Any
 import json
 
+from utils.emulator_query_cache import EmulatorQueryCache
+
 logger = logging.getLogger(__name__)
 
+INSTANCES_TTL = 2.0
+
 class LDPlayerManager:
     """雷电模拟器管理器"""
     
     def __init__(self):
         self.console_path = None
+        self._query_cache = EmulatorQueryCache("ldconsole")
+        self._hwnd_index: Dict[int, Dict[str, Any]] = {}  # 窗口句柄 -> 实例信息
+        self._indexed_instances = None
         self._find_console_path()
         
     def _find_console_path(self):
@@ -37,12 +47,15 @@ class LDPlayerManager:
         """检查雷电管理器是否可用"""
         return self.console_path is not None and os.path.exists(self.console_path)
     
-    def get_all_instances(self) -> List[Dict[str, Any]]:
-        """获取所有雷电模拟器实例信息"""
+    def get_all_instances(self, force: bool = False) -> List[Dict[str, Any]]:
+        """获取所有雷电模拟器实例信息（缓存 INSTANCES_TTL 秒）"""
         if not self.is_available():
             logger.warning("雷电管理器不可用")
             return []
-            
+        return self._query_cache.get(('list2',), self._query_instances, INSTANCES_TTL,
+                                     force=force, cache_empty=False)
+
+    def _query_instances(self) -> List[Dict[str, Any]]:
         try:
             # 使用list2命令获取详细信息
             result = subprocess.run(
@@ -90,11 +103,19 @@ class LDPlayerManager:
     def get_instance_by_hwnd(self, hwnd: int) -> Optional[Dict[str, Any]]:
         """根据窗口句柄获取实例信息"""
         instances = self.get_all_instances()
-        
-        for instance in instances:
-            if instance['top_hwnd'] == hwnd or instance['bind_hwnd'] == hwnd:
-                logger.info(f"找到匹配的雷电实例: 索引={instance['index']}, 端口={instance['adb_port']}")
-                return instance
+        if instances is not self._indexed_instances:
+            # 实例列表重新查询过，重建窗口句柄索引
+            hwnd_index = {}
+            for instance in instances:
+                for key in ('top_hwnd', 'bind_hwnd'):
+                    if instance[key]:
+                        hwnd_index[instance[key]] = instance
+            self._hwnd_index, self._indexed_instances = hwnd_index, instances
+
+        instance = self._hwnd_index.get(hwnd)
+        if instance is not None:
+            logger.debug(f"找到匹配的雷电实例: 索引={instance['index']}, 端口={instance['adb_port']}")
+            return instance
                 
         logger.warning(f"未找到匹配窗口句柄 {hwnd} 的雷电实例")
         return None
@@ -137,6 +158,7 @@ class LDPlayerManager:
                 timeout=30,
                 creationflags=subprocess.CREATE_NO_WINDOW
             )
+            self.invalidate_cache()
             
             success = result.returncode == 0
             if success:
@@ -163,6 +185,7 @@ class LDPlayerManager:
                 timeout=30,
                 creationflags=subprocess.CREATE_NO_WINDOW
             )
+            self.invalidate_cache()
             
             success = result.returncode == 0
             if success:
@@ -177,6 +200,15 @@ class LDPlayerManager:
             return False
 
 
+    def invalidate_cache(self):
+        """使实例列表缓存失效（实例启动/停止、分辨率修改后调用）"""
+        self._query_cache.invalidate()
+
+    def get_query_stats(self) -> Dict[str, int]:
+        """查询缓存命中、合并和失效次数"""
+        return self._query_cache.get_stats()
+
+
 # 全局实例
 _ldplayer_manager = None
 
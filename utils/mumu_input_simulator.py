@@ -12,6 +12,9 @@ from typing import Optional, Tuple, Dict, Any, List, List
 from dataclasses import dataclass
 
 from .mumu_manager import get_mumu_manager
+from .adb_client import AdbError
+from .adb_shell_session import AdbCommandNotSent, AdbShellTimeout, get_adb_shell_manager
+from .adb_gesture import estimate_shell_timeout, get_gesture_runner
 from .emulator_detector import EmulatorDetector
 
 logger = logging.getLogger(__name__)
@@ -32,10 +35,7 @@ class MuMuInputSimulator:
         self.mumu_manager = get_mumu_manager()
         self.detector = EmulatorDetector()
         # 添加缓存以提高性能
-        self._vm_index_cache = {}  # hwnd -> vm_index
-        self._vm_info_cache = None  # 缓存模拟器信息
-        self._vm_info_cache_time = 0  # 缓存时间戳
-        self._cache_timeout = 5.0  # 缓存超时时间（秒）
+        self._vm_index_cache = {}  # hwnd -> vm_index（VM信息由 MuMuManager 的查询缓存统一维护）
 
         # 从simple版本合并：窗口句柄变化检测和绑定会话管理
         self._last_hwnd_for_vm = {}  # vm_index -> hwnd
@@ -46,6 +46,9 @@ class MuMuInputSimulator:
         self._adb_keyboard_active_cache = {}  # vm_index -> (is_active, timestamp)
         self._adb_keyboard_cache_timeout = 300.0  # 缓存超时时间（秒）
 
+        # VM的ADB序列号缓存（持久shell会话用）
+        self._adb_serial_cache = {}  # vm_index -> "127.0.0.1:端口"
+
         # 高效模式配置
         self._efficient_mode = True  # 启用高效模式，减少不必要的检测
         self._skip_verification = True  # 跳过ADBKeyboard验证步骤
@@ -88,92 +91,23 @@ class MuMuInputSimulator:
             return cached_vm_index
 
         try:
-            logger.info(f"开始为窗口句柄 {hwnd} 获取VM索引")
-
-            # 获取模拟器信息（带缓存）
-            vm_info = self._get_cached_vm_info()
-            if not vm_info:
-                logger.warning("无法获取VM信息")
+            # 所有VM的信息只查询一次，窗口句柄映射由 MuMuManager 保存在内存中
+            vm_index = self.mumu_manager.get_vm_index_by_hwnd(hwnd)
+            if vm_index is None:
+                logger.warning(f"未找到窗口句柄 {hwnd} 对应的VM索引")
                 return None
 
-            # 将hwnd转换为十六进制字符串进行比较
-            hwnd_hex = f"{hwnd:08X}".upper()
-            logger.debug(f"目标窗口句柄十六进制: {hwnd_hex}")
-
-            # 处理返回的模拟器信息
-            if isinstance(vm_info, dict):
-                vm_list = []
-                for key, value in vm_info.items():
-                    if isinstance(value, dict) and 'index' in value:
-                        vm_list.append(value)
-                        logger.debug(f"找到VM信息: VM{value.get('index')} - main_wnd:{value.get('main_wnd', 'N/A')} render_wnd:{value.get('render_wnd', 'N/A')}")
-                if not vm_list and 'index' in vm_info:
-                    vm_list = [vm_info]
-                    logger.debug(f"单个VM信息: VM{vm_info.get('index')} - main_wnd:{vm_info.get('main_wnd', 'N/A')} render_wnd:{vm_info.get('render_wnd', 'N/A')}")
-            elif isinstance(vm_info, list):
-                vm_list = vm_info
-                for vm_data in vm_list:
-                    if isinstance(vm_data, dict):
-                        logger.debug(f"列表VM信息: VM{vm_data.get('index')} - main_wnd:{vm_data.get('main_wnd', 'N/A')} render_wnd:{vm_data.get('render_wnd', 'N/A')}")
-            else:
-                vm_list = []
-                logger.warning(f"VM信息格式不支持: {type(vm_info)}")
-
-            logger.info(f"共找到 {len(vm_list)} 个VM信息")
-
-            # 遍历所有模拟器，查找匹配的窗口句柄
-            for vm_data in vm_list:
-                if isinstance(vm_data, dict):
-                    main_wnd = vm_data.get('main_wnd', '')
-                    render_wnd = vm_data.get('render_wnd', '')
-                    vm_index = int(vm_data.get('index', 0))
-
-                    logger.debug(f"比较VM{vm_index}: main_wnd={main_wnd} render_wnd={render_wnd} vs 目标={hwnd_hex}")
-
-                    if main_wnd and main_wnd.upper() == hwnd_hex:
-                        logger.info(f"通过主窗口匹配找到VM索引: HWND {hwnd} -> VM {vm_index}")
-                        self._vm_index_cache[hwnd] = vm_index  # 缓存结果
-                        return vm_index
-                    if render_wnd and render_wnd.upper() == hwnd_hex:
-                        logger.info(f"通过渲染窗口匹配找到VM索引: HWND {hwnd} -> VM {vm_index}")
-                        self._vm_index_cache[hwnd] = vm_index  # 缓存结果
-                        return vm_index
-
-            logger.warning(f"未找到窗口句柄 {hwnd} 对应的VM索引")
-            return None
+            logger.info(f"找到VM索引: HWND {hwnd} -> VM {vm_index}")
+            self._vm_index_cache[hwnd] = vm_index  # 缓存结果
+            return vm_index
 
         except Exception as e:
             logger.error(f"获取VM索引失败: {e}")
             return None
 
     def _get_cached_vm_info(self):
-        """获取缓存的模拟器信息"""
-        import time
-        current_time = time.time()
-
-        # 如果缓存过期或不存在，重新获取
-        if (self._vm_info_cache is None or
-            current_time - self._vm_info_cache_time > self._cache_timeout):
-
-            logger.debug("VM信息缓存过期，重新获取...")
-
-            # 使用get_all_vm_info获取所有VM信息，这样可以处理多个VM的情况
-            self._vm_info_cache = self.mumu_manager.get_all_vm_info()
-            self._vm_info_cache_time = current_time
-
-            # 清理过期的VM索引缓存
-            self._vm_index_cache.clear()
-
-            logger.info(f"更新VM信息缓存: {self._vm_info_cache}")
-
-        return self._vm_info_cache
-
-    def clear_cache(self):
-        """清理所有缓存（用于多VM绑定时强制刷新）"""
-        logger.info("清理MuMu输入模拟器缓存")
-        self._vm_info_cache = None
-        self._vm_info_cache_time = 0
-        self._vm_index_cache.clear()
+        """获取缓存的模拟器信息（MuMuManager 查询缓存）"""
+        return self.mumu_manager.get_all_vm_info()
 
 
     # ==================== 键盘输入模拟 ====================
@@ -676,12 +610,13 @@ class MuMuInputSimulator:
             if len(path_points) < 2:
                 return False
 
-            # 优先尝试管道命令方式（最简单高效）
-            if self._execute_pipe_swipe(vm_index, path_points, total_duration):
-                return True
+            # 优先使用设备上缓存的手势脚本（重复拖拽只需一条命令）；脚本已经执行过时不再回退，避免重复拖拽
+            script_result = self._execute_script_swipe(vm_index, path_points, total_duration)
+            if script_result is not None:
+                return script_result
 
-            # 次选脚本文件方式
-            if self._execute_script_swipe(vm_index, path_points, total_duration):
+            # 次选管道命令方式
+            if self._execute_pipe_swipe(vm_index, path_points, total_duration):
                 return True
 
             # 再次选批量命令方式
@@ -758,113 +693,46 @@ class MuMuInputSimulator:
             logger.error(f"管道执行拖拽失败: {e}")
             return False
 
-    def _execute_script_swipe(self, vm_index: int, path_points: list, total_duration: int) -> bool:
-        """脚本文件执行拖拽 - 最高效的方式，创建临时脚本文件执行"""
-        try:
-            if len(path_points) < 2:
-                return False
-
-            import tempfile
-            import os
-
-            # 计算每个点之间的时间间隔（毫秒）
-            segment_count = len(path_points) - 1
-            segment_duration_ms = total_duration // segment_count
-
-            # 创建临时脚本文件
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.sh', delete=False, encoding='utf-8') as script_file:
-                script_path = script_file.name
-
-                # 写入脚本内容
-                script_file.write("#!/system/bin/sh\n")
-
-                # DOWN事件
-                start_x, start_y = path_points[0]
-                script_file.write(f"input motionevent DOWN {start_x} {start_y}\n")
-
-                # MOVE事件（包含延迟）
-                for i in range(1, len(path_points) - 1):
-                    x, y = path_points[i]
-                    if segment_duration_ms > 0:
-                        # 添加延迟（使用usleep，单位为微秒）
-                        delay_microseconds = segment_duration_ms * 1000
-                        script_file.write(f"usleep {delay_microseconds}\n")
-                    script_file.write(f"input motionevent MOVE {x} {y}\n")
-
-                # 最后一个点的延迟和UP事件
-                if segment_duration_ms > 0:
-                    delay_microseconds = segment_duration_ms * 1000
-                    script_file.write(f"usleep {delay_microseconds}\n")
-
-                end_x, end_y = path_points[-1]
-                script_file.write(f"input motionevent UP {end_x} {end_y}\n")
-
-            try:
-                # 将脚本文件推送到设备
-                device_script_path = f"/data/local/tmp/swipe_script_{vm_index}.sh"
-
-                # 推送文件到设备
-                push_success = self._push_script_to_device(vm_index, script_path, device_script_path)
-                if not push_success:
-                    logger.warning("推送脚本文件到设备失败")
-                    return False
-
-                # 给脚本文件执行权限并执行
-                chmod_success = self._execute_adb_shell_command(vm_index, f"chmod +x {device_script_path}")
-                if not chmod_success:
-                    logger.warning("设置脚本执行权限失败")
-                    return False
-
-                # 执行脚本
-                exec_success = self._execute_adb_shell_command(vm_index, f"sh {device_script_path}")
-
-                # 清理设备上的脚本文件
-                self._execute_adb_shell_command(vm_index, f"rm {device_script_path}")
-
-                if exec_success:
-                    logger.info(f"脚本拖拽完成: {len(path_points)}个点, 总时长: {total_duration}ms")
-                    return True
-                else:
-                    logger.warning("脚本执行失败")
-                    return False
-
-            finally:
-                # 清理本地临时文件
-                try:
-                    os.unlink(script_path)
-                except:
-                    pass
-
-        except Exception as e:
-            logger.error(f"脚本执行拖拽失败: {e}")
-            return False
+    def _execute_script_swipe(self, vm_index: int, path_points: list, total_duration: int) -> Optional[bool]:
+        """
+        手势脚本执行拖拽 - 路径编译成motionevent脚本，按内容哈希缓存在设备上，在持久shell会话中执行
 
-    def _push_script_to_device(self, vm_index: int, local_path: str, device_path: str) -> bool:
-        """推送脚本文件到设备"""
+        Returns:
+            True: 执行成功
+            False: 脚本已经在设备上执行（失败、超时或结果未知），调用方不应再回退，避免重复拖拽
+            None: 脚本没有启动（会话不可用、推送失败），可以回退到其他方式
+        """
         try:
-            if not self.mumu_manager.is_available():
-                return False
-
-            manager_path = self.mumu_manager.get_manager_path()
-            if not manager_path:
+            if len(path_points) < 2:
                 return False
 
-            # 构建push命令
-            cmd_args = [manager_path, "adb", "-v", str(vm_index), "-c", f"push {local_path} {device_path}"]
-
-            import subprocess
-            result = subprocess.run(cmd_args, capture_output=True, text=True, timeout=10)
+            if not get_adb_shell_manager().is_available():
+                return None
+            serial = self._get_adb_serial(vm_index)
+            if serial is None:
+                return None
 
-            if result.returncode == 0:
-                logger.debug(f"成功推送脚本文件: {local_path} -> {device_path}")
+            success, output = get_gesture_runner().run(serial, path_points, total_duration)
+            if success:
+                logger.info(f"脚本拖拽完成: {len(path_points)}个点, 总时长: {total_duration}ms")
                 return True
-            else:
-                logger.warning(f"推送脚本文件失败: {result.stderr}")
-                return False
+            logger.error(f"手势脚本已执行但失败，不再回退: {output.strip()[:200]}")
+            return False
 
-        except Exception as e:
-            logger.error(f"推送脚本文件异常: {e}")
+        except AdbCommandNotSent as e:
+            logger.warning(f"手势脚本未能启动，回退到其他方式: {e}")
+            self._adb_serial_cache.pop(vm_index, None)
+            return None
+        except AdbShellTimeout as e:
+            logger.error(f"手势脚本执行超时，拖拽可能已执行，不再回退: {e}")
             return False
+        except AdbError as e:
+            logger.error(f"手势脚本执行中断，拖拽可能已执行，不再回退: {e}")
+            self._adb_serial_cache.pop(vm_index, None)
+            return False
+        except Exception as e:
+            logger.error(f"脚本执行拖拽失败: {e}")
+            return None
 
     def _execute_batch_swipe(self, vm_index: int, path_points: list, total_duration: int) -> bool:
         """批量执行拖拽 - 使用shell脚本一次性执行所有命令"""
@@ -1010,9 +878,57 @@ class MuMuInputSimulator:
             logger.error(f"执行MuMu ADB快捷命令异常: {e}")
             return False
     
+    def _get_adb_serial(self, vm_index: int) -> Optional[str]:
+        """获取VM的ADB序列号（127.0.0.1:端口），取不到时返回None"""
+        serial = self._adb_serial_cache.get(vm_index)
+        if serial is None:
+            vm_info = self.mumu_manager.get_vm_info(vm_index) or {}
+            adb_port = vm_info.get('adb_port')
+            if not adb_port:
+                return None
+            serial = self._adb_serial_cache[vm_index] = f"{vm_info.get('adb_host_ip') or '127.0.0.1'}:{adb_port}"
+        return serial
+
+    def _execute_adb_shell_session(self, vm_index: int, shell_command: str) -> Optional[bool]:
+        """
+        在VM的持久shell会话中执行命令；会话不可用时返回None（回退到MuMuManager命令行）
+
+        超时按命令内容估算（sleep、input 条数、swipe 时长）；命令写入设备后超时或读取失败时可能已经执行，
+        返回False而不回退，避免同一输入执行两次。只有命令没有送到设备时才返回None。
+        """
+        manager = get_adb_shell_manager()
+        if not manager.is_available():
+            return None
+        serial = self._get_adb_serial(vm_index)
+        if serial is None:
+            return None
+        timeout = estimate_shell_timeout(shell_command)
+        try:
+            exit_code, output = manager.run(serial, shell_command, timeout=timeout)
+        except AdbShellTimeout:
+            logger.error(f"VM{vm_index} 持久shell会话执行超时 ({timeout:.1f}s)，命令可能已执行，不再回退: {shell_command[:100]}")
+            return False
+        except AdbCommandNotSent as e:
+            logger.debug(f"VM{vm_index} 持久shell会话不可用，回退到命令行: {e}")
+            self._adb_serial_cache.pop(vm_index, None)
+            return None
+        except AdbError as e:
+            logger.error(f"VM{vm_index} 持久shell会话读取结果失败，命令可能已执行，不再回退: {e}")
+            self._adb_serial_cache.pop(vm_index, None)
+            return False
+        if exit_code != 0:
+            logger.error(f"MuMu ADB shell命令执行失败 (退出码 {exit_code}): {output.strip()}")
+        else:
+            logger.debug(f"MuMu ADB shell命令执行成功: {shell_command}")
+        return exit_code == 0
+
     def _execute_adb_shell_command(self, vm_index: int, shell_command: str) -> bool:
-        """执行MuMu ADB shell命令"""
+        """执行MuMu ADB shell命令（优先使用持久shell会话）"""
         try:
+            session_result = self._execute_adb_shell_session(vm_index, shell_command)
+            if session_result is not None:
+                return session_result
+
             manager_path = self.mumu_manager.mumu_manager_path
             if not manager_path:
                 return False
@@ -1328,8 +1244,7 @@ class MuMuInputSimulator:
         self._adb_keyboard_active_cache.clear()
         self._last_hwnd_for_vm.clear()
         self._vm_binding_sessions.clear()
-        self._vm_info_cache = None
-        self._vm_info_cache_time = 0
+        self.mumu_manager.invalidate_cache()
         logger.info("已清理所有缓存（VM索引、ADBKeyboard状态、窗口句柄和绑定会话）")
 
     def set_efficient_mode(self, enabled: bool = True, skip_verification: bool = True):
@@ -9,26 +9,42 @@ MuMu模拟器管理器
 - 增强了 get_simulator_info() 的日志输出，记录原始输出和JSON解析结果
 - 增强了 __init__() 的日志输出，明确显示MuMuManager.exe是否找到
 - 这些日志将帮助诊断为什么 get_all_vm_info() 返回空字典的问题
+
+查询缓存：
+- 所有VM的信息通过一次 `info -v all` 获取并缓存，单个VM的信息和窗口句柄 -> VM索引都从这份缓存中取
+- 应用状态、VM配置按键缓存；多个窗口同时发起的相同查询只启动一次MuMuManager.exe
+- 启动/关闭/重启、窗口布局、应用安装启停、配置修改、分辨率调整后显式失效
 """
 
 import os
 import subprocess
 import json
 import logging
+import threading
 import win32gui
 import win32process
 import psutil
 from typing import Optional, Dict, List, Any, Tuple
 from pathlib import Path
 
+from utils.emulator_query_cache import EmulatorQueryCache
+
 logger = logging.getLogger(__name__)
 
+# 查询缓存时间（秒）：VM信息和应用状态会自行变化，配置只会被显式修改
+VM_INFO_TTL = 2.0
+APP_INFO_TTL = 2.0
+VM_SETTING_TTL = 60.0
+
 
 class MuMuManager:
     """MuMu模拟器管理器"""
     
     def __init__(self):
         self.mumu_manager_path = None
+        self._query_cache = EmulatorQueryCache("MuMuManager")
+        self._hwnd_vm_index: Dict[int, int] = {}  # 窗口句柄 -> VM索引
+        self._hwnd_index_lock = threading.Lock()  # 保护 _hwnd_vm_index 的重建、查找和失效
         self._find_mumu_manager()
 
         # 🔧 增强诊断：初始化后记录状态
@@ -213,8 +229,20 @@ class MuMuManager:
             logger.error(f"  MuMuManager路径: {self.mumu_manager_path}")
             return False, "", str(e)
     
-    def get_simulator_info(self, vm_index: Optional[int] = None) -> Dict[str, Any]:
-        """获取模拟器信息"""
+    def get_simulator_info(self, vm_index: Optional[int] = None, force: bool = False) -> Dict[str, Any]:
+        """获取模拟器信息（缓存；单个VM的信息优先从所有VM的信息中取）"""
+        if vm_index is None:
+            return self._query_cache.get(('info', 'all'), lambda: self._query_simulator_info(None),
+                                         VM_INFO_TTL, force=force, cache_empty=False)
+
+        vm_info = self.get_all_vm_info(force).get(str(vm_index))
+        if vm_info:
+            return vm_info
+        return self._query_cache.get(('info', vm_index), lambda: self._query_simulator_info(vm_index),
+                                     VM_INFO_TTL, force=force, cache_empty=False)
+
+    def _query_simulator_info(self, vm_index: Optional[int]) -> Dict[str, Any]:
+        """执行 info 命令获取模拟器信息"""
         args = ["info"]
         if vm_index is not None:
             args.extend(["-v", str(vm_index)])
@@ -256,12 +284,15 @@ class MuMuManager:
             logger.error(f"获取VM {vm_index} 信息失败: {e}")
             return None
 
-    def get_all_vm_info(self) -> Dict[str, Any]:
-        """获取所有VM的信息"""
+    def get_all_vm_info(self, force: bool = False) -> Dict[str, Any]:
+        """获取所有VM的信息（一次命令，缓存 VM_INFO_TTL 秒）"""
         try:
-            info = self.get_simulator_info()  # 不传参数获取所有VM信息
+            info = self.get_simulator_info(force=force)  # 不传参数获取所有VM信息
             logger.debug(f"get_all_vm_info 原始返回: {type(info)} - {info}")
 
+            if info and isinstance(info, list):
+                return {str(vm['index']): vm for vm in info if isinstance(vm, dict) and 'index' in vm}
+
             # 根据官方文档和实际测试，info -v all 可能返回不同格式
             # 如果返回的是单个VM信息（只有一个VM时），需要转换为字典格式
             if info and isinstance(info, dict):
@@ -286,49 +317,73 @@ class MuMuManager:
     def get_simulator_by_hwnd(self, hwnd: int) -> Optional[Dict[str, Any]]:
         """根据窗口句柄获取模拟器信息"""
         try:
-            # 首先验证这是否是MuMu主设备窗口
-            if self._is_mumu_main_device_window(hwnd):
-                logger.debug(f"确认窗口 {hwnd} 是MuMu主设备窗口")
-
-            # 获取所有模拟器信息
-            all_info = self.get_simulator_info()
-            if not all_info:
-                logger.debug(f"未获取到模拟器信息")
+            vm_index = self.get_vm_index_by_hwnd(hwnd)
+            if vm_index is None:
+                logger.debug(f"未找到匹配窗口句柄 {hwnd} 的模拟器")
                 return None
-
-            logger.debug(f"获取到模拟器信息类型: {type(all_info)}, 内容: {all_info}")
-
-            # 如果返回的是列表，遍历查找匹配的窗口句柄
-            if isinstance(all_info, list):
-                logger.debug(f"处理列表格式的模拟器信息，共 {len(all_info)} 个")
-                for simulator in all_info:
-                    if self._is_hwnd_match(hwnd, simulator):
-                        logger.debug(f"找到匹配的模拟器: {simulator}")
-                        return simulator
-            elif isinstance(all_info, dict):
-                # 🔧 修复：检查是否是多VM字典格式（键为VM索引）
-                if any(key.isdigit() for key in all_info.keys()):
-                    # 多VM字典格式，遍历每个VM
-                    logger.debug(f"处理多VM字典格式，共 {len(all_info)} 个VM")
-                    for vm_index, simulator_info in all_info.items():
-                        logger.debug(f"检查VM {vm_index}: {simulator_info}")
-                        if self._is_hwnd_match(hwnd, simulator_info):
-                            logger.debug(f"找到匹配的VM {vm_index}: {simulator_info}")
-                            return simulator_info
-                else:
-                    # 单个模拟器信息字典
-                    logger.debug(f"处理单个模拟器信息字典")
-                    if self._is_hwnd_match(hwnd, all_info):
-                        logger.debug(f"找到匹配的模拟器: {all_info}")
-                        return all_info
-
-            logger.debug(f"未找到匹配窗口句柄 {hwnd} 的模拟器")
-            return None
+            return self.get_all_vm_info().get(str(vm_index))
 
         except Exception as e:
             logger.error(f"根据窗口句柄获取模拟器信息失败: {e}")
             return None
 
+    def get_vm_index_by_hwnd(self, hwnd: int) -> Optional[int]:
+        """根据窗口句柄（主窗口/渲染窗口/同进程窗口）获取VM索引，映射保存在内存中"""
+        all_info = self.get_all_vm_info()
+        if not all_info:
+            logger.debug("未获取到模拟器信息")
+            return None
+
+        # 内存中的映射仍然有效时直接返回
+        with self._hwnd_index_lock:
+            vm_index = self._hwnd_vm_index.get(hwnd)
+        if vm_index is not None and self._is_hwnd_match(hwnd, all_info.get(str(vm_index)) or {}):
+            return vm_index
+
+        # 按主窗口/渲染窗口句柄重建映射
+        with self._hwnd_index_lock:
+            for index, simulator_info in all_info.items():
+                for key in ('main_wnd', 'render_wnd'):
+                    wnd = simulator_info.get(key)
+                    if isinstance(wnd, str) and wnd:
+                        try:
+                            self._hwnd_vm_index[int(wnd, 16)] = int(index)
+                        except ValueError:
+                            pass
+            vm_index = self._hwnd_vm_index.get(hwnd)
+        if vm_index is not None and str(vm_index) in all_info:
+            return vm_index
+
+        # 按进程ID匹配
+        for index, simulator_info in all_info.items():
+            if self._is_hwnd_match(hwnd, simulator_info):
+                logger.debug(f"找到匹配的VM {index}: {simulator_info}")
+                with self._hwnd_index_lock:
+                    self._hwnd_vm_index[hwnd] = int(index)
+                return int(index)
+        return None
+
+    def invalidate_cache(self, vm_index: Optional[int] = None):
+        """
+        使查询缓存失效（VM启动/关闭、分辨率或配置变化后调用）
+
+        Args:
+            vm_index: 只清除该VM的应用和配置缓存；所有VM的信息总是重新获取
+        """
+        if vm_index is None:
+            self._query_cache.invalidate()
+            with self._hwnd_index_lock:
+                self._hwnd_vm_index.clear()
+            return
+        self._query_cache.invalidate(lambda key: key[0] == 'info' or key[1] == vm_index)
+        with self._hwnd_index_lock:
+            for hwnd in [hwnd for hwnd, index in self._hwnd_vm_index.items() if index == vm_index]:
+                del self._hwnd_vm_index[hwnd]
+
+    def get_query_stats(self) -> Dict[str, int]:
+        """查询缓存命中、合并和失效次数"""
+        return self._query_cache.get_stats()
+
     def _is_mumu_main_device_window(self, hwnd: int) -> bool:
         """检查窗口是否为MuMu主设备窗口（标题包含"MuMu安卓设备"）"""
         try:
@@ -396,30 +451,35 @@ class MuMuManager:
             args.extend(["-pkg", package_name])
         
         success, stdout, stderr = self._run_command(args, timeout=60)
+        self.invalidate_cache(vm_index)
         return success
     
     def shutdown_simulator(self, vm_index: int) -> bool:
         """关闭模拟器"""
         args = ["control", "-v", str(vm_index), "shutdown"]
         success, stdout, stderr = self._run_command(args)
+        self.invalidate_cache(vm_index)
         return success
     
     def restart_simulator(self, vm_index: int) -> bool:
         """重启模拟器"""
         args = ["control", "-v", str(vm_index), "restart"]
         success, stdout, stderr = self._run_command(args, timeout=60)
+        self.invalidate_cache(vm_index)
         return success
     
     def show_window(self, vm_index: int) -> bool:
         """显示模拟器窗口"""
         args = ["control", "-v", str(vm_index), "show_window"]
         success, stdout, stderr = self._run_command(args)
+        self.invalidate_cache(vm_index)
         return success
     
     def hide_window(self, vm_index: int) -> bool:
         """隐藏模拟器窗口"""
         args = ["control", "-v", str(vm_index), "hide_window"]
         success, stdout, stderr = self._run_command(args)
+        self.invalidate_cache(vm_index)
         return success
     
     def set_window_layout(self, vm_index: int, x: Optional[int] = None, y: Optional[int] = None,
@@ -437,34 +497,47 @@ class MuMuManager:
             args.extend(["-sh", str(height)])
         
         success, stdout, stderr = self._run_command(args)
+        self.invalidate_cache(vm_index)
         return success
 
     def install_app(self, vm_index: int, apk_path: str) -> bool:
         """安装应用到模拟器"""
         args = ["control", "-v", str(vm_index), "app", "install", "-apk", apk_path]
         success, stdout, stderr = self._run_command(args, timeout=120)
+        self._invalidate_app_cache(vm_index)
         return success
 
     def uninstall_app(self, vm_index: int, package_name: str) -> bool:
         """卸载模拟器中的应用"""
         args = ["control", "-v", str(vm_index), "app", "uninstall", "-pkg", package_name]
         success, stdout, stderr = self._run_command(args)
+        self._invalidate_app_cache(vm_index)
         return success
 
     def launch_app(self, vm_index: int, package_name: str) -> bool:
         """启动模拟器中的应用"""
         args = ["control", "-v", str(vm_index), "app", "launch", "-pkg", package_name]
         success, stdout, stderr = self._run_command(args)
+        self._invalidate_app_cache(vm_index)
         return success
 
     def close_app(self, vm_index: int, package_name: str) -> bool:
         """关闭模拟器中的应用"""
         args = ["control", "-v", str(vm_index), "app", "close", "-pkg", package_name]
         success, stdout, stderr = self._run_command(args)
+        self._invalidate_app_cache(vm_index)
         return success
 
-    def get_app_info(self, vm_index: int, package_name: Optional[str] = None) -> Dict[str, Any]:
-        """获取应用信息"""
+    def _invalidate_app_cache(self, vm_index: int):
+        self._query_cache.invalidate(lambda key: key[0] == 'app' and key[1] == vm_index)
+
+    def get_app_info(self, vm_index: int, package_name: Optional[str] = None, force: bool = False) -> Dict[str, Any]:
+        """获取应用信息（缓存 APP_INFO_TTL 秒）"""
+        return self._query_cache.get(('app', vm_index, package_name),
+                                     lambda: self._query_app_info(vm_index, package_name),
+                                     APP_INFO_TTL, force=force, cache_empty=False)
+
+    def _query_app_info(self, vm_index: int, package_name: Optional[str]) -> Dict[str, Any]:
         args = ["control", "-v", str(vm_index), "app", "info"]
 
         if package_name:
@@ -536,6 +609,7 @@ class MuMuManager:
             args = ["setting", "-v", str(vm_index), "-k", key, "-val", value]
             success, stdout, stderr = self._run_command(args, timeout=10)
 
+            self.invalidate_cache(vm_index)
             if success:
                 logger.info(f"设置VM {vm_index} 配置成功: {key} = {value}")
             else:
@@ -547,13 +621,20 @@ class MuMuManager:
             logger.error(f"设置VM配置异常: {e}")
             return False
 
-    def get_vm_setting(self, vm_index: int, key: str) -> Optional[str]:
-        """获取VM配置"""
+    def get_vm_setting(self, vm_index: int, key: str, force: bool = False) -> Optional[str]:
+        """获取VM配置（缓存，set_vm_setting/分辨率调整后失效）"""
         try:
             if not self.is_available():
                 logger.error("MuMuManager不可用")
                 return None
+            return self._query_cache.get(('setting', vm_index, key), lambda: self._query_vm_setting(vm_index, key),
+                                         VM_SETTING_TTL, force=force, cache_empty=False)
+        except Exception as e:
+            logger.error(f"获取VM配置异常: {e}")
+            return None
 
+    def _query_vm_setting(self, vm_index: int, key: str) -> Optional[str]:
+        try:
             args = ["setting", "-v", str(vm_index), "-k", key]
             success, stdout, stderr = self._run_command(args, timeout=10)
 
@@ -586,7 +667,10 @@ class MuMuManager:
         try:
             from utils.mumu_resolution_manager import get_mumu_resolution_manager
             resolution_manager = get_mumu_resolution_manager()
-            return resolution_manager.adjust_resolution(vm_index, target_width, target_height)
+            try:
+                return resolution_manager.adjust_resolution(vm_index, target_width, target_height)
+            finally:
+                self.invalidate_cache(vm_index)
         except Exception as e:
             logger.error(f"调整分辨率失败: {e}")
             from utils.mumu_resolution_manager import ResolutionResult
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+
+"""
+目标文字编译匹配器
+将卡片的目标文字（单组/多组）编译一次，之后对OCR结果只做一次扫描即可得到所有匹配及位置：
+- 包含模式：Aho-Corasick 自动机
+- 完全匹配：哈希表
+- 模糊匹配：有界编辑距离，常见OCR混淆字符视为相同
+  卡片默认不允许错字（只容忍混淆字符），允许的错字数由卡片参数单独开启；
+  不超过 SHORT_TARGET_LENGTH 个字的短目标始终不允许错字，否则做子串匹配时几乎能匹配任何文字
+"""
+
+import logging
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 匹配模式（与卡片参数中的选项保持一致）
+MATCH_MODE_CONTAINS = "包含"
+MATCH_MODE_EXACT = "完全匹配"
+MATCH_MODE_FUZZY = "模糊匹配"
+
+MATCH_MODE_OPTIONS = [MATCH_MODE_CONTAINS, MATCH_MODE_EXACT, MATCH_MODE_FUZZY]
+
+# 不超过此长度的目标文字在模糊匹配时不允许错字
+SHORT_TARGET_LENGTH = 3
+
+# 常见OCR混淆字符组，同组内字符互相替换不计编辑距离
+_OCR_CONFUSION_GROUPS = [
+    "0OoD〇口",
+    "1lI|丨",
+    "2Z",
+    "5S",
+    "6b",
+    "8B",
+    "9g",
+    "人入",
+    "己已巳",
+    "未末",
+    "土士",
+    "日曰",
+    "千干",
+    "，,",
+    "：:",
+    "（(",
+    "）)",
+]
+
+
+def _build_confusion_map() -> Dict[str, str]:
+    """构建 字符 -> 规范字符 的映射"""
+    mapping = {}
+    for group in _OCR_CONFUSION_GROUPS:
+        canonical = group[0]
+        for ch in group:
+            mapping[ch] = canonical
+    return mapping
+
+
+_CONFUSION_MAP = _build_confusion_map()
+
+
+def normalize_ocr_text(text: str) -> str:
+    """将OCR混淆字符统一为规范字符（用于模糊匹配）"""
+    return "".join(_CONFUSION_MAP.get(ch, ch) for ch in text)
+
+
+def default_max_distance(target: str) -> int:
+    """根据目标文字长度给出默认允许的编辑距离：短目标不允许错误，其余每4个字允许1处错误，至少1处"""
+    if len(target) <= SHORT_TARGET_LENGTH:
+        return 0
+    return max(1, len(target) // 4)
+
+
+@dataclass(frozen=True)
+class TextMatch:
+    """单个匹配结果"""
+    result_index: int   # 命中的OCR结果下标
+    target_index: int   # 命中的目标文字下标（多组文字时即组序号）
+    target: str         # 目标文字
+    start: int          # 在该OCR结果文字中的起始位置
+    end: int            # 在该OCR结果文字中的结束位置（不含）
+    distance: int = 0   # 编辑距离（非模糊模式恒为0）
+
+
+class _AhoCorasick:
+    """Aho-Corasick 多模式匹配自动机"""
+
+    def __init__(self, patterns: Sequence[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        self._lengths = [len(p) for p in patterns]
+
+        for pattern_index, pattern in enumerate(patterns):
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                next_state = self._goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][ch] = next_state
+                state = next_state
+            self._output[state].append(pattern_index)
+
+        # BFS 构建失败指针，并把失败链上的输出合并到当前状态
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail_state = self._fail[state]
+                while fail_state and ch not in self._goto[fail_state]:
+                    fail_state = self._fail[fail_state]
+                candidate = self._goto[fail_state].get(ch, 0)
+                self._fail[next_state] = candidate if candidate != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter_matches(self, text: str):
+        """扫描文字，产出 (pattern_index, start, end)"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        lengths = self._lengths
+        state = 0
+        for pos, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                end = pos + 1
+                for pattern_index in output[state]:
+                    yield pattern_index, end - lengths[pattern_index], end
+
+
+def _fuzzy_find(pattern: str, text: str, max_distance: int) -> Optional[Tuple[int, int, int]]:
+    """
+    近似子串匹配（Sellers算法），返回编辑距离最小的 (start, end, distance)，超出上限返回None
+    """
+    m = len(pattern)
+    if m == 0:
+        return None
+
+    # 每列保存 (距离, 起点)
+    previous = [(i, 0) for i in range(m + 1)]
+    best = None
+    for j, ch in enumerate(text, start=1):
+        current = [(0, j)]
+        for i in range(1, m + 1):
+            cost = 0 if pattern[i - 1] == ch else 1
+            sub = (previous[i - 1][0] + cost, previous[i - 1][1])
+            dele = (current[i - 1][0] + 1, current[i - 1][1])
+            ins = (previous[i][0] + 1, previous[i][1])
+            current.append(min(sub, dele, ins, key=lambda item: item[0]))
+        distance, start = current[m]
+        if distance <= max_distance and (best is None or distance < best[2]):
+            best = (start, j, distance)
+            if distance == 0:
+                break
+        previous = current
+    return best
+
+
+class CompiledTextMatcher:
+    """
+    编译后的目标文字匹配器
+
+    每张卡片的目标文字只编译一次，之后对OCR结果列表做单次扫描返回所有匹配。
+    """
+
+    def __init__(self, targets: Sequence[str], match_mode: str = MATCH_MODE_CONTAINS,
+                 max_distance: Optional[int] = None):
+        self.targets: Tuple[str, ...] = tuple(t for t in targets)
+        if match_mode not in MATCH_MODE_OPTIONS:
+            # 未知模式沿用原有行为：默认包含
+            match_mode = MATCH_MODE_CONTAINS
+        self.match_mode = match_mode
+        self.max_distance = max_distance
+
+        self._automaton: Optional[_AhoCorasick] = None
+        self._exact_table: Dict[str, List[int]] = {}
+        self._fuzzy_targets: List[Tuple[str, int]] = []
+
+        if match_mode == MATCH_MODE_CONTAINS:
+            self._automaton = _AhoCorasick(self.targets)
+        elif match_mode == MATCH_MODE_EXACT:
+            for index, target in enumerate(self.targets):
+                self._exact_table.setdefault(target, []).append(index)
+        else:
+            for target in self.targets:
+                limit = max_distance if max_distance is not None else default_max_distance(target)
+                if len(target) <= SHORT_TARGET_LENGTH:
+                    limit = 0
+                self._fuzzy_targets.append((normalize_ocr_text(target), max(0, limit)))
+
+    def find_all(self, texts: Sequence[str]) -> List[TextMatch]:
+        """对OCR文字列表做单次扫描，返回所有匹配（按结果顺序、位置排序）"""
+        matches: List[TextMatch] = []
+        for result_index, text in enumerate(texts):
+            if not text:
+                continue
+            if self._automaton is not None:
+                for target_index, start, end in self._automaton.iter_matches(text):
+                    matches.append(TextMatch(result_index, target_index, self.targets[target_index], start, end))
+            elif self.match_mode == MATCH_MODE_EXACT:
+                stripped = text.strip()
+                indices = self._exact_table.get(stripped)
+                if indices:
+                    start = text.find(stripped)
+                    for target_index in indices:
+                        matches.append(TextMatch(result_index, target_index, self.targets[target_index],
+                                                 start, start + len(stripped)))
+            else:
+                normalized = normalize_ocr_text(text)
+                for target_index, (pattern, limit) in enumerate(self._fuzzy_targets):
+                    found = _fuzzy_find(pattern, normalized, limit)
+                    if found:
+                        start, end, distance = found
+                        matches.append(TextMatch(result_index, target_index, self.targets[target_index],
+                                                 start, end, distance))
+        matches.sort(key=lambda match: (match.result_index, match.start, match.target_index))
+        return matches
+
+    def find_first(self, texts: Sequence[str], target_index: Optional[int] = None) -> Optional[TextMatch]:
+        """返回第一个匹配（可限定目标下标），与原有逐条检查的顺序一致"""
+        for match in self.find_all(texts):
+            if target_index is None or match.target_index == target_index:
+                return match
+        return None
+
+    def best_by_target(self, texts: Sequence[str]) -> Dict[int, TextMatch]:
+        """返回每个目标的第一个匹配 {target_index: TextMatch}"""
+        best: Dict[int, TextMatch] = {}
+        for match in self.find_all(texts):
+            if match.target_index not in best:
+                best[match.target_index] = match
+        return best
+
+
+# 编译结果缓存：同一张卡片的目标文字只编译一次
+_MATCHER_CACHE_SIZE = 256
+_matcher_cache: "OrderedDict[Tuple[Tuple[str, ...], str, Optional[int]], CompiledTextMatcher]" = OrderedDict()
+_matcher_cache_lock = threading.Lock()
+
+
+def get_text_matcher(targets: Sequence[str], match_mode: str = MATCH_MODE_CONTAINS,
+                     max_distance: Optional[int] = None) -> CompiledTextMatcher:
+    """获取（缓存的）编译匹配器"""
+    key = (tuple(targets), match_mode, max_distance)
+    with _matcher_cache_lock:
+        matcher = _matcher_cache.get(key)
+        if matcher is not None:
+            _matcher_cache.move_to_end(key)
+            return matcher
+
+    matcher = CompiledTextMatcher(targets, match_mode, max_distance)
+    with _matcher_cache_lock:
+        _matcher_cache[key] = matcher
+        if len(_matcher_cache) > _MATCHER_CACHE_SIZE:
+            _matcher_cache.popitem(last=False)
+    logger.debug(f"编译文字匹配器: {len(matcher.targets)} 个目标, 模式: {matcher.match_mode}")
+    return matcher
+
+
+def find_first_matching_result(results: Sequence[dict], target_text: str,
+                               match_mode: str, max_distance: Optional[int] = None) -> Optional[dict]:
+    """在OCR结果列表中查找第一个匹配目标文字的结果"""
+    if not results or not target_text:
+        return None
+    matcher = get_text_matcher((target_text,), match_mode, max_distance)
+    match = matcher.find_first([r.get('text', '') for r in results])
+    return results[match.result_index] if match else None
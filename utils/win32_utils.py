@@ -28,8 +28,15 @@ import win32ui
 import win32con
 import logging
 
+from utils.workflow_profiler import profiled, SPAN_CAPTURE, SPAN_INPUT
+from utils.input_lock import serialized_input
+from utils.heavy_op_admission import admitted, OP_CAPTURE
+from utils.adb_framebuffer import capture_registered_window
+
 # 其他现有的导入保持不变...
 
+@profiled(SPAN_CAPTURE)
+@admitted(OP_CAPTURE)
 def capture_window_background(hwnd: int) -> Optional[np.ndarray]:
     """
     Captures the content of a window's client area specified by its handle (HWND) using background methods.
@@ -42,6 +49,11 @@ def capture_window_background(hwnd: int) -> Optional[np.ndarray]:
     Returns:
         A NumPy array representing the window's client area content in BGR format, or None if capture fails.
     """
+    # 已登记 ADB 帧缓冲截图的模拟器窗口直接返回设备最新帧
+    adb_frame = capture_registered_window(hwnd)
+    if adb_frame is not None:
+        return adb_frame
+
     if not PYWIN32_AVAILABLE:
         logging.error("capture_window_background: pywin32 未安装。")
         return None
@@ -433,6 +445,8 @@ def release_key_background(hwnd: int, key: str) -> bool:
         return False
 # --- END ADDED --- 
 
+@profiled(SPAN_INPUT)
+@serialized_input
 def click_background(hwnd: int, x: int, y: int, button: str = 'left', clicks: int = 1, interval: float = 0.1, random_range_x: int = 0, random_range_y: int = 0) -> bool:
     """
     Sends mouse click messages to a window at specified client coordinates.
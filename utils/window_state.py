@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+
+"""
+窗口状态缓存
+由单个后台监视线程维护每个窗口的状态（有效性、客户区、窗口矩形、DPI、标题），
+任务模块和执行器直接读取缓存，不再在每个卡片上调用 IsWindow/GetWindowRect/GetClientRect。
+
+- 状态对象不可变，更新时整体替换，读取无需加锁
+- 窗口尺寸变化、DPI变化或销毁时版本号递增并通知监听器
+- 轮询通过可替换的信息源进行（Win32 实现或用于测试的假窗口表）
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import win32gui
+    PYWIN32_AVAILABLE = True
+except ImportError:
+    PYWIN32_AVAILABLE = False
+
+# 状态变化原因
+WINDOW_EVENT_DESTROY = 'destroy'
+WINDOW_EVENT_RESIZE = 'resize'
+WINDOW_EVENT_MOVE = 'move'
+WINDOW_EVENT_DPI = 'dpi'
+WINDOW_EVENT_TITLE = 'title'
+
+Rect = Tuple[int, int, int, int]
+
+
+@dataclass(frozen=True)
+class WindowInfo:
+    """信息源返回的原始窗口信息"""
+    title: str
+    window_rect: Rect
+    client_rect: Rect
+    dpi: int = 96
+
+
+@dataclass(frozen=True)
+class WindowState:
+    """窗口状态快照"""
+    hwnd: int
+    valid: bool
+    title: str = ""
+    window_rect: Rect = (0, 0, 0, 0)
+    client_rect: Rect = (0, 0, 0, 0)
+    dpi: int = 96
+    version: int = 0
+    updated_at: float = field(default_factory=time.time)
+
+    @property
+    def client_size(self) -> Tuple[int, int]:
+        """客户区尺寸 (宽, 高)"""
+        return (self.client_rect[2] - self.client_rect[0], self.client_rect[3] - self.client_rect[1])
+
+    @property
+    def window_size(self) -> Tuple[int, int]:
+        """窗口尺寸 (宽, 高)"""
+        return (self.window_rect[2] - self.window_rect[0], self.window_rect[3] - self.window_rect[1])
+
+    @property
+    def scale_factor(self) -> float:
+        """DPI缩放因子"""
+        return self.dpi / 96.0
+
+
+class WindowInfoSource:
+    """窗口信息源接口"""
+
+    def query(self, hwnd: int) -> Optional[WindowInfo]:
+        """查询窗口信息，窗口不存在时返回 None"""
+        raise NotImplementedError
+
+
+class Win32WindowInfoSource(WindowInfoSource):
+    """基于 Win32 API 的窗口信息源"""
+
+    def __init__(self):
+        self._get_dpi_for_window = None
+        try:
+            import ctypes
+            user32 = ctypes.windll.user32
+            if hasattr(user32, 'GetDpiForWindow'):
+                self._get_dpi_for_window = user32.GetDpiForWindow
+        except Exception:
+            pass
+
+    def query(self, hwnd: int) -> Optional[WindowInfo]:
+        if not PYWIN32_AVAILABLE or not hwnd:
+            return None
+        try:
+            if not win32gui.IsWindow(hwnd):
+                return None
+            dpi = 96
+            if self._get_dpi_for_window is not None:
+                dpi = self._get_dpi_for_window(hwnd) or 96
+            return WindowInfo(
+                title=win32gui.GetWindowText(hwnd),
+                window_rect=tuple(win32gui.GetWindowRect(hwnd)),
+                client_rect=tuple(win32gui.GetClientRect(hwnd)),
+                dpi=dpi,
+            )
+        except Exception as e:
+            logger.debug(f"查询窗口 {hwnd} 信息失败: {e}")
+            return None
+
+
+class FakeWindowInfoSource(WindowInfoSource):
+    """假窗口表信息源（用于测试和无窗口环境）"""
+
+    def __init__(self, windows: Optional[Dict[int, WindowInfo]] = None):
+        self._windows: Dict[int, WindowInfo] = dict(windows or {})
+        self._lock = threading.Lock()
+        self.query_count = 0
+
+    def set_window(self, hwnd: int, title: str = "", window_rect: Rect = (0, 0, 800, 600),
+                   client_rect: Optional[Rect] = None, dpi: int = 96):
+        """创建或更新窗口"""
+        if client_rect is None:
+            client_rect = (0, 0, window_rect[2] - window_rect[0], window_rect[3] - window_rect[1])
+        with self._lock:
+            self._windows[hwnd] = WindowInfo(title, tuple(window_rect), tuple(client_rect), dpi)
+
+    def destroy_window(self, hwnd: int):
+        """销毁窗口"""
+        with self._lock:
+            self._windows.pop(hwnd, None)
+
+    def query(self, hwnd: int) -> Optional[WindowInfo]:
+        with self._lock:
+            self.query_count += 1
+            return self._windows.get(hwnd)
+
+
+def _diff_reasons(old: WindowState, new: WindowState) -> List[str]:
+    """比较两个状态，返回变化原因列表"""
+    if old.valid and not new.valid:
+        return [WINDOW_EVENT_DESTROY]
+    reasons = []
+    if old.valid != new.valid or old.client_rect != new.client_rect or old.window_size != new.window_size:
+        reasons.append(WINDOW_EVENT_RESIZE)
+    elif old.window_rect != new.window_rect:
+        reasons.append(WINDOW_EVENT_MOVE)
+    if old.dpi != new.dpi:
+        reasons.append(WINDOW_EVENT_DPI)
+    if old.title != new.title:
+        reasons.append(WINDOW_EVENT_TITLE)
+    return reasons
+
+
+class WindowStateWatcher:
+    """窗口状态监视器（单个后台线程轮询所有被监视的窗口）"""
+
+    def __init__(self, source: Optional[WindowInfoSource] = None, poll_interval: float = 0.25):
+        self.source = source or Win32WindowInfoSource()
+        self.poll_interval = poll_interval
+        self._states: Dict[int, WindowState] = {}
+        self._watch_counts: Dict[int, int] = {}
+        self._stale: Set[int] = set()
+        self._listeners: List[Callable[[int, WindowState, WindowState, List[str]], None]] = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # 监视管理
+    # ------------------------------------------------------------------
+    def watch(self, hwnd: int) -> WindowState:
+        """开始监视窗口（引用计数），返回当前状态"""
+        with self._lock:
+            self._watch_counts[hwnd] = self._watch_counts.get(hwnd, 0) + 1
+        state = self.refresh(hwnd)
+        self._ensure_thread()
+        return state
+
+    def unwatch(self, hwnd: int):
+        """停止监视窗口（引用计数归零时移除缓存）"""
+        with self._lock:
+            count = self._watch_counts.get(hwnd, 0) - 1
+            if count > 0:
+                self._watch_counts[hwnd] = count
+                return
+            self._watch_counts.pop(hwnd, None)
+            self._states.pop(hwnd, None)
+            self._stale.discard(hwnd)
+
+    def add_listener(self, callback: Callable[[int, WindowState, WindowState, List[str]], None]):
+        """添加状态变化监听器 callback(hwnd, old_state, new_state, reasons)"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """移除状态变化监听器"""
+        try:
+            self._listeners.remove(callback)
+        except ValueError:
+            pass
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+    def get_state(self, hwnd: int) -> WindowState:
+        """获取窗口状态（未缓存、已失效或未被监视且超过一个轮询周期时同步查询一次）"""
+        state = self._states.get(hwnd)
+        if state is None or hwnd in self._stale:
+            return self.refresh(hwnd)
+        if hwnd not in self._watch_counts and time.time() - state.updated_at > self.poll_interval:
+            return self.refresh(hwnd)
+        return state
+
+    def is_valid(self, hwnd: int) -> bool:
+        """窗口是否有效"""
+        return bool(hwnd) and self.get_state(hwnd).valid
+
+    def invalidate(self, hwnd: Optional[int] = None):
+        """标记窗口状态失效（hwnd 为 None 时标记全部），下次读取时重新查询"""
+        with self._lock:
+            if hwnd is None:
+                self._stale.update(self._states.keys())
+            else:
+                self._stale.add(hwnd)
+
+    # ------------------------------------------------------------------
+    # 轮询
+    # ------------------------------------------------------------------
+    def refresh(self, hwnd: int) -> WindowState:
+        """立即查询窗口并更新缓存，状态变化时通知监听器"""
+        info = self.source.query(hwnd) if hwnd else None
+        with self._lock:
+            old = self._states.get(hwnd)
+            version = old.version if old is not None else 0
+            if info is None:
+                new = WindowState(hwnd, False, version=version)
+            else:
+                new = WindowState(hwnd, True, info.title, info.window_rect, info.client_rect, info.dpi, version)
+            reasons = _diff_reasons(old, new) if old is not None else []
+            if reasons:
+                new = WindowState(new.hwnd, new.valid, new.title, new.window_rect, new.client_rect,
+                                  new.dpi, version + 1, new.updated_at)
+            self._states[hwnd] = new
+            self._stale.discard(hwnd)
+
+        if reasons:
+            logger.debug(f"窗口 {hwnd} 状态变化: {reasons}")
+            for listener in list(self._listeners):
+                try:
+                    listener(hwnd, old, new, reasons)
+                except Exception as e:
+                    logger.warning(f"窗口状态监听器出错: {e}")
+        return new
+
+    def poll_once(self):
+        """轮询一次所有被监视的窗口"""
+        with self._lock:
+            hwnds = list(self._watch_counts.keys())
+        for hwnd in hwnds:
+            self.refresh(hwnd)
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._poll_loop, name="WindowStateWatcher", daemon=True)
+        self._thread.start()
+
+    def _poll_loop(self):
+        while not self._stop_event.wait(self.poll_interval):
+            with self._lock:
+                if not self._watch_counts:
+                    self._thread = None
+                    return
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.warning(f"窗口状态轮询出错: {e}")
+
+    def stop(self):
+        """停止后台轮询"""
+        self._stop_event.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout=1)
+        self._thread = None
+
+
+# 全局窗口状态监视器
+_window_state_watcher: Optional[WindowStateWatcher] = None
+_watcher_lock = threading.Lock()
+
+# 执行后端登记的监视器：线程级优先，其次进程级（见 task_workflow.execution_backend）
+_current_watcher = threading.local()
+_default_watcher_override: Optional[WindowStateWatcher] = None
+
+
+def get_window_state_watcher() -> WindowStateWatcher:
+    """获取全局窗口状态监视器"""
+    global _window_state_watcher
+    if _window_state_watcher is None:
+        with _watcher_lock:
+            if _window_state_watcher is None:
+                _window_state_watcher = WindowStateWatcher()
+    return _window_state_watcher
+
+
+def set_window_info_source(source: WindowInfoSource):
+    """替换全局监视器的信息源（例如测试时使用假窗口表），并使现有缓存失效"""
+    watcher = get_window_state_watcher()
+    watcher.source = source
+    watcher.invalidate()
+
+
+def set_current_window_watcher(watcher: Optional[WindowStateWatcher]):
+    """登记当前线程使用的监视器（由执行后端登记），None 取消登记"""
+    _current_watcher.watcher = watcher
+
+
+def set_default_window_watcher(watcher: Optional[WindowStateWatcher]):
+    """替换进程默认使用的监视器（随默认执行后端一起替换），None 恢复全局监视器"""
+    global _default_watcher_override
+    _default_watcher_override = watcher
+
+
+def get_current_window_watcher() -> WindowStateWatcher:
+    """当前线程应使用的监视器：执行后端登记的监视器，未登记时为全局监视器"""
+    return (getattr(_current_watcher, 'watcher', None) or _default_watcher_override
+            or get_window_state_watcher())
+
+
+def get_window_state(hwnd: int) -> WindowState:
+    """获取窗口状态（使用当前执行后端的监视器）"""
+    return get_current_window_watcher().get_state(hwnd)
+
+
+def is_window_valid(hwnd: int) -> bool:
+    """窗口是否有效（读取缓存，不直接调用 IsWindow）"""
+    return get_current_window_watcher().is_valid(hwnd)
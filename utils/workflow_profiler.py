@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+
+"""
+工作流性能分析器
+为执行器和任务模块提供可嵌套的计时区间（截图、预处理、匹配、输入、等待等）：
+- 按卡片ID聚合为 次数/平均/P95 统计表
+- 按运行或按窗口导出 Chrome trace_event JSON（chrome://tracing 或 Perfetto 打开）
+  每个窗口每次运行开始时清空该窗口的区间并记录开始时间，导出的文件只包含本次运行
+- 运行时开关；关闭时 span() 直接返回共享的空上下文，开销可忽略
+"""
+
+import contextlib
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 常用区间名称
+SPAN_CARD = 'card'
+SPAN_CAPTURE = 'capture'
+SPAN_PREPROCESS = 'preprocess'
+SPAN_MATCH = 'match'
+SPAN_INPUT = 'input'
+SPAN_SLEEP = 'sleep'
+
+_NULL_SPAN = contextlib.nullcontext()
+
+# 区间事件: (名称, 卡片ID, 任务类型, 窗口句柄, 线程ID, 开始时间us, 耗时us, 嵌套深度)
+SpanEvent = Tuple[str, Any, Optional[str], Optional[int], int, float, float, int]
+
+
+class _StageStats:
+    """单个区间的耗时统计（保留最近的样本用于计算P95）"""
+
+    __slots__ = ('count', 'total_ms', 'max_ms', 'samples')
+
+    def __init__(self, max_samples: int):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.samples: Deque[float] = deque(maxlen=max_samples)
+
+    def add(self, duration_ms: float):
+        self.count += 1
+        self.total_ms += duration_ms
+        if duration_ms > self.max_ms:
+            self.max_ms = duration_ms
+        self.samples.append(duration_ms)
+
+    def to_dict(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0
+        return {
+            'count': self.count,
+            'total_ms': round(self.total_ms, 3),
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'p95_ms': round(p95, 3),
+            'max_ms': round(self.max_ms, 3),
+        }
+
+
+class _Span:
+    """计时区间上下文"""
+
+    __slots__ = ('_profiler', '_name', '_start_ns')
+
+    def __init__(self, profiler: 'WorkflowProfiler', name: str):
+        self._profiler = profiler
+        self._name = name
+        self._start_ns = 0
+
+    def __enter__(self):
+        local = self._profiler._local
+        local.depth = getattr(local, 'depth', 0) + 1
+        self._start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        end_ns = time.perf_counter_ns()
+        local = self._profiler._local
+        depth = local.depth
+        local.depth = depth - 1
+        self._profiler._add_span(self._name, self._start_ns, end_ns, depth - 1)
+        return False
+
+
+class _CardSpan(_Span):
+    """卡片根区间：设置当前线程的卡片上下文，使嵌套区间归属于该卡片"""
+
+    __slots__ = ('_card', '_previous')
+
+    def __init__(self, profiler: 'WorkflowProfiler', card_id: Any, task_type: Optional[str], hwnd: Optional[int]):
+        super().__init__(profiler, SPAN_CARD)
+        self._card = (card_id, task_type, hwnd)
+        self._previous = None
+
+    def __enter__(self):
+        local = self._profiler._local
+        self._previous = getattr(local, 'card', None)
+        local.card = self._card
+        return super().__enter__()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        super().__exit__(exc_type, exc_value, tb)
+        self._profiler._local.card = self._previous
+        return False
+
+
+class WorkflowProfiler:
+    """工作流性能分析器"""
+
+    def __init__(self, max_events: int = 200000, max_samples: int = 2048):
+        self.enabled = False
+        self.output_dir = "profiles"
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._max_samples = max_samples
+        self._events: Deque[SpanEvent] = deque(maxlen=max_events)
+        # {card_id: {'task_type': str, 'stages': {区间名: _StageStats}}}
+        self._cards: Dict[Any, Dict[str, Any]] = {}
+        self._epoch_ns = time.perf_counter_ns()
+        self._run_started = time.time()
+        self._window_run_started: Dict[Optional[int], float] = {}
+
+    # ------------------------------------------------------------------
+    # 开关
+    # ------------------------------------------------------------------
+    def set_enabled(self, enabled: bool):
+        """运行时开启/关闭记录"""
+        if enabled and not self.enabled:
+            self.reset()
+        self.enabled = bool(enabled)
+        logger.info(f"工作流性能分析已{'开启' if self.enabled else '关闭'}")
+
+    def reset(self):
+        """清空已记录的区间和统计（开始新的一次运行）"""
+        with self._lock:
+            self._events.clear()
+            self._cards.clear()
+            self._epoch_ns = time.perf_counter_ns()
+            self._run_started = time.time()
+            self._window_run_started.clear()
+
+    def begin_run(self, hwnd: Optional[int] = None):
+        """窗口开始新的一次运行：清空该窗口之前记录的区间并记录开始时间（卡片统计表继续累计）"""
+        with self._lock:
+            if any(event[3] == hwnd for event in self._events):
+                self._events = deque((event for event in self._events if event[3] != hwnd),
+                                     maxlen=self._events.maxlen)
+            self._window_run_started[hwnd] = time.time()
+
+    # ------------------------------------------------------------------
+    # 记录
+    # ------------------------------------------------------------------
+    def span(self, name: str):
+        """创建计时区间（关闭时返回空上下文）"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def card_span(self, card_id: Any, task_type: Optional[str] = None, hwnd: Optional[int] = None):
+        """创建卡片根区间（关闭时返回空上下文）"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _CardSpan(self, card_id, task_type, hwnd)
+
+    def _add_span(self, name: str, start_ns: int, end_ns: int, depth: int):
+        card_id, task_type, hwnd = getattr(self._local, 'card', None) or (None, None, None)
+        duration_ms = (end_ns - start_ns) / 1e6
+        event = (name, card_id, task_type, hwnd, threading.get_ident(),
+                 (start_ns - self._epoch_ns) / 1e3, (end_ns - start_ns) / 1e3, depth)
+        with self._lock:
+            self._events.append(event)
+            if card_id is None:
+                return
+            card = self._cards.get(card_id)
+            if card is None:
+                card = self._cards[card_id] = {'task_type': task_type, 'stages': {}}
+            stats = card['stages'].get(name)
+            if stats is None:
+                stats = card['stages'][name] = _StageStats(self._max_samples)
+            stats.add(duration_ms)
+
+    # ------------------------------------------------------------------
+    # 统计
+    # ------------------------------------------------------------------
+    def get_card_table(self) -> List[Dict[str, Any]]:
+        """按卡片ID聚合的统计表，每行包含卡片整体和各子区间的 次数/平均/P95"""
+        with self._lock:
+            cards = [(card_id, card['task_type'], {name: stats.to_dict() for name, stats in card['stages'].items()})
+                     for card_id, card in self._cards.items()]
+        table = []
+        for card_id, task_type, stages in cards:
+            total = stages.pop(SPAN_CARD, None) or {'count': 0, 'total_ms': 0.0, 'mean_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+            row = {'card_id': card_id, 'task_type': task_type}
+            row.update(total)
+            row['stages'] = stages
+            table.append(row)
+        return table
+
+    def top_cards(self, n: int = 10, key: str = 'total_ms') -> List[Dict[str, Any]]:
+        """返回最耗时的N个卡片（默认按总耗时排序）"""
+        return sorted(self.get_card_table(), key=lambda row: row.get(key, 0), reverse=True)[:n]
+
+    def format_table(self, n: int = 10) -> str:
+        """格式化最耗时卡片表（用于日志）"""
+        lines = [f"{'卡片':>6} {'类型':<14} {'次数':>6} {'平均ms':>9} {'P95ms':>9} {'总计ms':>11}  主要子区间"]
+        for row in self.top_cards(n):
+            stages = sorted(row['stages'].items(), key=lambda item: item[1]['total_ms'], reverse=True)[:3]
+            stage_text = ', '.join(f"{name}={stats['mean_ms']:.1f}" for name, stats in stages)
+            lines.append(f"{str(row['card_id']):>6} {str(row['task_type']):<14} {row['count']:>6} "
+                         f"{row['mean_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['total_ms']:>11.1f}  {stage_text}")
+        return '\n'.join(lines)
+
+    # ------------------------------------------------------------------
+    # Chrome trace 导出
+    # ------------------------------------------------------------------
+    def build_chrome_trace(self, hwnd: Optional[int] = None) -> Dict[str, Any]:
+        """构建 Chrome trace_event 数据；指定 hwnd 时只包含该窗口的区间"""
+        with self._lock:
+            events = list(self._events)
+        trace_events = []
+        processes = set()
+        for name, card_id, task_type, event_hwnd, tid, ts, dur, depth in events:
+            if hwnd is not None and event_hwnd != hwnd:
+                continue
+            pid = event_hwnd or 0
+            processes.add(pid)
+            trace_events.append({
+                'name': f"{card_id}:{task_type}" if name == SPAN_CARD else name,
+                'cat': name,
+                'ph': 'X',
+                'ts': round(ts, 3),
+                'dur': round(dur, 3),
+                'pid': pid,
+                'tid': tid,
+                'args': {'card_id': card_id, 'task_type': task_type, 'depth': depth},
+            })
+        for pid in processes:
+            trace_events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+                                 'args': {'name': f"窗口 {pid}" if pid else "未绑定窗口"}})
+        return {
+            'traceEvents': trace_events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'run_started': self._get_run_started(hwnd), 'hwnd': hwnd},
+        }
+
+    def _get_run_started(self, hwnd: Optional[int]) -> float:
+        """窗口本次运行的开始时间（没有调用过 begin_run 时为开启/重置的时间）"""
+        return self._window_run_started.get(hwnd, self._run_started)
+
+    def export_chrome_trace(self, path: Optional[str] = None, hwnd: Optional[int] = None) -> Optional[str]:
+        """导出 Chrome trace JSON（hwnd 为 None 时导出整次运行），返回文件路径"""
+        if path is None:
+            run_started = self._get_run_started(hwnd)
+            suffix = f"_hwnd{hwnd}" if hwnd is not None else ""
+            path = os.path.join(self.output_dir, time.strftime("profile_%Y%m%d_%H%M%S", time.localtime(run_started))
+                                + f"_{int(run_started * 1000) % 1000:03d}{suffix}.json")
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            trace = self.build_chrome_trace(hwnd)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(trace, f, ensure_ascii=False, default=str)
+            logger.info(f"性能分析已导出: {path} ({len(trace['traceEvents'])} 个事件)")
+            return path
+        except Exception as e:
+            logger.warning(f"导出性能分析失败: {e}")
+            return None
+
+
+# 全局性能分析器
+_workflow_profiler = WorkflowProfiler()
+
+
+def get_workflow_profiler() -> WorkflowProfiler:
+    """获取全局工作流性能分析器"""
+    return _workflow_profiler
+
+
+def profile_span(name: str):
+    """在全局性能分析器上创建计时区间（关闭时开销可忽略）"""
+    if not _workflow_profiler.enabled:
+        return _NULL_SPAN
+    return _Span(_workflow_profiler, name)
+
+
+def profiled(name: str) -> Callable[[Callable], Callable]:
+    """函数装饰器：把整个函数调用记录为一个计时区间"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _workflow_profiler.enabled:
+                return func(*args, **kwargs)
+            with _Span(_workflow_profiler, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+
+"""
+工作流结构化追踪
+用预分配的内存环形缓冲区记录结构化事件（卡片ID、类型、耗时、结果），替代热路径上的逐卡片INFO日志：
+- 按级别惰性过滤：级别未开启时不构造事件、不格式化字符串
+- 后台线程异步刷写到磁盘（JSON Lines）
+- 出错时把整个环形缓冲区转储到 日志目录/trace_dumps，便于事后分析；只保留最新的 MAX_DUMP_FILES 个转储文件
+"""
+
+import datetime
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# 追踪级别（与logging级别数值一致）
+TRACE_DEBUG = logging.DEBUG
+TRACE_INFO = logging.INFO
+TRACE_WARNING = logging.WARNING
+TRACE_ERROR = logging.ERROR
+
+# 事件字段顺序: (序号, 时间戳, 级别, 事件类型, 窗口句柄, 卡片ID, 任务类型, 耗时ms, 结果, 详情)
+_EVENT_FIELDS = ('seq', 'ts', 'level', 'kind', 'hwnd', 'card_id', 'task_type', 'duration_ms', 'outcome', 'detail')
+
+TraceEvent = Tuple[int, float, int, str, Optional[int], Any, Optional[str], Optional[float], Any, Any]
+
+# 转储文件放在日志目录下的子目录中，只保留最新的若干个
+DUMP_SUBDIR = "trace_dumps"
+MAX_DUMP_FILES = 20
+
+
+class WorkflowTracer:
+    """基于环形缓冲区的结构化追踪器"""
+
+    def __init__(self, capacity: int = 8192, level: int = TRACE_INFO):
+        self._capacity = max(16, int(capacity))
+        self._ring: List[Optional[TraceEvent]] = [None] * self._capacity
+        self._seq = 0
+        self._lock = threading.Lock()
+        self.level = level
+
+        # 异步刷写
+        self._trace_path: Optional[str] = None
+        self._dump_dir: Optional[str] = None
+        self._dump_count = 0
+        self._flush_interval = 1.0
+        self._flushed_seq = 0
+        self._dropped = 0
+        self._flush_event = threading.Event()
+        self._flush_thread: Optional[threading.Thread] = None
+        self._running = False
+
+    # ------------------------------------------------------------------
+    # 记录
+    # ------------------------------------------------------------------
+    def is_enabled(self, level: int) -> bool:
+        """级别是否开启（热路径上应先调用以避免构造参数）"""
+        return level >= self.level
+
+    def record(self, level: int, kind: str, card_id: Any = None, task_type: Optional[str] = None,
+               duration_ms: Optional[float] = None, outcome: Any = None, hwnd: Optional[int] = None,
+               detail: Union[None, str, Callable[[], Any]] = None):
+        """
+        记录一条事件
+
+        detail 可以传入无参可调用对象，仅在刷写或转储时才求值，避免热路径上格式化字符串。
+        """
+        if level < self.level:
+            return
+        with self._lock:
+            seq = self._seq
+            self._seq = seq + 1
+            self._ring[seq % self._capacity] = (seq, time.time(), level, kind, hwnd, card_id,
+                                                task_type, duration_ms, outcome, detail)
+
+    def card_finished(self, card_id: Any, task_type: str, duration_ms: float, success: bool,
+                      hwnd: Optional[int] = None, next_card_id: Any = None):
+        """记录卡片执行完成事件"""
+        if TRACE_INFO < self.level:
+            return
+        self.record(TRACE_INFO, 'card', card_id, task_type, duration_ms,
+                    'success' if success else 'failure', hwnd, next_card_id)
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+    def snapshot(self, since_seq: int = 0) -> List[TraceEvent]:
+        """按顺序返回环中序号 >= since_seq 的事件"""
+        with self._lock:
+            end = self._seq
+            start = max(since_seq, end - self._capacity)
+            events = [self._ring[seq % self._capacity] for seq in range(start, end)]
+        return [event for event in events if event is not None]
+
+    @staticmethod
+    def to_dict(event: TraceEvent) -> Dict[str, Any]:
+        """将事件转换为字典（此时才对惰性详情求值）"""
+        data = dict(zip(_EVENT_FIELDS, event))
+        detail = data.get('detail')
+        if callable(detail):
+            try:
+                data['detail'] = detail()
+            except Exception as e:
+                data['detail'] = f"<detail error: {e}>"
+        data['level'] = logging.getLevelName(data['level'])
+        return {key: value for key, value in data.items() if value is not None}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取追踪器统计"""
+        return {
+            'capacity': self._capacity,
+            'recorded': self._seq,
+            'flushed': self._flushed_seq,
+            'dropped': self._dropped,
+            'level': logging.getLevelName(self.level),
+            'trace_path': self._trace_path,
+        }
+
+    # ------------------------------------------------------------------
+    # 异步刷写和转储
+    # ------------------------------------------------------------------
+    def start(self, log_dir: str, flush_interval: float = 1.0):
+        """开启后台刷写线程，事件追加到 log_dir/trace_YYYY-MM-DD.jsonl"""
+        os.makedirs(log_dir, exist_ok=True)
+        self._trace_path = os.path.join(log_dir, datetime.date.today().strftime("trace_%Y-%m-%d.jsonl"))
+        self._dump_dir = os.path.join(log_dir, DUMP_SUBDIR)
+        self._flush_interval = flush_interval
+        if self._running:
+            return
+        self._running = True
+        self._flush_thread = threading.Thread(target=self._flush_loop, name="WorkflowTraceFlusher", daemon=True)
+        self._flush_thread.start()
+        logger.debug(f"工作流追踪已启动: {self._trace_path}")
+
+    def stop(self):
+        """停止后台刷写，并把剩余事件写入磁盘"""
+        self._running = False
+        self._flush_event.set()
+        if self._flush_thread and self._flush_thread.is_alive():
+            self._flush_thread.join(timeout=2)
+        self.flush()
+
+    def _flush_loop(self):
+        while self._running:
+            self._flush_event.wait(self._flush_interval)
+            self._flush_event.clear()
+            self.flush()
+
+    def flush(self):
+        """把尚未写入的事件追加到追踪文件"""
+        if not self._trace_path:
+            return
+        events = self.snapshot(self._flushed_seq)
+        if not events:
+            return
+        # 刷写跟不上时被覆盖的事件
+        self._dropped += max(0, events[0][0] - self._flushed_seq)
+        try:
+            with open(self._trace_path, 'a', encoding='utf-8') as f:
+                for event in events:
+                    f.write(json.dumps(self.to_dict(event), ensure_ascii=False, default=str))
+                    f.write('\n')
+            self._flushed_seq = events[-1][0] + 1
+        except Exception as e:
+            logger.warning(f"写入工作流追踪文件失败: {e}")
+
+    def dump(self, reason: str = "", path: Optional[str] = None) -> Optional[str]:
+        """
+        把整个环形缓冲区转储到文件（用于出错时的事后分析），返回文件路径
+
+        未指定路径时写入 start() 配置的日志目录下的 trace_dumps；追踪器未配置日志目录时不转储。
+        """
+        if path is None:
+            if not self._dump_dir:
+                logger.debug(f"工作流追踪未配置日志目录，跳过转储 (原因: {reason})")
+                return None
+            self._dump_count += 1
+            path = os.path.join(self._dump_dir, time.strftime("trace_dump_%Y%m%d_%H%M%S") + f"_{self._dump_count}.jsonl")
+        try:
+            events = self.snapshot(0)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'dump_reason': reason, 'events': len(events)}, ensure_ascii=False))
+                f.write('\n')
+                for event in events:
+                    f.write(json.dumps(self.to_dict(event), ensure_ascii=False, default=str))
+                    f.write('\n')
+            logger.info(f"工作流追踪已转储: {path} ({len(events)} 条事件, 原因: {reason})")
+        except Exception as e:
+            logger.warning(f"转储工作流追踪失败: {e}")
+            return None
+        self._prune_dumps(os.path.dirname(path) or ".")
+        return path
+
+    @staticmethod
+    def _prune_dumps(dump_dir: str):
+        """只保留最新的 MAX_DUMP_FILES 个转储文件"""
+        dumps = glob.glob(os.path.join(dump_dir, "trace_dump_*.jsonl"))
+        if len(dumps) <= MAX_DUMP_FILES:
+            return
+        dumps.sort(key=os.path.getmtime, reverse=True)
+        for old_path in dumps[MAX_DUMP_FILES:]:
+            try:
+                os.remove(old_path)
+            except OSError as e:
+                logger.debug(f"删除旧的追踪转储失败: {old_path}: {e}")
+
+
+# 全局追踪器
+_workflow_tracer = WorkflowTracer()
+
+
+def get_workflow_tracer() -> WorkflowTracer:
+    """获取全局工作流追踪器"""
+    return _workflow_tracer
+
+
+def configure_workflow_tracer(log_dir: str, level: int = TRACE_INFO, flush_interval: float = 1.0) -> WorkflowTracer:
+    """配置全局追踪器级别并开启异步刷写"""
+    _workflow_tracer.level = level
+    _workflow_tracer.start(log_dir, flush_interval)
+    return _workflow_tracer
+
+
+def shutdown_workflow_tracer():
+    """停止全局追踪器（写入剩余事件）"""
+    _workflow_tracer.stop()